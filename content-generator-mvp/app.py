@@ -13,15 +13,31 @@ Versión 3.3 - CSS Fix for CMS Compatibility + Article Structure
 """
 
 import streamlit as st
-import anthropic
 import requests
 import json
 import time
 import pandas as pd
 import os
-import re
+import uuid
+from functools import partial
 from datetime import datetime
 from gsc_checker import GSCChecker, render_gsc_auth_ui, render_gsc_check_results
+from telemetry import TelemetryStore, summarize_totals
+from result_cache import ResultCache
+from checkpoints import CheckpointStore
+from job_runner import JobRunner, JobStore, ACTIVE_STATUSES, JOB_CANCELLED, JOB_DONE, JOB_INTERRUPTED, JOB_QUEUED
+from rate_limiter import (
+    AdmissionController, RateLimitScheduler,
+    DEFAULT_MAX_IN_FLIGHT, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+)
+from prompts import ARQUETIPOS, generate_product_module, generate_carousel_module
+from article_analyzer import analyze_article
+from cms_export import export_for_cms
+from generator import (
+    ContentGeneratorV4, fetch_pdp_data, get_mock_pdp_data,
+    run_generation_job, ROUTING_PROFILES, DEFAULT_ROUTING_PROFILE, OUTLINE_MODE_MIN_LENGTH,
+    MAX_DRAFT_VARIANTS
+)
 
 # ============================================================================
 # CONFIGURACIÓN
@@ -45,6 +61,85 @@ if 'GSC_CLIENT_CONFIG' in st.secrets:
     except:
         st.warning("⚠️ GSC_CLIENT_CONFIG en secrets no es JSON válido")
 
+# ============================================================================
+# DATOS DE EJECUCIÓN (telemetría, cachés...) - no versionados
+# ============================================================================
+
+RUNTIME_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'runtime')
+
+TELEMETRY_STORE = TelemetryStore(os.path.join(RUNTIME_DATA_DIR, 'telemetry.jsonl'))
+TELEMETRY_SUMMARY_TTL = 300  # segundos; la firma del fichero invalida antes si hay registros nuevos
+
+DONE_RESULTS_CACHE_ENTRIES = 32  # Generaciones terminadas en memoria (resultados y descargas)
+
+@st.cache_resource
+def get_result_cache():
+    """Caché de resultados compartida por todas las sesiones del proceso"""
+    return ResultCache(os.path.join(RUNTIME_DATA_DIR, 'results'))
+
+@st.cache_resource
+def get_rate_scheduler():
+    """Planificador de llamadas a Anthropic compartido por todas las sesiones"""
+    return RateLimitScheduler(
+        requests_per_minute=int(st.secrets.get('ANTHROPIC_RPM', DEFAULT_REQUESTS_PER_MINUTE)),
+        tokens_per_minute=int(st.secrets.get('ANTHROPIC_TPM', DEFAULT_TOKENS_PER_MINUTE))
+    )
+
+@st.cache_resource
+def get_admission_controller():
+    """Límite de llamadas en curso del proceso, con cola justa entre editores"""
+    return AdmissionController(
+        max_in_flight=int(st.secrets.get('ANTHROPIC_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+    )
+
+@st.cache_resource
+def get_checkpoint_store():
+    """Checkpoints de etapas para reanudar generaciones fallidas"""
+    store = CheckpointStore(os.path.join(RUNTIME_DATA_DIR, 'checkpoints'))
+    store.prune()
+    return store
+
+@st.cache_resource
+def get_job_runner():
+    """Ejecutor de generaciones en segundo plano (sobrevive a reruns y recargas)"""
+    os.makedirs(RUNTIME_DATA_DIR, exist_ok=True)
+    store = JobStore(os.path.join(RUNTIME_DATA_DIR, 'jobs.sqlite3'))
+    # Los trabajos activos de un proceso anterior ya no tienen hilo que los ejecute
+    store.mark_interrupted()
+    return JobRunner(store, max_workers=int(st.secrets.get('GENERATION_WORKERS', 4)))
+
+@st.cache_data(ttl=TELEMETRY_SUMMARY_TTL, max_entries=8, show_spinner=False)
+def get_telemetry_summary(group_by, signature):
+    """
+    p50/p95 del histórico de telemetría
+    
+    `signature` (mtime y tamaño del fichero) forma parte de la clave: los reruns
+    no vuelven a leer el JSONL mientras no haya registros nuevos.
+    """
+    return TELEMETRY_STORE.summary(group_by=group_by)
+
+SAVINGS_REPORT_TTL = 300  # segundos; un registro nuevo cambia la firma e invalida antes
+
+@st.cache_data(ttl=SAVINGS_REPORT_TTL, max_entries=4, show_spinner=False)
+def get_checkpoint_savings(days, signature):
+    """Informe de reanudaciones (solo se relee si cambia la firma del registro)"""
+    return get_checkpoint_store().savings_report(days=days)
+
+@st.cache_resource(max_entries=DONE_RESULTS_CACHE_ENTRIES, show_spinner=False)
+def get_done_job_results(job_id):
+    """
+    Resultados de una generación terminada (no cambian: se leen de SQLite una vez)
+    
+    Se devuelve siempre el mismo objeto: los reruns no vuelven a deserializar el
+    artículo y los análisis memoizados por contenido no vuelven a calcular su hash.
+    """
+    return get_job_runner().store.get_result(job_id)
+
+@st.cache_resource(max_entries=DONE_RESULTS_CACHE_ENTRIES, show_spinner=False)
+def get_results_json_download(job_id):
+    """JSON completo de una generación terminada para descargar (se serializa una vez)"""
+    return json.dumps(get_done_job_results(job_id), indent=2, ensure_ascii=False)
+
 # ============================================================================
 # CARGA DE DATOS DE CATEGORÍAS - MEJORADA CON DEBUG
 # ============================================================================
@@ -119,20 +214,10 @@ def search_category(categories, search_term):
 def scrape_pdp_n8n(product_id):
     """Scrapea PDP usando webhook n8n"""
     try:
-        webhook_url = "https://n8n.prod.pccomponentes.com/webhook/extract-product-data"
-        
-        response = requests.post(
-            webhook_url,
-            json={"productId": product_id},
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Error en webhook: {response.status_code}")
-            return None
-            
+        return fetch_pdp_data(product_id)
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Error en webhook: {e.response.status_code}")
+        return None
     except requests.exceptions.ConnectionError:
         st.error("No se puede conectar al webhook. Conecta a la VPN")
         return None
@@ -140,1310 +225,6 @@ def scrape_pdp_n8n(product_id):
         st.error(f"Error scrapeando PDP: {str(e)}")
         return None
 
-def get_mock_pdp_data(product_id):
-    """Datos mock para testing sin VPN"""
-    return {
-        "productId": product_id,
-        "nombre": "Xiaomi Robot Vacuum E5 Robot con Función de Aspiración y Fregado",
-        "precio_actual": "59.99",
-        "precio_anterior": "64.99",
-        "descuento": "-7%",
-        "valoracion": "4.1",
-        "num_opiniones": "112",
-        "badges": ["Precio mínimo histórico"],
-        "url_producto": f"https://www.pccomponentes.com/producto/{product_id}",
-        "especificaciones": {
-            "potencia_succion": "2000Pa",
-            "navegacion": "Giroscopio + sensores IR",
-            "bateria": "2600 mAh",
-            "autonomia": "110 minutos",
-            "deposito_polvo": "400 ml",
-            "deposito_agua": "90 ml",
-            "altura": "70 mm",
-            "conectividad": "WiFi 2.4GHz",
-            "control_voz": "Alexa, Google Assistant",
-            "fregado": "Sí (mopa incluida)"
-        },
-        "descripcion": "Olvida la limpieza manual: aspira y friega con eficiencia, gestión desde tu móvil y acabado impecable en todo tipo de suelos.",
-        "opiniones_resumen": [
-            "Calidad-precio de 10. Es ligero, hace poco ruido y la app es muy sencilla de ejecutar.",
-            "Aspira muy bien en suelos duros. El fregado es perfecto para mantenimiento diario.",
-            "El perfil bajo de 70mm es genial para limpiar debajo de muebles.",
-            "No mapea por habitaciones pero limpia toda la superficie eficientemente."
-        ]
-    }
-
-# ============================================================================
-# ARQUETIPOS COMPLETOS CON CAMPOS ESPECÍFICOS
-# ============================================================================
-
-ARQUETIPOS = {
-    "ARQ-1": {
-        "code": "ARQ-1",
-        "name": "📰 Noticia / Actualidad",
-        "description": "Noticia sobre lanzamiento, actualización o evento relevante",
-        "funnel": "Top",
-        "default_length": 1200,
-        "use_case": "Lanzamientos, actualizaciones, eventos, anuncios oficiales",
-        "campos_especificos": {
-            "noticia_principal": {
-                "label": "¿Qué ha pasado? (noticia principal)",
-                "type": "textarea",
-                "placeholder": "Ej: Xiaomi lanza nuevo robot aspirador E5 Pro con mapeo láser y autovaciado por 199€",
-                "help": "Resumen de la noticia en 1-2 frases"
-            },
-            "fecha_evento": {
-                "label": "Fecha del evento/lanzamiento",
-                "type": "text",
-                "placeholder": "Ej: 25 de noviembre de 2025",
-                "help": "Fecha exacta si está disponible"
-            },
-            "fuente_oficial": {
-                "label": "Fuente oficial",
-                "type": "text",
-                "placeholder": "Ej: Comunicado oficial de Xiaomi, evento de prensa",
-                "help": "De dónde viene la información"
-            },
-            "contexto_previo": {
-                "label": "Contexto previo relevante",
-                "type": "textarea",
-                "placeholder": "Ej: El modelo anterior E5 fue bestseller en 2024 con más de 50.000 unidades vendidas",
-                "help": "Información de fondo que da contexto"
-            },
-            "impacto_usuario": {
-                "label": "Impacto para el usuario",
-                "type": "textarea",
-                "placeholder": "Ej: Los usuarios actuales del E5 podrán actualizar el firmware para activar nuevas funciones",
-                "help": "Qué significa esto para los lectores"
-            }
-        }
-    },
-    "ARQ-2": {
-        "code": "ARQ-2",
-        "name": "📖 Guía Paso a Paso",
-        "description": "Tutorial detallado para realizar una tarea o configuración",
-        "funnel": "Middle",
-        "default_length": 1800,
-        "use_case": "Configuraciones, instalaciones, resolución de problemas",
-        "campos_especificos": {
-            "tarea_objetivo": {
-                "label": "¿Qué tarea se va a explicar?",
-                "type": "text",
-                "placeholder": "Ej: Configurar el robot aspirador Xiaomi E5 para limpieza programada",
-                "help": "Objetivo claro que el usuario quiere conseguir"
-            },
-            "requisitos_previos": {
-                "label": "Requisitos previos",
-                "type": "textarea",
-                "placeholder": "Ej: Tener la app Xiaomi Home instalada, WiFi 2.4GHz configurado, robot cargado al 100%",
-                "help": "Qué necesita el usuario antes de empezar"
-            },
-            "tiempo_estimado": {
-                "label": "Tiempo estimado",
-                "type": "text",
-                "placeholder": "Ej: 10-15 minutos",
-                "help": "Cuánto tardará el proceso"
-            },
-            "dificultad": {
-                "label": "Nivel de dificultad",
-                "type": "text",
-                "placeholder": "Ej: Principiante / Intermedio / Avanzado",
-                "help": "Para qué nivel de usuario está pensado"
-            },
-            "puntos_criticos": {
-                "label": "Puntos críticos o errores comunes",
-                "type": "textarea",
-                "placeholder": "Ej: Asegúrate de conectar al WiFi 2.4GHz y NO 5GHz. Si no aparece el robot, reinicia la app",
-                "help": "Problemas típicos y cómo evitarlos"
-            }
-        }
-    },
-    "ARQ-3": {
-        "code": "ARQ-3",
-        "name": "💡 Explicación / Educativo",
-        "description": "Explica conceptos técnicos o funcionamiento de tecnología",
-        "funnel": "Top",
-        "default_length": 1600,
-        "use_case": "Educar sobre tecnologías, conceptos, diferencias técnicas",
-        "campos_especificos": {
-            "concepto_principal": {
-                "label": "Concepto a explicar",
-                "type": "text",
-                "placeholder": "Ej: Navegación láser vs giroscopio en robots aspiradores",
-                "help": "Qué se va a explicar"
-            },
-            "nivel_tecnico": {
-                "label": "Nivel técnico del público",
-                "type": "text",
-                "placeholder": "Ej: Usuario general sin conocimientos técnicos",
-                "help": "Define cuánto tecnicismo usar"
-            },
-            "analogias_utiles": {
-                "label": "Analogías o ejemplos útiles",
-                "type": "textarea",
-                "placeholder": "Ej: La navegación láser es como un GPS que mapea tu casa; el giroscopio es como conducir con brújula",
-                "help": "Comparaciones que faciliten la comprensión"
-            },
-            "aplicacion_practica": {
-                "label": "Aplicación práctica",
-                "type": "textarea",
-                "placeholder": "Ej: Con láser puedes limpiar solo la cocina; con giroscopio limpia toda la casa sin seleccionar",
-                "help": "Por qué es importante este concepto en la práctica"
-            }
-        }
-    },
-    "ARQ-4": {
-        "code": "ARQ-4",
-        "name": "⭐ Review / Análisis",
-        "description": "Análisis profundo de producto único con pros, contras y veredicto",
-        "funnel": "Middle",
-        "default_length": 1800,
-        "use_case": "Producto único destacado - Black Friday, lanzamientos, ofertas especiales",
-        "campos_especificos": {
-            "tiempo_uso": {
-                "label": "Tiempo de uso/prueba",
-                "type": "text",
-                "placeholder": "Ej: 2 semanas de uso intensivo",
-                "help": "Cuánto tiempo se ha probado el producto"
-            },
-            "escenarios_prueba": {
-                "label": "Escenarios de prueba",
-                "type": "textarea",
-                "placeholder": "Ej: Piso 75m², 2 adultos + perro, suelos de parquet y baldosa, limpieza diaria",
-                "help": "En qué contexto se ha probado"
-            },
-            "competencia_directa": {
-                "label": "Competencia directa",
-                "type": "text",
-                "placeholder": "Ej: Roborock Q7, Conga 3490, iRobot Roomba i3",
-                "help": "Productos similares para comparar"
-            },
-            "punto_fuerte_principal": {
-                "label": "Principal punto fuerte",
-                "type": "text",
-                "placeholder": "Ej: Relación calidad-precio imbatible en su rango",
-                "help": "Lo que más destaca del producto"
-            },
-            "limitacion_principal": {
-                "label": "Principal limitación",
-                "type": "text",
-                "placeholder": "Ej: No tiene mapeo por habitaciones",
-                "help": "Limitación más importante a mencionar (en positivo)"
-            }
-        }
-    },
-    "ARQ-5": {
-        "code": "ARQ-5",
-        "name": "⚖️ Comparativa A vs B",
-        "description": "Comparación directa entre 2-3 productos similares",
-        "funnel": "Middle",
-        "default_length": 1600,
-        "use_case": "Ayudar a elegir entre alternativas directas",
-        "campos_especificos": {
-            "producto_a_nombre": {
-                "label": "Producto A - Nombre",
-                "type": "text",
-                "placeholder": "Ej: Xiaomi Robot Vacuum E5",
-                "help": "Primer producto a comparar"
-            },
-            "producto_a_caracteristicas": {
-                "label": "Producto A - Características clave",
-                "type": "textarea",
-                "placeholder": "Ej: 2000Pa succión, 110 min autonomía, WiFi, fregado básico, 59€",
-                "help": "Specs principales del producto A"
-            },
-            "producto_a_mejor_para": {
-                "label": "Producto A - Mejor para casos de uso",
-                "type": "textarea",
-                "placeholder": "Ej: Presupuesto ajustado, pisos pequeños-medianos, mantenimiento diario básico",
-                "help": "Cuándo elegir el producto A"
-            },
-            "producto_b_nombre": {
-                "label": "Producto B - Nombre",
-                "type": "text",
-                "placeholder": "Ej: Roborock Q7",
-                "help": "Segundo producto a comparar"
-            },
-            "producto_b_caracteristicas": {
-                "label": "Producto B - Características clave",
-                "type": "textarea",
-                "placeholder": "Ej: 2700Pa succión, 180 min autonomía, mapeo láser, fregado inteligente, 99€",
-                "help": "Specs principales del producto B"
-            },
-            "producto_b_mejor_para": {
-                "label": "Producto B - Mejor para casos de uso",
-                "type": "textarea",
-                "placeholder": "Ej: Casas grandes, necesidad de mapeo por habitaciones, presupuesto medio",
-                "help": "Cuándo elegir el producto B"
-            },
-            "criterios_comparacion": {
-                "label": "Criterios principales de comparación",
-                "type": "textarea",
-                "placeholder": "Ej: Potencia de succión, autonomía, navegación, fregado, precio, app móvil",
-                "help": "En qué aspectos se van a comparar"
-            }
-        }
-    },
-    "ARQ-6": {
-        "code": "ARQ-6",
-        "name": "🔥 Deal Alert / Chollo",
-        "description": "Alerta de oferta destacada con urgencia",
-        "funnel": "Bottom",
-        "default_length": 1000,
-        "use_case": "Ofertas flash, chollos limitados, precio histórico",
-        "campos_especificos": {
-            "precio_actual": {
-                "label": "Precio actual",
-                "type": "text",
-                "placeholder": "Ej: 59€",
-                "help": "Precio de la oferta"
-            },
-            "precio_habitual": {
-                "label": "Precio habitual",
-                "type": "text",
-                "placeholder": "Ej: 89€",
-                "help": "Precio normal sin oferta"
-            },
-            "ahorro_total": {
-                "label": "Ahorro total",
-                "type": "text",
-                "placeholder": "Ej: 30€ (-34%)",
-                "help": "Cuánto se ahorra"
-            },
-            "duracion_oferta": {
-                "label": "Duración de la oferta",
-                "type": "text",
-                "placeholder": "Ej: Solo hasta medianoche / Mientras duren existencias / 72 horas",
-                "help": "Cuánto tiempo estará disponible"
-            },
-            "stock_disponible": {
-                "label": "Stock o unidades disponibles",
-                "type": "text",
-                "placeholder": "Ej: Quedan menos de 20 unidades / Stock limitado",
-                "help": "Información de disponibilidad para urgencia"
-            },
-            "precio_historico": {
-                "label": "¿Es precio mínimo histórico?",
-                "type": "text",
-                "placeholder": "Ej: Sí, primera vez por debajo de 60€ / No, pero mejor precio del mes",
-                "help": "Contexto histórico del precio"
-            },
-            "por_que_oferta": {
-                "label": "¿Por qué está en oferta?",
-                "type": "text",
-                "placeholder": "Ej: Black Friday / Nuevo modelo próximo a salir / Liquidación stock",
-                "help": "Razón de la oferta (si se conoce)"
-            }
-        }
-    },
-    "ARQ-7": {
-        "code": "ARQ-7",
-        "name": "🏆 Roundup / Mejores X",
-        "description": "Top X productos en una categoría",
-        "funnel": "Middle",
-        "default_length": 2200,
-        "use_case": "Lista categoría - Black Friday, guías de compra",
-        "campos_especificos": {
-            "numero_productos": {
-                "label": "Número de productos en el top",
-                "type": "text",
-                "placeholder": "Ej: 5",
-                "help": "Cuántos productos incluir (3-10 recomendado)"
-            },
-            "criterios_seleccion": {
-                "label": "Criterios de selección",
-                "type": "textarea",
-                "placeholder": "Ej: Probados personalmente, más vendidos del año, mejor valorados, diferentes rangos de precio",
-                "help": "Por qué estos productos y no otros"
-            },
-            "rango_precios": {
-                "label": "Rango de precios",
-                "type": "text",
-                "placeholder": "Ej: De 59€ a 299€",
-                "help": "Desde el más barato al más caro"
-            },
-            "categoria_especifica": {
-                "label": "Categoría específica",
-                "type": "text",
-                "placeholder": "Ej: Robots aspiradores con fregado / Monitores gaming 1440p / Portátiles <600€",
-                "help": "Define bien la categoría para el título"
-            },
-            "ganador_absoluto": {
-                "label": "Ganador absoluto (si lo hay)",
-                "type": "text",
-                "placeholder": "Ej: Roborock S7+ es nuestra elección premium / Xiaomi E5 mejor calidad-precio",
-                "help": "Producto destacado del top (opcional)"
-            }
-        }
-    },
-    "ARQ-8": {
-        "code": "ARQ-8",
-        "name": "💰 Por presupuesto",
-        "description": "Mejores productos por menos de X€",
-        "funnel": "Bottom",
-        "default_length": 1600,
-        "use_case": "Chollos en rango de precio específico",
-        "campos_especificos": {
-            "presupuesto_limite": {
-                "label": "Presupuesto límite",
-                "type": "text",
-                "placeholder": "Ej: 100€ / 500€ / 1000€",
-                "help": "Precio máximo del rango"
-            },
-            "que_esperar": {
-                "label": "Qué se puede esperar en este rango",
-                "type": "textarea",
-                "placeholder": "Ej: Por menos de 100€ puedes conseguir robots básicos sin mapeo pero con buena succión y app móvil",
-                "help": "Expectativas realistas del presupuesto"
-            },
-            "que_sacrificas": {
-                "label": "Qué características se sacrifican",
-                "type": "textarea",
-                "placeholder": "Ej: No tendrás mapeo láser ni autovaciado, pero la limpieza básica es efectiva",
-                "help": "Qué no esperar en este rango (en positivo)"
-            },
-            "mejor_opcion": {
-                "label": "Mejor opción en el rango",
-                "type": "text",
-                "placeholder": "Ej: Xiaomi E5 a 59€ es imbatible en calidad-precio",
-                "help": "Producto destacado del presupuesto"
-            }
-        }
-    },
-    "ARQ-9": {
-        "code": "ARQ-9",
-        "name": "🥊 Versus Detallado",
-        "description": "Enfrentamiento profundo producto a producto con ganador claro",
-        "funnel": "Bottom",
-        "default_length": 2000,
-        "use_case": "Decisión de compra entre dos modelos muy similares",
-        "campos_especificos": {
-            "producto_1": {
-                "label": "Producto 1",
-                "type": "text",
-                "placeholder": "Ej: Xiaomi Robot Vacuum E5",
-                "help": "Primer contendiente"
-            },
-            "producto_2": {
-                "label": "Producto 2",
-                "type": "text",
-                "placeholder": "Ej: Roborock Q7",
-                "help": "Segundo contendiente"
-            },
-            "categorias_versus": {
-                "label": "Categorías de enfrentamiento",
-                "type": "textarea",
-                "placeholder": "Ej: Potencia de succión, Autonomía, Navegación, Fregado, App móvil, Precio, Ruido",
-                "help": "Aspectos específicos a comparar (separa por comas o líneas)"
-            },
-            "ganador_categorias": {
-                "label": "Ganadores por categoría",
-                "type": "textarea",
-                "placeholder": "Ej: Succión: Roborock +700Pa | Autonomía: Roborock +70min | Precio: Xiaomi -40€",
-                "help": "Quién gana en cada categoría"
-            },
-            "ganador_global": {
-                "label": "Ganador global y por qué",
-                "type": "textarea",
-                "placeholder": "Ej: Xiaomi gana por precio y suficiencia; Roborock solo vale la pena si necesitas mapeo láser",
-                "help": "Veredicto final del versus"
-            }
-        }
-    },
-    "ARQ-10": {
-        "code": "ARQ-10",
-        "name": "👤 Por perfil de usuario",
-        "description": "Productos perfectos para un tipo específico de usuario",
-        "funnel": "Middle",
-        "default_length": 1800,
-        "use_case": "Segmentación por audiencia (gamers, estudiantes, profesionales)",
-        "campos_especificos": {
-            "perfil_usuario": {
-                "label": "Perfil de usuario",
-                "type": "text",
-                "placeholder": "Ej: Estudiante universitario / Gamer competitivo / Profesional teletrabajo",
-                "help": "Define el tipo de usuario objetivo"
-            },
-            "necesidades_especificas": {
-                "label": "Necesidades específicas del perfil",
-                "type": "textarea",
-                "placeholder": "Ej: Portabilidad, batería larga, presupuesto <600€, Office y navegación",
-                "help": "Qué necesita este usuario específicamente"
-            },
-            "prioridades": {
-                "label": "Prioridades del perfil",
-                "type": "textarea",
-                "placeholder": "Ej: 1. Precio, 2. Batería, 3. Peso, 4. Pantalla de calidad",
-                "help": "Orden de importancia de características"
-            },
-            "no_necesita": {
-                "label": "Qué NO necesita este perfil",
-                "type": "textarea",
-                "placeholder": "Ej: No necesita GPU dedicada, ni pantalla 4K, ni más de 16GB RAM",
-                "help": "Características por las que no vale pagar más"
-            }
-        }
-    },
-    "ARQ-11": {
-        "code": "ARQ-11",
-        "name": "🔮 Tendencias / Predicciones",
-        "description": "Análisis de tendencias del mercado o predicciones",
-        "funnel": "Top",
-        "default_length": 1400,
-        "use_case": "Contenido de autoridad, análisis de mercado, tendencias tech",
-        "campos_especificos": {
-            "tendencia_principal": {
-                "label": "Tendencia principal",
-                "type": "text",
-                "placeholder": "Ej: Robots aspiradores con IA y autovaciado se están volviendo accesibles",
-                "help": "Qué tendencia se está observando"
-            },
-            "datos_soporte": {
-                "label": "Datos que soportan la tendencia",
-                "type": "textarea",
-                "placeholder": "Ej: Ventas de modelos con autovaciado +150% vs 2023, precios han bajado 40% en 2 años",
-                "help": "Números, stats, datos concretos"
-            },
-            "prediccion": {
-                "label": "Predicción o evolución futura",
-                "type": "textarea",
-                "placeholder": "Ej: En 2026, los modelos básicos incluirán mapeo láser como estándar",
-                "help": "Hacia dónde va el mercado"
-            },
-            "impacto_consumidor": {
-                "label": "Impacto para el consumidor",
-                "type": "textarea",
-                "placeholder": "Ej: Mejor momento para comprar - más funciones por menos dinero que nunca",
-                "help": "Qué significa para el usuario final"
-            }
-        }
-    },
-    "ARQ-12": {
-        "code": "ARQ-12",
-        "name": "📦 Unboxing / Primera impresión",
-        "description": "Experiencia de unboxing y primeras horas con el producto",
-        "funnel": "Top/Middle",
-        "default_length": 1200,
-        "use_case": "Lanzamientos, primeras impresiones, experiencia inicial",
-        "campos_especificos": {
-            "contenido_caja": {
-                "label": "Contenido de la caja",
-                "type": "textarea",
-                "placeholder": "Ej: Robot, base de carga, mopa x2, cepillo extra, filtro adicional, manual",
-                "help": "Qué viene incluido"
-            },
-            "primera_impresion_build": {
-                "label": "Primera impresión - Construcción",
-                "type": "textarea",
-                "placeholder": "Ej: Plástico de calidad media-alta, peso 3kg, acabados limpios, botones físicos táctiles",
-                "help": "Calidad de construcción al tacto"
-            },
-            "sorpresas_positivas": {
-                "label": "Sorpresas positivas",
-                "type": "textarea",
-                "placeholder": "Ej: Incluye 2 mopas de repuesto y filtro extra, embalaje sostenible",
-                "help": "Qué ha superado expectativas"
-            },
-            "sorpresas_negativas": {
-                "label": "Decepciones o sorpresas negativas",
-                "type": "textarea",
-                "placeholder": "Ej: Manual solo en inglés, depósito de agua más pequeño de lo esperado",
-                "help": "Qué ha decepcionado (en tono neutral)"
-            },
-            "setup_inicial": {
-                "label": "Configuración inicial",
-                "type": "text",
-                "placeholder": "Ej: 5 minutos, muy sencillo, app intuitiva",
-                "help": "Experiencia del primer uso"
-            }
-        }
-    },
-    "ARQ-13": {
-        "code": "ARQ-13",
-        "name": "❓ FAQ / Preguntas Frecuentes",
-        "description": "Respuestas a las preguntas más comunes sobre un producto o categoría",
-        "funnel": "Middle",
-        "default_length": 1400,
-        "use_case": "Resolver dudas comunes, SEO de long-tail queries",
-        "campos_especificos": {
-            "producto_categoria": {
-                "label": "Producto o categoría",
-                "type": "text",
-                "placeholder": "Ej: Robots aspiradores / Xiaomi Robot Vacuum E5",
-                "help": "Sobre qué trata el FAQ"
-            },
-            "preguntas_principales": {
-                "label": "Preguntas principales (una por línea)",
-                "type": "textarea",
-                "placeholder": "¿Cuánto dura la batería?\n¿Se puede usar en alfombras?\n¿Necesita WiFi?",
-                "help": "Preguntas más comunes"
-            },
-            "audiencia": {
-                "label": "Audiencia objetivo",
-                "type": "text",
-                "placeholder": "Ej: Usuarios primerizos / Personas considerando compra",
-                "help": "Para quién va dirigido"
-            }
-        }
-    },
-    "ARQ-14": {
-        "code": "ARQ-14",
-        "name": "🎯 Caso de Uso Específico",
-        "description": "Soluciones para un problema o caso de uso muy concreto",
-        "funnel": "Bottom",
-        "default_length": 1600,
-        "use_case": "Nichos específicos (mascotas, pisos pequeños, etc.)",
-        "campos_especificos": {
-            "problema_especifico": {
-                "label": "Problema o caso de uso",
-                "type": "text",
-                "placeholder": "Ej: Limpieza efectiva con perros que sueltan mucho pelo",
-                "help": "Qué problema resuelve"
-            },
-            "contexto_detallado": {
-                "label": "Contexto detallado",
-                "type": "textarea",
-                "placeholder": "Ej: Dos perros labradores, piso 90m², suelos parquet y alfombras, pelo diario abundante",
-                "help": "Situación específica del usuario"
-            },
-            "caracteristicas_criticas": {
-                "label": "Características críticas para este caso",
-                "type": "textarea",
-                "placeholder": "Ej: Cepillo anti-enredo, depósito grande, succión 2500Pa+, app con alertas",
-                "help": "Qué debe tener sí o sí"
-            },
-            "productos_recomendados": {
-                "label": "Productos recomendados",
-                "type": "text",
-                "placeholder": "Ej: Roborock S7+ (premium), Conga 4690 (gama media), Xiaomi E10 (económico)",
-                "help": "Productos que mejor funcionan"
-            }
-        }
-    },
-    "ARQ-15": {
-        "code": "ARQ-15",
-        "name": "⚠️ Errores Comunes",
-        "description": "Errores típicos al comprar o usar un producto",
-        "funnel": "Middle",
-        "default_length": 1400,
-        "use_case": "Educar para evitar frustraciones post-compra",
-        "campos_especificos": {
-            "categoria_producto": {
-                "label": "Categoría o producto",
-                "type": "text",
-                "placeholder": "Ej: Robots aspiradores / Portátiles gaming",
-                "help": "Sobre qué trata"
-            },
-            "errores_principales": {
-                "label": "Errores principales (uno por línea)",
-                "type": "textarea",
-                "placeholder": "No considerar la altura del robot\nElegir por precio solo\nIgnorar tipo de suelos",
-                "help": "Errores más comunes"
-            },
-            "consecuencias": {
-                "label": "Consecuencias de cada error",
-                "type": "textarea",
-                "placeholder": "No puede limpiar debajo de muebles\nRenunciando a funciones esenciales\nRendimiento pobre en alfombras",
-                "help": "Qué pasa si se comete cada error"
-            }
-        }
-    },
-    "ARQ-16": {
-        "code": "ARQ-16",
-        "name": "🆚 X vs Y - Cuál elegir",
-        "description": "Dilema entre dos opciones con recomendación clara según perfil",
-        "funnel": "Bottom",
-        "default_length": 1600,
-        "use_case": "Ayudar a decidir entre dos alternativas populares",
-        "campos_especificos": {
-            "opcion_a": {
-                "label": "Opción A",
-                "type": "text",
-                "placeholder": "Ej: Xiaomi Robot Vacuum E5",
-                "help": "Primera opción"
-            },
-            "opcion_b": {
-                "label": "Opción B",
-                "type": "text",
-                "placeholder": "Ej: Roborock Q7",
-                "help": "Segunda opción"
-            },
-            "perfiles_usuario": {
-                "label": "Perfiles de usuario",
-                "type": "textarea",
-                "placeholder": "Perfil 1: Presupuesto ajustado\nPerfil 2: Necesita mapeo\nPerfil 3: Casa grande",
-                "help": "Diferentes tipos de usuarios"
-            },
-            "recomendacion_por_perfil": {
-                "label": "Recomendación por perfil",
-                "type": "textarea",
-                "placeholder": "Perfil 1 → Xiaomi E5\nPerfil 2 → Roborock Q7\nPerfil 3 → Roborock Q7",
-                "help": "Cuál elegir según perfil"
-            }
-        }
-    },
-    "ARQ-17": {
-        "code": "ARQ-17",
-        "name": "📊 Comparativa Tabla",
-        "description": "Comparación visual de múltiples productos en tabla",
-        "funnel": "Middle",
-        "default_length": 1200,
-        "use_case": "Comparar 3-5 productos visualmente",
-        "campos_especificos": {
-            "productos_comparar": {
-                "label": "Productos a comparar (uno por línea)",
-                "type": "textarea",
-                "placeholder": "Xiaomi E5\nRoborock Q7\nConga 4690\niRobot Roomba i3",
-                "help": "Lista de productos"
-            },
-            "criterios_tabla": {
-                "label": "Criterios de comparación (columnas)",
-                "type": "textarea",
-                "placeholder": "Precio\nPotencia succión\nAutonomía\nMapeo\nFregado\nApp",
-                "help": "Qué aspectos comparar"
-            },
-            "destacar_ganador": {
-                "label": "¿Destacar ganador por criterio?",
-                "type": "text",
-                "placeholder": "Sí / No",
-                "help": "Marcar el mejor en cada categoría"
-            }
-        }
-    },
-    "ARQ-18": {
-        "code": "ARQ-18",
-        "name": "🎁 Regalo Perfecto",
-        "description": "Guía de regalo para ocasión o persona específica",
-        "funnel": "Top/Middle",
-        "default_length": 1400,
-        "use_case": "Navidad, cumpleaños, ocasiones especiales",
-        "campos_especificos": {
-            "ocasion": {
-                "label": "Ocasión",
-                "type": "text",
-                "placeholder": "Ej: Navidad / Cumpleaños papá / Día de la madre",
-                "help": "Para qué ocasión"
-            },
-            "perfil_receptor": {
-                "label": "Perfil del receptor",
-                "type": "textarea",
-                "placeholder": "Ej: Persona mayor, no muy tech-savvy, vive en piso pequeño, le gusta la limpieza",
-                "help": "Cómo es la persona que recibe el regalo"
-            },
-            "presupuesto_regalo": {
-                "label": "Presupuesto",
-                "type": "text",
-                "placeholder": "Ej: 50-100€ / 100-200€ / Sin límite",
-                "help": "Rango de precio del regalo"
-            },
-            "opciones_regalo": {
-                "label": "Opciones de regalo (una por línea)",
-                "type": "textarea",
-                "placeholder": "Xiaomi E5 (económico)\nRoborock Q7 (gama media)\nRoborock S7+ (premium)",
-                "help": "Productos recomendados"
-            },
-            "por_que_perfecto": {
-                "label": "Por qué es perfecto para esta ocasión",
-                "type": "textarea",
-                "placeholder": "Ej: Regalar tiempo libre, producto útil que se usa a diario, tecnología accesible",
-                "help": "Justificación del regalo"
-            }
-        }
-    }
-}
-
-# ============================================================================
-# TONO DE MARCA
-# ============================================================================
-
-BRAND_TONE = """
-# Manual de Tono - PcComponentes
-
-## TONO ASPIRACIONAL (NO NEGATIVO)
-
-### HACER:
-- Enfoca en beneficios y soluciones
-- "Perfecto si..." en lugar de "Evita si..."
-- "Considera alternativas si..." SOLO si hay producto alternativo configurado
-- Honestidad aspiracional: refuerza lo positivo sin mentir
-- Traduce limitaciones en contexto útil
-
-### Ejemplos de tono correcto:
-INCORRECTO: "Este producto no tiene mapeo por habitaciones"
-CORRECTO: "Limpia toda tu casa con navegación inteligente; si necesitas control por habitaciones, hay modelos con láser"
-
-INCORRECTO: "No recomendado para perros grandes"
-CORRECTO: "Perfecto con mascotas estándar; con razas grandes de pelo largo, funciona bien pero el cepillo necesitará limpieza más frecuente"
-
-## PERSONALIDAD:
-- Expertos sin pedantería
-- Frikis sin vergüenza
-- Honestos pero no aburridos
-- Cercanos pero profesionales
-
-## EMOJIS PERMITIDOS:
-- ✅ Para puntos positivos
-- ⚡ Para destacar urgencia o velocidad
-- ❌ SOLO en comparativas técnicas (no para disuadir)
-"""
-
-# ============================================================================
-# CSS CORREGIDO PARA CMS - VERSIÓN 3.3 COMPATIBLE
-# ============================================================================
-
-CSS_CMS_COMPATIBLE = """<style>
-:root{
-  --orange-900:#FF6000;--orange-700:#FF8640;--orange-500:#FFAE80;--orange-300:#FFB7BF;
-  --blue-m-900:#170453;--blue-m-700:#51437E;--blue-m-500:#8B81A9;--blue-m-300:#C5C0D4;
-  --blue-d-900:#090029;--blue-d-700:#46405E;--blue-d-500:#848094;--blue-d-300:#C1BFC9;
-  --white:#FFFFFF;--gray-900:#999999;--gray-700:#949494;--gray-500:#C2C2C2;
-  --gray-300:#E6E6E6;--gray-200:#D9D9D9;--gray-150:#CFCFCF;--gray-50:#F4F4F4;
-  --ink:#141822;--muted:#62697A;--line:var(--gray-300);
-  --primary:var(--blue-m-900);--primary-100:var(--blue-m-300);
-  --accent:var(--orange-900);--accent-100:var(--orange-500);
-  --space-1:6px;--space-2:10px;--space-3:14px;--space-4:18px;--space-5:22px;
-  --radius-0:0;--radius-6:6px;--radius-10:10px;
-}
-*{box-sizing:border-box}
-html,body{margin:0;padding:0;background:var(--white);color:var(--ink);font:16px/1.6 system-ui,-apple-system,Segoe UI,Roboto,Ubuntu,"Helvetica Neue",Arial}
-article{max-width:100%;margin:0 auto}
-h1,h2,h3,h4{font-weight:800;margin:var(--space-4) 0 var(--space-2);color:var(--primary)}
-h1{font-size:34px}h2{font-size:24px}h3{font-size:20px}h4{font-size:16px}
-strong{font-weight:800}p,ul,ol{margin:var(--space-2) 0}
-a{color:var(--primary);text-decoration:underline}a:hover{opacity:.9}
-.kicker{display:inline-block;background:var(--primary-100);color:var(--primary);border:1px solid var(--primary);border-radius:999px;padding:4px 10px;font-size:12px;font-weight:700;margin-bottom:var(--space-2)}
-.badges{display:flex;gap:8px;flex-wrap:wrap;margin:var(--space-2) 0}
-.badge{border:1px solid var(--line);border-radius:999px;padding:4px 10px;font-size:12px;color:var(--muted);background:#fff}
-.callout{border-left:6px solid var(--primary);background:var(--gray-50);padding:var(--space-3) var(--space-4);border-radius:var(--radius-10);margin:var(--space-4) 0}
-.callout.accent{border-left-color:var(--accent);background:var(--accent-100)}
-.callout strong{color:var(--primary)}
-.bf-callout{background-color:#f4f4f4;padding:0.8em 1em;margin:1.2em 0;border-left:4px solid #FF8640;font-size:0.95em}
-.bf-callout a{color:#ff6000;font-weight:bold;text-decoration:underline}
-.btns{display:flex;gap:10px;flex-wrap:wrap;margin:var(--space-3) 0}
-.btn{display:inline-block;padding:10px 14px;border-radius:var(--radius-6);border:1px solid var(--line);text-decoration:none;font-weight:700}
-.btn.primary{background:var(--accent);color:#fff;border-color:var(--accent)}
-.btn.ghost{background:#fff;color:var(--ink)}
-.btn:hover{transform:translateY(-1px)}
-.toc{border:1px dashed var(--line);border-radius:var(--radius-6);padding:12px;background:#fff}
-.toc h4{margin:0 0 6px}
-.toc a{display:block;padding:4px 0;text-decoration:none;border-bottom:1px dashed var(--line);color:var(--muted)}
-.toc a:last-child{border-bottom:none}
-.toc a:hover{color:var(--primary)}
-.note{color:var(--muted);font-size:14px}
-meter{width:100%;height:10px}
-.grid{display:grid;gap:16px;margin:var(--space-3) 0}
-@media(min-width:860px){.grid.cols-3{grid-template-columns:repeat(3,1fr)}}
-@media(min-width:860px){.grid.cols-2{grid-template-columns:repeat(2,1fr)}}
-.card{border:1px solid var(--line);border-radius:var(--radius-6);padding:14px;background:#fff}
-.card h4{margin:0 0 8px}
-.card .why{color:var(--muted);font-size:14px}
-.hr{height:1px;background:var(--line);margin:var(--space-4) 0}
-.lt{border:1px solid var(--line);border-radius:var(--radius-0);overflow:hidden;background:#fff;margin:var(--space-3) 0}
-.lt .r{display:grid;border-top:1px solid var(--line)}
-.lt .r:first-child{border-top:none;background:var(--gray-50);font-weight:800}
-.lt .c{padding:10px}
-.lt.zebra .r:nth-child(odd):not(:first-child){background:#FCFCFD}
-.lt.cols-2 .r{grid-template-columns:1.4fr .6fr}
-.lt.cols-3 .r{grid-template-columns:1fr 1fr 1fr}
-.lt.cols-7 .r{grid-template-columns:1fr 1fr}
-@media(min-width:900px){.lt.cols-7 .r{grid-template-columns:.7fr .9fr .7fr 1.1fr .8fr .9fr .8fr}}
-.faqs .q{font-weight:800;margin:var(--space-3) 0 var(--space-2);font-size:18px;color:var(--primary)}
-.faqs .a{margin:0 0 var(--space-3)}
-.verdict-box{background:#f8f9fa;padding:1.5em;border-left:4px solid var(--primary);margin:1.5em 0;border-radius:var(--radius-6)}
-.verdict-box h3{margin-top:0}
-.verdict-box ul{margin:0;padding-left:1.2em}
-.verdict-box li{margin-bottom:0.5em}
-</style>"""
-
-# ============================================================================
-# EJEMPLOS CSS (para referencia en prompts) - ACTUALIZADO
-# ============================================================================
-
-EJEMPLOS_CSS = CSS_CMS_COMPATIBLE
-
-# ============================================================================
-# GENERADORES DE SHORTCODES - CORREGIDO v3.3: Usar <p><span> en lugar de <div>
-# ============================================================================
-
-def generate_product_module(article_id, nombre=""):
-    """Genera shortcode de producto destacado - CORREGIDO: usa <p><span>"""
-    shortcode = f'#MODULE_START#|{{"type":"article","params":{{"articleId":"{article_id}"}}}}|#MODULE_END#'
-    # CORRECCIÓN v3.3: Usar <p><span> en lugar de <div> para compatibilidad CMS
-    return f'<p><span>{shortcode}</span></p>'
-
-def generate_carousel_module(slug, category_id, order, navigation, loop, article_amount):
-    """Genera shortcode de carrusel de categoría - CORREGIDO: usa <p><span>"""
-    shortcode = {
-        "type": "carouselArticle",
-        "params": {
-            "articlesIds": [],
-            "slug": slug,
-            "slugUuids": {"categoryId": category_id},
-            "order": order,
-            "articleAmount": article_amount,
-            "activityName": "",
-            "title": "",
-            "collection": {"name": "", "id": ""},
-            "navigation": navigation == "true",
-            "loop": loop == "true"
-        }
-    }
-    shortcode_str = f"#MODULE_START#|{json.dumps(shortcode)}|#MODULE_END#"
-    # CORRECCIÓN v3.3: Usar <p><span> en lugar de <div> para compatibilidad CMS
-    return f'<p><span>{shortcode_str}</span></p>'
-
-# ============================================================================
-# ESTRUCTURA HTML OBLIGATORIA - NUEVO v3.3
-# ============================================================================
-
-HTML_STRUCTURE_INSTRUCTIONS = """
-# ESTRUCTURA HTML OBLIGATORIA (v3.3):
-
-El contenido DEBE seguir esta estructura exacta:
-
-```html
-<style>
-[CSS con variables :root - OBLIGATORIO]
-</style>
-<article>
-  <span class="kicker">[Etiqueta tipo ⚡ OFERTA BLACK FRIDAY 2025]</span>
-  <h1>[Título principal]</h1>
-  
-  [Callout Black Friday con clase .bf-callout]
-  
-  [Resto del contenido usando clases CSS definidas]
-  
-  [Módulos con formato: <p><span>#MODULE_START#|...|#MODULE_END#</span></p>]
-  
-</article>
-```
-
-# REGLAS CRÍTICAS:
-1. ✅ OBLIGATORIO envolver TODO el contenido en <article>...</article>
-2. ✅ Kicker SIEMPRE con <span class="kicker"> (NO usar <div>)
-3. ✅ Módulos SIEMPRE con <p><span>...</span></p> (NO usar <div>)
-4. ✅ CSS completo con variables :root al inicio
-5. ✅ Usar TODAS las clases CSS definidas
-"""
-
-# ============================================================================
-# PROMPTS PARA FLUJO DE 3 ETAPAS - ACTUALIZADOS v3.3 CON ESTRUCTURA ARTICLE
-# ============================================================================
-
-def build_generation_prompt_stage1_draft(pdp_data, arquetipo, target_length, keywords, 
-                                         context, links, modules, objetivo, 
-                                         producto_alternativo, casos_uso, campos_arquetipo):
-    """ETAPA 1: Generación del BORRADOR inicial - v3.3 CON ESTRUCTURA ARTICLE"""
-    
-    keywords_str = ", ".join(keywords) if keywords else "No especificadas"
-    arquetipo_context = build_arquetipo_context(arquetipo['code'], campos_arquetipo)
-    
-    link_principal = links.get('principal', {})
-    links_secundarios = links.get('secundarios', [])
-    
-    link_info = ""
-    if link_principal.get('url'):
-        link_info = f"""
-# ENLACES A INCLUIR:
-## Enlace Principal (OBLIGATORIO):
-URL: {link_principal.get('url')}
-Texto anchor: {link_principal.get('text')}
-Ubicación: Primeros 2-3 párrafos
-"""
-    
-    if links_secundarios:
-        link_info += f"""
-## Enlaces Secundarios:
-{chr(10).join([f"- URL: {link.get('url')} | Texto: {link.get('text')}" for link in links_secundarios])}
-"""
-
-    alternativo_info = ""
-    if producto_alternativo.get('url'):
-        alternativo_info = f"""
-# PRODUCTO ALTERNATIVO:
-URL: {producto_alternativo.get('url')}
-Texto: {producto_alternativo.get('text', 'producto alternativo')}
-IMPORTANTE: Incluir en "Considera alternativas si:" con enlace.
-"""
-    else:
-        casos_uso_str = ""
-        if casos_uso:
-            casos_uso_str = f"\nCasos de uso:\n" + "\n".join([f"- {caso}" for caso in casos_uso])
-        alternativo_info = f"""
-# PRODUCTO ALTERNATIVO: NO CONFIGURADO
-Box veredicto solo con "✅ Perfecto si:" desarrollado extensamente.{casos_uso_str}
-"""
-
-    module_info = ""
-    if modules and len(modules) > 0:
-        module_info = f"""
-# MÓDULOS DE CONTENIDO ({len(modules)} configurados - TODOS OBLIGATORIOS):
-
-"""
-        
-        for idx, mod in enumerate(modules):
-            module_info += f"\n## Módulo {idx + 1}:\n"
-            
-            if mod['type'] == 'product':
-                module_info += f"""
-**Tipo:** Producto Destacado
-**Nombre:** {mod['nombre']}
-**Shortcode EXACTO (COPIAR TAL CUAL):**
-{mod['shortcode']}
-"""
-            
-            elif mod['type'] == 'carousel':
-                module_info += f"""
-**Tipo:** Carrusel de Categoría
-**Categoría:** {mod['category_name']}
-**Shortcode EXACTO (COPIAR TAL CUAL):**
-{mod['shortcode']}
-"""
-
-    prompt = f"""
-# TAREA: GENERACIÓN DE BORRADOR INICIAL (ETAPA 1/3)
-
-Eres experto redactor de PcComponentes para contenido optimizado Google Discover.
-
-Esta es la ETAPA 1: Genera un BORRADOR inicial del contenido.
-
-# OBJETIVO DEL CONTENIDO:
-{objetivo}
-
-# ARQUETIPO:
-{arquetipo['code']} - {arquetipo['name']}
-{arquetipo['description']}
-
-{arquetipo_context}
-
-# DATOS PRODUCTO:
-{json.dumps(pdp_data, indent=2, ensure_ascii=False) if pdp_data else "N/A"}
-
-# CONTEXTO:
-{context if context else "Condiciones estándar PcComponentes"}
-
-# KEYWORDS SEO:
-{keywords_str}
-
-{link_info}
-
-{alternativo_info}
-
-{module_info}
-
-# CONTROL ESTRICTO DE LONGITUD:
-
-**LONGITUD OBJETIVO: {target_length} palabras**
-
-CRÍTICO - CONTROL DE EXTENSIÓN:
-- Genera EXACTAMENTE entre {int(target_length * 0.95)} y {int(target_length * 1.05)} palabras
-- Cuenta palabras mientras escribes
-- Si te quedas corto, desarrolla más las secciones principales
-- Si te pasas, sé más conciso en descripciones
-
-# FORMATO OUTPUT - HTML PURO (NO MARKDOWN):
-
-Genera HTML puro y funcional. NO uses markdown. NO uses ``` de código.
-
-{HTML_STRUCTURE_INSTRUCTIONS}
-
-# CSS OBLIGATORIO (COPIAR EXACTAMENTE AL INICIO):
-
-{CSS_CMS_COMPATIBLE}
-
-# ESTRUCTURA OBLIGATORIA DEL CONTENIDO:
-
-```html
-<style>[CSS completo con :root]</style>
-<article>
-  <span class="kicker">⚡ [ETIQUETA]</span>
-  <h1>[Título]</h1>
-  
-  <p class="bf-callout">⚡ <strong>Consejo:</strong> No te pierdas las mejores ofertas de PcComponentes este Black Friday. ¡Visita nuestra página de <a href="https://www.pccomponentes.com/black-friday">Black Friday</a>!</p>
-  
-  [Contenido con clases CSS]
-  
-  [Módulos con <p><span>...</span></p>]
-  
-</article>
-```
-
-# CLASES CSS OBLIGATORIAS A USAR:
-
-✅ .kicker - Para etiquetas (USAR CON <span>, NO <div>)
-✅ .badges y .badge - Para tags de características
-✅ .callout - Para destacados importantes
-✅ .callout.accent - Para destacados urgentes (ofertas)
-✅ .bf-callout - Para el callout de Black Friday
-✅ .toc - Para tabla de contenidos
-✅ .lt, .lt .r, .lt .c - Para tablas de especificaciones
-✅ .lt.zebra - Para tablas con filas alternas
-✅ .lt.cols-2, .lt.cols-3 - Para definir columnas en tablas
-✅ .grid, .grid.cols-2, .grid.cols-3 - Para layouts en grid
-✅ .card - Para tarjetas de contenido
-✅ .btns, .btn, .btn.primary, .btn.ghost - Para botones
-✅ .faqs, .faqs .q, .faqs .a - Para sección de FAQs
-✅ .verdict-box - Para el box de veredicto final
-✅ .hr - Para separadores
-✅ .note - Para notas pequeñas
-
-# FORMATO DE MÓDULOS - CRÍTICO:
-
-✅ CORRECTO: <p><span>#MODULE_START#|...|#MODULE_END#</span></p>
-❌ INCORRECTO: <div>#MODULE_START#|...|#MODULE_END#</div>
-❌ INCORRECTO: <div style="margin:...">...</div>
-
-# ESTRUCTURA DE TABLAS (IMPORTANTE):
-
-Para tablas de especificaciones, usa EXACTAMENTE esta estructura:
-
-<div class="lt cols-2 zebra" role="table">
-<div class="r"><div class="c"><strong>Especificación</strong></div><div class="c"><strong>Valor</strong></div></div>
-<div class="r"><div class="c">Tamaño</div><div class="c">27 pulgadas</div></div>
-<div class="r"><div class="c">Resolución</div><div class="c">QHD (2560×1440)</div></div>
-</div>
-
-# ESTRUCTURA DE CARDS EN GRID:
-
-<div class="grid cols-3">
-<div class="card"><h4><strong>Título</strong></h4><p class="why">Descripción</p></div>
-<div class="card"><h4><strong>Título</strong></h4><p class="why">Descripción</p></div>
-<div class="card"><h4><strong>Título</strong></h4><p class="why">Descripción</p></div>
-</div>
-
-# ESTRUCTURA DE BOTONES:
-
-<div class="btns"><a class="btn primary" href="URL">Texto principal</a> <a class="btn ghost" href="URL">Texto secundario</a></div>
-
-# ESTRUCTURA DE VEREDICTO FINAL:
-
-<div class="verdict-box">
-<h3>✅ Perfecto si:</h3>
-<ul>
-<li>Punto 1</li>
-<li>Punto 2</li>
-</ul>
-</div>
-
-# ESTRUCTURA DE FAQs:
-
-<div class="faqs">
-<h3><strong>Pregunta 1</strong></h3>
-<p>Respuesta 1</p>
-<h3><strong>Pregunta 2</strong></h3>
-<p>Respuesta 2</p>
-</div>
-
-# TONO DE MARCA PCCOMPONENTES:
-
-✅ HACER:
-- Enfoque aspiracional y positivo
-- "Perfecto si..." en lugar de "Evita si..."
-- Honestidad sin negatividad
-- Expertos sin pedantería
-
-❌ NO HACER:
-- Negatividad o desánimo
-- "Este producto no tiene X" → "Funciona con Y; si necesitas X, hay alternativas"
-- Lenguaje robótico o corporativo
-- Exceso de emojis (solo ✅ ⚡ en puntos clave)
-
-# VERIFICACIÓN FINAL ANTES DE ENTREGAR:
-
-1. ¿Está envuelto en <article>...</article>?
-2. ¿El kicker usa <span class="kicker"> (NO <div>)?
-3. ¿Tiene entre {int(target_length * 0.95)} y {int(target_length * 1.05)} palabras?
-4. ¿Es HTML puro (sin markdown)?
-5. ¿Incluye TODOS los módulos con formato <p><span>?
-6. ¿Los shortcodes están exactos (sin modificar)?
-7. ¿El tono es aspiracional?
-8. ¿Los enlaces están incluidos?
-9. ¿Usa las clases CSS definidas (NO estilos inline)?
-10. ¿Incluye el callout de Black Friday?
-11. ¿Las tablas usan la estructura .lt correcta?
-
-GENERA AHORA EL BORRADOR INICIAL.
-Responde SOLO con el HTML (desde <style> hasta </article>).
-"""
-    
-    return prompt
-
-
-def build_correction_prompt_stage2(draft_content, target_length, arquetipo, objetivo):
-    """ETAPA 2: Análisis crítico y correcciones - v3.3 con verificación de estructura"""
-    
-    prompt = f"""
-# TAREA: ANÁLISIS CRÍTICO DEL BORRADOR (ETAPA 2/3)
-
-Eres editor senior de PcComponentes. Tu trabajo es CRITICAR el borrador y proponer CORRECCIONES específicas.
-
-# BORRADOR A ANALIZAR:
-
-{draft_content}
-
-# CONTEXTO:
-- Arquetipo: {arquetipo['code']} - {arquetipo['name']}
-- Objetivo: {objetivo}
-- Longitud objetivo: {target_length} palabras
-
-# TU TRABAJO:
-
-Analiza el borrador con OJO CRÍTICO y responde SOLO en formato JSON:
-
-{{
-  "longitud_actual": <número de palabras>,
-  "longitud_objetivo": {target_length},
-  "necesita_ajuste_longitud": true/false,
-  "estructura_html": {{
-    "tiene_article": true/false,
-    "kicker_usa_span": true/false,
-    "modulos_usan_p_span": true/false,
-    "css_tiene_root": true/false
-  }},
-  "problemas_encontrados": [
-    {{
-      "tipo": "longitud|estructura|tono|enlaces|modulos|seo|css",
-      "gravedad": "crítico|medio|menor",
-      "descripcion": "Descripción del problema",
-      "ubicacion": "Dónde está el problema",
-      "correccion_sugerida": "Cómo corregirlo"
-    }}
-  ],
-  "aspectos_positivos": [
-    "Qué está bien en el borrador"
-  ],
-  "instrucciones_revision": [
-    "Instrucciones específicas para la corrección final"
-  ],
-  "necesita_reescritura_completa": true/false
-}}
-
-# CRITERIOS DE EVALUACIÓN:
-
-1. **Estructura HTML** (CRÍTICO - v3.3):
-   - ¿Está envuelto en <article>...</article>? → CRÍTICO si falta
-   - ¿El kicker usa <span class="kicker">? → CRÍTICO si usa <div>
-   - ¿Los módulos usan <p><span>...</span></p>? → CRÍTICO si usan <div>
-   - ¿El CSS tiene variables :root? → CRÍTICO si falta
-
-2. **Longitud** (CRÍTICO):
-   - ¿Está en rango {int(target_length * 0.95)}-{int(target_length * 1.05)} palabras?
-   - Si no, ¿qué secciones ampliar o reducir?
-
-3. **HTML puro**:
-   - ¿Hay markdown (**, ##, [])? → CRÍTICO
-   - ¿Está bien formateado?
-
-4. **CSS y Clases**:
-   - ¿Usa las clases CSS definidas (.kicker, .callout, .lt, .grid, etc.)?
-   - ¿Hay estilos inline que deberían ser clases?
-   - ¿Las tablas usan estructura .lt correcta?
-
-5. **Módulos**:
-   - ¿Están TODOS los módulos?
-   - ¿Los shortcodes están exactos?
-   - ¿Tienen formato <p><span>?
-
-6. **Tono**:
-   - ¿Es aspiracional?
-   - ¿Evita negatividad?
-   - ¿Suena humano?
-
-7. **Estructura**:
-   - ¿Sigue el arquetipo?
-   - ¿Hay jerarquía HTML clara?
-
-8. **Enlaces**:
-   - ¿Están los enlaces obligatorios?
-   - ¿Están integrados naturalmente?
-   - ¿Incluye callout Black Friday?
-
-9. **SEO**:
-   - ¿Keywords bien integradas?
-   - ¿Títulos optimizados?
-
-10. **Valor**:
-    - ¿Aporta información útil?
-    - ¿Ayuda a tomar decisiones?
-
-SÉ CRÍTICO. Encuentra 3-5 problemas reales.
-Responde SOLO con el JSON.
-"""
-    
-    return prompt
-
-
-def build_final_generation_prompt_stage3(draft_content, corrections_json, target_length):
-    """ETAPA 3: Generación final con correcciones aplicadas - v3.3"""
-    
-    prompt = f"""
-# TAREA: GENERACIÓN FINAL CON CORRECCIONES (ETAPA 3/3)
-
-# BORRADOR INICIAL:
-{draft_content}
-
-# ANÁLISIS CRÍTICO Y CORRECCIONES:
-{corrections_json}
-
-# TU TRABAJO:
-
-Genera la VERSIÓN FINAL del contenido aplicando TODAS las correcciones indicadas.
-
-# INSTRUCCIONES CRÍTICAS (v3.3):
-
-1. **Estructura <article>**: OBLIGATORIO envolver todo en <article>...</article>
-2. **Kicker**: OBLIGATORIO usar <span class="kicker"> (NO <div>)
-3. **Módulos**: OBLIGATORIO formato <p><span>#MODULE_START#|...|#MODULE_END#</span></p>
-4. **Longitud**: DEBE estar en rango {int(target_length * 0.95)}-{int(target_length * 1.05)} palabras
-5. **HTML puro**: Elimina TODO el markdown si quedó alguno
-6. **CSS**: Debe usar el CSS con variables :root (NO CSS simple)
-7. **Clases CSS**: Usa TODAS las clases definidas (.kicker, .callout, .lt, .grid, etc.)
-8. **NO estilos inline**: Reemplaza estilos inline por clases CSS
-9. **Correcciones**: Aplica TODAS las correcciones del JSON
-10. **Calidad**: Esta es la versión final - máxima calidad
-
-# CSS OBLIGATORIO (debe aparecer al inicio):
-
-{CSS_CMS_COMPATIBLE}
-
-# ESTRUCTURA OBLIGATORIA:
-
-```html
-<style>[CSS con :root]</style>
-<article>
-  <span class="kicker">...</span>
-  <h1>...</h1>
-  <p class="bf-callout">...</p>
-  [Contenido]
-  <p><span>#MODULE_START#|...|#MODULE_END#</span></p>
-  [Más contenido]
-</article>
-```
-
-# VERIFICACIÓN FINAL:
-
-Antes de entregar, confirma:
-✅ Envuelto en <article>...</article>
-✅ Kicker con <span class="kicker"> (NO div)
-✅ Módulos con <p><span>...</span></p> (NO div)
-✅ CSS con variables :root
-✅ Longitud correcta
-✅ Sin markdown
-✅ Clases CSS usadas correctamente
-✅ Sin estilos inline innecesarios
-✅ Todos los módulos presentes
-✅ Todas las correcciones aplicadas
-✅ Tono aspiracional
-✅ Enlaces incluidos
-✅ Callout Black Friday presente
-✅ Tablas con estructura .lt
-
-GENERA AHORA LA VERSIÓN FINAL.
-Responde SOLO con el HTML completo (desde <style> hasta </article>).
-"""
-    
-    return prompt
-
 # ============================================================================
 # UI - RENDERIZADO DE CAMPOS ESPECÍFICOS Y MÓDULOS
 # ============================================================================
@@ -1741,261 +522,6 @@ def render_module_configurator():
     return modules_data
 
 
-def build_arquetipo_context(arquetipo_code, campos_valores):
-    """Construye contexto específico del arquetipo"""
-    if not campos_valores:
-        return ""
-    
-    campos_llenos = {k: v for k, v in campos_valores.items() if v and v.strip()}
-    
-    if not campos_llenos:
-        return ""
-    
-    context = f"\n# INFORMACIÓN ESPECÍFICA DEL ARQUETIPO {arquetipo_code}:\n\n"
-    
-    for campo_key, valor in campos_llenos.items():
-        label = campo_key.replace('_', ' ').title()
-        context += f"**{label}:**\n{valor}\n\n"
-    
-    context += "Usa esta información específica para crear contenido relevante.\n"
-    
-    return context
-
-def get_arquetipo_guidelines(arquetipo_code):
-    """Devuelve directrices específicas de estructura para cada arquetipo"""
-    
-    guidelines = {
-        "ARQ-1": """
-**Estructura Noticia:**
-1. Lead con las 5W (qué, quién, cuándo, dónde, por qué)
-2. Contexto y antecedentes
-3. Detalles específicos
-4. Implicaciones para usuarios
-5. Fuentes y referencias
-6. Conclusión con proyección futura
-
-**Tono:** Informativo, urgente si procede.
-""",
-        "ARQ-2": """
-**Estructura Guía:**
-1. Introducción: qué se va a conseguir
-2. Requisitos previos listados
-3. Pasos numerados (3-10 típicamente)
-4. Avisos de puntos críticos en callouts
-5. Verificación final
-6. Troubleshooting común
-
-**Tono:** Instructivo, claro, paciente.
-""",
-        "ARQ-3": """
-**Estructura Explicación:**
-1. Hook: por qué importa
-2. Definición simple primero
-3. Explicación técnica progresiva
-4. Analogías y ejemplos
-5. Aplicaciones reales
-6. Comparaciones si aplica
-7. Takeaway clave
-
-**Tono:** Educativo pero accesible.
-""",
-        "ARQ-4": """
-**Estructura Review:**
-1. Veredicto rápido
-2. Contexto (precio, competencia)
-3. Diseño y construcción
-4. Rendimiento con datos reales
-5. Experiencia de uso
-6. Comparativa con competencia
-7. FAQs
-8. Veredicto final
-
-**Tono:** Experto, honesto, equilibrado.
-""",
-        "ARQ-5": """
-**Estructura Comparativa:**
-1. Intro: por qué comparar
-2. Tabla comparativa visual
-3. Análisis Producto A
-4. Análisis Producto B
-5. Comparación por categorías
-6. Veredicto: cuál elegir
-7. Conclusión con recomendación
-
-**Tono:** Imparcial, analítico.
-""",
-        "ARQ-6": """
-**Estructura Deal Alert:**
-1. Hook con precio en negrita
-2. Por qué es chollo
-3. Características clave
-4. Para quién es perfecto
-5. Duración y stock
-6. CTA urgente
-7. Alternativas si se agota
-
-**Tono:** Urgente, directo.
-""",
-        "ARQ-7": """
-**Estructura Roundup:**
-1. Criterios de selección
-2. Ganador destacado si lo hay
-3. Producto #1-N con análisis
-4. Tabla comparativa completa
-5. Guía de compra
-6. Conclusión por perfil
-
-**Tono:** Autoridad, comprehensivo.
-""",
-        "ARQ-8": """
-**Estructura Por Presupuesto:**
-1. Qué esperar en este rango
-2. Mejor opción destacada
-3. Alternativas en el rango
-4. Qué sacrificas vs superiores (positivo)
-5. Tabla comparativa
-6. Consejos para maximizar
-7. Conclusión
-
-**Tono:** Realista, honesto, optimista.
-""",
-        "ARQ-9": """
-**Estructura Versus:**
-1. Presentación de contendientes
-2. Round 1-N por categoría
-3. Tabla puntuación final
-4. Ganador absoluto y por qué
-5. Cuándo elegir al perdedor
-
-**Tono:** Deportivo, entretenido, riguroso.
-""",
-        "ARQ-10": """
-**Estructura Por Perfil:**
-1. Definición del perfil
-2. Necesidades específicas
-3. Producto recomendado y por qué
-4. Características clave
-5. Qué NO necesita (ahorro)
-6. Alternativas si varía
-7. Conclusión personalizada
-
-**Tono:** Empático, consultivo.
-""",
-        "ARQ-11": """
-**Estructura Tendencias:**
-1. Contexto: situación actual
-2. Tendencia con datos
-3. Causas
-4. Predicción de evolución
-5. Impacto para consumidores
-6. Recomendaciones prácticas
-7. Qué hacer ahora
-
-**Tono:** Analítico, con autoridad.
-""",
-        "ARQ-12": """
-**Estructura Unboxing:**
-1. Primera impresión caja/packaging
-2. Contenido completo
-3. Construcción y materiales
-4. Sorpresas positivas
-5. Decepciones (neutral)
-6. Setup inicial
-7. Primeras horas de uso
-8. Veredicto preliminar
-
-**Tono:** Entusiasta, descriptivo, honesto.
-"""
-    }
-    
-    return guidelines.get(arquetipo_code, "Sigue mejores prácticas del arquetipo.")
-
-# ============================================================================
-# GENERATOR CLASS
-# ============================================================================
-
-class ContentGeneratorV4:
-    """Generador con flujo de 3 etapas"""
-    
-    def __init__(self, api_key):
-        self.client = anthropic.Anthropic(api_key=api_key)
-    
-    def generate_stage(self, prompt, max_tokens=10000, stage_name=""):
-        """Llama a Claude API para una etapa"""
-        try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            result = message.content[0].text
-            return result
-        except Exception as e:
-            st.error(f"Error en {stage_name}: {str(e)}")
-            return None
-    
-    def generate_with_3_stages(self, pdp_data, arquetipo, target_length, keywords,
-                               context, links, modules, objetivo, producto_alternativo,
-                               casos_uso, campos_arquetipo, progress_callback=None):
-        """Flujo completo de generación en 3 etapas"""
-        
-        # ETAPA 1: Borrador inicial
-        if progress_callback:
-            progress_callback(0, "📝 Etapa 1/3: Generando borrador inicial...")
-        
-        prompt_draft = build_generation_prompt_stage1_draft(
-            pdp_data, arquetipo, target_length, keywords, context, links,
-            modules, objetivo, producto_alternativo, casos_uso, campos_arquetipo
-        )
-        
-        draft_content = self.generate_stage(prompt_draft, max_tokens=12000, stage_name="Borrador")
-        
-        if not draft_content:
-            return None, None, None
-        
-        # ETAPA 2: Análisis crítico
-        if progress_callback:
-            progress_callback(33, "🔍 Etapa 2/3: Análisis crítico y correcciones...")
-        
-        prompt_correction = build_correction_prompt_stage2(
-            draft_content, target_length, arquetipo, objetivo
-        )
-        
-        corrections_json = self.generate_stage(prompt_correction, max_tokens=4000, stage_name="Análisis")
-        
-        if not corrections_json:
-            return draft_content, None, None
-        
-        # ETAPA 3: Versión final
-        if progress_callback:
-            progress_callback(66, "✨ Etapa 3/3: Generando versión final...")
-        
-        prompt_final = build_final_generation_prompt_stage3(
-            draft_content, corrections_json, target_length
-        )
-        
-        final_content = self.generate_stage(prompt_final, max_tokens=12000, stage_name="Versión Final")
-        
-        if progress_callback:
-            progress_callback(100, "✅ Generación completada")
-        
-        return draft_content, corrections_json, final_content
-
-
-# ============================================================================
-# FUNCIONES AUXILIARES
-# ============================================================================
-
-def count_words_in_html(html_content):
-    """Cuenta palabras en HTML (excluyendo tags)"""
-    # Remover tags HTML
-    text = re.sub(r'<[^>]+>', '', html_content)
-    # Remover espacios extras
-    text = re.sub(r'\s+', ' ', text).strip()
-    # Contar palabras
-    words = len(text.split())
-    return words
-
 # ============================================================================
 # FUNCIÓN DE VERIFICACIÓN GSC
 # ============================================================================
@@ -2099,6 +625,497 @@ def render_gsc_verification_section(keywords_input):
     
     return False  # No bloquear si no hay verificación
 
+# ============================================================================
+# GENERACIÓN EN SEGUNDO PLANO
+# ============================================================================
+
+def get_session_owner():
+    """Identificador del editor para listar sus generaciones"""
+    if 'job_owner' not in st.session_state:
+        st.session_state.job_owner = st.query_params.get('editor') or uuid.uuid4().hex[:12]
+    st.query_params['editor'] = st.session_state.job_owner
+    return st.session_state.job_owner
+
+def attach_job(job_id):
+    """Muestra un trabajo en el panel; el id va en la URL para sobrevivir a recargas"""
+    st.session_state.active_job_id = job_id
+    st.query_params['job'] = job_id
+
+def render_job_panel():
+    """Panel de generaciones: trabajo activo (con sondeo) y lista de trabajos del editor"""
+    runner = get_job_runner()
+    owner = get_session_owner()
+    
+    if 'active_job_id' not in st.session_state and st.query_params.get('job'):
+        st.session_state.active_job_id = st.query_params['job']
+    
+    jobs = runner.store.list_jobs(owner=owner, limit=10)
+    if len(jobs) > 1:
+        st.markdown("---")
+        with st.expander(f"🗂️ Mis generaciones ({len(jobs)})", expanded=False):
+            estados = {'queued': "🕒", 'running': "⏳", 'done': "✅", 'failed': "❌", 'interrupted': "⚠️", 'cancelled': "⛔"}
+            for job in jobs:
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.markdown(
+                        f"{estados.get(job['status'], '•')} **{job['title']}** · "
+                        f"{job['created_at'][11:16]} · {job['progress']}%"
+                    )
+                with col2:
+                    if st.button("Ver", key=f"ver_job_{job['id']}", use_container_width=True):
+                        attach_job(job['id'])
+    
+    job_id = st.session_state.get('active_job_id')
+    if not job_id:
+        return
+    
+    # Solo el estado: el resultado de un trabajo terminado se lee una vez (get_done_job_results)
+    job = runner.store.get(job_id, include_result=False)
+    if not job:
+        st.warning(f"⚠️ No se encuentra la generación {job_id}")
+        return
+    
+    st.markdown("---")
+    if job['status'] in ACTIVE_STATUSES:
+        render_active_job(job_id)
+    elif job['status'] == JOB_DONE:
+        render_generation_results(job_id, get_done_job_results(job_id))
+    else:
+        job['result'] = runner.store.get_result(job_id)
+        render_failed_job(job)
+
+@st.fragment(run_every=2)
+def render_active_job(job_id):
+    """Progreso de un trabajo en curso; solo este fragmento se refresca al sondear"""
+    job = get_job_runner().store.get(job_id, include_result=False)
+    
+    if job['status'] not in ACTIVE_STATUSES:
+        st.rerun()  # Terminado: repintar la página con los resultados
+    
+    st.markdown(f"### ⏳ {job['title']}")
+    st.caption(f"Generación `{job_id}` · puedes seguir editando el formulario mientras tanto")
+    st.progress(job['progress'])
+    
+    label = "🕒 En cola..." if job['status'] == JOB_QUEUED else (job['messages'] or ["⏳ Iniciando generación..."])[-1]
+    with st.status(label, expanded=True):
+        for message in job['messages']:
+            st.write(message)
+        if st.button("⛔ Cancelar generación", key=f"cancel_{job_id}"):
+            if get_job_runner().cancel(job_id):
+                st.toast("⛔ Cancelando: se conservarán las etapas ya completadas")
+
+def render_failed_job(job):
+    """Error o cancelación de una generación con las etapas guardadas para reanudar"""
+    results = job['result'] or {}
+    draft = results.get('draft')
+    
+    if job['status'] == JOB_INTERRUPTED:
+        st.error("❌ La generación se interrumpió al reiniciarse el servidor")
+    elif job['status'] == JOB_CANCELLED:
+        st.warning("⛔ Generación cancelada")
+    else:
+        st.error(f"❌ Error en generación: {results.get('error') or 'error inesperado'}")
+    
+    if draft:
+        etapas = "borrador y análisis" if results.get('corrections') else "borrador"
+        st.info(
+            f"💾 El {etapas} se ha guardado. Pulsa **Generar Contenido** de nuevo "
+            f"con los mismos datos para reanudar desde la etapa pendiente."
+        )
+        if st.toggle("📝 Ver borrador guardado", key=f"preview_draft_{job['id']}"):
+            st.components.v1.html(draft, height=600, scrolling=True)
+    elif job['status'] == JOB_INTERRUPTED:
+        st.info("💾 Pulsa **Generar Contenido** con los mismos datos para reanudar desde el último checkpoint.")
+    
+    with st.expander("Ver registro de la generación"):
+        for message in job['messages']:
+            st.write(message)
+
+def render_generation_results(job_id, results):
+    """
+    Resultados de una generación completada (pestañas final, borrador, análisis y métricas)
+    
+    Las pestañas de Streamlit se pintan todas en cada rerun: lo pesado (código
+    HTML, vista previa del borrador) solo se envía al activar su interruptor.
+    """
+    draft = results['draft']
+    corrections = results['corrections']
+    final = results['final']
+    meta = results['metadata']
+    
+    # Un solo análisis del HTML final (memoizado) para todas las pestañas y reruns
+    report = analyze_article(final)
+    word_counts = report['words']
+    longitud_real = word_counts['total']
+    estructura_final = report['structure']
+    
+    st.markdown("---")
+    st.success(f"✅ Contenido generado")
+    if meta['etapas_reanudadas']:
+        st.info(f"💾 Reanudado desde checkpoint: {len(meta['etapas_reanudadas'])} etapa(s) no se volvieron a pagar")
+    if meta['desde_cache']:
+        st.info("♻️ Resultado recuperado de la caché. Marca **Regenerar aunque exista en caché** para generarlo de nuevo.")
+    
+    with st.expander("📋 Configuración aplicada", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown(f"**Arquetipo:** {meta['arquetipo_nombre']}")
+            st.markdown(f"**Producto:** {meta['product_id']}")
+        with col2:
+            st.markdown(f"**Módulos:** {len(meta['modulos'])}")
+            if len(meta['modulos']) > 0:
+                for mod in meta['modulos']:
+                    if mod['type'] == 'product':
+                        st.markdown(f"- 🎯 {mod['nombre']}")
+                    else:
+                        st.markdown(f"- 🎠 {mod['category_name']}")
+        with col3:
+            st.markdown(f"**Alternativo:** {'✅' if meta['producto_alternativo'].get('url') else '❌'}")
+            st.markdown(f"**Casos uso:** {len(meta['casos_uso'])}")
+            st.markdown(f"**Keywords:** {len(meta['keywords'])}")
+    
+    # ✅ TABS DE RESULTADOS
+    st.markdown("---")
+    st.markdown("## 📊 Resultados de la Generación")
+    
+    tab1, tab2, tab3, tab4 = st.tabs([
+        "📄 Versión Final",
+        "📝 Borrador",
+        "🔍 Análisis Crítico",
+        "📈 Métricas"
+    ])
+    
+    with tab1:
+        st.markdown("### 📄 Contenido Final")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Longitud objetivo", f"{meta['longitud_objetivo']}")
+        with col2:
+            st.metric("Longitud real", f"{longitud_real}")
+        with col3:
+            diferencia = longitud_real - meta['longitud_objetivo']
+            st.metric("Diferencia", f"{diferencia:+d}")
+        with col4:
+            porcentaje = (longitud_real / meta['longitud_objetivo'] * 100) - 100
+            st.metric("Precisión", f"{porcentaje:+.1f}%")
+        
+        # Verificación de estructura v3.3
+        st.markdown("#### 🔍 Verificación Estructura v3.3:")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown(f"{'✅' if estructura_final['tiene_article'] else '❌'} `<article>`")
+        with col2:
+            st.markdown(f"{'✅' if estructura_final['kicker_usa_span'] else '❌'} Kicker `<span>`")
+        with col3:
+            modulos_ok = estructura_final['modulos_usan_p_span'] and bool(report['modules'])
+            st.markdown(f"{'✅' if modulos_ok else '❌'} Módulos `<p><span>`")
+        with col4:
+            st.markdown(f"{'✅' if estructura_final['css_tiene_root'] else '❌'} CSS `:root`")
+        
+        with st.expander("👁️ Vista previa renderizada", expanded=True):
+            st.components.v1.html(final, height=800, scrolling=True)
+        
+        if st.toggle("</> Código HTML", key=f"code_final_{job_id}"):
+            st.code(final, language='html')
+        
+        # Exportación para el CMS: minificada, con solo el CSS que usa el artículo
+        export = export_for_cms(final)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "⬇️ Descargar HTML",
+                data=export['content'],
+                file_name=f"contenido_{meta['arquetipo']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+                mime="text/html",
+                use_container_width=True
+            )
+        with col2:
+            st.download_button(
+                "⬇️ Descargar JSON completo",
+                data=get_results_json_download(job_id),
+                file_name=f"generacion_{meta['arquetipo']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+                use_container_width=True
+            )
+        st.caption(
+            f"📦 HTML para el CMS: {export['original_bytes'] / 1024:.1f} KB → {export['bytes'] / 1024:.1f} KB "
+            f"(−{export['saved_pct']}%) · CSS: {export['css_rules']} reglas usadas, "
+            f"{export['css_rules_removed']} sin uso y {export['css_duplicates_removed']} repetidas eliminadas, "
+            f"{export['css_variables_removed']} variables sin uso"
+        )
+    
+    with tab2:
+        st.markdown("### 📝 Borrador Inicial (Etapa 1)")
+        st.caption("Primera versión generada antes de la autocorrección")
+        
+        if st.toggle("Ver borrador", key=f"preview_draft_{job_id}"):
+            st.components.v1.html(draft, height=600, scrolling=True)
+    
+    with tab3:
+        st.markdown("### 🔍 Análisis Crítico (Etapa 2)")
+        st.caption("La IA analiza y sugiere correcciones")
+        
+        corrections_data = corrections
+        
+        # Mostrar verificación de estructura v3.3
+        if 'estructura_html' in corrections_data:
+            st.markdown("#### 🏗️ Verificación Estructura HTML v3.3:")
+            estructura = corrections_data['estructura_html']
+            cols = st.columns(4)
+            with cols[0]:
+                status_article = "✅" if estructura.get('tiene_article') else "❌"
+                st.markdown(f"{status_article} `<article>`")
+            with cols[1]:
+                status_kicker = "✅" if estructura.get('kicker_usa_span') else "❌"
+                st.markdown(f"{status_kicker} Kicker `<span>`")
+            with cols[2]:
+                status_modulos = "✅" if estructura.get('modulos_usan_p_span') else "❌"
+                st.markdown(f"{status_modulos} Módulos `<p><span>`")
+            with cols[3]:
+                status_css = "✅" if estructura.get('css_tiene_root') else "❌"
+                st.markdown(f"{status_css} CSS `:root`")
+        
+        if 'problemas_encontrados' in corrections_data:
+            st.markdown("#### ⚠️ Problemas Encontrados:")
+            for prob in corrections_data['problemas_encontrados']:
+                gravedad_emoji = {
+                    'crítico': '🔴',
+                    'medio': '🟡',
+                    'menor': '🟢'
+                }.get(prob.get('gravedad', ''), '⚪')
+                
+                st.markdown(f"{gravedad_emoji} **{prob.get('tipo', 'N/A').upper()}** ({prob.get('gravedad', 'N/A')})")
+                st.markdown(f"- {prob.get('descripcion', 'N/A')}")
+                st.markdown(f"- 📍 Ubicación: {prob.get('ubicacion', 'N/A')}")
+                st.markdown(f"- ✅ Corrección: {prob.get('correccion_sugerida', 'N/A')}")
+                st.markdown("---")
+        
+        if 'aspectos_positivos' in corrections_data:
+            st.markdown("#### ✅ Aspectos Positivos:")
+            for aspecto in corrections_data['aspectos_positivos']:
+                st.markdown(f"- {aspecto}")
+        
+        with st.expander("Ver análisis JSON completo"):
+            st.json(corrections_data)
+    
+    with tab4:
+        st.markdown("### 📈 Métricas de Generación")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**Configuración:**")
+            st.markdown(f"- Arquetipo: {meta['arquetipo_nombre']}")
+            st.markdown(f"- Keyword principal: {meta['keyword_principal']}")
+            st.markdown(f"- Módulos: {len(meta['modulos'])}")
+            st.markdown(f"- Producto: {meta['product_id']}")
+        
+        with col2:
+            st.markdown("**Resultados:**")
+            st.markdown(f"- Longitud: {longitud_real} / {meta['longitud_objetivo']} palabras")
+            st.markdown(f"- Precisión: {porcentaje:+.1f}%")
+            st.markdown(f"- Formato: HTML puro {'✅' if estructura_final['sin_markdown'] else '❌'}")
+            shortcodes_final = {module['shortcode'] for module in report['modules']}
+            incluidos = sum(1 for mod in meta['modulos'] if mod.get('shortcode') in shortcodes_final)
+            st.markdown(
+                f"- Módulos incluidos: {incluidos}/{len(meta['modulos'])} "
+                f"{'✅' if incluidos == len(meta['modulos']) else '⚠️'}"
+            )
+        
+        with st.expander(f"📝 Palabras por sección ({len(word_counts['sections'])})"):
+            st.dataframe(
+                pd.DataFrame([
+                    {'Sección': section['heading'], 'Nivel': section['level'], 'Palabras': section['words']}
+                    for section in word_counts['sections']
+                ]),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        with st.expander(f"🔗 Enlaces ({len(report['links'])}) y módulos ({len(report['modules'])})"):
+            for link in report['links']:
+                st.markdown(f"- [{link['text'] or link['href']}]({link['href']})")
+            for module in report['modules']:
+                estado = "✅" if module['valid_json'] and module['wrapped'] else "⚠️"
+                st.markdown(f"- {estado} Módulo `{module['type'] or 'JSON no válido'}`")
+        
+        with st.expander("🎨 Clases CSS y estilos en línea"):
+            st.markdown("**Clases usadas:** " + (", ".join(
+                f"`{name}` ×{count}" for name, count in report['css_classes'].items()
+            ) or "ninguna"))
+            if report['undefined_classes']:
+                st.warning(
+                    "⚠️ Clases sin definir en el `<style>`: "
+                    + ", ".join(f"`{name}`" for name in report['undefined_classes'])
+                )
+            if report['inline_styles']:
+                st.markdown(f"**Estilos en línea:** {len(report['inline_styles'])}")
+                for style in report['inline_styles'][:20]:
+                    st.markdown(f"- `<{style['tag']}>` `{style['style']}`")
+        
+        with st.expander("🗂️ Árbol de encabezados"):
+            lineas = []
+            pendientes = [(node, 0) for node in reversed(report['headings'])]
+            while pendientes:
+                node, nivel = pendientes.pop()
+                lineas.append(f"{'    ' * nivel}- **H{node['level']}** {node['text']}")
+                pendientes.extend((child, nivel + 1) for child in reversed(node['children']))
+            st.markdown("\n".join(lineas) or "Sin encabezados")
+        
+        st.markdown("---")
+        st.markdown("**⏱️ Telemetría por etapa:**")
+        
+        if meta['telemetria']:
+            totales = summarize_totals(meta['telemetria'])
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Llamadas", totales['calls'])
+            with col2:
+                st.metric("Tokens entrada / salida", f"{totales['input_tokens']:,} / {totales['output_tokens']:,}")
+            with col3:
+                st.metric("Coste estimado", f"${totales['cost_usd']:.4f}")
+            with col4:
+                st.metric("Tiempo en API", f"{totales['latency_s']:.1f}s")
+            
+            st.dataframe(
+                pd.DataFrame(meta['telemetria'])[[
+                    'stage_name', 'model', 'input_tokens', 'output_tokens',
+                    'cache_creation_input_tokens', 'cache_read_input_tokens',
+                    'cost_usd', 'latency_s', 'ttft_s', 'stop_reason'
+                ]],
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        with st.expander(f"📊 Histórico {meta['arquetipo']} (p50 / p95)"):
+            historico = [
+                row for row in get_telemetry_summary('arquetipo', TELEMETRY_STORE.signature())
+                if row['arquetipo'] == meta['arquetipo']
+            ]
+            if historico:
+                st.dataframe(pd.DataFrame(historico), use_container_width=True, hide_index=True)
+            else:
+                st.caption("Sin datos históricos todavía")
+        
+        length_report = meta['ajuste_longitud']
+        if length_report and length_report['sections']:
+            st.markdown("---")
+            st.markdown("**📏 Ajuste de longitud por secciones:**")
+            st.markdown(f"- Antes: {length_report['before']} → Después: {length_report['after']} palabras")
+            for section in length_report['sections']:
+                estado = "✅" if section['applied'] else "⏭️"
+                st.markdown(
+                    f"- {estado} {section['heading']}: "
+                    f"{section['before']} → {section['after']} (objetivo {section['target']})"
+                )
+        
+        early_aborts = meta.get('abortos_tempranos')
+        if early_aborts:
+            st.markdown("---")
+            ahorrados = sum(abort['tokens_saved'] or 0 for abort in early_aborts)
+            st.markdown(
+                f"**🛑 Respuestas cortadas en streaming:** {len(early_aborts)} · "
+                f"~{ahorrados:,} tokens de salida ahorrados"
+            )
+            for abort in early_aborts:
+                st.markdown(
+                    f"- {abort['stage_name']}: {abort['detail']} (cortada a los ~{abort['tokens']} tokens, "
+                    f"reintentada con instrucciones específicas)"
+                )
+        
+        continuations = meta.get('continuaciones')
+        trimmed_inputs = meta.get('recorte_prompt')
+        if continuations or trimmed_inputs:
+            st.markdown("---")
+            st.markdown("**✂️ Presupuesto de tokens:**")
+            if trimmed_inputs:
+                st.markdown(f"- Prompt recortado (datos opcionales): {', '.join(trimmed_inputs)}")
+            for continuation in continuations or []:
+                st.markdown(
+                    f"- {continuation['stage_name']}: cortada por max_tokens, continuación "
+                    f"{continuation['number']} (+{continuation['tokens']:,} tokens)"
+                )
+        
+        structure_report = meta.get('reparacion_estructura')
+        if structure_report:
+            st.markdown("---")
+            reglas = {
+                'bloque_codigo': "Bloques de código ```",
+                'article': "Contenido sin `<article>`",
+                'kicker': "Kicker en `<div>`",
+                'markdown': "Markdown pasado a HTML",
+                'modulo': "Módulos fuera de `<p><span>`"
+            }
+            if structure_report['fixes']:
+                st.markdown(
+                    f"**🧱 Estructura corregida en local:** {len(structure_report['fixes'])} cambio(s) "
+                    f"sin llamadas a la API"
+                )
+                por_regla = {}
+                for fix in structure_report['fixes']:
+                    por_regla.setdefault(fix['rule'], []).append(fix['detail'])
+                for regla, detalles in por_regla.items():
+                    with st.expander(f"{reglas.get(regla, regla)}: {len(detalles)}"):
+                        for detalle in detalles:
+                            st.code(detalle, language=None)
+            else:
+                st.caption("✅ Estructura v3.3 correcta: no hizo falta corregir nada")
+            if structure_report['pending']:
+                st.warning(
+                    "⚠️ Fallos de estructura que no se pueden corregir en local: "
+                    + ", ".join(structure_report['pending'])
+                )
+        
+        module_report = meta.get('reparacion_modulos')
+        if module_report:
+            st.markdown("---")
+            st.markdown(
+                f"**🧩 Verificación de módulos:** {module_report['ok']}/{module_report['expected']} "
+                f"exactos en el texto generado"
+            )
+            if module_report['repairs']:
+                acciones = {
+                    'corregido': "🔧 Shortcode alterado, sustituido por el original",
+                    'reenvuelto': "📦 Envoltorio corregido a `<p><span>`",
+                    'insertado': "➕ Faltaba, insertado al final del artículo",
+                    'duplicado': "✂️ Copia duplicada eliminada",
+                    'eliminado': "✂️ Módulo no configurado eliminado"
+                }
+                for repair in module_report['repairs']:
+                    modulo = f"Módulo {repair['module'] + 1}" if repair['module'] is not None else "Sin configurar"
+                    st.markdown(f"- {modulo} (`{repair['type'] or '?'}`): {acciones[repair['action']]}")
+            else:
+                st.caption("✅ Todos los módulos llegaron exactos: no hizo falta reparar nada")
+        
+        variant_report = meta.get('variantes_borrador')
+        if variant_report:
+            st.markdown("---")
+            st.markdown(
+                f"**🎲 Variantes del borrador:** elegida la {variant_report['chosen'] + 1} "
+                f"de {variant_report['variants']}"
+            )
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        'Variante': item['index'] + 1,
+                        'Puntuación': item['score'],
+                        'Estructura': item['estructura'],
+                        'Longitud': item['longitud'],
+                        'Keywords': item['keywords'],
+                        'Módulos': item['modulos'],
+                        'Palabras': item['palabras'],
+                        'Fallos': ", ".join(item['fallos_estructura'] + [
+                            f"sin '{k}'" for k in item['keywords_ausentes']
+                        ])
+                    }
+                    for item in variant_report['ranking']
+                ]),
+                use_container_width=True,
+                hide_index=True
+            )
+
+
 # ============================================================================
 # UI PRINCIPAL
 # ============================================================================
@@ -2123,6 +1140,34 @@ def render_sidebar():
         st.markdown("✅ **Módulos <p><span>**")
         st.markdown("---")
         
+        st.markdown("### 🚦 Carga de la API")
+        carga = get_admission_controller().snapshot()
+        st.caption(
+            f"{carga['in_flight']}/{carga['max_in_flight']} llamadas en curso · "
+            f"{carga['waiting']} en cola ({carga['jobs_waiting']} trabajos) · "
+            f"~{carga['avg_call_seconds']:.0f}s por llamada"
+        )
+        st.markdown("---")
+        
+        st.markdown("### ♻️ Caché de resultados")
+        cache_stats = get_result_cache().stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Aciertos", f"{cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}")
+        with col2:
+            st.metric("Tasa", f"{cache_stats['hit_rate']:.0%}")
+        st.caption(
+            f"{cache_stats['entries']} entradas · "
+            f"{cache_stats['bytes'] / 1024 / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB"
+        )
+        
+        savings = get_checkpoint_savings(7, get_checkpoint_store().signature())
+        st.caption(
+            f"💾 Checkpoints (7 días): {savings['resumes']} reanudaciones · "
+            f"{savings['calls_saved']} llamadas ahorradas"
+        )
+        st.markdown("---")
+        
         st.markdown("### Info")
         st.markdown("Versión 3.3 - Structure Fix")
         st.markdown("© 2025 PcComponentes")
@@ -2294,6 +1339,41 @@ def main():
             height=100
         )
         casos_uso = [caso.strip() for caso in casos_uso_text.split('\n') if caso.strip()] if casos_uso_text else []
+        
+        st.markdown("### 🧭 Enrutado de Modelos")
+        routing_profile = st.selectbox(
+            "Perfil por etapa",
+            options=list(ROUTING_PROFILES.keys()),
+            index=list(ROUTING_PROFILES.keys()).index(DEFAULT_ROUTING_PROFILE),
+            format_func=lambda x: ROUTING_PROFILES[x]['name'],
+            help="Modelo y temperatura de cada etapa; los límites de tokens se ajustan a la longitud"
+        )
+        
+        st.markdown("### 🗂️ Motor de Borrador")
+        generation_mode = st.radio(
+            "Generación del borrador (Etapa 1)",
+            options=['auto', 'serial', 'outline'],
+            format_func=lambda x: {
+                'auto': f"🤖 Automático (esquema desde {OUTLINE_MODE_MIN_LENGTH} palabras)",
+                'serial': "📝 Completo en una llamada",
+                'outline': "🗂️ Esquema + secciones en paralelo"
+            }[x],
+            help="El modo esquema redacta las secciones en paralelo: reduce el tiempo en artículos largos"
+        )
+        draft_variants = st.select_slider(
+            "Variantes del borrador",
+            options=list(range(1, MAX_DRAFT_VARIANTS + 1)),
+            value=1,
+            help="Genera varios borradores a la vez y solo el mejor (estructura, longitud, keywords y módulos) "
+                 "pasa al análisis y la versión final: tarda casi lo mismo que uno solo"
+        )
+        
+        st.markdown("### 📏 Control de Longitud")
+        length_correction = st.checkbox(
+            "Ajustar longitud por secciones",
+            value=True,
+            help="Si la versión final se sale de ±5%, amplía/condensa solo las secciones necesarias en lugar de regenerar todo"
+        )
     
     # Botón generar
     st.markdown("---")
@@ -2306,8 +1386,13 @@ def main():
             use_container_width=True,
             disabled=(not objetivo or block_generation)
         )
+        force_regenerate = st.checkbox(
+            "🔄 Regenerar aunque exista en caché",
+            value=False,
+            help="Por defecto, una generación con los mismos datos y configuración se recupera de la caché sin coste"
+        )
     
-    # Proceso de generación
+    # Proceso de generación (en segundo plano: los reruns no la interrumpen)
     if generate:
         # Limpiar resultados GSC previos
         if 'gsc_check_results' in st.session_state:
@@ -2344,223 +1429,64 @@ def main():
             "text": alternativo_text
         } if alternativo_url else {}
         
-        # ✅ USAR ContentGeneratorV4
-        generator = ContentGeneratorV4(st.secrets['ANTHROPIC_API_KEY'])
-        
-        progress = st.progress(0)
-        status = st.status("⏳ Iniciando generación...", expanded=True)
-        
-        def update_progress(percent, message):
-            progress.progress(percent)
-            status.write(message)
-        
-        # ✅ FLUJO DE 3 ETAPAS
-        draft, corrections, final = generator.generate_with_3_stages(
-            pdp_data=pdp_data,
-            arquetipo=arquetipo,
-            target_length=content_length,
-            keywords=keywords_list,
-            context=context,
-            links=links,
-            modules=modules_data,
-            objetivo=objetivo,
-            producto_alternativo=producto_alternativo,
-            casos_uso=casos_uso,
-            campos_arquetipo=campos_arquetipo,
-            progress_callback=update_progress
-        )
-        
-        if not final:
-            st.error("❌ Error en generación")
-            st.stop()
-        
-        final_content = final
-        progress.progress(100)
-        status.update(label="✅ Generación completada", state="complete")
-        
-        st.session_state.results = {
-            'draft': draft,
-            'corrections': corrections,
-            'final': final_content,
-            'metadata': {
-                'product_id': product_id or "N/A",
-                'arquetipo': arquetipo_code,
-                'objetivo': objetivo,
-                'keyword_principal': keyword_principal,
-                'keywords_secundarias': keywords_secundarias,
-                'longitud_objetivo': content_length,
-                'longitud_real': count_words_in_html(final_content),
-                'num_modulos': len(modules_data),
-                'campos_arquetipo': campos_arquetipo,
-                'modulos': modules_data,
-                'timestamp': datetime.now().isoformat()
-            }
+        generation_request = {
+            'pdp_data': pdp_data,
+            'arquetipo': arquetipo,
+            'target_length': content_length,
+            'keywords': keywords_list,
+            'context': context,
+            'links': links,
+            'modules': modules_data,
+            'objetivo': objetivo,
+            'producto_alternativo': producto_alternativo,
+            'casos_uso': casos_uso,
+            'campos_arquetipo': campos_arquetipo,
+            'length_correction': length_correction,
+            'generation_mode': generation_mode,
+            'draft_variants': draft_variants,
+            'force_regenerate': force_regenerate
         }
         
-        st.markdown("---")
-        st.success(f"✅ Contenido generado")
-        
-        with st.expander("📋 Configuración aplicada", expanded=True):
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.markdown(f"**Arquetipo:** {arquetipo['name']}")
-                st.markdown(f"**Producto:** {product_id or 'N/A'}")
-            with col2:
-                st.markdown(f"**Módulos:** {len(modules_data)}")
-                if len(modules_data) > 0:
-                    for mod in modules_data:
-                        if mod['type'] == 'product':
-                            st.markdown(f"- 🎯 {mod['nombre']}")
-                        else:
-                            st.markdown(f"- 🎠 {mod['category_name']}")
-            with col3:
-                st.markdown(f"**Alternativo:** {'✅' if producto_alternativo.get('url') else '❌'}")
-                st.markdown(f"**Casos uso:** {len(casos_uso)}")
-                st.markdown(f"**Keywords:** {len(keywords_list)}")
-        
-        # ✅ TABS DE RESULTADOS
-        st.markdown("---")
-        st.markdown("## 📊 Resultados de la Generación")
-        
-        tab1, tab2, tab3, tab4 = st.tabs([
-            "📄 Versión Final",
-            "📝 Borrador",
-            "🔍 Análisis Crítico",
-            "📈 Métricas"
-        ])
-        
-        with tab1:
-            st.markdown("### 📄 Contenido Final")
-            
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Longitud objetivo", f"{content_length}")
-            with col2:
-                longitud_real = count_words_in_html(final_content)
-                st.metric("Longitud real", f"{longitud_real}")
-            with col3:
-                diferencia = longitud_real - content_length
-                st.metric("Diferencia", f"{diferencia:+d}")
-            with col4:
-                porcentaje = (longitud_real / content_length * 100) - 100
-                st.metric("Precisión", f"{porcentaje:+.1f}%")
-            
-            # Verificación de estructura v3.3
-            st.markdown("#### 🔍 Verificación Estructura v3.3:")
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                has_article = '<article>' in final_content.lower()
-                st.markdown(f"{'✅' if has_article else '❌'} `<article>`")
-            with col2:
-                has_span_kicker = '<span class="kicker">' in final_content.lower()
-                st.markdown(f"{'✅' if has_span_kicker else '❌'} Kicker `<span>`")
-            with col3:
-                has_p_span_module = '<p><span>#module' in final_content.lower()
-                st.markdown(f"{'✅' if has_p_span_module else '❌'} Módulos `<p><span>`")
-            with col4:
-                has_root = ':root' in final_content
-                st.markdown(f"{'✅' if has_root else '❌'} CSS `:root`")
-            
-            with st.expander("👁️ Vista previa renderizada", expanded=True):
-                st.components.v1.html(final_content, height=800, scrolling=True)
-            
-            with st.expander("</> Código HTML"):
-                st.code(final_content, language='html')
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.download_button(
-                    "⬇️ Descargar HTML",
-                    data=final_content,
-                    file_name=f"contenido_{arquetipo_code}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
-                    mime="text/html",
-                    use_container_width=True
-                )
-            with col2:
-                st.download_button(
-                    "⬇️ Descargar JSON completo",
-                    data=json.dumps(st.session_state.results, indent=2, ensure_ascii=False),
-                    file_name=f"generacion_{arquetipo_code}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json",
-                    use_container_width=True
-                )
-        
-        with tab2:
-            st.markdown("### 📝 Borrador Inicial (Etapa 1)")
-            st.caption("Primera versión generada antes de la autocorrección")
-            
-            with st.expander("Ver borrador", expanded=False):
-                st.components.v1.html(draft, height=600, scrolling=True)
+        metadata = {
+            'product_id': product_id or "N/A",
+            'arquetipo': arquetipo_code,
+            'arquetipo_nombre': arquetipo['name'],
+            'objetivo': objetivo,
+            'keyword_principal': keyword_principal,
+            'keywords_secundarias': keywords_secundarias,
+            'keywords': keywords_list,
+            'longitud_objetivo': content_length,
+            'num_modulos': len(modules_data),
+            'perfil_enrutado': routing_profile,
+            'campos_arquetipo': campos_arquetipo,
+            'modulos': modules_data,
+            'producto_alternativo': producto_alternativo,
+            'casos_uso': casos_uso
+        }
         
-        with tab3:
-            st.markdown("### 🔍 Análisis Crítico (Etapa 2)")
-            st.caption("La IA analiza y sugiere correcciones")
-            
-            try:
-                corrections_data = json.loads(corrections)
-                
-                # Mostrar verificación de estructura v3.3
-                if 'estructura_html' in corrections_data:
-                    st.markdown("#### 🏗️ Verificación Estructura HTML v3.3:")
-                    estructura = corrections_data['estructura_html']
-                    cols = st.columns(4)
-                    with cols[0]:
-                        status_article = "✅" if estructura.get('tiene_article') else "❌"
-                        st.markdown(f"{status_article} `<article>`")
-                    with cols[1]:
-                        status_kicker = "✅" if estructura.get('kicker_usa_span') else "❌"
-                        st.markdown(f"{status_kicker} Kicker `<span>`")
-                    with cols[2]:
-                        status_modulos = "✅" if estructura.get('modulos_usan_p_span') else "❌"
-                        st.markdown(f"{status_modulos} Módulos `<p><span>`")
-                    with cols[3]:
-                        status_css = "✅" if estructura.get('css_tiene_root') else "❌"
-                        st.markdown(f"{status_css} CSS `:root`")
-                
-                if 'problemas_encontrados' in corrections_data:
-                    st.markdown("#### ⚠️ Problemas Encontrados:")
-                    for prob in corrections_data['problemas_encontrados']:
-                        gravedad_emoji = {
-                            'crítico': '🔴',
-                            'medio': '🟡',
-                            'menor': '🟢'
-                        }.get(prob.get('gravedad', ''), '⚪')
-                        
-                        st.markdown(f"{gravedad_emoji} **{prob.get('tipo', 'N/A').upper()}** ({prob.get('gravedad', 'N/A')})")
-                        st.markdown(f"- {prob.get('descripcion', 'N/A')}")
-                        st.markdown(f"- 📍 Ubicación: {prob.get('ubicacion', 'N/A')}")
-                        st.markdown(f"- ✅ Corrección: {prob.get('correccion_sugerida', 'N/A')}")
-                        st.markdown("---")
-                
-                if 'aspectos_positivos' in corrections_data:
-                    st.markdown("#### ✅ Aspectos Positivos:")
-                    for aspecto in corrections_data['aspectos_positivos']:
-                        st.markdown(f"- {aspecto}")
-                
-                with st.expander("Ver análisis JSON completo"):
-                    st.json(corrections_data)
-            
-            except:
-                st.code(corrections)
+        # Todo lo que usa st.* se resuelve aquí, en el hilo de la sesión
+        generator = ContentGeneratorV4(
+            st.secrets['ANTHROPIC_API_KEY'],
+            routing_profile=routing_profile,
+            telemetry_store=TELEMETRY_STORE,
+            result_cache=get_result_cache(),
+            checkpoint_store=get_checkpoint_store(),
+            scheduler=get_rate_scheduler(),
+            admission=get_admission_controller()
+        )
         
-        with tab4:
-            st.markdown("### 📈 Métricas de Generación")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("**Configuración:**")
-                st.markdown(f"- Arquetipo: {arquetipo['name']}")
-                st.markdown(f"- Keyword principal: {keyword_principal}")
-                st.markdown(f"- Módulos: {len(modules_data)}")
-                st.markdown(f"- Producto: {product_id or 'N/A'}")
-            
-            with col2:
-                st.markdown("**Resultados:**")
-                st.markdown(f"- Longitud: {count_words_in_html(final_content)} / {content_length} palabras")
-                st.markdown(f"- Precisión: {porcentaje:+.1f}%")
-                st.markdown(f"- Formato: HTML puro ✅")
-                st.markdown(f"- Módulos incluidos: {len(modules_data)}/{len(modules_data)} ✅")
+        job_id = get_job_runner().submit(
+            partial(run_generation_job, generator, generation_request, metadata),
+            owner=get_session_owner(),
+            title=f"{arquetipo['name']} · {keyword_principal or objetivo[:40]}",
+            params=metadata,
+            on_cancel=generator.cancel,
+            on_discard=generator.close
+        )
+        attach_job(job_id)
+        st.toast("🚀 Generación enviada: puedes seguir preparando el siguiente artículo")
+    
+    render_job_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,181 @@
+"""
+Article Analyzer
+Informe de un artículo HTML en una sola pasada (html.parser), compartido por
+todas las pestañas de resultados y por la puntuación de borradores
+- Estructura v3.3: <article>, kicker en <span>, módulos en <p><span>, CSS con :root
+- Clases CSS usadas (y las que el <style> no define), estilos en línea y enlaces
+- Shortcodes de módulos, árbol de encabezados y palabras (total y por sección)
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List
+
+from word_count import SHORTCODE_MARKER, SHORTCODE_PATTERN, VOID_TAGS, WordCountParser, section_counts
+
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+CSS_CLASS_PATTERN = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+SHORTCODE_START = '#MODULE_START#|'
+SHORTCODE_END = '|#MODULE_END#'
+
+# Markdown que queda en el texto visible: **negrita**, ## encabezado, [texto](url)
+MARKDOWN_PATTERN = re.compile(r'\*\*[^*\n]+\*\*|(?:^|\s)#{2,6}\s|\[[^\]\n]+\]\([^)\s]+\)')
+
+CACHE_SIZE = 64
+
+
+def parse_shortcode(shortcode: str) -> Dict:
+    """
+    Datos de un shortcode #MODULE_START#|{json}|#MODULE_END#
+
+    Returns:
+        Diccionario con 'type', 'params' y 'valid_json'
+    """
+    payload = shortcode[len(SHORTCODE_START):-len(SHORTCODE_END)]
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        data = None
+
+    if not isinstance(data, dict):
+        return {'type': None, 'params': None, 'valid_json': False}
+    return {'type': data.get('type'), 'params': data.get('params'), 'valid_json': True}
+
+
+class _ArticleParser(WordCountParser):
+    """WordCountParser que además recoge estructura, clases, enlaces, módulos y encabezados"""
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []             # Etiquetas abiertas (para saber si un módulo va en <p><span>)
+        self.css = []
+        self.classes = {}           # clase -> usos
+        self.inline_styles = []
+        self.links = []
+        self.modules = []
+        self.headings = []          # (nivel, texto) en orden de aparición
+        self.text = []
+        self.kicker_span = False
+        self._link = None
+        self._heading = None
+
+    def _record_attrs(self, tag, attrs):
+        attrs = dict(attrs)
+        class_names = (attrs.get('class') or '').split()
+        for name in class_names:
+            self.classes[name] = self.classes.get(name, 0) + 1
+        if tag == 'span' and 'kicker' in class_names:
+            self.kicker_span = True
+        if (attrs.get('style') or '').strip():
+            self.inline_styles.append({'tag': tag, 'style': attrs['style'].strip()})
+        return attrs
+
+    def handle_starttag(self, tag, attrs):
+        attrs_dict = self._record_attrs(tag, attrs)
+
+        if tag == 'a':
+            self._link = {'href': attrs_dict.get('href') or '', 'text': []}
+        elif tag in HEADING_TAGS:
+            self._heading = (int(tag[1]), [])
+
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+        super().handle_starttag(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self._record_attrs(tag, attrs)
+        super().handle_startendtag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in self.stack:
+            while self.stack.pop() != tag:
+                pass
+
+        if tag == 'a' and self._link:
+            self.links.append({'href': self._link['href'], 'text': ' '.join(''.join(self._link['text']).split())})
+            self._link = None
+        elif self._heading and tag == f"h{self._heading[0]}":
+            self.headings.append((self._heading[0], ' '.join(''.join(self._heading[1]).split())))
+            self._heading = None
+
+        super().handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self.stack and self.stack[-1] == 'style':
+            self.css.append(data)
+        elif not self.skip_depth and SHORTCODE_MARKER in data:
+            wrapped = self.stack[-2:] == ['p', 'span']
+            for match in SHORTCODE_PATTERN.finditer(data):
+                self.modules.append({
+                    'shortcode': match.group(0), 'wrapped': wrapped, **parse_shortcode(match.group(0))
+                })
+        super().handle_data(data)
+
+    def handle_text(self, data):
+        # Entre bloques el texto se separa con un espacio ("fin.</p><p>Otro")
+        self.text.append(data if self.joinable else ' ' + data)
+        if self._link:
+            self._link['text'].append(data)
+        if self._heading:
+            self._heading[1].append(data)
+        super().handle_text(data)
+
+
+def _heading_tree(headings) -> List[Dict]:
+    """Anida los encabezados por nivel (h3 dentro del h2 anterior, etc.)"""
+    tree, open_nodes = [], []
+    for level, text in headings:
+        node = {'level': level, 'text': text, 'children': []}
+        while open_nodes and open_nodes[-1]['level'] >= level:
+            open_nodes.pop()
+        (open_nodes[-1]['children'] if open_nodes else tree).append(node)
+        open_nodes.append(node)
+    return tree
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def analyze_article(html_content: str) -> Dict:
+    """
+    Analiza un artículo en una sola pasada
+
+    El informe está memoizado por contenido y se comparte entre llamadas
+    (y entre reruns de la app): no se debe modificar.
+
+    Returns:
+        Diccionario con 'structure', 'words', 'css_classes', 'undefined_classes',
+        'inline_styles', 'links', 'modules', 'headings' y 'text'
+    """
+    html_content = html_content or ''
+    parser = _ArticleParser()
+    parser.feed(html_content)
+    parser.close()
+
+    css = ''.join(parser.css)
+    text = ' '.join(''.join(parser.text).split())
+    defined_classes = set(CSS_CLASS_PATTERN.findall(css))
+
+    return {
+        'structure': {
+            'tiene_article': parser.article_depth is not None,
+            'kicker_usa_span': parser.kicker_span,
+            'modulos_usan_p_span': all(module['wrapped'] for module in parser.modules),
+            'css_tiene_root': ':root' in css,
+            'h1_unico': sum(1 for level, _ in parser.headings if level == 1) == 1,
+            'sin_markdown': '```' not in html_content and not MARKDOWN_PATTERN.search(text),
+        },
+        'words': {
+            'total': parser.total,
+            'sections': [
+                {'heading': heading, 'level': level, 'words': words}
+                for heading, level, words in section_counts(parser)
+            ]
+        },
+        'css_classes': dict(sorted(parser.classes.items())),
+        'undefined_classes': sorted(set(parser.classes) - defined_classes) if css else [],
+        'inline_styles': parser.inline_styles,
+        'links': parser.links,
+        'modules': parser.modules,
+        'headings': _heading_tree(parser.headings),
+        'text': text
+    }
@@ -0,0 +1,477 @@
+"""
+Batch CLI
+Generación por lotes sin Streamlit a partir de un CSV/JSONL de trabajos
+Usa el mismo flujo de 3 etapas que la app (prompts.py + generator.py)
+
+Uso:
+    python batch_cli.py trabajos.csv --output-dir salida/ --workers 4
+    python batch_cli.py trabajos.csv --output-dir salida/ --batch-api   # Message Batches API
+
+Columnas (CSV) o claves (JSONL) de cada trabajo:
+    job_id, product_id, arquetipo (ARQ-n), keyword_principal, keywords_secundarias,
+    objetivo, longitud, contexto, link_principal_url, link_principal_text,
+    links_secundarios, modules, campos, producto_alternativo_url,
+    producto_alternativo_text, casos_uso
+En CSV, links_secundarios, modules y campos van como JSON y casos_uso separados por '|'.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import anthropic
+
+from batch_executor import BatchExecutor, DEFAULT_POLL_SECONDS
+from cms_export import export_for_cms
+from checkpoints import CheckpointStore
+from generator import (
+    AsyncContentGenerator, arun_generation_job, fetch_pdp_data, get_mock_pdp_data,
+    ROUTING_PROFILES, DEFAULT_ROUTING_PROFILE, MAX_DRAFT_VARIANTS
+)
+from prompts import ARQUETIPOS, generate_product_module, generate_carousel_module
+from rate_limiter import (
+    AdmissionController, RateLimitScheduler,
+    DEFAULT_MAX_IN_FLIGHT, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+)
+from result_cache import ResultCache
+from telemetry import TelemetryStore, summarize_totals
+
+RUNTIME_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'runtime')
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.streamlit', 'secrets.toml')
+
+DEFAULT_WORKERS = 4
+
+
+def log(job_id: str, message: str):
+    """Imprime un aviso de progreso con el id del trabajo"""
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] [{job_id}] {message}", flush=True)
+
+
+def load_settings() -> Dict:
+    """
+    Configuración de la API: variables de entorno y, si existe, .streamlit/secrets.toml
+
+    Returns:
+        Diccionario con ANTHROPIC_API_KEY, ANTHROPIC_BASE_URL, ANTHROPIC_RPM,
+        ANTHROPIC_TPM y ANTHROPIC_MAX_IN_FLIGHT
+    """
+    settings = {}
+    if os.path.exists(SECRETS_PATH):
+        try:
+            import tomllib
+            with open(SECRETS_PATH, 'rb') as f:
+                settings.update(tomllib.load(f))
+        except (ImportError, ValueError):
+            pass  # Python < 3.11 o fichero no válido: solo variables de entorno
+
+    for key in ('ANTHROPIC_API_KEY', 'ANTHROPIC_BASE_URL', 'ANTHROPIC_RPM', 'ANTHROPIC_TPM',
+                'ANTHROPIC_MAX_IN_FLIGHT'):
+        if os.environ.get(key):
+            settings[key] = os.environ[key]
+    return settings
+
+
+def _parse_json_field(value, default):
+    """Campo JSON de un CSV (en JSONL ya viene deserializado)"""
+    if value in (None, ''):
+        return default
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def load_jobs(path: str) -> List[Dict]:
+    """Lee los trabajos de un CSV o JSONL (según la extensión)"""
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def build_modules(specs: List[Dict]) -> List[Dict]:
+    """
+    Convierte la especificación de módulos del trabajo al formato de la app
+
+    Producto: {"type": "product", "article_id": "...", "nombre": "..."}
+    Carrusel: {"type": "carousel", "category_name", "slug", "category_id", "order",
+               "navigation", "loop", "article_amount"}
+    """
+    modules = []
+    for idx, spec in enumerate(specs):
+        module = dict(spec, id=idx)
+        if spec['type'] == 'product':
+            module['nombre'] = spec.get('nombre') or f"Producto {idx + 1}"
+            module['shortcode'] = generate_product_module(spec['article_id'], spec.get('nombre', ''))
+        elif spec['type'] == 'carousel':
+            module.setdefault('category_name', spec['slug'])
+            module['shortcode'] = generate_carousel_module(
+                spec['slug'],
+                spec['category_id'],
+                spec.get('order', 'relevance'),
+                str(spec.get('navigation', 'true')).lower(),
+                str(spec.get('loop', 'true')).lower(),
+                int(spec.get('article_amount', 12))
+            )
+        else:
+            raise ValueError(f"Tipo de módulo desconocido: {spec['type']}")
+        modules.append(module)
+    return modules
+
+
+def build_job(row: Dict, index: int, args) -> Dict:
+    """
+    Traduce una fila del fichero de trabajos a request + metadata de run_generation_job
+
+    Los datos de la PDP no se piden aquí: los carga cada trabajo al empezar (load_pdp).
+
+    Raises:
+        ValueError: si falta el objetivo, el arquetipo no existe o un campo JSON no es válido
+    """
+    job_id = str(row.get('job_id') or f"job{index + 1:04d}")
+
+    arquetipo_code = (row.get('arquetipo') or '').strip()
+    if arquetipo_code not in ARQUETIPOS:
+        raise ValueError(f"Arquetipo desconocido: '{arquetipo_code}'")
+    arquetipo = ARQUETIPOS[arquetipo_code]
+
+    objetivo = (row.get('objetivo') or '').strip()
+    if not objetivo:
+        raise ValueError("El objetivo es obligatorio")
+
+    keyword_principal = (row.get('keyword_principal') or '').strip()
+    keywords_secundarias = (row.get('keywords_secundarias') or '').strip()
+    keywords = f"{keyword_principal}, {keywords_secundarias}" if keywords_secundarias else keyword_principal
+    keywords_list = [k.strip() for k in keywords.split(",")] if keywords else []
+
+    target_length = int(row.get('longitud') or arquetipo['default_length'])
+
+    product_id = str(row.get('product_id') or '').strip()
+
+    links = {
+        "principal": {
+            "url": row['link_principal_url'],
+            "text": row.get('link_principal_text', '')
+        } if row.get('link_principal_url') else {},
+        "secundarios": _parse_json_field(row.get('links_secundarios'), [])
+    }
+
+    producto_alternativo = {
+        "url": row['producto_alternativo_url'],
+        "text": row.get('producto_alternativo_text', '')
+    } if row.get('producto_alternativo_url') else {}
+
+    casos_uso = row.get('casos_uso') or []
+    if isinstance(casos_uso, str):
+        casos_uso = [caso.strip() for caso in casos_uso.split('|') if caso.strip()]
+
+    modules = build_modules(_parse_json_field(row.get('modules'), []))
+    campos_arquetipo = _parse_json_field(row.get('campos'), {})
+
+    request = {
+        'pdp_data': None,
+        'arquetipo': arquetipo,
+        'target_length': target_length,
+        'keywords': keywords_list,
+        'context': row.get('contexto') or '',
+        'links': links,
+        'modules': modules,
+        'objetivo': objetivo,
+        'producto_alternativo': producto_alternativo,
+        'casos_uso': casos_uso,
+        'campos_arquetipo': campos_arquetipo,
+        'length_correction': not args.no_length_correction,
+        'generation_mode': args.mode,
+        'draft_variants': args.variants,
+        'force_regenerate': args.force
+    }
+
+    metadata = {
+        'job_id': job_id,
+        'product_id': product_id or "N/A",
+        'arquetipo': arquetipo_code,
+        'arquetipo_nombre': arquetipo['name'],
+        'objetivo': objetivo,
+        'keyword_principal': keyword_principal,
+        'keywords_secundarias': keywords_secundarias,
+        'keywords': keywords_list,
+        'longitud_objetivo': target_length,
+        'num_modulos': len(modules),
+        'perfil_enrutado': args.routing_profile,
+        'campos_arquetipo': campos_arquetipo,
+        'modulos': modules,
+        'producto_alternativo': producto_alternativo,
+        'casos_uso': casos_uso,
+        'origen': 'batch_cli'
+    }
+
+    return {'job_id': job_id, 'product_id': product_id, 'request': request, 'metadata': metadata}
+
+
+def load_pdp(job: Dict, args):
+    """
+    Carga los datos de la PDP del trabajo en su request
+
+    Se llama al empezar cada trabajo (en un hilo, el webhook es bloqueante): las
+    peticiones se solapan con la generación de los demás y una PDP lenta o
+    caída solo afecta a su trabajo.
+
+    Raises:
+        requests.exceptions.RequestException: si el webhook falla
+    """
+    product_id = job['product_id']
+    if product_id:
+        job['request']['pdp_data'] = get_mock_pdp_data(product_id) if args.mock_pdp else fetch_pdp_data(product_id)
+
+
+async def run_job(job: Dict, services: Dict, args, semaphore: asyncio.Semaphore) -> Dict:
+    """
+    Ejecuta un trabajo y escribe <job_id>.html y <job_id>.json en el directorio de salida
+
+    Espera turno en `semaphore` (args.workers trabajos a la vez); cada trabajo
+    tiene su AsyncContentGenerator y su cliente, que se cierra al terminar.
+    """
+    async with semaphore:
+        job_id = job['job_id']
+        start = time.perf_counter()
+        await asyncio.to_thread(load_pdp, job, args)
+
+        generator = AsyncContentGenerator(
+            services['api_key'],
+            routing_profile=args.routing_profile,
+            telemetry_store=services['telemetry'],
+            result_cache=services['cache'],
+            checkpoint_store=services['checkpoints'],
+            scheduler=services['scheduler'],
+            admission=services['admission'],
+            base_url=services['base_url']
+        )
+
+        def progress(percent, message):
+            if percent is None or args.verbose:
+                log(job_id, message)
+
+        log(job_id, "🚀 Iniciando generación")
+        results = await arun_generation_job(generator, job['request'], job['metadata'], progress)
+        return write_job_outputs(job, results, args.output_dir, time.perf_counter() - start)
+
+
+async def run_jobs(jobs: List[Dict], services: Dict, args) -> List[Dict]:
+    """
+    Ejecuta todos los trabajos en un solo event loop, hasta args.workers a la vez
+
+    Las llamadas de todos los trabajos (y sus secciones y variantes) comparten
+    el event loop; un trabajo que falla solo deja su fila de error en el informe.
+    """
+    semaphore = asyncio.Semaphore(args.workers)
+
+    async def run(job):
+        try:
+            return await run_job(job, services, args, semaphore)
+        except Exception as e:
+            log(job['job_id'], f"❌ {e}")
+            return {'job_id': job['job_id'], 'status': 'error', 'error': str(e)}
+
+    return await asyncio.gather(*(run(job) for job in jobs))
+
+
+def write_job_outputs(job: Dict, results: Dict, output_dir: str, duration_s: float) -> Dict:
+    """Escribe <job_id>.html, <job_id>.cms.html y <job_id>.json y devuelve la fila del informe"""
+    job_id = job['job_id']
+
+    with open(os.path.join(output_dir, f"{job_id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    export = None
+    if results['final']:
+        with open(os.path.join(output_dir, f"{job_id}.html"), 'w', encoding='utf-8') as f:
+            f.write(results['final'])
+        # Versión para el CMS: minificada y con solo el CSS usado (mismos bytes en cada exportación)
+        export = export_for_cms(results['final'])
+        with open(os.path.join(output_dir, f"{job_id}.cms.html"), 'w', encoding='utf-8') as f:
+            f.write(export['content'])
+
+    totals = summarize_totals(results['metadata']['telemetria'])
+    summary = {
+        'job_id': job_id,
+        'status': 'error' if results.get('error') else 'ok',
+        'arquetipo': job['metadata']['arquetipo'],
+        'keyword_principal': job['metadata']['keyword_principal'],
+        'longitud_objetivo': job['metadata']['longitud_objetivo'],
+        'longitud_real': results['metadata']['longitud_real'],
+        'desde_cache': results['metadata']['desde_cache'],
+        'llamadas': totals['calls'],
+        'coste_usd': totals['cost_usd'],
+        'bytes_cms': export['bytes'] if export else 0,
+        'ahorro_cms_bytes': export['saved_bytes'] if export else 0,
+        'duracion_s': round(duration_s, 1),
+        'error': results.get('error', '')
+    }
+    log(job_id, f"{'✅' if summary['status'] == 'ok' else '❌'} {summary['longitud_real']} palabras "
+                f"· ${summary['coste_usd']:.4f} · {summary['duracion_s']}s")
+    return summary
+
+
+def write_report(rows: List[Dict], output_dir: str):
+    """Informe resumen del lote (summary.csv + summary.json)"""
+    fields = [
+        'job_id', 'status', 'arquetipo', 'keyword_principal', 'longitud_objetivo',
+        'longitud_real', 'desde_cache', 'llamadas', 'coste_usd', 'bytes_cms', 'ahorro_cms_bytes',
+        'duracion_s', 'error'
+    ]
+    with open(os.path.join(output_dir, 'summary.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'jobs': len(rows),
+        'ok': sum(1 for r in rows if r['status'] == 'ok'),
+        'errors': sum(1 for r in rows if r['status'] != 'ok'),
+        'from_cache': sum(1 for r in rows if r.get('desde_cache')),
+        'cost_usd': round(sum(r.get('coste_usd') or 0 for r in rows), 4),
+        'rows': rows
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generación de contenido por lotes (flujo de 3 etapas)")
+    parser.add_argument('jobs_file', help="CSV o JSONL con un trabajo por fila")
+    parser.add_argument('--output-dir', default='batch_output', help="Carpeta de salida")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Trabajos en paralelo (en un solo event loop)")
+    parser.add_argument('--routing-profile', default=DEFAULT_ROUTING_PROFILE, choices=list(ROUTING_PROFILES))
+    parser.add_argument('--mode', default='auto', choices=['auto', 'serial', 'outline'],
+                        help="Motor de borrador (Etapa 1)")
+    parser.add_argument('--variants', type=int, default=1, choices=range(1, MAX_DRAFT_VARIANTS + 1),
+                        metavar=f"1-{MAX_DRAFT_VARIANTS}",
+                        help="Borradores alternativos a la vez; solo el mejor pasa a las etapas 2 y 3 (no aplica a --batch-api)")
+    parser.add_argument('--no-length-correction', action='store_true', help="Sin ajuste de longitud por secciones")
+    parser.add_argument('--force', action='store_true', help="Regenerar aunque exista en caché")
+    parser.add_argument('--mock-pdp', action='store_true', help="Datos de producto de ejemplo (sin VPN)")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar todos los avisos de progreso")
+    parser.add_argument('--batch-api', action='store_true',
+                        help="Usar la Message Batches API (mitad de precio; borrador completo y sin ajuste de longitud)")
+    parser.add_argument('--poll-seconds', type=float, default=DEFAULT_POLL_SECONDS,
+                        help="Intervalo de consulta de los lotes (--batch-api)")
+    parser.add_argument('--base-url', default=None, help="URL base de la API (p. ej. un servidor local de pruebas)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    settings = load_settings()
+
+    if not settings.get('ANTHROPIC_API_KEY'):
+        print("Configura ANTHROPIC_API_KEY (variable de entorno o .streamlit/secrets.toml)", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Filas no válidas se informan sin detener el lote
+    jobs, rows = [], []
+    for index, row in enumerate(load_jobs(args.jobs_file)):
+        try:
+            jobs.append(build_job(row, index, args))
+        except Exception as e:
+            job_id = str(row.get('job_id') or f"job{index + 1:04d}")
+            log(job_id, f"❌ Trabajo no válido: {e}")
+            rows.append({'job_id': job_id, 'status': 'invalid', 'error': str(e)})
+
+    base_url = args.base_url or settings.get('ANTHROPIC_BASE_URL')
+    telemetry = TelemetryStore(os.path.join(RUNTIME_DATA_DIR, 'telemetry.jsonl'))
+
+    if args.batch_api:
+        jobs, failed = asyncio.run(load_pdps(jobs, args))
+        rows.extend(failed)
+        rows.extend(run_batch_api(jobs, settings['ANTHROPIC_API_KEY'], base_url, telemetry, args))
+        return finish(rows, args.output_dir)
+
+    services = {
+        'api_key': settings['ANTHROPIC_API_KEY'],
+        'base_url': base_url,
+        'telemetry': telemetry,
+        'cache': ResultCache(os.path.join(RUNTIME_DATA_DIR, 'results')),
+        'checkpoints': CheckpointStore(os.path.join(RUNTIME_DATA_DIR, 'checkpoints')),
+        'scheduler': RateLimitScheduler(
+            requests_per_minute=int(settings.get('ANTHROPIC_RPM', DEFAULT_REQUESTS_PER_MINUTE)),
+            tokens_per_minute=int(settings.get('ANTHROPIC_TPM', DEFAULT_TOKENS_PER_MINUTE))
+        ),
+        'admission': AdmissionController(
+            max_in_flight=int(settings.get('ANTHROPIC_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+        )
+    }
+
+    print(f"📦 {len(jobs)} trabajos · {args.workers} en paralelo · perfil {args.routing_profile}", flush=True)
+
+    rows.extend(asyncio.run(run_jobs(jobs, services, args)))
+    return finish(rows, args.output_dir)
+
+
+async def load_pdps(jobs: List[Dict], args):
+    """
+    Carga a la vez (hasta args.workers) las PDP de los trabajos de --batch-api
+
+    Returns:
+        (trabajos con su PDP, filas de informe de los que fallaron)
+    """
+    semaphore = asyncio.Semaphore(args.workers)
+
+    async def load(job):
+        async with semaphore:
+            try:
+                await asyncio.to_thread(load_pdp, job, args)
+                return None
+            except Exception as e:
+                log(job['job_id'], f"❌ Datos de producto: {e}")
+                return {'job_id': job['job_id'], 'status': 'error', 'error': str(e)}
+
+    errors = await asyncio.gather(*(load(job) for job in jobs))
+    return [job for job, error in zip(jobs, errors) if not error], [error for error in errors if error]
+
+
+def run_batch_api(jobs: List[Dict], api_key: str, base_url, telemetry, args) -> List[Dict]:
+    """
+    Ejecuta los trabajos con la Message Batches API
+
+    El estado se guarda en <output-dir>/batch_state.json: relanzar el mismo
+    comando retoma los lotes pendientes sin reenviar las etapas ya resueltas.
+    """
+    start = time.perf_counter()
+    executor = BatchExecutor(
+        anthropic.Anthropic(api_key=api_key, base_url=base_url),
+        os.path.join(args.output_dir, 'batch_state.json'),
+        routing_profile=args.routing_profile,
+        poll_seconds=args.poll_seconds,
+        telemetry_store=telemetry,
+        log=lambda message: log('batch', message)
+    )
+    results = executor.run(jobs)
+    duration_s = time.perf_counter() - start
+    return [write_job_outputs(job, results[job['job_id']], args.output_dir, duration_s) for job in jobs]
+
+
+def finish(rows: List[Dict], output_dir: str) -> int:
+    """Escribe el informe del lote y devuelve el código de salida"""
+    rows.sort(key=lambda r: r['job_id'])
+    report = write_report(rows, output_dir)
+    print(
+        f"🏁 {report['ok']}/{report['jobs']} correctos · {report['from_cache']} desde caché · "
+        f"${report['cost_usd']:.4f} · informe en {os.path.join(output_dir, 'summary.csv')}",
+        flush=True
+    )
+    return 0 if report['errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Batch Executor
+Generación masiva con la Message Batches API de Anthropic (mitad de precio, sin prisa)
+- Un lote por etapa: todos los borradores, luego todos los análisis y luego las versiones finales
+- Estado por trabajo en un JSON en disco: al relanzar se retoman los lotes abiertos
+- base_url configurable para probar contra un servidor local que imite la API
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from generator import build_stage_request, count_words_in_html, validate_json_schema, DEFAULT_ROUTING_PROFILE
+from shortcode_verifier import repair_modules
+from structure_fixer import fix_structure
+from prompts import (
+    CRITIQUE_TOOL,
+    build_generation_prompt_stage1_draft, build_correction_prompt_stage2,
+    build_final_generation_prompt_stage3
+)
+from telemetry import build_stage_record
+from token_budget import PromptBudgetExceeded, fit_prompt_args
+
+# Orden de las etapas y dónde se guarda el resultado de cada una
+STAGES = ['draft', 'critique', 'final']
+STAGE_RESULT_KEYS = {'draft': 'draft', 'critique': 'corrections', 'final': 'final'}
+STAGE_NAMES = {'draft': "Borrador", 'critique': "Análisis", 'final': "Versión Final"}
+
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+BATCH_DISCOUNT = 0.5           # Las llamadas por lotes cuestan la mitad
+DEFAULT_POLL_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 2       # Intentos por etapa y trabajo (errores, resultados no válidos)
+
+
+class BatchState:
+    """Estado persistente de una ejecución por lotes (trabajos + lotes enviados)"""
+
+    def __init__(self, path: str):
+        """
+        Carga el estado (o lo crea vacío)
+
+        Args:
+            path: Ruta del fichero JSON de estado
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.data = {'created_at': datetime.now().isoformat(), 'jobs': {}, 'batches': []}
+
+    def job(self, job_id: str) -> Dict:
+        """Estado de un trabajo (se crea en la primera etapa si no existe)"""
+        return self.data['jobs'].setdefault(job_id, {
+            'stage': STAGES[0], 'attempts': {}, 'telemetria': [], 'error': None
+        })
+
+    def open_batches(self) -> List[Dict]:
+        """Lotes enviados cuyos resultados aún no se han recogido"""
+        return [b for b in self.data['batches'] if not b.get('collected')]
+
+    def save(self):
+        """Escritura atómica del estado"""
+        with self._lock:
+            self.data['updated_at'] = datetime.now().isoformat()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+class BatchExecutor:
+    """Ejecuta el flujo de 3 etapas de muchos trabajos como lotes de la Message Batches API"""
+
+    def __init__(self, client, state_path: str, routing_profile: str = DEFAULT_ROUTING_PROFILE,
+                 poll_seconds: float = DEFAULT_POLL_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 telemetry_store=None, log: Optional[Callable[[str], None]] = None):
+        """
+        Inicializa el ejecutor
+
+        Args:
+            client: anthropic.Anthropic (con base_url propio si se usa un servidor local)
+            state_path: Fichero de estado; reutilizarlo retoma la ejecución
+            routing_profile: Perfil de modelos y temperaturas por etapa
+            poll_seconds: Intervalo de consulta del estado de un lote
+            max_attempts: Intentos por etapa antes de dar el trabajo por fallido
+            telemetry_store: TelemetryStore opcional
+            log: Función para avisos de progreso
+        """
+        self.client = client
+        self.state = BatchState(state_path)
+        self.routing_profile = routing_profile
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.telemetry_store = telemetry_store
+        self.log = log or print
+
+    def _build_request(self, stage: str, job: Dict, job_state: Dict) -> Dict:
+        """Parámetros de la llamada de una etapa (mismos prompts que el flujo síncrono)"""
+        req = job['request']
+
+        if stage == 'draft':
+            prompt_args, _, _ = fit_prompt_args(build_generation_prompt_stage1_draft, (
+                req['pdp_data'], req['arquetipo'], req['target_length'], req['keywords'],
+                req['context'], req['links'], req['modules'], req['objetivo'],
+                req['producto_alternativo'], req['casos_uso'], req['campos_arquetipo']
+            ))
+            prompt = build_generation_prompt_stage1_draft(*prompt_args)
+        elif stage == 'critique':
+            prompt = build_correction_prompt_stage2(
+                job_state['draft'], req['target_length'], req['arquetipo'], req['objetivo']
+            )
+        else:
+            prompt = build_final_generation_prompt_stage3(
+                job_state['draft'], job_state['corrections'], req['target_length']
+            )
+
+        tool = CRITIQUE_TOOL if stage == 'critique' else None
+        return build_stage_request(prompt, stage, req['target_length'], self.routing_profile, tool=tool)
+
+    def _submit(self, stage: str, jobs: List[Dict]) -> Optional[Dict]:
+        """
+        Envía un lote con la etapa `stage` de los trabajos indicados
+
+        Los trabajos cuyo prompt no cabe en el modelo fallan sin enviarse.
+
+        Returns:
+            Registro del lote o None si no queda ninguna petición que enviar
+        """
+        # custom_id admite solo [a-zA-Z0-9_-]{1,64}: se mapea al job_id en el estado
+        custom_ids, requests = {}, []
+        for idx, job in enumerate(jobs):
+            job_state = self.state.job(job['job_id'])
+            try:
+                params = self._build_request(stage, job, job_state)
+            except PromptBudgetExceeded as e:
+                job_state['stage'] = STATUS_ERROR
+                job_state['failed_stage'] = stage
+                job_state['error'] = f"Error en {STAGE_NAMES[stage]}: {e}"
+                self.log(f"❌ [{job['job_id']}] {job_state['error']}")
+                continue
+            custom_ids[f"{stage}-{idx}"] = job['job_id']
+            requests.append({'custom_id': f"{stage}-{idx}", 'params': params})
+
+        if not requests:
+            self.state.save()
+            return None
+
+        batch = self.client.messages.batches.create(requests=requests)
+        record = {
+            'id': batch.id,
+            'stage': stage,
+            'custom_ids': custom_ids,
+            'submitted_at': datetime.now().isoformat(),
+            'collected': False
+        }
+        self.state.data['batches'].append(record)
+        self.state.save()
+        self.log(f"📤 Lote {batch.id}: {STAGE_NAMES[stage]} de {len(jobs)} trabajo(s)")
+        return record
+
+    def _wait(self, record: Dict):
+        """Espera a que el lote termine de procesarse"""
+        while True:
+            batch = self.client.messages.batches.retrieve(record['id'])
+            if batch.processing_status == 'ended':
+                return
+            counts = batch.request_counts
+            self.log(
+                f"⏳ Lote {record['id']} ({STAGE_NAMES[record['stage']]}): "
+                f"{counts.succeeded + counts.errored} completadas, {counts.processing} en proceso"
+            )
+            time.sleep(self.poll_seconds)
+
+    def _parse(self, stage: str, message):
+        """Resultado de la etapa a partir del mensaje; None si no es válido"""
+        if stage == 'critique':
+            tool_input = next(
+                (block.input for block in message.content
+                 if block.type == "tool_use" and block.name == CRITIQUE_TOOL['name']),
+                None
+            )
+            return tool_input if not validate_json_schema(tool_input, CRITIQUE_TOOL['input_schema']) else None
+
+        text = "".join(block.text for block in message.content if block.type == "text")
+        if text and stage == 'draft':
+            text = fix_structure(text)['content']
+        return text or None
+
+    def _collect(self, record: Dict, jobs_by_id: Dict):
+        """Recoge los resultados de un lote terminado y avanza el estado de cada trabajo"""
+        stage = record['stage']
+        seen = set()
+
+        for item in self.client.messages.batches.results(record['id']):
+            job_id = record['custom_ids'].get(item.custom_id)
+            if job_id is None:
+                continue
+            seen.add(job_id)
+            job_state = self.state.job(job_id)
+
+            value, error = None, None
+            if item.result.type == 'succeeded':
+                message = item.result.message
+                value = self._parse(stage, message)
+                error = None if value else "respuesta no válida"
+                self._record(stage, job_id, jobs_by_id.get(job_id), message, record['id'])
+            else:
+                error = getattr(getattr(item.result, 'error', None), 'error', None)
+                error = getattr(error, 'message', None) or item.result.type
+
+            self._apply(job_id, job_state, stage, value, error)
+
+        # Peticiones sin resultado (no deberían darse): cuentan como intento fallido
+        for job_id in set(record['custom_ids'].values()) - seen:
+            self._apply(job_id, self.state.job(job_id), stage, None, "sin resultado en el lote")
+
+        record['collected'] = True
+        self.state.save()
+
+    def _apply(self, job_id: str, job_state: Dict, stage: str, value, error: Optional[str]):
+        """Guarda el resultado de una etapa o contabiliza el intento fallido"""
+        if value:
+            job_state[STAGE_RESULT_KEYS[stage]] = value
+            next_idx = STAGES.index(stage) + 1
+            job_state['stage'] = STAGES[next_idx] if next_idx < len(STAGES) else STATUS_DONE
+            return
+
+        attempts = job_state['attempts'].get(stage, 0) + 1
+        job_state['attempts'][stage] = attempts
+        if attempts >= self.max_attempts:
+            job_state['stage'] = STATUS_ERROR
+            job_state['failed_stage'] = stage
+            job_state['error'] = f"Error en {STAGE_NAMES[stage]}: {error}"
+            self.log(f"❌ [{job_id}] {job_state['error']}")
+
+    def _record(self, stage: str, job_id: str, job: Optional[Dict], message, batch_id: str):
+        """Telemetría de una llamada del lote (coste con el descuento de la Batches API)"""
+        metadata = (job or {}).get('metadata', {})
+        record = build_stage_record(
+            stage, STAGE_NAMES[stage], message.model, message.usage,
+            stop_reason=message.stop_reason,
+            context={
+                'arquetipo': metadata.get('arquetipo'),
+                'routing_profile': self.routing_profile,
+                'target_length': metadata.get('longitud_objetivo'),
+                'job_id': job_id,
+                'batch_id': batch_id
+            }
+        )
+        if record['cost_usd'] is not None:
+            record['cost_usd'] = round(record['cost_usd'] * BATCH_DISCOUNT, 6)
+
+        self.state.job(job_id)['telemetria'].append(record)
+        if self.telemetry_store:
+            try:
+                self.telemetry_store.append(record)
+            except OSError:
+                pass
+
+    def run(self, jobs: List[Dict]) -> Dict[str, Dict]:
+        """
+        Ejecuta (o retoma) los trabajos etapa a etapa
+
+        Args:
+            jobs: Trabajos con 'job_id', 'request' y 'metadata' (formato de batch_cli.build_job)
+
+        Returns:
+            {job_id: resultados} con el mismo formato que generator.run_generation_job
+        """
+        jobs_by_id = {job['job_id']: job for job in jobs}
+        for job in jobs:
+            job_state = self.state.job(job['job_id'])
+            # Relanzar reintenta los trabajos fallidos desde la etapa que falló
+            if job_state['stage'] == STATUS_ERROR and job_state.get('failed_stage'):
+                job_state['stage'] = job_state.pop('failed_stage')
+                job_state['attempts'][job_state['stage']] = 0
+                job_state['error'] = None
+        self.state.save()
+
+        # Lotes enviados antes de un reinicio: esperar y recoger antes de enviar nada nuevo
+        for record in self.state.open_batches():
+            self.log(f"🔁 Retomando lote {record['id']} ({STAGE_NAMES[record['stage']]})")
+            self._wait(record)
+            self._collect(record, jobs_by_id)
+
+        for stage in STAGES:
+            while True:
+                pending = [job for job in jobs if self.state.job(job['job_id'])['stage'] == stage]
+                if not pending:
+                    break
+                record = self._submit(stage, pending)
+                if record:
+                    self._wait(record)
+                    self._collect(record, jobs_by_id)
+
+        return {job['job_id']: self.build_results(job) for job in jobs}
+
+    def build_results(self, job: Dict) -> Dict:
+        """Resultados de un trabajo a partir de su estado"""
+        job_state = self.state.job(job['job_id'])
+        final = job_state.get('final')
+
+        # Misma corrección local de estructura y módulos que el flujo síncrono
+        structure_report, module_report = None, None
+        if final:
+            structure_report = fix_structure(final)
+            module_report = repair_modules(structure_report.pop('content'), job['request'].get('modules'))
+            final = module_report.pop('content')
+
+        results = {
+            'draft': job_state.get('draft'),
+            'corrections': job_state.get('corrections'),
+            'final': final,
+            'metadata': {
+                **job['metadata'],
+                'longitud_real': count_words_in_html(final) if final else 0,
+                'telemetria': job_state['telemetria'],
+                'desde_cache': False,
+                'etapas_reanudadas': [],
+                'ajuste_longitud': None,
+                'variantes_borrador': None,
+                'reparacion_estructura': structure_report,
+                'reparacion_modulos': module_report,
+                'abortos_tempranos': [],
+                'continuaciones': [],
+                'recorte_prompt': [],
+                'modo': 'batch_api',
+                'timestamp': datetime.now().isoformat()
+            }
+        }
+        if job_state['stage'] != STATUS_DONE:
+            results['error'] = job_state.get('error') or "Generación incompleta"
+        return results
@@ -0,0 +1,439 @@
+"""
+Benchmark
+Mediciones del flujo de generación sobre un conjunto fijo de trabajos de ejemplo
+- routing: latencia, tokens y coste de cada perfil de enrutado (modelo por etapa)
+- load: N sesiones a la vez con planificador compartido, con y sin control de admisión
+  (el cliente simulado responde 429 por encima de su capacidad)
+- async: rendimiento de N generaciones en un solo event loop frente a un hilo por generación
+- prompts: tiempo de construcción del prompt de borrador con el prefijo precompilado
+  frente a compilarlo en cada llamada (sin llamadas a la API)
+- words: recuento de palabras del artículo con la regex anterior frente a word_count
+  (en frío y memoizado), con la longitud_real que da cada uno
+- Cliente simulado por defecto (fake_client: latencia por modelo, sin coste);
+  con --live, la API real (ANTHROPIC_API_KEY)
+
+Uso:
+    python benchmark.py routing                              # Todos los perfiles, cliente simulado
+    python benchmark.py routing --profile rapido --repeat 3
+    python benchmark.py --live --format json --output routing.json routing --repeat 1
+    python benchmark.py load --sessions 50 --max-in-flight 8 --capacity 10
+    python benchmark.py async --jobs 50 --workers 4
+    python benchmark.py prompts --repeat 1000
+    python benchmark.py words --words 3000 --repeat 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import anthropic
+
+from fake_client import FakeAsyncAnthropic
+from generator import AsyncContentGenerator, ContentGeneratorV4, ROUTING_PROFILES
+from job_runner import DEFAULT_MAX_WORKERS
+from prompt_profiler import sample_draft, sample_request
+from prompts import ARQUETIPOS, build_generation_prompt_stage1_draft, compile_draft_prompt_prefix
+from rate_limiter import (
+    AdmissionController, RateLimitScheduler,
+    DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY, DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+)
+from telemetry import percentile, summarize_records, summarize_totals
+import word_count
+
+# Trabajos de referencia: un borrador completo y uno largo en modo esquema + secciones
+FIXTURE_ARQUETIPOS = ('ARQ-1', 'ARQ-4', 'ARQ-7')
+DEFAULT_TIME_SCALE = 0.01  # Cliente simulado: 1 s de latencia simulada = 10 ms reales
+THROUGHPUT_WINDOWS = 10    # Tramos en que se divide la prueba de carga para medir la estabilidad
+
+
+def make_client(args):
+    """Cliente async de la API real (--live) o simulado"""
+    if args.live:
+        return anthropic.AsyncAnthropic(api_key=os.environ['ANTHROPIC_API_KEY'])
+    return FakeAsyncAnthropic(time_scale=args.time_scale)
+
+
+async def run_fixture(client, profile: str, arquetipo_code: str, use_streaming: bool) -> Dict:
+    """Genera un trabajo de referencia y devuelve su duración y telemetría"""
+    generator = AsyncContentGenerator(None, routing_profile=profile, client=client,
+                                      use_streaming=use_streaming)
+    request = sample_request(arquetipo_code)
+    start = time.perf_counter()
+    _, _, final = await generator.agenerate_with_3_stages(**request)
+    return {
+        'wall_s': time.perf_counter() - start,
+        'ok': bool(final),
+        'records': generator.stage_metrics
+    }
+
+
+async def benchmark_routing(args) -> List[Dict]:
+    """
+    Recorre los trabajos de referencia con cada perfil de enrutado
+
+    Returns:
+        Una fila por perfil (totales por trabajo) seguida de una por perfil y etapa (p50)
+    """
+    client = make_client(args)
+    profile_rows, stage_rows = [], []
+    try:
+        for profile in args.profile or ROUTING_PROFILES:
+            runs = []
+            for _ in range(args.repeat):
+                for code in FIXTURE_ARQUETIPOS:
+                    runs.append(await run_fixture(client, profile, code, not args.no_streaming))
+
+            records = [record for run in runs for record in run['records']]
+            totals = summarize_totals(records)
+            walls = [run['wall_s'] for run in runs]
+            profile_rows.append({
+                'profile': profile, 'stage': '(trabajo)', 'model': '',
+                'jobs': len(runs), 'ok': sum(run['ok'] for run in runs), 'calls': totals['calls'],
+                'latency_p50_s': round(percentile(walls, 50), 2),
+                'latency_p95_s': round(percentile(walls, 95), 2),
+                'input_tokens': round(totals['input_tokens'] / len(runs)),
+                'output_tokens': round(totals['output_tokens'] / len(runs)),
+                'cost_usd': round(totals['cost_usd'] / len(runs), 4)
+            })
+            for row in summarize_records(records, group_by='routing_profile'):
+                models = sorted({r['model'] for r in records if r['stage'] == row['stage']})
+                stage_rows.append({
+                    'profile': profile, 'stage': row['stage'], 'model': ", ".join(models),
+                    'jobs': '', 'ok': '', 'calls': row['calls'],
+                    'latency_p50_s': row['latency_s_p50'], 'latency_p95_s': row['latency_s_p95'],
+                    'input_tokens': row['input_tokens_p50'], 'output_tokens': row['output_tokens_p50'],
+                    'cost_usd': row['cost_usd_p50']
+                })
+    finally:
+        await client.close()
+    return profile_rows + stage_rows
+
+
+def _throughput_windows(completed: List, start: float, end: float) -> List[float]:
+    """
+    Tokens de salida entregados por segundo en cada tramo central de la prueba
+
+    Se descartan el primer y el último tramo (arranque y cierre); se mide en
+    tokens y no en llamadas porque un borrador y un análisis duran muy distinto.
+    """
+    width = (end - start) / THROUGHPUT_WINDOWS
+    tokens = [0] * THROUGHPUT_WINDOWS
+    for instant, output_tokens in completed:
+        tokens[min(int((instant - start) / width), THROUGHPUT_WINDOWS - 1)] += output_tokens
+    return [count / width for count in tokens[1:-1]]
+
+
+def run_load(args, max_in_flight) -> Dict:
+    """
+    Lanza args.sessions generaciones a la vez, cada una en su hilo (como los trabajos de la app)
+
+    Todas comparten planificador, control de admisión (si max_in_flight) y cliente
+    simulado. Los límites de tiempo del planificador se escalan con --time-scale.
+    """
+    scale = args.time_scale
+    client = FakeAsyncAnthropic(time_scale=scale, capacity=args.capacity, retry_after=args.retry_after * scale,
+                                overload_rate=args.overload_rate)
+    scheduler = RateLimitScheduler(
+        requests_per_minute=int(DEFAULT_REQUESTS_PER_MINUTE / scale),
+        tokens_per_minute=int(DEFAULT_TOKENS_PER_MINUTE / scale),
+        base_delay=DEFAULT_BASE_DELAY * scale,
+        max_delay=DEFAULT_MAX_DELAY * scale
+    )
+    admission = AdmissionController(max_in_flight=max_in_flight) if max_in_flight else None
+
+    def session(idx):
+        generator = ContentGeneratorV4(None, client=client, scheduler=scheduler, admission=admission,
+                                       use_streaming=not args.no_streaming)
+        request = sample_request(FIXTURE_ARQUETIPOS[idx % len(FIXTURE_ARQUETIPOS)])
+        start = time.perf_counter()
+        try:
+            _, _, final = generator.generate_with_3_stages(**request)
+        finally:
+            generator.close()
+        return bool(final), time.perf_counter() - start
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        sessions = list(executor.map(session, range(args.sessions)))
+    end = time.monotonic()
+
+    server = client.server
+    windows = _throughput_windows(server.completed, start, end)
+    latencies = [latency for _, latency in sessions]
+    return {
+        'mode': f"admisión ({max_in_flight})" if max_in_flight else "sin admisión",
+        'sessions': args.sessions,
+        'ok': sum(ok for ok, _ in sessions),
+        'calls': len(server.completed),
+        'http_429': server.rate_limited,
+        'http_529': server.overloaded,
+        'server_max_in_flight': server.max_in_flight,
+        'wall_s': round(end - start, 2),
+        'tokens_per_s': round(sum(tokens for _, tokens in server.completed) / (end - start)),
+        'window_min': round(min(windows)),
+        'window_max': round(max(windows)),
+        'job_p50_s': round(percentile(latencies, 50), 2),
+        'job_p95_s': round(percentile(latencies, 95), 2)
+    }
+
+
+def benchmark_load(args) -> List[Dict]:
+    """Prueba de carga con control de admisión y, como referencia, sin él"""
+    rows = [run_load(args, args.max_in_flight)]
+    if not args.admission_only:
+        rows.append(run_load(args, None))
+    return rows
+
+
+def _throughput_row(mode: str, threads: int, server, results: List, wall: float) -> Dict:
+    """Fila del benchmark async: trabajos y tokens de salida por segundo"""
+    latencies = [latency for _, latency in results]
+    return {
+        'mode': mode,
+        'threads': threads,
+        'jobs': len(results),
+        'ok': sum(ok for ok, _ in results),
+        'calls': len(server.completed),
+        'wall_s': round(wall, 2),
+        'jobs_per_s': round(len(results) / wall, 1),
+        'tokens_per_s': round(sum(tokens for _, tokens in server.completed) / wall),
+        'job_p50_s': round(percentile(latencies, 50), 2),
+        'job_p95_s': round(percentile(latencies, 95), 2)
+    }
+
+
+def run_event_loop(args) -> Dict:
+    """args.jobs generaciones a la vez en un único event loop (AsyncContentGenerator)"""
+    client = FakeAsyncAnthropic(time_scale=args.time_scale)
+
+    async def job(idx):
+        start = time.perf_counter()
+        result = await run_fixture(client, 'calidad', FIXTURE_ARQUETIPOS[idx % len(FIXTURE_ARQUETIPOS)],
+                                   not args.no_streaming)
+        return result['ok'], time.perf_counter() - start
+
+    async def run_all():
+        try:
+            return await asyncio.gather(*(job(idx) for idx in range(args.jobs)))
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    return _throughput_row("event loop", 1, client.server, results, time.perf_counter() - start)
+
+
+def run_threads(args, workers: int) -> Dict:
+    """args.jobs generaciones con un hilo por generación (ContentGeneratorV4), `workers` a la vez"""
+    client = FakeAsyncAnthropic(time_scale=args.time_scale)
+
+    def job(idx):
+        generator = ContentGeneratorV4(None, client=client, use_streaming=not args.no_streaming)
+        request = sample_request(FIXTURE_ARQUETIPOS[idx % len(FIXTURE_ARQUETIPOS)])
+        start = time.perf_counter()
+        try:
+            _, _, final = generator.generate_with_3_stages(**request)
+        finally:
+            generator.close()
+        return bool(final), time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(job, range(args.jobs)))
+    return _throughput_row(f"hilos ({workers})", workers, client.server, results, time.perf_counter() - start)
+
+
+def benchmark_async(args) -> List[Dict]:
+    """
+    Un event loop con todas las generaciones frente a un hilo por generación
+
+    Sin planificador ni control de admisión: mide solo cuánto trabajo saca
+    cada modelo de concurrencia del cliente. La pasada con --workers hilos es
+    la de la app (JobRunner); la de --jobs hilos, un hilo por trabajo sin límite.
+    """
+    rows = [run_event_loop(args), run_threads(args, args.workers)]
+    if args.workers != args.jobs:
+        rows.append(run_threads(args, args.jobs))
+    return rows
+
+
+def _build_times(build, repeat: int) -> List[float]:
+    """Microsegundos de `repeat` llamadas a build() por arquetipo"""
+    times = []
+    for code in ARQUETIPOS:
+        request = sample_request(code)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build(request)
+            times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def benchmark_prompts(args) -> List[Dict]:
+    """
+    Construcción del prompt de borrador de los 18 arquetipos
+
+    'precompilado' es el camino de la app (DRAFT_PROMPT_PREFIXES + datos);
+    'al vuelo' compila además el prefijo en cada llamada, como antes de
+    precompilarlo.
+    """
+    modes = {
+        'precompilado': lambda request: build_generation_prompt_stage1_draft(**request),
+        'al vuelo': lambda request: (compile_draft_prompt_prefix(request['arquetipo'])
+                                     + build_generation_prompt_stage1_draft(**request)),
+    }
+    rows = []
+    for mode, build in modes.items():
+        times = _build_times(build, args.repeat)
+        rows.append({
+            'mode': mode,
+            'builds': len(times),
+            'p50_us': round(percentile(times, 50), 1),
+            'p95_us': round(percentile(times, 95), 1),
+            'total_ms': round(sum(times) / 1000, 1)
+        })
+    return rows
+
+
+def count_words_regex(html_content: str) -> int:
+    """Recuento anterior a word_count: quita etiquetas con una regex y cuenta CSS y shortcodes como palabras"""
+    text = re.sub(r'<[^>]+>', '', html_content)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return len(text.split())
+
+
+def _count_times(count, html_content: str, repeat: int, before=None) -> List[float]:
+    """Microsegundos de `repeat` llamadas a count(html_content); before() se ejecuta fuera de la medida"""
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        count(html_content)
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def benchmark_words(args) -> List[Dict]:
+    """
+    Recuento de palabras de un artículo sintético (prompt_profiler.sample_draft)
+
+    'regex' es el recuento anterior; 'en frío' vacía la caché de word_count
+    antes de cada llamada y 'memoizado' repite el mismo HTML ya analizado.
+    La columna longitud_real es lo que cada uno guardaría en el artículo.
+    """
+    modules = sample_request(FIXTURE_ARQUETIPOS[0])['modules']
+    html_content = sample_draft(args.words, modules)
+
+    modes = [
+        ('regex (anterior)', count_words_regex, None),
+        ('word_count en frío', word_count.count_words, word_count._analyze.cache_clear),
+        ('word_count memoizado', word_count.count_words, None),
+    ]
+    rows = []
+    for mode, count, before in modes:
+        words = count(html_content)  # También deja el análisis en caché para la pasada memoizada
+        times = _count_times(count, html_content, args.repeat, before)
+        rows.append({
+            'mode': mode,
+            'html_kb': round(len(html_content.encode('utf-8')) / 1024, 1),
+            'longitud_real': words,
+            'p50_us': round(percentile(times, 50), 1),
+            'p95_us': round(percentile(times, 95), 1),
+            'total_ms': round(sum(times) / 1000, 1)
+        })
+    return rows
+
+
+def format_rows(rows: List[Dict], output_format: str) -> str:
+    """Filas como tabla markdown ('table') o JSON"""
+    if output_format == 'json':
+        return json.dumps(rows, indent=2, ensure_ascii=False)
+    if not rows:
+        return ""
+    fields = list(rows[0])
+    lines = [f"| {' | '.join(fields)} |", f"|{'---|' * len(fields)}"]
+    lines += [f"| {' | '.join(str(row[field]) for field in fields)} |" for row in rows]
+    return "\n".join(lines) + "\n"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del flujo de generación")
+    parser.add_argument('--live', action='store_true', help="API real (ANTHROPIC_API_KEY) en vez del cliente simulado")
+    parser.add_argument('--time-scale', type=float, default=DEFAULT_TIME_SCALE,
+                        help="Cliente simulado: factor sobre la latencia simulada")
+    parser.add_argument('--format', default='table', choices=['table', 'json'])
+    parser.add_argument('--output', default=None, help="Fichero de salida (por defecto, la consola)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    routing = commands.add_parser('routing', help="Latencia, tokens y coste por perfil de enrutado")
+    routing.add_argument('--profile', action='append', choices=list(ROUTING_PROFILES),
+                         help="Perfil a medir (repetible; por defecto, todos)")
+    routing.add_argument('--repeat', type=int, default=3, help="Pasadas por el conjunto de trabajos")
+    routing.add_argument('--no-streaming', action='store_true')
+
+    load = commands.add_parser('load', help="Sesiones simultáneas con y sin control de admisión (cliente simulado)")
+    load.add_argument('--sessions', type=int, default=50)
+    load.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Plazas del control de admisión")
+    load.add_argument('--capacity', type=int, default=10,
+                      help="Peticiones simultáneas que acepta el cliente simulado antes de responder 429")
+    load.add_argument('--retry-after', type=float, default=1.0, help="retry-after de los 429 simulados (segundos simulados)")
+    load.add_argument('--overload-rate', type=float, default=0.0,
+                      help="Fracción de peticiones que el cliente simulado rechaza con 529")
+    load.add_argument('--admission-only', action='store_true', help="Sin la pasada de referencia sin admisión")
+    load.add_argument('--no-streaming', action='store_true')
+
+    throughput = commands.add_parser('async', help="Un event loop frente a un hilo por generación (cliente simulado)")
+    throughput.add_argument('--jobs', type=int, default=50, help="Generaciones completas a lanzar")
+    throughput.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                            help="Hilos de la pasada de referencia (los del JobRunner de la app)")
+    throughput.add_argument('--no-streaming', action='store_true')
+
+    prompts = commands.add_parser('prompts', help="Tiempo de construcción del prompt de borrador (sin API)")
+    prompts.add_argument('--repeat', type=int, default=1000, help="Construcciones por arquetipo")
+
+    words = commands.add_parser('words', help="Recuento de palabras: regex anterior frente a word_count (sin API)")
+    words.add_argument('--words', type=int, default=3000, help="Palabras del artículo sintético")
+    words.add_argument('--repeat', type=int, default=200, help="Recuentos por modo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.command == 'routing':
+        rows = asyncio.run(benchmark_routing(args))
+    elif args.command == 'load':
+        if args.live:
+            print("La prueba de carga solo se ejecuta con el cliente simulado", file=sys.stderr)
+            return 2
+        rows = benchmark_load(args)
+    elif args.command == 'async':
+        if args.live:
+            print("El benchmark async solo se ejecuta con el cliente simulado", file=sys.stderr)
+            return 2
+        rows = benchmark_async(args)
+    elif args.command == 'prompts':
+        rows = benchmark_prompts(args)
+    elif args.command == 'words':
+        rows = benchmark_words(args)
+
+    text = format_rows(rows, args.format)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"{len(rows)} filas → {args.output}")
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Checkpoints
+Persistencia de las etapas completadas de una generación para reanudarla
+tras un fallo (timeout, sobrecarga) sin volver a pagar las etapas ya hechas
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+DEFAULT_MAX_AGE_DAYS = 7
+
+
+class CheckpointStore:
+    """Checkpoints por trabajo en disco (<job_key>.json) + registro de reanudaciones"""
+
+    def __init__(self, directory: str, max_age_days: int = DEFAULT_MAX_AGE_DAYS):
+        """
+        Inicializa el almacén
+
+        Args:
+            directory: Carpeta de checkpoints
+            max_age_days: Antigüedad a partir de la cual se descartan
+        """
+        self.directory = directory
+        self.max_age_days = max_age_days
+        self.resume_log_path = os.path.join(directory, 'resumes.jsonl')
+        self._lock = threading.Lock()
+
+    def _path(self, job_key: str) -> str:
+        return os.path.join(self.directory, f"{job_key}.json")
+
+    def load(self, job_key: str) -> Dict:
+        """
+        Etapas completadas de un trabajo
+
+        Returns:
+            {etapa: resultado} (vacío si no hay checkpoint o ha caducado)
+        """
+        path = self._path(job_key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+        if time.time() - os.path.getmtime(path) > self.max_age_days * 86400:
+            self.clear(job_key)
+            return {}
+
+        return data.get('stages', {})
+
+    def save(self, job_key: str, stage: str, value, metadata: Optional[Dict] = None):
+        """Guarda el resultado de una etapa (escritura atómica)"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(job_key)
+
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                data = {'job_key': job_key, 'stages': {}, 'created_at': datetime.now().isoformat()}
+
+            data['stages'][stage] = value
+            data['updated_at'] = datetime.now().isoformat()
+            if metadata:
+                data.setdefault('metadata', {}).update(metadata)
+
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def clear(self, job_key: str):
+        """Elimina el checkpoint de un trabajo terminado"""
+        try:
+            os.remove(self._path(job_key))
+        except OSError:
+            pass
+
+    def record_resume(self, job_key: str, stages_skipped: list):
+        """
+        Registra una reanudación y las llamadas de etapa que se ahorraron
+
+        Las entradas más antiguas que max_age_days (la ventana del informe) se descartan.
+        """
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'job_key': job_key[:16],
+            'stages_skipped': stages_skipped,
+            'calls_saved': len(stages_skipped)
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune_resume_log()
+            with open(self.resume_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _prune_resume_log(self) -> int:
+        """
+        Reescribe el registro de reanudaciones sin las entradas caducadas (con el lock retenido)
+
+        Returns:
+            Entradas descartadas
+        """
+        since = datetime.now() - timedelta(days=self.max_age_days)
+        try:
+            with open(self.resume_log_path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return 0
+
+        kept = []
+        for line in lines:
+            try:
+                if datetime.fromisoformat(json.loads(line)['timestamp']) >= since:
+                    kept.append(line)
+            except (json.JSONDecodeError, KeyError, ValueError):
+                continue
+        if len(kept) == len(lines):
+            return 0
+
+        tmp_path = f"{self.resume_log_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(kept)
+        os.replace(tmp_path, self.resume_log_path)
+        return len(lines) - len(kept)
+
+    def signature(self) -> Optional[tuple]:
+        """(mtime_ns, tamaño) del registro de reanudaciones; None si no existe"""
+        try:
+            stat = os.stat(self.resume_log_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def savings_report(self, days: int = 7) -> Dict:
+        """
+        Reanudaciones y llamadas de etapa ahorradas en los últimos `days` días
+
+        Returns:
+            Diccionario con 'resumes', 'calls_saved' y 'by_stage'
+        """
+        since = datetime.now() - timedelta(days=days)
+        report = {'days': days, 'resumes': 0, 'calls_saved': 0, 'by_stage': {}}
+
+        if not os.path.exists(self.resume_log_path):
+            return report
+
+        with open(self.resume_log_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if datetime.fromisoformat(entry['timestamp']) < since:
+                        continue
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue
+                report['resumes'] += 1
+                report['calls_saved'] += entry.get('calls_saved', 0)
+                for stage in entry.get('stages_skipped', []):
+                    report['by_stage'][stage] = report['by_stage'].get(stage, 0) + 1
+
+        return report
+
+    def prune(self) -> int:
+        """Elimina checkpoints y reanudaciones caducados; devuelve cuántos checkpoints se borraron"""
+        if not os.path.isdir(self.directory):
+            return 0
+
+        with self._lock:
+            self._prune_resume_log()
+
+        removed = 0
+        limit = time.time() - self.max_age_days * 86400
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
@@ -0,0 +1,306 @@
+"""
+CMS Export
+HTML listo para publicar en el CMS: mínimo y estable byte a byte
+- Un solo <style> con las reglas del CSS (CSS_CMS_COMPATIBLE) que usa el artículo:
+  clases y etiquetas presentes, variables --x referenciadas y sin reglas repetidas
+- HTML sin espacios sobrantes ni comentarios; los shortcodes de módulos no se tocan
+- Determinista e idempotente: exportar dos veces el mismo artículo da los mismos bytes
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+from structure_fixer import Element, Raw, parse_tree, serialize
+from word_count import INLINE_TAGS, SHORTCODE_PATTERN
+
+PRESERVED_TAGS = {'pre', 'textarea', 'script'}  # Espacios significativos: no se tocan
+ALWAYS_USED_TAGS = {'html', 'body'}             # El CMS las pone aunque no estén en el artículo
+# Elementos en línea: los espacios a su alrededor se ven ("texto <img> texto")
+INLINE_LEVEL_TAGS = INLINE_TAGS | {'img', 'input', 'button', 'label', 'select', 'meter', 'progress'}
+
+CSS_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_PSEUDO_PATTERN = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+CSS_CLASS_PATTERN = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+CSS_TYPE_PATTERN = re.compile(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)')
+CSS_VAR_REF_PATTERN = re.compile(r'var\(\s*(--[\w-]+)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Cadenas y paréntesis: un ';' dentro (url("data:image/svg+xml;base64,...")) no separa declaraciones
+CSS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+CSS_DECLARATION_TOKEN_PATTERN = re.compile(rf'{CSS_STRING}|[();]')
+CSS_VALUE_SPACE_PATTERN = re.compile(rf'({CSS_STRING})|\s+')
+
+CACHE_SIZE = 64
+
+
+def parse_css(css: str) -> List[Tuple[str, object]]:
+    """
+    Reglas de una hoja de estilos (sin comentarios)
+
+    Returns:
+        Lista de (selector o cabecera @, declaraciones); en los bloques @media
+        las declaraciones son a su vez una lista de reglas, y las reglas @ sin
+        bloque (@import, @charset...) llevan None
+    """
+    css = CSS_COMMENT_PATTERN.sub('', css)
+    rules, _ = _parse_block(css, 0)
+    return rules
+
+
+def _parse_block(css: str, position: int) -> Tuple[List, int]:
+    rules = []
+    while position < len(css):
+        open_at = css.find('{', position)
+        close_at = css.find('}', position)
+        if close_at != -1 and (open_at == -1 or close_at < open_at):
+            return rules, close_at + 1  # Fin del bloque @ que nos contiene
+        if css[position:].lstrip().startswith('@'):
+            end = css.find(';', position)
+            if end != -1 and (open_at == -1 or end < open_at) and (close_at == -1 or end < close_at):
+                # Regla @ sin bloque: se conserva tal cual
+                rules.append((' '.join(css[position:end].split()), None))
+                position = end + 1
+                continue
+        if open_at == -1:
+            break
+
+        prelude = ' '.join(css[position:open_at].split())
+        if prelude.startswith('@'):
+            inner, position = _parse_block(css, open_at + 1)
+            rules.append((prelude, inner))
+        else:
+            end = css.find('}', open_at)
+            end = len(css) if end == -1 else end
+            rules.append((prelude, css[open_at + 1:end]))
+            position = end + 1
+    return rules, len(css)
+
+
+def _minify_selector(selector: str) -> str:
+    selector = ' '.join(selector.split())
+    return re.sub(r'\s*([>+~,])\s*', r'\1', selector)
+
+
+def _split_declarations(declarations: str) -> List[str]:
+    """Declaraciones separadas por ';' sin partir cadenas ni paréntesis"""
+    items, depth, start = [], 0, 0
+    for match in CSS_DECLARATION_TOKEN_PATTERN.finditer(declarations):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(depth - 1, 0)
+        elif token == ';' and not depth:
+            items.append(declarations[start:match.start()])
+            start = match.end()
+    items.append(declarations[start:])
+    return items
+
+
+def _minify_declarations(declarations: str) -> str:
+    items = []
+    for item in _split_declarations(declarations):
+        name, sep, value = item.partition(':')
+        if sep and name.strip():
+            # Los espacios dentro de una cadena ("...") se conservan
+            value = CSS_VALUE_SPACE_PATTERN.sub(lambda match: match.group(1) or ' ', value.strip())
+            items.append(f"{name.strip()}:{value}")
+    return ';'.join(items)
+
+
+def _selector_used(selector: str, classes: Set[str], tags: Set[str]) -> bool:
+    """True si todas las clases y etiquetas del selector aparecen en el artículo"""
+    bare = CSS_PSEUDO_PATTERN.sub('', selector)
+    if not bare.strip() or bare.strip() == '*':
+        return True  # :root, *, ::selection...
+    return (all(name in classes for name in CSS_CLASS_PATTERN.findall(bare))
+            and all(name.lower() in tags for name in CSS_TYPE_PATTERN.findall(bare)))
+
+
+def _prune_rules(rules: List, classes: Set[str], tags: Set[str]) -> Tuple[List, int]:
+    """Reglas usadas por el artículo (con los selectores sin uso quitados de cada lista)"""
+    kept, dropped = [], 0
+    for prelude, body in rules:
+        if body is None:
+            kept.append((prelude, body))
+            continue
+        if isinstance(body, list):
+            inner, inner_dropped = _prune_rules(body, classes, tags)
+            dropped += inner_dropped
+            if inner:
+                kept.append((' '.join(prelude.split()), inner))
+            continue
+
+        selectors = [
+            _minify_selector(s) for s in prelude.split(',') if s.strip() and _selector_used(s, classes, tags)
+        ]
+        declarations = _minify_declarations(body)
+        if selectors and declarations:
+            kept.append((','.join(selectors), declarations))
+        else:
+            dropped += 1
+    return kept, dropped
+
+
+def _dedupe_rules(rules: List) -> Tuple[List, int]:
+    """Quita las reglas idénticas repetidas (se queda la última: es la que gana en cascada)"""
+    seen, result = set(), []
+    for rule in reversed(rules):
+        key = _serialize_css([rule])
+        if key not in seen:
+            seen.add(key)
+            result.append(rule)
+    return result[::-1], len(rules) - len(result)
+
+
+def _prune_variables(rules: List, inline_styles: List[str]) -> int:
+    """
+    Quita de :root las variables --x que no se usan (directa o indirectamente)
+
+    Returns:
+        Número de variables eliminadas
+    """
+    definitions = {}
+    for prelude, body in rules:
+        if prelude == ':root' and isinstance(body, str):
+            for item in _split_declarations(body):
+                name, _, value = item.partition(':')
+                if name.startswith('--'):
+                    definitions[name] = value
+
+    references = set()
+    pending = [
+        ref for prelude, body in rules if prelude != ':root'
+        for ref in CSS_VAR_REF_PATTERN.findall(str(body))
+    ]
+    pending += [ref for style in inline_styles for ref in CSS_VAR_REF_PATTERN.findall(style)]
+    while pending:
+        name = pending.pop()
+        if name not in references:
+            references.add(name)
+            pending.extend(CSS_VAR_REF_PATTERN.findall(definitions.get(name, '')))
+
+    removed = 0
+    for idx, (prelude, body) in enumerate(rules):
+        if prelude == ':root' and isinstance(body, str):
+            items = _split_declarations(body)
+            used = [item for item in items if not item.startswith('--') or item.partition(':')[0] in references]
+            removed += len(items) - len(used)
+            rules[idx] = (prelude, ';'.join(used))
+    rules[:] = [(prelude, body) for prelude, body in rules if body or body is None]
+    return removed
+
+
+def _serialize_rule(prelude: str, body) -> str:
+    if body is None:
+        return f"{prelude};"
+    return f"{prelude}{{{_serialize_css(body) if isinstance(body, list) else body}}}"
+
+
+def _serialize_css(rules: List) -> str:
+    return ''.join(_serialize_rule(prelude, body) for prelude, body in rules)
+
+
+def _count_rules(rules: List) -> int:
+    return sum(_count_rules(body) if isinstance(body, list) else 1 for _, body in rules)
+
+
+def _is_block(node) -> bool:
+    return node is None or isinstance(node, Raw) or (isinstance(node, Element) and node.tag not in INLINE_LEVEL_TAGS)
+
+
+def _collapse(text: str) -> str:
+    """Espacios seguidos a uno solo, sin tocar los shortcodes (su JSON debe llegar exacto)"""
+    parts, position = [], 0
+    for match in SHORTCODE_PATTERN.finditer(text):
+        parts.append(WHITESPACE_PATTERN.sub(' ', text[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(WHITESPACE_PATTERN.sub(' ', text[position:]))
+    return ''.join(parts)
+
+
+def _minify_tree(element: Element, styles: List[Element], used: Dict):
+    """Quita comentarios y espacios sobrantes; recoge los <style>, clases, etiquetas y estilos en línea"""
+    children = []
+    for child in element.children:
+        if isinstance(child, Raw) and child.startswith('<!--') and not child.startswith('<!--['):
+            continue  # Comentarios (salvo los condicionales)
+        children.append(child)
+
+    result = []
+    for idx, child in enumerate(children):
+        if isinstance(child, Element):
+            used['tags'].add(child.tag)
+            attrs = dict(child.attrs)
+            used['classes'].update((attrs.get('class') or '').split())
+            if attrs.get('style'):
+                used['inline_styles'].append(attrs['style'])
+            if child.tag == 'style':
+                styles.append(child)
+            elif child.tag not in PRESERVED_TAGS:
+                _minify_tree(child, styles, used)
+            result.append(child)
+            continue
+        if isinstance(child, Raw) or element.tag in PRESERVED_TAGS:
+            result.append(child)
+            continue
+
+        text = _collapse(child)
+        previous = result[-1] if result else None
+        following = children[idx + 1] if idx + 1 < len(children) else None
+        if _is_block(previous) and element.tag not in INLINE_TAGS:
+            text = text.lstrip(' ')
+        if _is_block(following) and element.tag not in INLINE_TAGS:
+            text = text.rstrip(' ')
+        if text:
+            result.append(text)
+    element.children = result
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def export_for_cms(html_content: str) -> Dict:
+    """
+    Exporta un artículo para el CMS
+
+    Memoizado por contenido (el informe se comparte: no se debe modificar).
+
+    Returns:
+        Diccionario con 'content', 'original_bytes', 'bytes', 'saved_bytes',
+        'saved_pct', 'css_rules' (conservadas), 'css_rules_removed',
+        'css_duplicates_removed' y 'css_variables_removed'
+    """
+    html_content = html_content or ''
+    root = parse_tree(html_content)
+    styles, used = [], {'tags': set(ALWAYS_USED_TAGS), 'classes': set(), 'inline_styles': []}
+    _minify_tree(root, styles, used)
+
+    rules, removed, duplicates, variables = [], 0, 0, 0
+    if styles:
+        css = ''.join(child for style in styles for child in style.children if isinstance(child, str))
+        rules, removed = _prune_rules(parse_css(css), used['classes'], used['tags'])
+        rules, duplicates = _dedupe_rules(rules)
+        variables = _prune_variables(rules, used['inline_styles'])
+
+        # Un solo <style> (donde estaba el primero)
+        first = styles[0]
+        first.children = [_serialize_css(rules)]
+        first.start_text = '<style>'
+        first.closed = True
+        for style in styles[1:] if rules else styles:
+            style.parent.children = [child for child in style.parent.children if child is not style]
+
+    content = serialize(root).strip()
+    original_bytes = len(html_content.encode('utf-8'))
+    size = len(content.encode('utf-8'))
+    return {
+        'content': content,
+        'original_bytes': original_bytes,
+        'bytes': size,
+        'saved_bytes': original_bytes - size,
+        'saved_pct': round(100 * (original_bytes - size) / original_bytes, 1) if original_bytes else 0.0,
+        'css_rules': _count_rules(rules),
+        'css_rules_removed': removed,
+        'css_duplicates_removed': duplicates,
+        'css_variables_removed': variables
+    }
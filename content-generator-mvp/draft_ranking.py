@@ -0,0 +1,91 @@
+"""
+Draft Ranking
+Puntuación local de borradores alternativos (sin llamadas a la API)
+- Estructura: <style> con :root, <article>, kicker en <span>, h1 único, h2, módulos en <p><span>
+- Longitud: desviación respecto a la longitud objetivo
+- Keywords: proporción de keywords que aparecen en el texto
+- Módulos: shortcodes solicitados presentes tal cual
+"""
+
+from typing import Dict, List, Optional
+
+from article_analyzer import analyze_article
+
+# Peso de cada criterio en la puntuación final (suman 1)
+SCORE_WEIGHTS = {
+    'estructura': 0.30,
+    'longitud': 0.30,
+    'keywords': 0.20,
+    'modulos': 0.20,
+}
+
+# Desviación de longitud a partir de la cual el criterio puntúa 0 (±50%)
+LENGTH_ZERO_DEVIATION = 0.5
+
+MIN_SECTIONS = 2  # h2 mínimos para considerar que el borrador tiene secciones
+
+
+def score_draft(html_content: str, target_length: int, keywords: Optional[List[str]],
+                modules: Optional[List[Dict]]) -> Dict:
+    """
+    Puntúa un borrador entre 0 y 1
+
+    Args:
+        html_content: HTML del borrador
+        target_length: Palabras objetivo
+        keywords: Keywords que deben aparecer
+        modules: Módulos solicitados (con 'shortcode')
+
+    Returns:
+        Diccionario con 'score', la nota de cada criterio y el detalle de los fallos
+    """
+    report = analyze_article(html_content)
+    checks = {
+        **report['structure'],
+        'tiene_secciones': sum(1 for s in report['words']['sections'] if s['level'] == 'h2') >= MIN_SECTIONS
+    }
+    words = report['words']['total']
+    deviation = abs(words - target_length) / target_length if target_length else 0.0
+
+    text = report['text'].lower()
+    keywords = [k.strip() for k in (keywords or []) if k and k.strip()]
+    missing_keywords = [k for k in keywords if k.lower() not in text]
+
+    found = {module['shortcode'] for module in report['modules']}
+    shortcodes = [m['shortcode'] for m in (modules or []) if m.get('shortcode')]
+    missing_modules = [idx for idx, shortcode in enumerate(shortcodes) if shortcode not in found]
+
+    scores = {
+        'estructura': sum(checks.values()) / len(checks),
+        'longitud': max(0.0, 1 - deviation / LENGTH_ZERO_DEVIATION),
+        'keywords': 1 - len(missing_keywords) / len(keywords) if keywords else 1.0,
+        'modulos': 1 - len(missing_modules) / len(shortcodes) if shortcodes else 1.0,
+    }
+
+    return {
+        'score': round(sum(SCORE_WEIGHTS[name] * value for name, value in scores.items()), 4),
+        **{name: round(value, 4) for name, value in scores.items()},
+        'palabras': words,
+        'fallos_estructura': [name for name, ok in checks.items() if not ok],
+        'keywords_ausentes': missing_keywords,
+        'modulos_ausentes': missing_modules,
+    }
+
+
+def rank_drafts(drafts: List[Optional[str]], target_length: int, keywords: Optional[List[str]],
+                modules: Optional[List[Dict]]) -> List[Dict]:
+    """
+    Ordena borradores alternativos de mejor a peor
+
+    Los borradores vacíos (variantes que fallaron) se descartan. En caso de
+    empate gana la variante con menor índice.
+
+    Returns:
+        Puntuaciones (score_draft + 'index' de la variante), la mejor primero
+    """
+    ranking = [
+        {'index': idx, **score_draft(draft, target_length, keywords, modules)}
+        for idx, draft in enumerate(drafts) if draft
+    ]
+    ranking.sort(key=lambda item: (-item['score'], item['index']))
+    return ranking
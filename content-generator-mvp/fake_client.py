@@ -0,0 +1,354 @@
+"""
+Fake Client
+Cliente de Anthropic simulado para benchmarks y pruebas sin llamadas a la API
+- FakeAsyncAnthropic: messages.create y messages.stream con la interfaz de AsyncAnthropic
+- FakeAnthropic: messages.batches (create, retrieve, results) de la Message Batches API
+- Respuestas sintéticas por etapa (borrador/final HTML, esquema JSON, secciones, análisis por herramienta)
+- Latencia simulada por modelo, corte por max_tokens (con continuación), 429 al superar
+  la capacidad y 529 aleatorios (reproducibles)
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Union
+
+import anthropic
+import httpx
+
+from prompt_profiler import SAMPLE_CORRECTIONS, SAMPLE_SENTENCE, sample_draft
+from rate_limiter import estimate_tokens
+from token_budget import request_text
+
+# Latencia simulada por modelo: tiempo hasta el primer token y velocidad de salida
+MODEL_SPEEDS = {
+    "claude-sonnet-4-20250514": {"ttft": 1.5, "tokens_per_second": 60},
+    "claude-3-5-haiku-20241022": {"ttft": 0.6, "tokens_per_second": 150},
+}
+DEFAULT_SPEED = {"ttft": 1.0, "tokens_per_second": 80}
+STREAM_CHUNK_CHARS = 400
+
+SHORTCODE_PATTERN = re.compile(r'#MODULE_START#\|.*?\|#MODULE_END#', re.DOTALL)
+TARGET_PATTERNS = (
+    re.compile(r'LONGITUD OBJETIVO: (\d+) palabras'),      # Borrador
+    re.compile(r'LONGITUD TOTAL: (\d+) palabras'),         # Esquema
+    re.compile(r'Longitud objetivo:\*\* (\d+) palabras'),  # Ajuste de longitud
+    re.compile(r'entre (\d+) y (\d+) palabras'),           # Sección
+    re.compile(r'rango (\d+)-(\d+) palabras'),             # Versión final
+)
+DEFAULT_TARGET_WORDS = 1500
+
+Response = Union[str, Dict]
+
+
+def _target_words(prompt: str) -> int:
+    """Palabras objetivo que pide el prompt (punto medio si es un rango)"""
+    for pattern in TARGET_PATTERNS:
+        match = pattern.search(prompt)
+        if match:
+            values = [int(value) for value in match.groups()]
+            return sum(values) // len(values)
+    return DEFAULT_TARGET_WORDS
+
+
+def _paragraph(words: int) -> str:
+    sentence = SAMPLE_SENTENCE.split()
+    return " ".join(itertools.islice(itertools.cycle(sentence), max(words, 1)))
+
+
+def prompt_text(request: Dict) -> str:
+    """Texto del primer mensaje de usuario (acepta contenido en bloques)"""
+    content = request['messages'][0]['content']
+    return content if isinstance(content, str) else "".join(block['text'] for block in content)
+
+
+def default_responder(request: Dict) -> Response:
+    """
+    Respuesta sintética a una petición, según la etapa que reconoce en el prompt
+
+    Returns:
+        Texto de la respuesta, o el input de la herramienta (dict) si la petición fuerza una
+    """
+    prompt = prompt_text(request)
+    words = _target_words(prompt)
+
+    if request.get('tools'):
+        return dict(SAMPLE_CORRECTIONS, longitud_objetivo=words)
+
+    if 'ESQUEMA DEL ARTÍCULO' in prompt:
+        modules = len(re.findall(r'^- Módulo \d+:', prompt, re.MULTILINE))
+        titles = ['', 'Qué ofrece', 'Para quién es', 'Veredicto']
+        return json.dumps({
+            'kicker': '⚡ OFERTA',
+            'titulo': 'Título del artículo',
+            'secciones': [
+                {'nivel': 'h2' if title else 'intro', 'titulo': title, 'palabras': words // len(titles),
+                 'puntos': ['Idea clave'], 'componentes': [], 'modulos': [idx] if idx < modules else [],
+                 'enlaces': []}
+                for idx, title in enumerate(titles)
+            ]
+        }, ensure_ascii=False)
+
+    if 'REDACCIÓN DE UNA SECCIÓN' in prompt:
+        title = re.search(r'# SECCIÓN A REDACTAR:\nTítulo: (.*)', prompt).group(1)
+        heading = '' if title == 'Introducción' else f"<h2>{title}</h2>\n"
+        shortcodes = dict.fromkeys(SHORTCODE_PATTERN.findall(prompt.split('# ENLACES DE ESTA SECCIÓN:')[1]))
+        return heading + f"<p>{_paragraph(words)}</p>" + "".join(
+            f"\n<p><span>{shortcode}</span></p>" for shortcode in shortcodes
+        )
+
+    if 'AJUSTE DE LONGITUD' in prompt:
+        section = prompt.split('# SECCIÓN:\n\n', 1)[1].split('\n\n# REGLAS:', 1)[0]
+        heading = re.match(r'\s*(<h[23][^>]*>.*?</h[23]>)', section, re.DOTALL)
+        return (heading.group(1) + "\n" if heading else "") + f"<p>{_paragraph(words)}</p>" + "".join(
+            f"\n<p><span>{shortcode}</span></p>" for shortcode in SHORTCODE_PATTERN.findall(section)
+        )
+
+    modules = [{'shortcode': shortcode} for shortcode in dict.fromkeys(SHORTCODE_PATTERN.findall(prompt))]
+    return sample_draft(words, modules)
+
+
+def build_message(request: Dict, response: Response, input_tokens: int) -> SimpleNamespace:
+    """
+    Mensaje con la forma del SDK para una respuesta
+
+    El texto se corta si supera max_tokens (stop_reason 'max_tokens'); el input
+    de una herramienta cortado llega vacío, como el JSON incompleto en la API.
+    """
+    if isinstance(response, dict):
+        output_tokens, stop_reason = estimate_tokens(json.dumps(response, ensure_ascii=False)), 'tool_use'
+        if output_tokens > request['max_tokens']:
+            response, output_tokens, stop_reason = {}, request['max_tokens'], 'max_tokens'
+        block = SimpleNamespace(type='tool_use', name=request['tools'][0]['name'], input=response)
+    else:
+        output_tokens, stop_reason = estimate_tokens(response), 'end_turn'
+        if output_tokens > request['max_tokens']:
+            response = response[:len(response) * request['max_tokens'] // output_tokens]
+            output_tokens, stop_reason = request['max_tokens'], 'max_tokens'
+        block = SimpleNamespace(type='text', text=response)
+
+    return SimpleNamespace(
+        id=f"msg_fake_{id(block):x}",
+        model=request['model'],
+        content=[block],
+        stop_reason=stop_reason,
+        usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                              cache_creation_input_tokens=0, cache_read_input_tokens=0)
+    )
+
+
+def overloaded_error() -> anthropic.APIStatusError:
+    """529 (API sobrecargada) sin retry-after: el planificador reintenta con backoff"""
+    response = httpx.Response(529, request=httpx.Request('POST', 'https://api.anthropic.com/v1/messages'))
+    return anthropic.APIStatusError("overloaded_error", response=response, body=None)
+
+
+def rate_limit_error(retry_after: float) -> anthropic.RateLimitError:
+    """429 como lo lanza el SDK, con cabecera retry-after"""
+    response = httpx.Response(
+        429, headers={'retry-after': str(retry_after)},
+        request=httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+    )
+    return anthropic.RateLimitError("rate_limit_error", response=response, body=None)
+
+
+class _FakeServer:
+    """Respuestas, latencia, capacidad y contadores compartidos por las interfaces simuladas"""
+
+    def __init__(self, responder: Callable[[Dict], Response] = default_responder,
+                 time_scale: float = 0.0, capacity: Optional[int] = None,
+                 retry_after: float = 1.0, speeds: Optional[Dict] = None,
+                 overload_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            responder: Función petición -> respuesta completa (texto o input de herramienta)
+            time_scale: Factor sobre la latencia simulada (0 = sin esperas)
+            capacity: Peticiones simultáneas que acepta antes de responder 429 (None = sin límite)
+            retry_after: Segundos de retry-after en los 429
+            speeds: Latencias por modelo (por defecto MODEL_SPEEDS)
+            overload_rate: Fracción de peticiones que fallan con 529 (reproducible con `seed`)
+        """
+        self.responder = responder
+        self.time_scale = time_scale
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.speeds = speeds or MODEL_SPEEDS
+        self.overload_rate = overload_rate
+        self._random = random.Random(seed)
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.completed = []  # (time.monotonic, tokens de salida) de cada respuesta entregada
+        self._lock = threading.Lock()  # Los generadores síncronos llaman desde varios hilos
+
+    def respond(self, request: Dict) -> SimpleNamespace:
+        """
+        Mensaje de respuesta a `request`
+
+        Si el último mensaje es del asistente (respuesta parcial), se devuelve solo
+        lo que falta de la respuesta completa.
+        """
+        self.requests.append(request)
+        response = self.responder(request)
+        last = request['messages'][-1]
+        if last['role'] == 'assistant' and isinstance(response, str):
+            response = response[len(last['content']):] if response.startswith(last['content']) else response
+        return build_message(request, response, estimate_tokens(request_text(request)))
+
+    def duration(self, message: SimpleNamespace) -> Dict:
+        """Segundos simulados hasta el primer token y totales"""
+        speed = self.speeds.get(message.model, DEFAULT_SPEED)
+        ttft = speed['ttft'] * self.time_scale
+        return {'ttft': ttft, 'total': ttft + message.usage.output_tokens / speed['tokens_per_second'] * self.time_scale}
+
+    def enter(self):
+        """Abre una petición (RateLimitError si la capacidad está completa, 529 según overload_rate)"""
+        with self._lock:
+            if self.capacity is not None and self.in_flight >= self.capacity:
+                self.rate_limited += 1
+                raise rate_limit_error(self.retry_after)
+            if self.overload_rate and self._random.random() < self.overload_rate:
+                self.overloaded += 1
+                raise overloaded_error()
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self, message: Optional[SimpleNamespace] = None):
+        """Cierra una petición (con `message` si se entregó la respuesta completa)"""
+        with self._lock:
+            self.in_flight -= 1
+            if message is not None:
+                self.completed.append((time.monotonic(), message.usage.output_tokens))
+
+
+class _FakeStream:
+    """Respuesta en streaming: text_stream por trozos y get_final_message()"""
+
+    def __init__(self, server: _FakeServer, request: Dict):
+        self._server = server
+        self._request = request
+        self.current_message_snapshot = None
+
+    async def __aenter__(self):
+        self._server.enter()
+        self._message = self._server.respond(self._request)
+        self._timing = self._server.duration(self._message)
+        self._start = time.monotonic()
+        self._finished = False
+        self.current_message_snapshot = SimpleNamespace(usage=SimpleNamespace(
+            input_tokens=self._message.usage.input_tokens, output_tokens=0
+        ))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.leave(self._message if self._finished else None)
+        return False
+
+    @property
+    async def text_stream(self):
+        block = self._message.content[0]
+        text = block.text if block.type == 'text' else ''
+        chunks = [text[idx:idx + STREAM_CHUNK_CHARS] for idx in range(0, len(text), STREAM_CHUNK_CHARS)]
+        await asyncio.sleep(self._timing['ttft'])
+        step = (self._timing['total'] - self._timing['ttft']) / max(len(chunks), 1)
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                await asyncio.sleep(step)
+            yield chunk
+
+    async def get_final_message(self):
+        await asyncio.sleep(max(self._start + self._timing['total'] - time.monotonic(), 0))
+        self._finished = True
+        return self._message
+
+
+class _FakeAsyncMessages:
+    def __init__(self, server: _FakeServer):
+        self._server = server
+
+    async def create(self, **request):
+        self._server.enter()
+        delivered = None
+        try:
+            message = self._server.respond(request)
+            await asyncio.sleep(self._server.duration(message)['total'])
+            delivered = message
+            return message
+        finally:
+            self._server.leave(delivered)
+
+    def stream(self, **request):
+        return _FakeStream(self._server, request)
+
+
+class FakeAsyncAnthropic:
+    """Sustituto de anthropic.AsyncAnthropic (generador async y benchmarks)"""
+
+    def __init__(self, **server_options):
+        """Args: los de _FakeServer (responder, time_scale, capacity, retry_after, speeds)"""
+        self.server = _FakeServer(**server_options)
+        self.messages = _FakeAsyncMessages(self.server)
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeBatches:
+    """messages.batches: cada lote termina tras `polls_to_end` consultas"""
+
+    def __init__(self, server: _FakeServer, polls_to_end: int, errored: Callable[[Dict], bool]):
+        self._server = server
+        self._polls_to_end = polls_to_end
+        self._errored = errored
+        self.batches = {}
+
+    def create(self, requests: List[Dict]):
+        batch_id = f"msgbatch_fake_{len(self.batches) + 1}"
+        self.batches[batch_id] = {'requests': requests, 'polls': 0}
+        return self.retrieve(batch_id, count=False)
+
+    def retrieve(self, batch_id: str, count: bool = True):
+        batch = self.batches[batch_id]
+        if count:
+            batch['polls'] += 1
+        ended = batch['polls'] >= self._polls_to_end
+        total = len(batch['requests'])
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status='ended' if ended else 'in_progress',
+            request_counts=SimpleNamespace(succeeded=total if ended else 0, errored=0,
+                                           processing=0 if ended else total)
+        )
+
+    def results(self, batch_id: str):
+        for item in self.batches[batch_id]['requests']:
+            if self._errored(item):
+                result = SimpleNamespace(type='errored', error=SimpleNamespace(
+                    error=SimpleNamespace(message='overloaded_error')
+                ))
+            else:
+                result = SimpleNamespace(type='succeeded', message=self._server.respond(item['params']))
+            yield SimpleNamespace(custom_id=item['custom_id'], result=result)
+
+
+class FakeAnthropic:
+    """Sustituto de anthropic.Anthropic para la Message Batches API (batch_executor)"""
+
+    def __init__(self, polls_to_end: int = 1, errored: Callable[[Dict], bool] = lambda item: False,
+                 **server_options):
+        """
+        Args:
+            polls_to_end: Consultas de estado hasta que un lote termina
+            errored: Función petición del lote -> True si su resultado es un error
+            server_options: Los de _FakeServer
+        """
+        self.server = _FakeServer(**server_options)
+        self.messages = SimpleNamespace(batches=_FakeBatches(self.server, polls_to_end, errored))
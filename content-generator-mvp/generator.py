@@ -0,0 +1,1285 @@
+"""
+Generator
+Motor de generación en 3 etapas (ContentGeneratorV4) y utilidades de HTML/JSON
+Sin dependencias de Streamlit: lo comparten la app y la generación por lotes (batch_cli.py)
+"""
+
+import asyncio
+import html
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import partial
+from types import SimpleNamespace
+
+import anthropic
+import requests
+
+from draft_ranking import rank_drafts
+from length_controller import LengthController
+from telemetry import build_stage_record
+from word_count import count_words
+from result_cache import make_cache_key
+from shortcode_verifier import repair_modules
+from structure_fixer import fix_structure
+from stream_validator import RETRY_INSTRUCTIONS, STAGE_OUTPUT_KINDS, EarlyAbort, StreamValidator
+from rate_limiter import estimate_tokens
+from token_budget import PromptBudgetExceeded, fit_output_tokens, fit_prompt_args, request_text
+from prompts import (
+    BF_CALLOUT_HTML, CRITIQUE_TOOL, CSS_CMS_COMPATIBLE,
+    build_generation_prompt_stage1_draft, build_correction_prompt_stage2,
+    build_final_generation_prompt_stage3, build_outline_prompt_stage1,
+    build_section_prompt_stage1, split_static_prefix
+)
+
+# ============================================================================
+# DATOS DE PRODUCTO (N8N)
+# ============================================================================
+
+PDP_WEBHOOK_URL = "https://n8n.prod.pccomponentes.com/webhook/extract-product-data"
+
+def fetch_pdp_data(product_id):
+    """
+    Obtiene los datos de la PDP mediante el webhook n8n
+    
+    Raises:
+        requests.exceptions.RequestException: error de conexión o respuesta no 200
+    """
+    response = requests.post(
+        PDP_WEBHOOK_URL,
+        json={"productId": product_id},
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
+def get_mock_pdp_data(product_id):
+    """Datos mock para testing sin VPN"""
+    return {
+        "productId": product_id,
+        "nombre": "Xiaomi Robot Vacuum E5 Robot con Función de Aspiración y Fregado",
+        "precio_actual": "59.99",
+        "precio_anterior": "64.99",
+        "descuento": "-7%",
+        "valoracion": "4.1",
+        "num_opiniones": "112",
+        "badges": ["Precio mínimo histórico"],
+        "url_producto": f"https://www.pccomponentes.com/producto/{product_id}",
+        "especificaciones": {
+            "potencia_succion": "2000Pa",
+            "navegacion": "Giroscopio + sensores IR",
+            "bateria": "2600 mAh",
+            "autonomia": "110 minutos",
+            "deposito_polvo": "400 ml",
+            "deposito_agua": "90 ml",
+            "altura": "70 mm",
+            "conectividad": "WiFi 2.4GHz",
+            "control_voz": "Alexa, Google Assistant",
+            "fregado": "Sí (mopa incluida)"
+        },
+        "descripcion": "Olvida la limpieza manual: aspira y friega con eficiencia, gestión desde tu móvil y acabado impecable en todo tipo de suelos.",
+        "opiniones_resumen": [
+            "Calidad-precio de 10. Es ligero, hace poco ruido y la app es muy sencilla de ejecutar.",
+            "Aspira muy bien en suelos duros. El fregado es perfecto para mantenimiento diario.",
+            "El perfil bajo de 70mm es genial para limpiar debajo de muebles.",
+            "No mapea por habitaciones pero limpia toda la superficie eficientemente."
+        ]
+    }
+
+# ============================================================================
+# GENERATOR CLASS
+# ============================================================================
+
+# Modo esquema + secciones en paralelo
+OUTLINE_MODE_MIN_LENGTH = 1800   # En modo automático, a partir de esta longitud
+SECTION_CONCURRENCY = 4          # Secciones redactadas a la vez
+
+# Variantes de borrador generadas a la vez (solo la mejor pasa a las etapas 2 y 3)
+MAX_DRAFT_VARIANTS = 4
+
+# Reintentos con instrucciones específicas tras abortar una respuesta en streaming
+# (el último intento no se aborta: lo que llegue lo corrige structure_fixer)
+EARLY_ABORT_RETRIES = 1
+
+# Respuestas cortadas por max_tokens: se piden continuaciones (no se repite la llamada)
+MAX_CONTINUATIONS = 2
+
+# Plazo máximo de un trabajo completo (incluye esperas por límites de la API)
+JOB_DEADLINE_SECONDS = 15 * 60
+
+# Plazo de cada llamada: base + max_tokens / velocidad mínima de salida esperada
+# (max_tokens ya escala con la longitud objetivo de la etapa)
+STAGE_TIMEOUT_BASE_SECONDS = 30
+STAGE_MIN_TOKENS_PER_SECOND = 25
+
+
+class StageTimeout(Exception):
+    """Una llamada de etapa ha superado su plazo"""
+    status_code = 408  # Como un Request Timeout: el planificador lo reintenta
+
+
+def get_stage_timeout(max_tokens):
+    """Segundos máximos de una llamada que puede generar hasta `max_tokens`"""
+    return STAGE_TIMEOUT_BASE_SECONDS + max_tokens / STAGE_MIN_TOKENS_PER_SECOND
+
+# Modelos disponibles para el enrutado por etapa
+MODEL_SONNET = "claude-sonnet-4-20250514"
+MODEL_HAIKU = "claude-3-5-haiku-20241022"
+
+# Presupuesto de salida por etapa: base + palabras_objetivo × tokens_por_palabra
+# (la base cubre el bloque CSS y el marcado HTML; ~3 tokens/palabra en HTML en español)
+STAGE_TOKEN_BUDGETS = {
+    "draft":    {"base": 3000, "tokens_per_word": 3.0, "max": 16000},
+    "outline":  {"base": 1500, "tokens_per_word": 0.5, "max": 4000},
+    "section":  {"base": 500,  "tokens_per_word": 3.0, "max": 6000},
+    "critique": {"base": 2500, "tokens_per_word": 0.5, "max": 6000},
+    "final":    {"base": 3000, "tokens_per_word": 3.0, "max": 16000},
+    "length":   {"base": 500,  "tokens_per_word": 3.0, "max": 6000},
+}
+
+# Perfiles de enrutado: modelo y temperatura por etapa
+ROUTING_PROFILES = {
+    "calidad": {
+        "name": "🎯 Calidad (todo Sonnet)",
+        "stages": {
+            "draft":    {"model": MODEL_SONNET, "temperature": 1.0},
+            "outline":  {"model": MODEL_SONNET, "temperature": 0.7},
+            "section":  {"model": MODEL_SONNET, "temperature": 1.0},
+            "critique": {"model": MODEL_SONNET, "temperature": 0.3},
+            "final":    {"model": MODEL_SONNET, "temperature": 0.7},
+            "length":   {"model": MODEL_SONNET, "temperature": 0.7},
+        }
+    },
+    "equilibrado": {
+        "name": "⚖️ Equilibrado (análisis y ajustes con Haiku)",
+        "stages": {
+            "draft":    {"model": MODEL_SONNET, "temperature": 1.0},
+            "outline":  {"model": MODEL_SONNET, "temperature": 0.7},
+            "section":  {"model": MODEL_SONNET, "temperature": 1.0},
+            "critique": {"model": MODEL_HAIKU,  "temperature": 0.3},
+            "final":    {"model": MODEL_SONNET, "temperature": 0.7},
+            "length":   {"model": MODEL_HAIKU,  "temperature": 0.7},
+        }
+    },
+    "rapido": {
+        "name": "⚡ Rápido (solo borrador y final con Sonnet)",
+        "stages": {
+            "draft":    {"model": MODEL_SONNET, "temperature": 1.0},
+            "outline":  {"model": MODEL_HAIKU,  "temperature": 0.7},
+            "section":  {"model": MODEL_HAIKU,  "temperature": 1.0},
+            "critique": {"model": MODEL_HAIKU,  "temperature": 0.3},
+            "final":    {"model": MODEL_SONNET, "temperature": 0.7},
+            "length":   {"model": MODEL_HAIKU,  "temperature": 0.7},
+        }
+    },
+}
+
+DEFAULT_ROUTING_PROFILE = "equilibrado"
+
+def get_stage_settings(stage, target_words, profile=DEFAULT_ROUTING_PROFILE):
+    """
+    Configuración de una etapa: modelo, max_tokens y temperatura
+    
+    Args:
+        stage: Clave de STAGE_TOKEN_BUDGETS (draft, critique, final...)
+        target_words: Palabras objetivo de la etapa (artículo o sección)
+        profile: Clave de ROUTING_PROFILES
+    
+    Returns:
+        Diccionario con 'model', 'max_tokens' y 'temperature'
+    """
+    budget = STAGE_TOKEN_BUDGETS[stage]
+    routing = ROUTING_PROFILES.get(profile, ROUTING_PROFILES[DEFAULT_ROUTING_PROFILE])['stages'][stage]
+    max_tokens = int(budget['base'] + (target_words or 0) * budget['tokens_per_word'])
+    
+    return {
+        'model': routing['model'],
+        'max_tokens': min(max_tokens, budget['max']),
+        'temperature': routing['temperature']
+    }
+
+def build_stage_request(prompt, stage=None, target_words=None,
+                        profile=DEFAULT_ROUTING_PROFILE, max_tokens=None, cache_prompt=False, tool=None):
+    """
+    Parámetros de la llamada a la API para una etapa
+    
+    Con `stage` se aplican el modelo, la temperatura y el presupuesto de
+    tokens del perfil de enrutado; `max_tokens` explícito tiene prioridad.
+    Con `cache_prompt` el prompt se marca para la caché de prompts de la API
+    (útil solo si se va a repetir, p. ej. en variantes de borrador).
+    Si el prompt empieza por un prefijo estático precompilado (borrador por
+    arquetipo), ese prefijo va en su propio bloque marcado para la caché: es
+    idéntico en todas las generaciones del arquetipo.
+    Con `tool` se fuerza esa herramienta (tools + tool_choice).
+    max_tokens se ajusta en local a lo que cabe en el modelo con la entrada
+    estimada (prompt y, si la hay, definición de la herramienta).
+    
+    Raises:
+        PromptBudgetExceeded: el prompt no deja sitio para la respuesta
+    """
+    if stage:
+        settings = get_stage_settings(stage, target_words, profile)
+    else:
+        settings = {'model': MODEL_SONNET, 'max_tokens': 10000, 'temperature': None}
+    
+    if max_tokens:
+        settings['max_tokens'] = max_tokens
+    
+    content = prompt
+    prefix, rest = split_static_prefix(prompt)
+    if prefix:
+        content = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                   {"type": "text", "text": rest}]
+        if cache_prompt:
+            content[1]['cache_control'] = {"type": "ephemeral"}
+    elif cache_prompt:
+        content = [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+    
+    request = {
+        'model': settings['model'],
+        'max_tokens': settings['max_tokens'],
+        'messages': [{"role": "user", "content": content}]
+    }
+    if tool:
+        request['tools'] = [tool]
+        request['tool_choice'] = {"type": "tool", "name": tool['name']}
+    if settings['temperature'] is not None:
+        request['temperature'] = settings['temperature']
+    
+    request['max_tokens'] = fit_output_tokens(settings['model'], estimate_tokens(request_text(request)),
+                                              settings['max_tokens'])
+    return request
+
+def build_continuation_request(request, partial_text):
+    """
+    Petición que continúa una respuesta cortada por max_tokens
+    
+    El texto ya recibido va como inicio de la respuesta del asistente (sin
+    espacios finales: la API no los admite) y el modelo sigue desde ahí.
+    max_tokens se vuelve a ajustar al contexto que queda.
+    
+    Raises:
+        PromptBudgetExceeded: la respuesta parcial ya no deja sitio para continuar
+    """
+    continued = dict(request)
+    continued['messages'] = [*request['messages'], {"role": "assistant", "content": partial_text.rstrip()}]
+    continued['max_tokens'] = fit_output_tokens(
+        request['model'], estimate_tokens(request_text(continued)), request['max_tokens']
+    )
+    return continued
+
+class AsyncContentGenerator:
+    """
+    Generador con flujo de 3 etapas sobre AsyncAnthropic
+    
+    Las etapas son corrutinas (prefijo `a`): muchas generaciones y llamadas
+    de sección comparten un único event loop y se pueden cancelar.
+    """
+    
+    def __init__(self, api_key, routing_profile=DEFAULT_ROUTING_PROFILE,
+                 telemetry_store=None, use_streaming=True, result_cache=None,
+                 checkpoint_store=None, scheduler=None, admission=None, base_url=None,
+                 client=None):
+        # Con planificador, los reintentos los gestiona él (no el SDK)
+        self.client = client or anthropic.AsyncAnthropic(
+            api_key=api_key, base_url=base_url, max_retries=0 if scheduler else 2
+        )
+        self.scheduler = scheduler
+        self.admission = admission
+        self.job_deadline = None
+        self._progress = None
+        self.routing_profile = routing_profile
+        self.telemetry_store = telemetry_store
+        self.use_streaming = use_streaming
+        self.result_cache = result_cache
+        self.checkpoint_store = checkpoint_store
+        self.cache_hit = False
+        self.resumed_stages = []
+        self.length_report = None
+        self.variant_report = None
+        self.module_report = None
+        self.early_aborts = []
+        self.continuations = []
+        self.trimmed_inputs = []
+        self.stage_metrics = []
+        self.errors = []
+        self.partial = {}
+        self.cancelled = False
+        self.job_context = {}
+    
+    def _build_request(self, prompt, max_tokens=None, stage=None, target_words=None, cache_prompt=False,
+                       tool=None):
+        """Parámetros de la llamada para una etapa con el perfil de enrutado del generador"""
+        return build_stage_request(prompt, stage, target_words, self.routing_profile,
+                                   max_tokens, cache_prompt, tool)
+    
+    def _record_stage(self, stage, stage_name, model, usage=None, latency_s=0.0,
+                      ttft_s=None, stop_reason=None, error=None, attempts=1):
+        """Guarda la telemetría de una llamada (memoria + almacén persistente)"""
+        record = build_stage_record(
+            stage or "custom", stage_name, model, usage=usage, latency_s=latency_s,
+            ttft_s=ttft_s, stop_reason=stop_reason, error=error,
+            context={**self.job_context, 'attempts': attempts}
+        )
+        self.stage_metrics.append(record)
+        
+        if self.telemetry_store:
+            try:
+                self.telemetry_store.append(record)
+            except OSError:
+                pass  # La telemetría nunca debe romper la generación
+        
+        return record
+    
+    def _on_retry(self, attempt, delay, error):
+        """Avisa del reintento en el progreso (sin avanzar el porcentaje)"""
+        if self._progress:
+            status = getattr(error, 'status_code', None) or type(error).__name__
+            self._progress(None, f"⏳ API ocupada ({status}), reintento {attempt} en {delay:.0f}s...")
+    
+    def _report_error(self, message):
+        """
+        Registra un error de etapa y lo muestra en el progreso
+        
+        No usa st.error: la generación puede ejecutarse fuera del hilo de la sesión.
+        """
+        self.errors.append(message)
+        if self._progress:
+            self._progress(None, f"❌ {message}")
+    
+    def _on_queue(self, position, eta_seconds):
+        """Muestra la posición en la cola global y el tiempo estimado"""
+        if self._progress:
+            self._progress(None, f"🕒 En cola: posición {position} · ETA ~{eta_seconds:.0f}s")
+    
+    async def _send(self, request, streaming=False, first_token=None, validator=None):
+        """
+        Ejecuta una llamada a la API (a través del planificador si existe)
+        
+        Cada intento tiene un plazo derivado de max_tokens (StageTimeout al vencer).
+        `first_token` (asyncio.Event) se activa al llegar el primer token o la
+        respuesta: para entonces el prompt ya está en la caché de prompts.
+        Con `validator` (StreamValidator, solo en streaming) el texto se valida
+        según llega y la llamada se corta con EarlyAbort si incumple la estructura.
+        
+        Returns:
+            (mensaje, tiempo hasta el primer token, intentos)
+        """
+        timing = {'ttft': None}
+        timeout = get_stage_timeout(request['max_tokens'])
+        if self.job_deadline is not None:
+            timeout = max(min(timeout, self.job_deadline - time.monotonic()), 1)
+        
+        async def request_message():
+            start = time.perf_counter()
+            timing['ttft'] = None
+            if streaming:
+                async with self.client.messages.stream(**request) as stream:
+                    async for text in stream.text_stream:
+                        if timing['ttft'] is None:
+                            timing['ttft'] = time.perf_counter() - start
+                            if first_token:
+                                first_token.set()
+                        if not validator:
+                            break  # get_final_message() consume el resto
+                        violation = validator.feed(text)
+                        if violation:
+                            # Salir del bloque cierra la conexión: no se generan más tokens
+                            snapshot = getattr(stream, 'current_message_snapshot', None)
+                            raise EarlyAbort(violation, SimpleNamespace(
+                                input_tokens=getattr(getattr(snapshot, 'usage', None), 'input_tokens', 0),
+                                output_tokens=violation['tokens']
+                            ))
+                    return await stream.get_final_message()
+            return await self.client.messages.create(**request)
+        
+        async def call():
+            # Plazo por intento: al vencer se aborta la petición en vuelo
+            try:
+                return await asyncio.wait_for(request_message(), timeout)
+            except asyncio.TimeoutError:
+                raise StageTimeout(f"tiempo agotado ({timeout:.0f}s)") from None
+        
+        # Plaza de admisión por intento: se suelta mientras el planificador espera un reintento
+        slot = None
+        if self.admission:
+            job_id = self.job_context.get('generation_id') or id(self)
+            slot = partial(self.admission.slot_async, job_id, self.job_deadline, self._on_queue)
+        
+        if self.scheduler:
+            message, attempts = await self.scheduler.run_async(
+                call,
+                estimated_tokens=estimate_tokens(request_text(request)) + request['max_tokens'],
+                deadline=self.job_deadline,
+                on_retry=self._on_retry,
+                usage_tokens=lambda m: m.usage.input_tokens + m.usage.output_tokens,
+                slot=slot
+            )
+        elif slot:
+            async with slot():
+                message, attempts = await call(), 1
+        else:
+            message, attempts = await call(), 1
+        
+        if first_token:
+            first_token.set()
+        return message, timing['ttft'], attempts
+    
+    async def agenerate_stage(self, prompt, max_tokens=None, stage_name="", stage=None, target_words=None,
+                              prefix_ready=None):
+        """
+        Llama a Claude API para una etapa (en streaming si está activado)
+        
+        Con `prefix_ready` (asyncio.Event) el prompt se comparte entre variantes:
+        se marca para la caché de prompts y el evento se activa cuando ya está en ella.
+        En streaming, las etapas que devuelven HTML se validan según llegan: si
+        la salida incumple claramente la estructura se corta y se repite una vez
+        con una instrucción sobre el fallo (queda registrado en early_aborts).
+        Si la respuesta se corta por max_tokens, se continúa desde donde quedó
+        (hasta MAX_CONTINUATIONS veces, registrado en continuations).
+        """
+        kind = STAGE_OUTPUT_KINDS.get(stage) if self.use_streaming else None
+        aborts = []
+        
+        for retry in range(EARLY_ABORT_RETRIES + 1):
+            # Tras un aborto se repite con una instrucción sobre el fallo detectado
+            attempt_prompt = prompt if not aborts else (
+                f"{prompt}\n\n{RETRY_INSTRUCTIONS[aborts[-1]['rule']]}"
+            )
+            try:
+                request = self._build_request(attempt_prompt, max_tokens, stage, target_words,
+                                              cache_prompt=prefix_ready is not None)
+            except PromptBudgetExceeded as e:
+                self._report_error(f"Error en {stage_name}: {str(e)}")
+                result = None
+                break
+            validator = StreamValidator(kind) if kind and retry < EARLY_ABORT_RETRIES else None
+            
+            start = time.perf_counter()
+            
+            try:
+                message, ttft, attempts = await self._send(
+                    request, streaming=self.use_streaming, first_token=prefix_ready, validator=validator
+                )
+                result = message.content[0].text
+            except EarlyAbort as abort:
+                self._record_stage(stage, stage_name, request['model'], abort.usage,
+                                   time.perf_counter() - start, error=f"Abortada: {abort.violation['rule']}")
+                aborts.append({'stage': stage, 'stage_name': stage_name, **abort.violation})
+                if self._progress:
+                    self._progress(None, f"🛑 {stage_name}: {abort.violation['detail']} "
+                                         f"(cortada a los ~{abort.violation['tokens']} tokens), reintentando...")
+                continue
+            except Exception as e:
+                self._record_stage(stage, stage_name, request['model'],
+                                   latency_s=time.perf_counter() - start, error=str(e))
+                self._report_error(f"Error en {stage_name}: {str(e)}")
+                result = None
+                break
+            
+            self._record_stage(stage, stage_name, request['model'], message.usage,
+                               time.perf_counter() - start, ttft, message.stop_reason, attempts=attempts)
+            if result and message.stop_reason == "max_tokens":
+                result = await self._acontinue(request, result, stage, stage_name)
+            break
+        
+        # Tokens ahorrados: lo que habría seguido escribiendo el intento abortado
+        # (se estima con la salida del intento que sí terminó)
+        for abort in aborts:
+            completed = message.usage.output_tokens if result else None
+            abort['tokens_saved'] = max(completed - abort['tokens'], 0) if completed else None
+        self.early_aborts.extend(aborts)
+        return result
+    
+    async def _acontinue(self, request, partial_text, stage, stage_name):
+        """
+        Completa una respuesta cortada por max_tokens con llamadas de continuación
+        
+        Returns:
+            Texto completo (o el parcial si una continuación falla)
+        """
+        text = partial_text
+        for number in range(1, MAX_CONTINUATIONS + 1):
+            if self._progress:
+                self._progress(None, f"✂️ {stage_name}: respuesta cortada por longitud, continuando ({number})...")
+            
+            start = time.perf_counter()
+            try:
+                continued = build_continuation_request(request, text)
+                message, ttft, attempts = await self._send(continued, streaming=self.use_streaming)
+            except Exception as e:
+                self._record_stage(stage, f"{stage_name} (continuación {number})", request['model'],
+                                   latency_s=time.perf_counter() - start, error=str(e))
+                self._report_error(f"Error al continuar {stage_name}: {str(e)}")
+                break
+            
+            self._record_stage(stage, f"{stage_name} (continuación {number})", request['model'], message.usage,
+                               time.perf_counter() - start, ttft, message.stop_reason, attempts=attempts)
+            text = text.rstrip() + "".join(block.text for block in message.content if block.type == "text")
+            self.continuations.append({
+                'stage': stage, 'stage_name': stage_name, 'number': number,
+                'tokens': message.usage.output_tokens, 'stop_reason': message.stop_reason
+            })
+            if message.stop_reason != "max_tokens":
+                break
+        
+        return text
+    
+    async def agenerate_structured_stage(self, prompt, tool, stage_name="", stage=None,
+                                         target_words=None, max_attempts=2):
+        """
+        Llama a Claude API forzando una herramienta y devuelve su input validado
+        
+        La respuesta es siempre el objeto de la herramienta (nunca texto libre);
+        si no cumple el esquema se repite la llamada hasta `max_attempts` veces.
+        Si el objeto se corta por max_tokens, el reintento pide el doble de
+        salida (lo que quepa en el modelo); si ya no cabe más, error de presupuesto.
+        
+        Returns:
+            dict validado contra tool['input_schema'] o None
+        """
+        try:
+            request = self._build_request(prompt, None, stage, target_words, tool=tool)
+        except PromptBudgetExceeded as e:
+            self._report_error(f"Error en {stage_name}: {str(e)}")
+            return None
+        
+        errors = []
+        for _ in range(max_attempts):
+            start = time.perf_counter()
+            try:
+                message, _, attempts = await self._send(request)
+            except Exception as e:
+                self._record_stage(stage, stage_name, request['model'],
+                                   latency_s=time.perf_counter() - start, error=str(e))
+                self._report_error(f"Error en {stage_name}: {str(e)}")
+                return None
+            
+            self._record_stage(stage, stage_name, request['model'], message.usage,
+                               time.perf_counter() - start, None, message.stop_reason,
+                               attempts=attempts)
+            
+            if message.stop_reason == "max_tokens":
+                # Objeto cortado: repetir la misma llamada daría el mismo corte
+                errors = [f"respuesta cortada en {request['max_tokens']} tokens"]
+                larger = self._build_request(prompt, request['max_tokens'] * 2, stage, target_words, tool=tool)
+                if larger['max_tokens'] <= request['max_tokens']:
+                    self._report_error(f"Error en {stage_name}: la respuesta no cabe en "
+                                       f"{request['max_tokens']} tokens de salida de {request['model']}")
+                    return None
+                request = larger
+                continue
+            
+            tool_input = next(
+                (block.input for block in message.content
+                 if block.type == "tool_use" and block.name == tool['name']),
+                None
+            )
+            errors = validate_json_schema(tool_input, tool['input_schema'])
+            if not errors:
+                return tool_input
+        
+        self._report_error(f"Error en {stage_name}: respuesta no válida ({'; '.join(errors[:3])})")
+        return None
+    
+    async def agenerate_with_3_stages(self, pdp_data, arquetipo, target_length, keywords,
+                                      context, links, modules, objetivo, producto_alternativo,
+                                      casos_uso, campos_arquetipo, progress_callback=None,
+                                      length_correction=True, generation_mode="auto",
+                                      force_regenerate=False, draft_variants=1):
+        """
+        Flujo completo de generación en 3 etapas
+        
+        progress_callback(porcentaje, mensaje) recibe porcentaje None para
+        avisos que no suponen avance (p. ej. reintentos por límite de la API).
+        Con draft_variants > 1 se generan varios borradores a la vez y solo
+        el mejor (puntuado en local) pasa a las etapas 2 y 3.
+        """
+        
+        self._progress = progress_callback
+        self.job_deadline = time.monotonic() + JOB_DEADLINE_SECONDS
+        self.length_report = None
+        self.variant_report = None
+        self.module_report = None
+        self.structure_report = None
+        self.early_aborts = []
+        self.continuations = []
+        self.trimmed_inputs = []
+        self.cache_hit = False
+        self.resumed_stages = []
+        self.stage_metrics = []
+        self.errors = []
+        self.partial = {}
+        self.cancelled = False
+        self.job_context = {
+            'generation_id': uuid.uuid4().hex[:12],
+            'arquetipo': arquetipo['code'],
+            'routing_profile': self.routing_profile,
+            'target_length': target_length
+        }
+        
+        use_outline = self._use_outline_mode(generation_mode, target_length)
+        draft_variants = max(1, min(int(draft_variants or 1), MAX_DRAFT_VARIANTS))
+        prompt_args = (
+            pdp_data, arquetipo, target_length, keywords, context, links,
+            modules, objetivo, producto_alternativo, casos_uso, campos_arquetipo
+        )
+        
+        # PRESUPUESTO: datos opcionales recortados por prioridad si el prompt no cabe
+        prompt_args, self.trimmed_inputs, prompt_tokens = fit_prompt_args(
+            build_outline_prompt_stage1 if use_outline else build_generation_prompt_stage1_draft, prompt_args
+        )
+        if self.trimmed_inputs and progress_callback:
+            progress_callback(None, f"✂️ Prompt recortado a ~{prompt_tokens} tokens: "
+                                    f"{', '.join(self.trimmed_inputs)}")
+        
+        # Clave del trabajo: identifica la caché de resultados y los checkpoints
+        cache_key = None
+        if self.result_cache or self.checkpoint_store:
+            cache_key = self.build_cache_key(
+                *prompt_args, use_outline, length_correction, draft_variants
+            )
+            self.job_context['job_key'] = cache_key[:16]
+        
+        # CACHÉ: mismos prompts + misma configuración = mismo resultado
+        if self.result_cache and not force_regenerate:
+            cached = self.result_cache.get(cache_key)
+            if cached:
+                self.cache_hit = True
+                self.length_report = cached.get('length_report')
+                self.module_report = cached.get('module_report')
+                self.structure_report = cached.get('structure_report')
+                if progress_callback:
+                    progress_callback(100, "♻️ Resultado recuperado de la caché (sin llamadas a la API)")
+                return cached['draft'], cached['corrections'], cached['final']
+        
+        # CHECKPOINTS: reanudar desde la última etapa completada
+        checkpoint = {}
+        if self.checkpoint_store:
+            if force_regenerate:
+                self.checkpoint_store.clear(cache_key)
+            else:
+                checkpoint = self.checkpoint_store.load(cache_key)
+        
+        # ETAPA 1: Borrador inicial (completo o esquema + secciones en paralelo)
+        draft_content = checkpoint.get('draft')
+        
+        if draft_content:
+            self.resumed_stages.append('draft')
+            if progress_callback:
+                progress_callback(33, "💾 Etapa 1/3: Borrador recuperado del checkpoint")
+        else:
+            draft_content = await self.agenerate_draft_variants(
+                prompt_args, use_outline, draft_variants, progress_callback
+            )
+        
+        if not draft_content:
+            return None, None, None
+        
+        # Formato corregido en local antes del análisis: el análisis no gasta
+        # sus correcciones en fallos de estructura que no necesitan al modelo
+        draft_content = fix_structure(draft_content)['content']
+        
+        self.partial['draft'] = draft_content
+        self._save_checkpoint(cache_key, 'draft', draft_content)
+        
+        # ETAPA 2: Análisis crítico
+        corrections_json = checkpoint.get('corrections')
+        
+        if corrections_json:
+            self.resumed_stages.append('corrections')
+            if progress_callback:
+                progress_callback(66, "💾 Etapa 2/3: Análisis recuperado del checkpoint")
+        else:
+            if progress_callback:
+                progress_callback(33, "🔍 Etapa 2/3: Análisis crítico y correcciones...")
+            
+            prompt_correction = build_correction_prompt_stage2(
+                draft_content, target_length, arquetipo, objetivo
+            )
+            
+            corrections_json = await self.agenerate_structured_stage(
+                prompt_correction, CRITIQUE_TOOL, stage_name="Análisis",
+                stage="critique", target_words=target_length
+            )
+        
+        if not corrections_json:
+            return draft_content, None, None
+        
+        self.partial['corrections'] = corrections_json
+        self._save_checkpoint(cache_key, 'corrections', corrections_json)
+        
+        # ETAPA 3: Versión final
+        if progress_callback:
+            progress_callback(66, "✨ Etapa 3/3: Generando versión final...")
+        
+        prompt_final = build_final_generation_prompt_stage3(
+            draft_content, corrections_json, target_length
+        )
+        
+        final_content = await self.agenerate_stage(
+            prompt_final, stage_name="Versión Final", stage="final", target_words=target_length
+        )
+        
+        # AJUSTE DE LONGITUD: solo las secciones necesarias, sin repetir las 3 etapas
+        if final_content and length_correction:
+            final_content = await self.acorrect_length(final_content, target_length, progress_callback)
+        
+        # ESTRUCTURA Y MÓDULOS: formato v3.3 y shortcodes exactos, corregidos en local (sin otra llamada)
+        if final_content:
+            final_content = self.normalize_structure(final_content, progress_callback)
+            final_content = self.verify_modules(final_content, modules, progress_callback)
+        
+        if self.resumed_stages and self.checkpoint_store:
+            self.checkpoint_store.record_resume(cache_key, self.resumed_stages)
+        
+        if final_content and self.checkpoint_store:
+            self.checkpoint_store.clear(cache_key)
+        
+        if final_content and self.result_cache:
+            try:
+                self.result_cache.set(cache_key, {
+                    'draft': draft_content,
+                    'corrections': corrections_json,
+                    'final': final_content,
+                    'length_report': self.length_report,
+                    'module_report': self.module_report,
+                    'structure_report': self.structure_report,
+                    'generation_id': self.job_context['generation_id'],
+                    'timestamp': datetime.now().isoformat()
+                })
+            except OSError:
+                pass  # Sin caché no se pierde el resultado
+        
+        if progress_callback:
+            progress_callback(100, "✅ Generación completada")
+        
+        return draft_content, corrections_json, final_content
+    
+    def _save_checkpoint(self, job_key, stage, value):
+        """Persiste una etapa completada (si hay almacén de checkpoints)"""
+        if not self.checkpoint_store or stage in self.resumed_stages:
+            return
+        try:
+            self.checkpoint_store.save(job_key, stage, value, {
+                'arquetipo': self.job_context.get('arquetipo'),
+                'generation_id': self.job_context.get('generation_id')
+            })
+        except OSError:
+            pass  # Sin checkpoint solo se pierde la posibilidad de reanudar
+    
+    @staticmethod
+    def _use_outline_mode(generation_mode, target_length):
+        """Resuelve el motor de borrador ('auto' usa esquema en artículos largos)"""
+        return generation_mode == "outline" or (
+            generation_mode == "auto" and target_length >= OUTLINE_MODE_MIN_LENGTH
+        )
+    
+    def build_cache_key(self, pdp_data, arquetipo, target_length, keywords, context, links,
+                        modules, objetivo, producto_alternativo, casos_uso, campos_arquetipo,
+                        use_outline, length_correction, draft_variants=1):
+        """
+        Clave de caché de una generación
+        
+        Hash de los prompts completos (etapa 1 con todos los datos; etapas 2 y 3
+        sin el borrador, que es derivado) más la configuración de modelos.
+        """
+        prompt_args = (
+            pdp_data, arquetipo, target_length, keywords, context, links,
+            modules, objetivo, producto_alternativo, casos_uso, campos_arquetipo
+        )
+        
+        if use_outline:
+            prompt_stage1 = build_outline_prompt_stage1(*prompt_args)
+        else:
+            prompt_stage1 = build_generation_prompt_stage1_draft(*prompt_args)
+        
+        options = {'outline': use_outline, 'length_correction': length_correction}
+        if draft_variants > 1:
+            options['draft_variants'] = draft_variants  # Sin variantes, la clave no cambia
+        
+        return make_cache_key(
+            prompt_stage1,
+            build_correction_prompt_stage2("", target_length, arquetipo, objetivo),
+            build_final_generation_prompt_stage3("", "", target_length),
+            CRITIQUE_TOOL,
+            {stage: get_stage_settings(stage, target_length, self.routing_profile)
+             for stage in STAGE_TOKEN_BUDGETS},
+            options
+        )
+    
+    async def _agenerate_draft(self, prompt_args, use_outline, progress_callback=None, prefix_ready=None):
+        """Un borrador con el motor indicado (si el modo esquema falla, borrador completo)"""
+        target_length = prompt_args[2]
+        draft_content = None
+        
+        if use_outline:
+            draft_content = await self.agenerate_draft_outline_mode(
+                *prompt_args, progress_callback=progress_callback, prefix_ready=prefix_ready
+            )
+            
+            if not draft_content and progress_callback:
+                progress_callback(0, "⚠️ Modo esquema no disponible, generando borrador completo...")
+        
+        if not draft_content:
+            if progress_callback:
+                progress_callback(0, "📝 Etapa 1/3: Generando borrador inicial...")
+            
+            prompt_draft = build_generation_prompt_stage1_draft(*prompt_args)
+            
+            draft_content = await self.agenerate_stage(
+                prompt_draft, stage_name="Borrador", stage="draft", target_words=target_length,
+                prefix_ready=prefix_ready
+            )
+        
+        return draft_content
+    
+    async def agenerate_draft_variants(self, prompt_args, use_outline, variants, progress_callback=None):
+        """
+        Etapa 1 con `variants` borradores alternativos generados a la vez
+        
+        La primera variante sale sola hasta que su prompt está en la caché de
+        prompts; las demás lo reutilizan. Los borradores se puntúan en local
+        (draft_ranking) y se devuelve el mejor; el ranking queda en variant_report.
+        """
+        if variants <= 1:
+            return await self._agenerate_draft(prompt_args, use_outline, progress_callback)
+        
+        target_length, keywords, modules = prompt_args[2], prompt_args[3], prompt_args[6]
+        
+        if progress_callback:
+            progress_callback(0, f"🎲 Etapa 1/3: Generando {variants} variantes del borrador a la vez...")
+        
+        prefix_ready = asyncio.Event()
+        first = asyncio.create_task(self._agenerate_draft(prompt_args, use_outline, prefix_ready=prefix_ready))
+        waiter = asyncio.create_task(prefix_ready.wait())
+        
+        try:
+            # Sin streaming no hay primer token que esperar: salen todas a la vez
+            if self.use_streaming:
+                await asyncio.wait({first, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            
+            drafts = await asyncio.gather(first, *(
+                self._agenerate_draft(prompt_args, use_outline, prefix_ready=prefix_ready)
+                for _ in range(variants - 1)
+            ))
+        finally:
+            first.cancel()
+            waiter.cancel()
+        
+        ranking = rank_drafts(drafts, target_length, keywords, modules)
+        if not ranking:
+            return None
+        
+        best = ranking[0]
+        self.variant_report = {'variants': variants, 'chosen': best['index'], 'ranking': ranking}
+        
+        if progress_callback:
+            progress_callback(
+                30,
+                f"🏆 Etapa 1/3: Variante {best['index'] + 1}/{variants} elegida "
+                f"(puntuación {best['score']:.2f}, {len(ranking)} válidas)"
+            )
+        
+        return drafts[best['index']]
+    
+    async def agenerate_draft_outline_mode(self, pdp_data, arquetipo, target_length, keywords,
+                                           context, links, modules, objetivo, producto_alternativo,
+                                           casos_uso, campos_arquetipo, progress_callback=None,
+                                           prefix_ready=None):
+        """Etapa 1 alternativa: esquema JSON y secciones redactadas en paralelo"""
+        
+        if progress_callback:
+            progress_callback(0, "🗂️ Etapa 1/3: Generando esquema del artículo...")
+        
+        prompt_outline = build_outline_prompt_stage1(
+            pdp_data, arquetipo, target_length, keywords, context, links,
+            modules, objetivo, producto_alternativo, casos_uso, campos_arquetipo
+        )
+        
+        outline_raw = await self.agenerate_stage(
+            prompt_outline, stage_name="Esquema", stage="outline", target_words=target_length,
+            prefix_ready=prefix_ready
+        )
+        outline = normalize_outline(parse_json_response(outline_raw), target_length, len(modules or []))
+        
+        if not outline:
+            return None
+        
+        num_sections = len(outline['secciones'])
+        if progress_callback:
+            progress_callback(
+                10,
+                f"📝 Etapa 1/3: Redactando {num_sections} secciones en paralelo "
+                f"(máx. {SECTION_CONCURRENCY} a la vez)..."
+            )
+        
+        semaphore = asyncio.Semaphore(SECTION_CONCURRENCY)
+        
+        async def write_section(idx, section):
+            prompt_section = build_section_prompt_stage1(
+                outline, idx, pdp_data, arquetipo, keywords, objetivo,
+                links, modules or [], producto_alternativo, casos_uso
+            )
+            async with semaphore:
+                return await self.agenerate_stage(
+                    prompt_section,
+                    stage_name=f"Sección {idx + 1}",
+                    stage="section",
+                    target_words=section['palabras']
+                )
+        
+        sections_html = await asyncio.gather(
+            *(write_section(idx, section) for idx, section in enumerate(outline['secciones']))
+        )
+        
+        if not all(sections_html):
+            return None
+        
+        return assemble_article(outline, sections_html, modules or [])
+    
+    def normalize_structure(self, html_content, progress_callback=None):
+        """Corrige en local la estructura v3.3 (article, kicker, módulos, markdown)"""
+        self.structure_report = fix_structure(html_content)
+        
+        if progress_callback and self.structure_report['applied']:
+            progress_callback(
+                97, f"🧱 Estructura corregida en local: {len(self.structure_report['fixes'])} cambio(s) (sin llamadas a la API)"
+            )
+        
+        return self.structure_report.pop('content')
+    
+    def verify_modules(self, html_content, modules, progress_callback=None):
+        """Verifica los shortcodes contra los módulos configurados y los repara en local"""
+        self.module_report = repair_modules(html_content, modules)
+        
+        if progress_callback and self.module_report['applied']:
+            progress_callback(
+                98, f"🧩 Módulos reparados en local: {len(self.module_report['repairs'])} (sin llamadas a la API)"
+            )
+        
+        return self.module_report.pop('content')
+    
+    async def acorrect_length(self, html_content, target_length, progress_callback=None):
+        """Amplía/condensa solo las secciones necesarias si la longitud sale de ±5%"""
+        controller = LengthController(partial(self.agenerate_stage, stage="length"), count_words_in_html)
+        
+        if progress_callback:
+            progress_callback(90, "📏 Verificando longitud por secciones...")
+        
+        self.length_report = await controller.adjust_async(html_content, target_length)
+        
+        if progress_callback and self.length_report['applied']:
+            ajustadas = sum(1 for s in self.length_report['sections'] if s['applied'])
+            progress_callback(
+                95,
+                f"📏 Longitud ajustada en {ajustadas} sección(es): "
+                f"{self.length_report['before']} → {self.length_report['after']} palabras"
+            )
+        
+        return self.length_report['content']
+
+
+class ContentGeneratorV4(AsyncContentGenerator):
+    """
+    Generador con flujo de 3 etapas (API síncrona)
+    
+    Envoltorio fino de AsyncContentGenerator para los hilos de trabajo (app y
+    batch_cli): generate_with_3_stages se ejecuta en un event loop propio del
+    generador, así el cliente async conserva sus conexiones. El resto de la
+    API es la async (agenerate_stage, acorrect_length...).
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._task = None
+        self._run_lock = threading.Lock()
+        self._task_lock = threading.Lock()  # Une la comprobación de cancel() y la creación de la tarea
+        self._cancel_requested = False
+    
+    def _run(self, coro):
+        """
+        Ejecuta una corrutina del generador hasta terminar (una a la vez)
+        
+        Raises:
+            asyncio.CancelledError: si se llamó a cancel() antes o durante la ejecución
+        """
+        with self._run_lock:
+            with self._task_lock:
+                if self._cancel_requested:
+                    coro.close()
+                    raise asyncio.CancelledError()
+                self._task = self._loop.create_task(coro)
+            try:
+                return self._loop.run_until_complete(self._task)
+            finally:
+                with self._task_lock:
+                    self._task = None
+    
+    def cancel(self):
+        """
+        Cancela la generación desde otro hilo (aborta la petición en vuelo)
+        
+        Si aún no ha empezado, la generación termina sin llamar a la API.
+        """
+        with self._task_lock:
+            self._cancel_requested = True
+            task = self._task
+            if task is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(task.cancel)
+    
+    def close(self):
+        """Cierra el cliente y el event loop del generador"""
+        if self._loop.is_closed():
+            return
+        try:
+            self._loop.run_until_complete(self.client.close())
+        except Exception:
+            pass
+        self._loop.close()
+    
+    def generate_with_3_stages(self, *args, **kwargs):
+        """
+        Versión síncrona de agenerate_with_3_stages
+        
+        Si se cancela con cancel(), devuelve las etapas ya completadas
+        (borrador y análisis) con la versión final a None.
+        """
+        try:
+            return self._run(self.agenerate_with_3_stages(*args, **kwargs))
+        except asyncio.CancelledError:
+            self.cancelled = True
+            if self._progress:
+                self._progress(None, "⛔ Generación cancelada")
+            return self.partial.get('draft'), self.partial.get('corrections'), None
+
+
+# ============================================================================
+# FUNCIONES AUXILIARES
+# ============================================================================
+
+def count_words_in_html(html_content):
+    """Cuenta palabras visibles en HTML (sin CSS, scripts ni shortcodes de módulos)"""
+    return count_words(html_content)
+
+JSON_SCHEMA_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float)
+}
+
+def validate_json_schema(data, schema, path="$"):
+    """
+    Valida un objeto contra un subconjunto de JSON Schema
+    (type, properties, required, items, enum)
+    
+    Returns:
+        Lista de errores (vacía si es válido)
+    """
+    errors = []
+    expected = schema.get("type")
+    
+    if expected:
+        python_type = JSON_SCHEMA_TYPES[expected]
+        is_bool = isinstance(data, bool)
+        if not isinstance(data, python_type) or (is_bool and expected in ("integer", "number")):
+            return [f"{path}: se esperaba {expected}"]
+    
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: valor '{data}' no permitido")
+    
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: obligatorio")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate_json_schema(data[key], subschema, f"{path}.{key}"))
+    
+    if expected == "array" and "items" in schema:
+        for idx, item in enumerate(data):
+            errors.extend(validate_json_schema(item, schema["items"], f"{path}[{idx}]"))
+    
+    return errors
+
+def parse_json_response(text):
+    """Extrae el objeto JSON de una respuesta del modelo (tolera ``` y texto alrededor)"""
+    if not text:
+        return None
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+def normalize_outline(outline, target_length, num_modules):
+    """
+    Valida el esquema del modo secciones y reparte palabras y módulos
+    
+    - Escala las palabras por sección para que sumen target_length
+    - Cada módulo queda asignado a una única sección (los no asignados
+      van a la sección más larga)
+    """
+    if not isinstance(outline, dict) or not isinstance(outline.get('secciones'), list):
+        return None
+    
+    secciones = [sec for sec in outline['secciones'] if isinstance(sec, dict)]
+    if not secciones:
+        return None
+    
+    for idx, sec in enumerate(secciones):
+        try:
+            sec['palabras'] = max(int(sec.get('palabras') or 0), 0)
+        except (TypeError, ValueError):
+            sec['palabras'] = 0
+        sec['titulo'] = str(sec.get('titulo') or '').strip()
+        sec['nivel'] = 'intro' if idx == 0 and not sec['titulo'] else 'h2'
+        if sec['nivel'] == 'h2' and not sec['titulo']:
+            return None
+        sec['puntos'] = [str(p) for p in sec.get('puntos') or []]
+        sec['componentes'] = [str(c) for c in sec.get('componentes') or []]
+        sec['enlaces'] = [str(e) for e in sec.get('enlaces') or []]
+    
+    # Palabras: escalar a la longitud objetivo (reparto equitativo si faltan)
+    total = sum(sec['palabras'] for sec in secciones)
+    for sec in secciones:
+        if total > 0:
+            sec['palabras'] = max(int(sec['palabras'] * target_length / total), 50)
+        else:
+            sec['palabras'] = max(target_length // len(secciones), 50)
+    
+    # Módulos: índices válidos, sin duplicados
+    asignados = set()
+    for sec in secciones:
+        modulos = []
+        for mod_idx in sec.get('modulos') or []:
+            try:
+                mod_idx = int(mod_idx)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= mod_idx < num_modules and mod_idx not in asignados:
+                modulos.append(mod_idx)
+                asignados.add(mod_idx)
+        sec['modulos'] = modulos
+    
+    pendientes = [idx for idx in range(num_modules) if idx not in asignados]
+    if pendientes:
+        mayor = max(secciones, key=lambda sec: sec['palabras'])
+        mayor['modulos'].extend(pendientes)
+    
+    outline['secciones'] = secciones
+    outline['kicker'] = str(outline.get('kicker') or '⚡ PcComponentes').strip()
+    outline['titulo'] = str(outline.get('titulo') or '').strip()
+    return outline
+
+def assemble_article(outline, sections_html, modules):
+    """Ensambla localmente <style> + <article> a partir de las secciones redactadas"""
+    parts = [
+        CSS_CMS_COMPATIBLE,
+        "<article>",
+        f'<span class="kicker">{html.escape(outline["kicker"], quote=False)}</span>',
+        f'<h1>{html.escape(outline["titulo"], quote=False)}</h1>',
+        BF_CALLOUT_HTML
+    ]
+    
+    for section, section_html in zip(outline['secciones'], sections_html):
+        section_html = re.sub(r'^\s*```[a-zA-Z]*\s*|\s*```\s*$', '', section_html.strip())
+        # Garantizar que los módulos asignados están presentes y exactos
+        for mod_idx in section['modulos']:
+            shortcode = modules[mod_idx]['shortcode']
+            if shortcode not in section_html:
+                section_html += f"\n{shortcode}"
+        parts.append(section_html)
+    
+    parts.append("</article>")
+    return "\n".join(parts)
+
+# ============================================================================
+# EJECUCIÓN DE UN TRABAJO COMPLETO
+# ============================================================================
+
+def run_generation_job(generator, request, metadata, progress_callback=None):
+    """
+    Ejecuta el flujo de 3 etapas de un trabajo y empaqueta sus resultados
+    
+    No llama a st.*: se usa desde el JobRunner de la app.
+    
+    Args:
+        generator: ContentGeneratorV4 ya configurado
+        request: Argumentos de generate_with_3_stages (sin progress_callback)
+        metadata: Datos descriptivos del trabajo que se copian a los resultados
+        progress_callback: Callback (porcentaje, mensaje) opcional
+    
+    El generador se cierra al terminar (un generador por trabajo).
+    
+    Returns:
+        Resultados serializables (draft, corrections, final, metadata); con
+        'error' si la generación no llegó a la versión final.
+    """
+    try:
+        draft, corrections, final = generator.generate_with_3_stages(
+            **request, progress_callback=progress_callback
+        )
+    finally:
+        generator.close()
+    
+    return package_job_results(generator, draft, corrections, final, metadata)
+
+async def arun_generation_job(generator, request, metadata, progress_callback=None):
+    """
+    Como run_generation_job, con un AsyncContentGenerator desde una corrutina
+    
+    Lo usa batch_cli.py para llevar muchos trabajos en un solo event loop.
+    El cliente del generador se cierra al terminar.
+    """
+    try:
+        draft, corrections, final = await generator.agenerate_with_3_stages(
+            **request, progress_callback=progress_callback
+        )
+    finally:
+        await generator.client.close()
+    
+    return package_job_results(generator, draft, corrections, final, metadata)
+
+def package_job_results(generator, draft, corrections, final, metadata):
+    """Resultados serializables de un trabajo terminado (versiones, telemetría e informes)"""
+    results = {
+        'draft': draft,
+        'corrections': corrections,
+        'final': final,
+        'metadata': {
+            **metadata,
+            'longitud_real': count_words_in_html(final) if final else 0,
+            'telemetria': generator.stage_metrics,
+            'desde_cache': generator.cache_hit,
+            'etapas_reanudadas': generator.resumed_stages,
+            'ajuste_longitud': {
+                k: v for k, v in generator.length_report.items() if k != 'content'
+            } if generator.length_report else None,
+            'variantes_borrador': generator.variant_report,
+            'reparacion_estructura': generator.structure_report,
+            'reparacion_modulos': generator.module_report,
+            'abortos_tempranos': generator.early_aborts,
+            'continuaciones': generator.continuations,
+            'recorte_prompt': generator.trimmed_inputs,
+            'timestamp': datetime.now().isoformat()
+        }
+    }
+    
+    if generator.cancelled:
+        results['cancelled'] = True
+        results['error'] = "Cancelada por el editor"
+    elif not final:
+        results['error'] = "; ".join(generator.errors) or "Error en generación"
+    
+    return results
@@ -0,0 +1,281 @@
+"""
+Job Runner
+Ejecución de generaciones en segundo plano, independiente de los reruns de Streamlit
+- Pool de hilos compartido por todas las sesiones del proceso
+- Estado de cada trabajo persistido en SQLite (progreso, avisos, resultado)
+- La interfaz consulta el trabajo por id: un rerun o recargar la pestaña no lo cancela
+- Cancelación a petición del editor (conservando el resultado parcial)
+"""
+
+import json
+import sqlite3
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MAX_WORKERS = 4
+MAX_MESSAGES = 200  # Avisos de progreso conservados por trabajo
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_INTERRUPTED = 'interrupted'
+JOB_CANCELLED = 'cancelled'
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class JobStore:
+    """Estado de los trabajos en SQLite (una conexión por operación, seguro entre hilos)"""
+
+    def __init__(self, path: str):
+        """
+        Inicializa el almacén y crea la tabla si no existe
+
+        Args:
+            path: Ruta del fichero SQLite
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    owner TEXT,
+                    title TEXT,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    messages TEXT NOT NULL DEFAULT '[]',
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        job = dict(row)
+        job['messages'] = json.loads(job['messages'] or '[]')
+        job['params'] = json.loads(job['params']) if job['params'] else None
+        if 'result' in job:
+            job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def create(self, owner: str, title: str, params: Optional[Dict] = None) -> str:
+        """Registra un trabajo en cola y devuelve su id"""
+        job_id = uuid.uuid4().hex[:12]
+        now = datetime.now().isoformat()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, title, status, params, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, title, JOB_QUEUED,
+                 json.dumps(params, ensure_ascii=False) if params is not None else None, now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        """
+        Trabajo por id (None si no existe)
+
+        Con include_result=False no se lee ni se deserializa el resultado (el
+        artículo completo): basta para consultar el estado.
+        """
+        columns = "*" if include_result else (
+            "id, owner, title, status, progress, messages, params, error, created_at, updated_at"
+        )
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_result(self, job_id: str) -> Optional[Dict]:
+        """Resultado de un trabajo (None si no existe o aún no tiene)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row['result']) if row and row['result'] else None
+
+    def list_jobs(self, owner: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Trabajos más recientes (de un propietario si se indica), sin el resultado"""
+        query = "SELECT id, owner, title, status, progress, error, created_at, updated_at FROM jobs"
+        args = []
+        if owner:
+            query += " WHERE owner = ?"
+            args.append(owner)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, args).fetchall()]
+
+    def update(self, job_id: str, **fields):
+        """Actualiza columnas del trabajo (result se serializa a JSON)"""
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        fields['updated_at'] = datetime.now().isoformat()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def transition(self, job_id: str, from_status: str, to_status: str, **fields) -> bool:
+        """
+        Cambia el estado solo si el trabajo sigue en `from_status` (UPDATE condicional)
+
+        Returns:
+            True si el trabajo estaba en `from_status` y se ha actualizado
+        """
+        fields['status'] = to_status
+        fields['updated_at'] = datetime.now().isoformat()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(f"UPDATE jobs SET {columns} WHERE id = ? AND status = ?",
+                                  (*fields.values(), job_id, from_status))
+            return cursor.rowcount == 1
+
+    def add_message(self, job_id: str, message: str, percent: Optional[int] = None):
+        """Añade un aviso de progreso (percent None = aviso sin avance)"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT messages, progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return
+            messages = json.loads(row['messages'] or '[]')
+            messages.append(message)
+            progress = row['progress'] if percent is None else int(percent)
+            conn.execute(
+                "UPDATE jobs SET messages = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(messages[-MAX_MESSAGES:], ensure_ascii=False), progress,
+                 datetime.now().isoformat(), job_id)
+            )
+
+    def mark_interrupted(self) -> int:
+        """
+        Marca como interrumpidos los trabajos activos de un proceso anterior
+
+        Returns:
+            Número de trabajos marcados
+        """
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                f"WHERE status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})",
+                (JOB_INTERRUPTED, "Servidor reiniciado durante la generación",
+                 datetime.now().isoformat(), *ACTIVE_STATUSES)
+            )
+            return cursor.rowcount
+
+
+class JobRunner:
+    """Pool de hilos que ejecuta trabajos y persiste su estado en un JobStore"""
+
+    def __init__(self, store: JobStore, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Inicializa el ejecutor
+
+        Args:
+            store: Almacén de estado de los trabajos
+            max_workers: Trabajos ejecutándose a la vez
+        """
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._cancel_hooks = {}   # job_id -> función que aborta el trabajo en curso
+        self._discard_hooks = {}  # job_id -> función que libera los recursos de un trabajo que no llega a ejecutarse
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[Callable], Dict], owner: str, title: str,
+               params: Optional[Dict] = None, on_cancel: Optional[Callable[[], None]] = None,
+               on_discard: Optional[Callable[[], None]] = None) -> str:
+        """
+        Encola un trabajo
+
+        Args:
+            fn: Función fn(progress_callback) -> resultado serializable a JSON.
+                Si el resultado contiene 'error', el trabajo termina como fallido
+                conservando el resultado parcial.
+            owner: Sesión/editor propietario (para listar sus trabajos)
+            title: Descripción corta del trabajo
+            params: Parámetros a guardar con el trabajo (informativo)
+            on_cancel: Función que aborta el trabajo en curso (desde otro hilo).
+                Tras cancelar, fn debe devolver su resultado parcial con 'cancelled'.
+            on_discard: Función que libera lo que fn tiene reservado (p. ej. cerrar
+                el generador) si el trabajo se cancela antes de empezar
+
+        Returns:
+            Id del trabajo
+        """
+        job_id = self.store.create(owner, title, params)
+        with self._lock:
+            if on_cancel:
+                self._cancel_hooks[job_id] = on_cancel
+            if on_discard:
+                self._discard_hooks[job_id] = on_discard
+        self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancela un trabajo en cola o en curso
+
+        Returns:
+            True si se ha pedido la cancelación
+        """
+        job = self.store.get(job_id, include_result=False)
+        if not job or job['status'] not in ACTIVE_STATUSES:
+            return False
+
+        # Aún sin hilo: si sigue en cola, _execute ya no podrá pasarlo a running
+        if self.store.transition(job_id, JOB_QUEUED, JOB_CANCELLED, error="Cancelada por el editor"):
+            with self._lock:
+                self._cancel_hooks.pop(job_id, None)
+                discard = self._discard_hooks.pop(job_id, None)
+            if discard:
+                discard()
+            return True
+
+        with self._lock:
+            hook = self._cancel_hooks.get(job_id)
+        if not hook:
+            return False
+        self.store.add_message(job_id, "⛔ Cancelando...")
+        hook()
+        return True
+
+    def _run(self, job_id: str, fn: Callable):
+        try:
+            self._execute(job_id, fn)
+        finally:
+            with self._lock:
+                self._cancel_hooks.pop(job_id, None)
+                self._discard_hooks.pop(job_id, None)
+
+    def _execute(self, job_id: str, fn: Callable):
+        # Cancelado mientras esperaba: cancel() ya ha liberado sus recursos
+        if not self.store.transition(job_id, JOB_QUEUED, JOB_RUNNING):
+            return
+
+        def progress(percent, message):
+            self.store.add_message(job_id, message, percent)
+
+        try:
+            result = fn(progress)
+        except Exception as e:
+            self.store.add_message(job_id, f"❌ {e}")
+            self.store.update(job_id, status=JOB_FAILED, error=traceback.format_exc(limit=5))
+            return
+
+        if result and result.get('cancelled'):
+            self.store.update(job_id, status=JOB_CANCELLED, error=result.get('error'), result=result)
+        elif result and result.get('error'):
+            self.store.update(job_id, status=JOB_FAILED, error=result['error'], result=result)
+        else:
+            self.store.update(job_id, status=JOB_DONE, progress=100, result=result)
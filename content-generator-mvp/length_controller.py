@@ -0,0 +1,350 @@
+"""
+Length Controller
+Corrige la longitud del artículo final ajustando solo las secciones necesarias
+Cuenta palabras por sección (h2/h3), pide ampliar/condensar en paralelo y
+reinserta las secciones reescritas sin regenerar el artículo completo
+"""
+
+import asyncio
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+
+# Banda de tolerancia sobre la longitud objetivo (±5%)
+LENGTH_TOLERANCE = 0.05
+
+# Límites de reescritura por sección
+MIN_SECTION_WORDS = 40       # Secciones más cortas no se tocan
+MIN_ADJUSTMENT_WORDS = 25    # Ajustes menores no compensan una llamada
+MAX_EXPAND_RATIO = 0.6       # Una sección puede crecer hasta un 60%
+MAX_CONDENSE_RATIO = 0.4     # Una sección puede reducirse hasta un 40%
+MAX_SECTIONS_PER_PASS = 4
+MAX_WORKERS = 4
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr'
+}
+
+SHORTCODE_PATTERN = re.compile(r'#MODULE_START#\|.*?\|#MODULE_END#', re.DOTALL)
+CODE_FENCE_PATTERN = re.compile(r'^\s*```[a-zA-Z]*\s*|\s*```\s*$')
+
+
+class _SectionBoundaryParser(HTMLParser):
+    """Localiza los h2/h3 que son hijos directos de <article>"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.depth = 0
+        self.article_depth = None
+        self.article_start = None
+        self.article_end = None
+        self.headings = []  # [(posición, tag)]
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'article' and self.article_depth is None:
+            self.article_depth = self.depth
+            self.article_start = self.getpos()
+        elif tag in ('h2', 'h3') and self.article_depth is not None and self.depth == self.article_depth + 1:
+            self.headings.append((self.getpos(), tag))
+
+        if tag not in VOID_TAGS:
+            self.depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        self.depth = max(self.depth - 1, 0)
+        if tag == 'article' and self.article_depth is not None and self.depth == self.article_depth:
+            self.article_end = self.getpos()
+
+
+def _line_offsets(html_content: str) -> List[int]:
+    """Offset absoluto del inicio de cada línea (HTMLParser trabaja con línea/columna)"""
+    offsets = [0]
+    for match in re.finditer('\n', html_content):
+        offsets.append(match.end())
+    return offsets
+
+
+def split_sections(html_content: str) -> Dict:
+    """
+    Divide el contenido de <article> en secciones delimitadas por h2/h3
+
+    Solo se cortan los encabezados de primer nivel dentro de <article>; los h3
+    anidados (FAQs, veredicto) pertenecen a la sección que los contiene, así
+    cada sección es un fragmento HTML equilibrado que se puede sustituir.
+
+    Args:
+        html_content: HTML completo (<style> + <article>)
+
+    Returns:
+        Diccionario con 'prefix', 'sections' y 'suffix'. Cada sección tiene
+        'heading', 'level' y 'html'.
+    """
+    parser = _SectionBoundaryParser()
+    parser.feed(html_content)
+    parser.close()
+
+    if parser.article_start is None:
+        return {'prefix': html_content, 'sections': [], 'suffix': ''}
+
+    offsets = _line_offsets(html_content)
+
+    def to_offset(pos):
+        line, col = pos
+        return offsets[line - 1] + col
+
+    # El cuerpo empieza justo después de la etiqueta <article ...>
+    article_tag_start = to_offset(parser.article_start)
+    body_start = html_content.index('>', article_tag_start) + 1
+
+    if parser.article_end is not None:
+        body_end = to_offset(parser.article_end)
+    else:
+        body_end = len(html_content)
+
+    cut_points = [body_start] + [to_offset(pos) for pos, _ in parser.headings] + [body_end]
+    levels = [None] + [tag for _, tag in parser.headings]
+
+    sections = []
+    for idx in range(len(cut_points) - 1):
+        fragment = html_content[cut_points[idx]:cut_points[idx + 1]]
+        if not fragment.strip():
+            continue
+        heading_match = re.match(r'\s*<h[23][^>]*>(.*?)</h[23]>', fragment, re.DOTALL | re.IGNORECASE)
+        heading = re.sub(r'<[^>]+>', '', heading_match.group(1)).strip() if heading_match else 'Introducción'
+        sections.append({
+            'heading': heading,
+            'level': levels[idx] or 'intro',
+            'html': fragment
+        })
+
+    return {
+        'prefix': html_content[:body_start],
+        'sections': sections,
+        'suffix': html_content[body_end:]
+    }
+
+
+def join_sections(parts: Dict) -> str:
+    """Reconstruye el HTML a partir de prefix + secciones + suffix"""
+    return parts['prefix'] + ''.join(s['html'] for s in parts['sections']) + parts['suffix']
+
+
+def is_within_tolerance(actual: int, target: int, tolerance: float = LENGTH_TOLERANCE) -> bool:
+    """True si la longitud está dentro de la banda ±tolerance"""
+    if target <= 0:
+        return True
+    return abs(actual - target) <= target * tolerance
+
+
+def plan_adjustments(section_words: List[int], target_length: int,
+                     total_words: Optional[int] = None) -> Dict[int, int]:
+    """
+    Reparte la diferencia de palabras entre las secciones más largas
+
+    Args:
+        section_words: Palabras de cada sección
+        target_length: Longitud objetivo del artículo
+        total_words: Total actual (por defecto la suma de secciones)
+
+    Returns:
+        {índice_sección: palabras_objetivo} solo para las secciones a reescribir
+    """
+    total = sum(section_words) if total_words is None else total_words
+    remaining = target_length - total
+    if remaining == 0:
+        return {}
+
+    ratio = MAX_EXPAND_RATIO if remaining > 0 else MAX_CONDENSE_RATIO
+    candidates = sorted(
+        (idx for idx, words in enumerate(section_words) if words >= MIN_SECTION_WORDS),
+        key=lambda idx: section_words[idx],
+        reverse=True
+    )
+
+    plan = {}
+    for idx in candidates[:MAX_SECTIONS_PER_PASS]:
+        if abs(remaining) < MIN_ADJUSTMENT_WORDS:
+            break
+        capacity = int(section_words[idx] * ratio)
+        change = min(abs(remaining), capacity)
+        if change < MIN_ADJUSTMENT_WORDS:
+            continue
+        change = change if remaining > 0 else -change
+        plan[idx] = section_words[idx] + change
+        remaining -= change
+
+    return plan
+
+
+def build_section_length_prompt(section_html: str, current_words: int, target_words: int) -> str:
+    """Prompt para ampliar o condensar una única sección del artículo"""
+
+    action = "AMPLÍA" if target_words > current_words else "CONDENSA"
+
+    return f"""
+# TAREA: AJUSTE DE LONGITUD DE UNA SECCIÓN
+
+Eres editor senior de PcComponentes. {action} esta sección del artículo.
+
+**Longitud actual:** {current_words} palabras
+**Longitud objetivo:** {target_words} palabras (entre {int(target_words * 0.95)} y {int(target_words * 1.05)})
+
+# SECCIÓN:
+
+{section_html}
+
+# REGLAS:
+
+1. Mantén el encabezado de la sección sin cambios
+2. Conserva las clases CSS, los enlaces y la estructura HTML
+3. Copia los shortcodes #MODULE_START#|...|#MODULE_END# EXACTOS, en su <p><span>
+4. HTML puro: sin markdown, sin ``` de código
+5. NO añadas <style>, <article> ni otras secciones
+6. Mantén el tono aspiracional de PcComponentes
+
+Responde SOLO con el HTML de la sección.
+"""
+
+
+def _clean_rewrite(text: str) -> str:
+    """Elimina fences de código que el modelo pueda añadir"""
+    return CODE_FENCE_PATTERN.sub('', text.strip())
+
+
+def _is_safe_rewrite(original: str, rewrite: str) -> bool:
+    """Comprueba que la reescritura conserva encabezado y shortcodes"""
+    if not rewrite.strip():
+        return False
+    if SHORTCODE_PATTERN.findall(original) != SHORTCODE_PATTERN.findall(rewrite):
+        return False
+    heading = re.match(r'\s*(<h[23][^>]*>)', original, re.IGNORECASE)
+    if heading and not rewrite.lstrip().lower().startswith(heading.group(1).lower()):
+        return False
+    return True
+
+
+class LengthController:
+    """Ajusta la longitud de un artículo reescribiendo solo algunas secciones"""
+
+    def __init__(self, generate_fn: Callable[..., Optional[str]],
+                 word_counter: Callable[[str], int],
+                 tolerance: float = LENGTH_TOLERANCE,
+                 max_workers: int = MAX_WORKERS):
+        """
+        Inicializa el controlador
+
+        Args:
+            generate_fn: Llamada async al modelo (prompt, target_words, stage_name) -> texto
+            word_counter: Función que cuenta palabras de un fragmento HTML
+            tolerance: Banda aceptada sobre la longitud objetivo
+            max_workers: Secciones reescritas en paralelo
+        """
+        self.generate_fn = generate_fn
+        self.word_counter = word_counter
+        self.tolerance = tolerance
+        self.max_workers = max_workers
+
+    def _rewrite_request(self, section: Dict, current_words: int, target_words: int):
+        """Argumentos de generate_fn para reescribir una sección"""
+        prompt = build_section_length_prompt(section['html'], current_words, target_words)
+        # max_tokens lo calcula el generador con el presupuesto de la etapa de longitud
+        return prompt, {
+            'target_words': target_words,
+            'stage_name': f"Ajuste longitud: {section['heading']}"
+        }
+
+    async def _rewrite_section(self, section: Dict, current_words: int,
+                               target_words: int) -> Optional[str]:
+        prompt, kwargs = self._rewrite_request(section, current_words, target_words)
+        result = await self.generate_fn(prompt, **kwargs)
+        return _clean_rewrite(result) if result else None
+
+    def _plan(self, html_content: str, target_length: int):
+        """
+        Divide, cuenta y planifica el ajuste
+
+        Returns:
+            (parts, palabras por sección, informe inicial, plan); plan vacío si no hay que ajustar
+        """
+        parts = split_sections(html_content)
+        section_words = [self.word_counter(s['html']) for s in parts['sections']]
+        total_before = sum(section_words)
+
+        report = {
+            'content': html_content,
+            'target': target_length,
+            'before': total_before,
+            'after': total_before,
+            'applied': False,
+            'sections': []
+        }
+
+        if not parts['sections'] or is_within_tolerance(total_before, target_length, self.tolerance):
+            return parts, section_words, report, {}
+
+        return parts, section_words, report, plan_adjustments(section_words, target_length, total_before)
+
+    async def adjust_async(self, html_content: str, target_length: int) -> Dict:
+        """
+        Corrige la longitud si el total está fuera de la banda
+
+        Las secciones se reescriben a la vez con asyncio.gather (hasta max_workers).
+
+        Args:
+            html_content: HTML final del artículo
+            target_length: Longitud objetivo en palabras
+
+        Returns:
+            Diccionario con 'content' (HTML ajustado) y el informe del ajuste
+        """
+        parts, section_words, report, plan = self._plan(html_content, target_length)
+        if not plan:
+            return report
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def rewrite(idx, target_words):
+            async with semaphore:
+                return await self._rewrite_section(parts['sections'][idx], section_words[idx], target_words)
+
+        results = await asyncio.gather(*(rewrite(idx, target) for idx, target in plan.items()))
+        return self._apply(parts, section_words, report, plan, dict(zip(plan, results)))
+
+    def _apply(self, parts: Dict, section_words: List[int], report: Dict,
+               plan: Dict[int, int], rewrites: Dict[int, Optional[str]]) -> Dict:
+        """Reinserta las reescrituras válidas y completa el informe"""
+        for idx, target_words in plan.items():
+            section = parts['sections'][idx]
+            rewrite = rewrites.get(idx)
+            entry = {
+                'heading': section['heading'],
+                'before': section_words[idx],
+                'target': target_words,
+                'after': section_words[idx],
+                'applied': False
+            }
+
+            if rewrite and _is_safe_rewrite(section['html'], rewrite):
+                new_words = self.word_counter(rewrite)
+                # Solo se acepta si se mueve en la dirección correcta
+                if (new_words - section_words[idx]) * (target_words - section_words[idx]) > 0:
+                    # Conservar el espaciado original entre secciones
+                    trailing = section['html'][len(section['html'].rstrip()):]
+                    section['html'] = rewrite.rstrip() + trailing
+                    entry['after'] = new_words
+                    entry['applied'] = True
+
+            report['sections'].append(entry)
+
+        if any(entry['applied'] for entry in report['sections']):
+            report['content'] = join_sections(parts)
+            report['after'] = sum(self.word_counter(s['html']) for s in parts['sections'])
+            report['applied'] = True
+
+        return report
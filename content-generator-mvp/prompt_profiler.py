@@ -0,0 +1,349 @@
+"""
+Prompt Profiler
+Tokens de cada sección de los prompts de las 3 etapas, para decidir qué recortar con datos
+- Componentes conocidos (CSS, guía de componentes, directrices del arquetipo, JSON de la PDP,
+  shortcodes de módulos, borrador, correcciones) se miden como sección propia
+- El resto se reparte por los encabezados '# ...' del prompt
+- Marca qué secciones van en el prefijo estático precompilado (caché de prompts)
+- Estimación local de tokens (rate_limiter.estimate_tokens): sin llamadas a la API
+
+Uso:
+    python prompt_profiler.py                          # Tabla de todas las secciones
+    python prompt_profiler.py --summary                # Media por etapa y sección (de más a menos tokens)
+    python prompt_profiler.py --format csv --output perfil.csv
+    python prompt_profiler.py --arquetipo ARQ-4 --draft borrador.html
+"""
+
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from generator import get_mock_pdp_data
+from prompts import (
+    ARQUETIPOS, BF_CALLOUT_HTML, CRITIQUE_TOOL, CSS_CMS_COMPATIBLE, HTML_COMPONENTS_GUIDE,
+    HTML_STRUCTURE_INSTRUCTIONS, build_arquetipo_context, build_correction_prompt_stage2,
+    build_final_generation_prompt_stage3, build_generation_prompt_stage1_draft, build_module_info,
+    generate_carousel_module, generate_product_module, get_arquetipo_guidelines, split_static_prefix
+)
+from rate_limiter import estimate_tokens
+
+STAGES = ('draft', 'critique', 'final')
+HEADING_PATTERN = re.compile(r'^# (.+?):?[ \t]*$', re.MULTILINE)
+FIRST_SECTION = '(inicio)'
+TOOL_SECTION = 'herramienta (esquema)'
+FIELDS = ['arquetipo', 'stage', 'section', 'chars', 'tokens', 'pct', 'cached']
+
+SAMPLE_PRODUCT_ID = '1234567'
+SAMPLE_SENTENCE = (
+    "Aspira y friega en una sola pasada, se controla desde el móvil y su perfil "
+    "bajo llega debajo de sofás y camas sin esfuerzo."
+)
+SAMPLE_CORRECTIONS = {
+    "longitud_actual": 0,
+    "longitud_objetivo": 0,
+    "necesita_ajuste_longitud": False,
+    "estructura_html": {
+        "tiene_article": True, "kicker_usa_span": True,
+        "modulos_usan_p_span": True, "css_tiene_root": True
+    },
+    "problemas_encontrados": [
+        {
+            "tipo": "seo", "gravedad": "medio",
+            "descripcion": "La keyword principal no aparece en el primer párrafo",
+            "ubicacion": "Introducción",
+            "correccion_sugerida": "Incluir la keyword principal en la primera frase"
+        },
+        {
+            "tipo": "tono", "gravedad": "menor",
+            "descripcion": "Una frase presenta una limitación en negativo",
+            "ubicacion": "Sección de especificaciones",
+            "correccion_sugerida": "Reformular en positivo con la alternativa"
+        }
+    ],
+    "aspectos_positivos": ["Estructura clara", "Tabla comparativa completa"],
+    "instrucciones_revision": ["Mover la keyword al primer párrafo", "Reformular la frase negativa"],
+    "necesita_reescritura_completa": False
+}
+
+
+def sample_request(arquetipo_code: str) -> Dict:
+    """
+    Datos de ejemplo de una generación (PDP mock, dos módulos, enlaces, campos del arquetipo)
+
+    Los campos del arquetipo se rellenan con sus propios ejemplos del formulario.
+    """
+    arquetipo = ARQUETIPOS[arquetipo_code]
+    campos = {
+        key: re.sub(r'^Ej:\s*', '', campo.get('placeholder', ''))
+        for key, campo in arquetipo.get('campos_especificos', {}).items()
+    }
+    return {
+        'pdp_data': get_mock_pdp_data(SAMPLE_PRODUCT_ID),
+        'arquetipo': arquetipo,
+        'target_length': arquetipo['default_length'],
+        'keywords': ['robot aspirador', 'robot aspirador barato', 'xiaomi e5'],
+        'context': '',
+        'links': {
+            'principal': {'url': 'https://www.pccomponentes.com/robots-aspiradores', 'text': 'robots aspiradores'},
+            'secundarios': [{'url': 'https://www.pccomponentes.com/xiaomi', 'text': 'Xiaomi'}]
+        },
+        'modules': [
+            {'type': 'product', 'nombre': 'Xiaomi Robot Vacuum E5',
+             'shortcode': generate_product_module(SAMPLE_PRODUCT_ID)},
+            {'type': 'carousel', 'category_name': 'robots-aspiradores',
+             'shortcode': generate_carousel_module('robots-aspiradores', '123', 'relevance', 'true', 'true', 12)}
+        ],
+        'objetivo': 'Ayudar a decidir si el robot encaja en un piso pequeño con mascotas',
+        'producto_alternativo': {},
+        'casos_uso': [],
+        'campos_arquetipo': campos
+    }
+
+
+def sample_draft(target_length: int, modules: Optional[List[Dict]] = None) -> str:
+    """Borrador sintético de `target_length` palabras con la estructura v3.3 (CSS, kicker, módulos)"""
+    words_per_paragraph = 4 * len(SAMPLE_SENTENCE.split())
+    paragraphs = [
+        f"<h2>Sección {idx + 1}</h2>\n<p>{' '.join([SAMPLE_SENTENCE] * 4)}</p>"
+        for idx in range(max(target_length // words_per_paragraph, 1))
+    ]
+    shortcodes = [module['shortcode'] for module in modules or []]
+    return "\n".join([
+        CSS_CMS_COMPATIBLE,
+        "<article>",
+        '<span class="kicker">⚡ OFERTA</span>',
+        "<h1>Título del artículo</h1>",
+        BF_CALLOUT_HTML,
+        *paragraphs,
+        *shortcodes,
+        "</article>"
+    ])
+
+
+def _overlaps(start: int, end: int, spans: List) -> bool:
+    return any(start < span_end and span_start < end for span_start, span_end, _ in spans)
+
+
+def _heading_sections(text: str, current: str) -> Tuple[List[List], str]:
+    """
+    Trozos de texto por encabezado; lo anterior al primero sigue en la sección `current`
+
+    Returns:
+        (trozos [nombre, texto], último encabezado)
+    """
+    sections = []
+    position = 0
+    for match in HEADING_PATTERN.finditer(text):
+        if match.start() > position:
+            sections.append([current, text[position:match.start()]])
+        current = match.group(1).strip()
+        position = match.start()
+    if position < len(text):
+        sections.append([current, text[position:]])
+    return sections, current
+
+
+def _split_sections(text: str, components: Dict[str, str], current: str) -> Tuple[List[List], str]:
+    spans = []
+    for name, component in components.items():
+        if not component or not component.strip():
+            continue
+        start = text.find(component)
+        while start != -1 and _overlaps(start, start + len(component), spans):
+            start = text.find(component, start + 1)
+        if start != -1:
+            spans.append((start, start + len(component), name))
+    spans.sort()
+
+    sections = []
+    position = 0
+    for start, end, name in spans + [(len(text), len(text), None)]:
+        chunks, current = _heading_sections(text[position:start], current)
+        sections.extend(chunks)
+        if name:
+            sections.append([name, text[start:end]])
+        position = end
+    return sections, current
+
+
+def profile_prompt(prompt: str, components: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Divide un prompt en secciones con nombre y estima los tokens de cada una
+
+    Args:
+        prompt: Prompt completo
+        components: Textos conocidos que se miden como sección propia ({nombre: texto}).
+            Si un texto aparece varias veces cuenta la primera que no esté dentro de
+            otro componente anterior (el borrador, que trae su CSS, va primero)
+
+    Returns:
+        Secciones en orden ('section', 'chars', 'tokens', 'cached'); la suma de
+        'chars' es la longitud del prompt
+    """
+    components = components or {}
+    prefix, rest = split_static_prefix(prompt)
+
+    parts, current = [], FIRST_SECTION
+    if prefix:
+        sections, current = _split_sections(prefix, components, current)
+        parts = [(section, True) for section in sections]
+    sections, _ = _split_sections(rest, components, current)
+    parts += [(section, False) for section in sections]
+
+    # Los trozos solo de espacios se suman a la sección vecina; las contiguas del mismo nombre se unen
+    merged, pending = [], ''
+    for (name, text), cached in parts:
+        if not text.strip() and (not merged or merged[-1]['cached'] != cached):
+            pending += text
+        elif merged and merged[-1]['cached'] == cached and (merged[-1]['section'] == name or not text.strip()):
+            merged[-1]['text'] += text
+        else:
+            merged.append({'section': name, 'text': pending + text, 'cached': cached})
+            pending = ''
+
+    return [
+        {'section': item['section'], 'chars': len(item['text']),
+         'tokens': estimate_tokens(item['text']), 'cached': item['cached']}
+        for item in merged
+    ]
+
+
+def build_stage_prompts(request: Dict, draft: str, corrections: Dict) -> Dict[str, str]:
+    """Prompts de las 3 etapas para los datos de `request` (mismos constructores que el generador)"""
+    req = request
+    return {
+        'draft': build_generation_prompt_stage1_draft(
+            req['pdp_data'], req['arquetipo'], req['target_length'], req['keywords'],
+            req['context'], req['links'], req['modules'], req['objetivo'],
+            req['producto_alternativo'], req['casos_uso'], req['campos_arquetipo']
+        ),
+        'critique': build_correction_prompt_stage2(draft, req['target_length'], req['arquetipo'], req['objetivo']),
+        'final': build_final_generation_prompt_stage3(draft, corrections, req['target_length'])
+    }
+
+
+def profile_arquetipo(arquetipo_code: str, draft: Optional[str] = None) -> List[Dict]:
+    """
+    Perfil de tokens de las 3 etapas de un arquetipo con datos de ejemplo
+
+    Args:
+        arquetipo_code: Código ARQ-n
+        draft: HTML de un borrador real (por defecto, uno sintético de la longitud por defecto)
+
+    Returns:
+        Filas con FIELDS ('pct': porcentaje del prompt de la etapa)
+    """
+    request = sample_request(arquetipo_code)
+    draft = draft or sample_draft(request['target_length'], request['modules'])
+    corrections = dict(SAMPLE_CORRECTIONS, longitud_objetivo=request['target_length'])
+    prompts = build_stage_prompts(request, draft, corrections)
+
+    components = {
+        'borrador': draft,
+        'correcciones': json.dumps(corrections, ensure_ascii=False, separators=(',', ':')),
+        'pdp_json': json.dumps(request['pdp_data'], indent=2, ensure_ascii=False),
+        'modulos': build_module_info(request['modules']),
+        'campos_arquetipo': build_arquetipo_context(arquetipo_code, request['campos_arquetipo']).strip(),
+        'directrices_arquetipo': get_arquetipo_guidelines(arquetipo_code).strip(),
+        'css': CSS_CMS_COMPATIBLE,
+        'estructura_html': HTML_STRUCTURE_INSTRUCTIONS.strip(),
+        'guia_componentes': HTML_COMPONENTS_GUIDE.strip()
+    }
+
+    rows = []
+    for stage in STAGES:
+        sections = profile_prompt(prompts[stage], components)
+        if stage == 'critique':
+            # El esquema de la herramienta forzada también es entrada
+            tool = json.dumps(CRITIQUE_TOOL, ensure_ascii=False)
+            sections.append({'section': TOOL_SECTION, 'chars': len(tool),
+                             'tokens': estimate_tokens(tool), 'cached': False})
+        total = sum(section['tokens'] for section in sections)
+        rows.extend(
+            {'arquetipo': arquetipo_code, 'stage': stage, **section,
+             'pct': round(100 * section['tokens'] / total, 1) if total else 0.0}
+            for section in sections
+        )
+    return rows
+
+
+def summarize(rows: List[Dict]) -> List[Dict]:
+    """Media por etapa y sección entre arquetipos, de más a menos tokens"""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['stage'], row['section']), []).append(row)
+    arquetipos = len({row['arquetipo'] for row in rows}) or 1
+
+    summary = [
+        {'arquetipo': f"media ({arquetipos})", 'stage': stage, 'section': section,
+         'chars': round(sum(r['chars'] for r in group) / arquetipos),
+         'tokens': round(sum(r['tokens'] for r in group) / arquetipos),
+         'pct': round(sum(r['pct'] for r in group) / arquetipos, 1),
+         'cached': all(r['cached'] for r in group)}
+        for (stage, section), group in groups.items()
+    ]
+    summary.sort(key=lambda row: (STAGES.index(row['stage']), -row['tokens']))
+    return summary
+
+
+def format_rows(rows: List[Dict], output_format: str) -> str:
+    """Filas como tabla markdown ('table'), CSV o JSON"""
+    if output_format == 'json':
+        return json.dumps(rows, indent=2, ensure_ascii=False)
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FIELDS, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+    lines = [f"| {' | '.join(FIELDS)} |", f"|{'---|' * len(FIELDS)}"]
+    lines += [
+        f"| {row['arquetipo']} | {row['stage']} | {row['section']} | {row['chars']} | "
+        f"{row['tokens']} | {row['pct']} | {'sí' if row['cached'] else ''} |"
+        for row in rows
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tokens por sección de los prompts de las 3 etapas")
+    parser.add_argument('--arquetipo', action='append', choices=list(ARQUETIPOS),
+                        help="Arquetipo a medir (repetible; por defecto, todos)")
+    parser.add_argument('--draft', default=None, help="HTML de un borrador real para las etapas 2 y 3")
+    parser.add_argument('--summary', action='store_true', help="Media por etapa y sección entre arquetipos")
+    parser.add_argument('--format', default='table', choices=['table', 'csv', 'json'])
+    parser.add_argument('--output', default=None, help="Fichero de salida (por defecto, la consola)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    draft = None
+    if args.draft:
+        with open(args.draft, encoding='utf-8') as f:
+            draft = f.read()
+
+    rows = []
+    for code in args.arquetipo or ARQUETIPOS:
+        rows.extend(profile_arquetipo(code, draft))
+    if args.summary:
+        rows = summarize(rows)
+
+    text = format_rows(rows, args.format)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        print(f"{len(rows)} filas → {args.output}")
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1731 @@
+"""
+Prompts
+Arquetipos, tono de marca, CSS para CMS y constructores de prompts del flujo de 3 etapas
+Sin dependencias de Streamlit: lo comparten la app y la generación por lotes (batch_cli.py)
+"""
+
+import json
+from types import MappingProxyType
+
+# ============================================================================
+# ARQUETIPOS COMPLETOS CON CAMPOS ESPECÍFICOS
+# ============================================================================
+
+ARQUETIPOS = {
+    "ARQ-1": {
+        "code": "ARQ-1",
+        "name": "📰 Noticia / Actualidad",
+        "description": "Noticia sobre lanzamiento, actualización o evento relevante",
+        "funnel": "Top",
+        "default_length": 1200,
+        "use_case": "Lanzamientos, actualizaciones, eventos, anuncios oficiales",
+        "campos_especificos": {
+            "noticia_principal": {
+                "label": "¿Qué ha pasado? (noticia principal)",
+                "type": "textarea",
+                "placeholder": "Ej: Xiaomi lanza nuevo robot aspirador E5 Pro con mapeo láser y autovaciado por 199€",
+                "help": "Resumen de la noticia en 1-2 frases"
+            },
+            "fecha_evento": {
+                "label": "Fecha del evento/lanzamiento",
+                "type": "text",
+                "placeholder": "Ej: 25 de noviembre de 2025",
+                "help": "Fecha exacta si está disponible"
+            },
+            "fuente_oficial": {
+                "label": "Fuente oficial",
+                "type": "text",
+                "placeholder": "Ej: Comunicado oficial de Xiaomi, evento de prensa",
+                "help": "De dónde viene la información"
+            },
+            "contexto_previo": {
+                "label": "Contexto previo relevante",
+                "type": "textarea",
+                "placeholder": "Ej: El modelo anterior E5 fue bestseller en 2024 con más de 50.000 unidades vendidas",
+                "help": "Información de fondo que da contexto"
+            },
+            "impacto_usuario": {
+                "label": "Impacto para el usuario",
+                "type": "textarea",
+                "placeholder": "Ej: Los usuarios actuales del E5 podrán actualizar el firmware para activar nuevas funciones",
+                "help": "Qué significa esto para los lectores"
+            }
+        }
+    },
+    "ARQ-2": {
+        "code": "ARQ-2",
+        "name": "📖 Guía Paso a Paso",
+        "description": "Tutorial detallado para realizar una tarea o configuración",
+        "funnel": "Middle",
+        "default_length": 1800,
+        "use_case": "Configuraciones, instalaciones, resolución de problemas",
+        "campos_especificos": {
+            "tarea_objetivo": {
+                "label": "¿Qué tarea se va a explicar?",
+                "type": "text",
+                "placeholder": "Ej: Configurar el robot aspirador Xiaomi E5 para limpieza programada",
+                "help": "Objetivo claro que el usuario quiere conseguir"
+            },
+            "requisitos_previos": {
+                "label": "Requisitos previos",
+                "type": "textarea",
+                "placeholder": "Ej: Tener la app Xiaomi Home instalada, WiFi 2.4GHz configurado, robot cargado al 100%",
+                "help": "Qué necesita el usuario antes de empezar"
+            },
+            "tiempo_estimado": {
+                "label": "Tiempo estimado",
+                "type": "text",
+                "placeholder": "Ej: 10-15 minutos",
+                "help": "Cuánto tardará el proceso"
+            },
+            "dificultad": {
+                "label": "Nivel de dificultad",
+                "type": "text",
+                "placeholder": "Ej: Principiante / Intermedio / Avanzado",
+                "help": "Para qué nivel de usuario está pensado"
+            },
+            "puntos_criticos": {
+                "label": "Puntos críticos o errores comunes",
+                "type": "textarea",
+                "placeholder": "Ej: Asegúrate de conectar al WiFi 2.4GHz y NO 5GHz. Si no aparece el robot, reinicia la app",
+                "help": "Problemas típicos y cómo evitarlos"
+            }
+        }
+    },
+    "ARQ-3": {
+        "code": "ARQ-3",
+        "name": "💡 Explicación / Educativo",
+        "description": "Explica conceptos técnicos o funcionamiento de tecnología",
+        "funnel": "Top",
+        "default_length": 1600,
+        "use_case": "Educar sobre tecnologías, conceptos, diferencias técnicas",
+        "campos_especificos": {
+            "concepto_principal": {
+                "label": "Concepto a explicar",
+                "type": "text",
+                "placeholder": "Ej: Navegación láser vs giroscopio en robots aspiradores",
+                "help": "Qué se va a explicar"
+            },
+            "nivel_tecnico": {
+                "label": "Nivel técnico del público",
+                "type": "text",
+                "placeholder": "Ej: Usuario general sin conocimientos técnicos",
+                "help": "Define cuánto tecnicismo usar"
+            },
+            "analogias_utiles": {
+                "label": "Analogías o ejemplos útiles",
+                "type": "textarea",
+                "placeholder": "Ej: La navegación láser es como un GPS que mapea tu casa; el giroscopio es como conducir con brújula",
+                "help": "Comparaciones que faciliten la comprensión"
+            },
+            "aplicacion_practica": {
+                "label": "Aplicación práctica",
+                "type": "textarea",
+                "placeholder": "Ej: Con láser puedes limpiar solo la cocina; con giroscopio limpia toda la casa sin seleccionar",
+                "help": "Por qué es importante este concepto en la práctica"
+            }
+        }
+    },
+    "ARQ-4": {
+        "code": "ARQ-4",
+        "name": "⭐ Review / Análisis",
+        "description": "Análisis profundo de producto único con pros, contras y veredicto",
+        "funnel": "Middle",
+        "default_length": 1800,
+        "use_case": "Producto único destacado - Black Friday, lanzamientos, ofertas especiales",
+        "campos_especificos": {
+            "tiempo_uso": {
+                "label": "Tiempo de uso/prueba",
+                "type": "text",
+                "placeholder": "Ej: 2 semanas de uso intensivo",
+                "help": "Cuánto tiempo se ha probado el producto"
+            },
+            "escenarios_prueba": {
+                "label": "Escenarios de prueba",
+                "type": "textarea",
+                "placeholder": "Ej: Piso 75m², 2 adultos + perro, suelos de parquet y baldosa, limpieza diaria",
+                "help": "En qué contexto se ha probado"
+            },
+            "competencia_directa": {
+                "label": "Competencia directa",
+                "type": "text",
+                "placeholder": "Ej: Roborock Q7, Conga 3490, iRobot Roomba i3",
+                "help": "Productos similares para comparar"
+            },
+            "punto_fuerte_principal": {
+                "label": "Principal punto fuerte",
+                "type": "text",
+                "placeholder": "Ej: Relación calidad-precio imbatible en su rango",
+                "help": "Lo que más destaca del producto"
+            },
+            "limitacion_principal": {
+                "label": "Principal limitación",
+                "type": "text",
+                "placeholder": "Ej: No tiene mapeo por habitaciones",
+                "help": "Limitación más importante a mencionar (en positivo)"
+            }
+        }
+    },
+    "ARQ-5": {
+        "code": "ARQ-5",
+        "name": "⚖️ Comparativa A vs B",
+        "description": "Comparación directa entre 2-3 productos similares",
+        "funnel": "Middle",
+        "default_length": 1600,
+        "use_case": "Ayudar a elegir entre alternativas directas",
+        "campos_especificos": {
+            "producto_a_nombre": {
+                "label": "Producto A - Nombre",
+                "type": "text",
+                "placeholder": "Ej: Xiaomi Robot Vacuum E5",
+                "help": "Primer producto a comparar"
+            },
+            "producto_a_caracteristicas": {
+                "label": "Producto A - Características clave",
+                "type": "textarea",
+                "placeholder": "Ej: 2000Pa succión, 110 min autonomía, WiFi, fregado básico, 59€",
+                "help": "Specs principales del producto A"
+            },
+            "producto_a_mejor_para": {
+                "label": "Producto A - Mejor para casos de uso",
+                "type": "textarea",
+                "placeholder": "Ej: Presupuesto ajustado, pisos pequeños-medianos, mantenimiento diario básico",
+                "help": "Cuándo elegir el producto A"
+            },
+            "producto_b_nombre": {
+                "label": "Producto B - Nombre",
+                "type": "text",
+                "placeholder": "Ej: Roborock Q7",
+                "help": "Segundo producto a comparar"
+            },
+            "producto_b_caracteristicas": {
+                "label": "Producto B - Características clave",
+                "type": "textarea",
+                "placeholder": "Ej: 2700Pa succión, 180 min autonomía, mapeo láser, fregado inteligente, 99€",
+                "help": "Specs principales del producto B"
+            },
+            "producto_b_mejor_para": {
+                "label": "Producto B - Mejor para casos de uso",
+                "type": "textarea",
+                "placeholder": "Ej: Casas grandes, necesidad de mapeo por habitaciones, presupuesto medio",
+                "help": "Cuándo elegir el producto B"
+            },
+            "criterios_comparacion": {
+                "label": "Criterios principales de comparación",
+                "type": "textarea",
+                "placeholder": "Ej: Potencia de succión, autonomía, navegación, fregado, precio, app móvil",
+                "help": "En qué aspectos se van a comparar"
+            }
+        }
+    },
+    "ARQ-6": {
+        "code": "ARQ-6",
+        "name": "🔥 Deal Alert / Chollo",
+        "description": "Alerta de oferta destacada con urgencia",
+        "funnel": "Bottom",
+        "default_length": 1000,
+        "use_case": "Ofertas flash, chollos limitados, precio histórico",
+        "campos_especificos": {
+            "precio_actual": {
+                "label": "Precio actual",
+                "type": "text",
+                "placeholder": "Ej: 59€",
+                "help": "Precio de la oferta"
+            },
+            "precio_habitual": {
+                "label": "Precio habitual",
+                "type": "text",
+                "placeholder": "Ej: 89€",
+                "help": "Precio normal sin oferta"
+            },
+            "ahorro_total": {
+                "label": "Ahorro total",
+                "type": "text",
+                "placeholder": "Ej: 30€ (-34%)",
+                "help": "Cuánto se ahorra"
+            },
+            "duracion_oferta": {
+                "label": "Duración de la oferta",
+                "type": "text",
+                "placeholder": "Ej: Solo hasta medianoche / Mientras duren existencias / 72 horas",
+                "help": "Cuánto tiempo estará disponible"
+            },
+            "stock_disponible": {
+                "label": "Stock o unidades disponibles",
+                "type": "text",
+                "placeholder": "Ej: Quedan menos de 20 unidades / Stock limitado",
+                "help": "Información de disponibilidad para urgencia"
+            },
+            "precio_historico": {
+                "label": "¿Es precio mínimo histórico?",
+                "type": "text",
+                "placeholder": "Ej: Sí, primera vez por debajo de 60€ / No, pero mejor precio del mes",
+                "help": "Contexto histórico del precio"
+            },
+            "por_que_oferta": {
+                "label": "¿Por qué está en oferta?",
+                "type": "text",
+                "placeholder": "Ej: Black Friday / Nuevo modelo próximo a salir / Liquidación stock",
+                "help": "Razón de la oferta (si se conoce)"
+            }
+        }
+    },
+    "ARQ-7": {
+        "code": "ARQ-7",
+        "name": "🏆 Roundup / Mejores X",
+        "description": "Top X productos en una categoría",
+        "funnel": "Middle",
+        "default_length": 2200,
+        "use_case": "Lista categoría - Black Friday, guías de compra",
+        "campos_especificos": {
+            "numero_productos": {
+                "label": "Número de productos en el top",
+                "type": "text",
+                "placeholder": "Ej: 5",
+                "help": "Cuántos productos incluir (3-10 recomendado)"
+            },
+            "criterios_seleccion": {
+                "label": "Criterios de selección",
+                "type": "textarea",
+                "placeholder": "Ej: Probados personalmente, más vendidos del año, mejor valorados, diferentes rangos de precio",
+                "help": "Por qué estos productos y no otros"
+            },
+            "rango_precios": {
+                "label": "Rango de precios",
+                "type": "text",
+                "placeholder": "Ej: De 59€ a 299€",
+                "help": "Desde el más barato al más caro"
+            },
+            "categoria_especifica": {
+                "label": "Categoría específica",
+                "type": "text",
+                "placeholder": "Ej: Robots aspiradores con fregado / Monitores gaming 1440p / Portátiles <600€",
+                "help": "Define bien la categoría para el título"
+            },
+            "ganador_absoluto": {
+                "label": "Ganador absoluto (si lo hay)",
+                "type": "text",
+                "placeholder": "Ej: Roborock S7+ es nuestra elección premium / Xiaomi E5 mejor calidad-precio",
+                "help": "Producto destacado del top (opcional)"
+            }
+        }
+    },
+    "ARQ-8": {
+        "code": "ARQ-8",
+        "name": "💰 Por presupuesto",
+        "description": "Mejores productos por menos de X€",
+        "funnel": "Bottom",
+        "default_length": 1600,
+        "use_case": "Chollos en rango de precio específico",
+        "campos_especificos": {
+            "presupuesto_limite": {
+                "label": "Presupuesto límite",
+                "type": "text",
+                "placeholder": "Ej: 100€ / 500€ / 1000€",
+                "help": "Precio máximo del rango"
+            },
+            "que_esperar": {
+                "label": "Qué se puede esperar en este rango",
+                "type": "textarea",
+                "placeholder": "Ej: Por menos de 100€ puedes conseguir robots básicos sin mapeo pero con buena succión y app móvil",
+                "help": "Expectativas realistas del presupuesto"
+            },
+            "que_sacrificas": {
+                "label": "Qué características se sacrifican",
+                "type": "textarea",
+                "placeholder": "Ej: No tendrás mapeo láser ni autovaciado, pero la limpieza básica es efectiva",
+                "help": "Qué no esperar en este rango (en positivo)"
+            },
+            "mejor_opcion": {
+                "label": "Mejor opción en el rango",
+                "type": "text",
+                "placeholder": "Ej: Xiaomi E5 a 59€ es imbatible en calidad-precio",
+                "help": "Producto destacado del presupuesto"
+            }
+        }
+    },
+    "ARQ-9": {
+        "code": "ARQ-9",
+        "name": "🥊 Versus Detallado",
+        "description": "Enfrentamiento profundo producto a producto con ganador claro",
+        "funnel": "Bottom",
+        "default_length": 2000,
+        "use_case": "Decisión de compra entre dos modelos muy similares",
+        "campos_especificos": {
+            "producto_1": {
+                "label": "Producto 1",
+                "type": "text",
+                "placeholder": "Ej: Xiaomi Robot Vacuum E5",
+                "help": "Primer contendiente"
+            },
+            "producto_2": {
+                "label": "Producto 2",
+                "type": "text",
+                "placeholder": "Ej: Roborock Q7",
+                "help": "Segundo contendiente"
+            },
+            "categorias_versus": {
+                "label": "Categorías de enfrentamiento",
+                "type": "textarea",
+                "placeholder": "Ej: Potencia de succión, Autonomía, Navegación, Fregado, App móvil, Precio, Ruido",
+                "help": "Aspectos específicos a comparar (separa por comas o líneas)"
+            },
+            "ganador_categorias": {
+                "label": "Ganadores por categoría",
+                "type": "textarea",
+                "placeholder": "Ej: Succión: Roborock +700Pa | Autonomía: Roborock +70min | Precio: Xiaomi -40€",
+                "help": "Quién gana en cada categoría"
+            },
+            "ganador_global": {
+                "label": "Ganador global y por qué",
+                "type": "textarea",
+                "placeholder": "Ej: Xiaomi gana por precio y suficiencia; Roborock solo vale la pena si necesitas mapeo láser",
+                "help": "Veredicto final del versus"
+            }
+        }
+    },
+    "ARQ-10": {
+        "code": "ARQ-10",
+        "name": "👤 Por perfil de usuario",
+        "description": "Productos perfectos para un tipo específico de usuario",
+        "funnel": "Middle",
+        "default_length": 1800,
+        "use_case": "Segmentación por audiencia (gamers, estudiantes, profesionales)",
+        "campos_especificos": {
+            "perfil_usuario": {
+                "label": "Perfil de usuario",
+                "type": "text",
+                "placeholder": "Ej: Estudiante universitario / Gamer competitivo / Profesional teletrabajo",
+                "help": "Define el tipo de usuario objetivo"
+            },
+            "necesidades_especificas": {
+                "label": "Necesidades específicas del perfil",
+                "type": "textarea",
+                "placeholder": "Ej: Portabilidad, batería larga, presupuesto <600€, Office y navegación",
+                "help": "Qué necesita este usuario específicamente"
+            },
+            "prioridades": {
+                "label": "Prioridades del perfil",
+                "type": "textarea",
+                "placeholder": "Ej: 1. Precio, 2. Batería, 3. Peso, 4. Pantalla de calidad",
+                "help": "Orden de importancia de características"
+            },
+            "no_necesita": {
+                "label": "Qué NO necesita este perfil",
+                "type": "textarea",
+                "placeholder": "Ej: No necesita GPU dedicada, ni pantalla 4K, ni más de 16GB RAM",
+                "help": "Características por las que no vale pagar más"
+            }
+        }
+    },
+    "ARQ-11": {
+        "code": "ARQ-11",
+        "name": "🔮 Tendencias / Predicciones",
+        "description": "Análisis de tendencias del mercado o predicciones",
+        "funnel": "Top",
+        "default_length": 1400,
+        "use_case": "Contenido de autoridad, análisis de mercado, tendencias tech",
+        "campos_especificos": {
+            "tendencia_principal": {
+                "label": "Tendencia principal",
+                "type": "text",
+                "placeholder": "Ej: Robots aspiradores con IA y autovaciado se están volviendo accesibles",
+                "help": "Qué tendencia se está observando"
+            },
+            "datos_soporte": {
+                "label": "Datos que soportan la tendencia",
+                "type": "textarea",
+                "placeholder": "Ej: Ventas de modelos con autovaciado +150% vs 2023, precios han bajado 40% en 2 años",
+                "help": "Números, stats, datos concretos"
+            },
+            "prediccion": {
+                "label": "Predicción o evolución futura",
+                "type": "textarea",
+                "placeholder": "Ej: En 2026, los modelos básicos incluirán mapeo láser como estándar",
+                "help": "Hacia dónde va el mercado"
+            },
+            "impacto_consumidor": {
+                "label": "Impacto para el consumidor",
+                "type": "textarea",
+                "placeholder": "Ej: Mejor momento para comprar - más funciones por menos dinero que nunca",
+                "help": "Qué significa para el usuario final"
+            }
+        }
+    },
+    "ARQ-12": {
+        "code": "ARQ-12",
+        "name": "📦 Unboxing / Primera impresión",
+        "description": "Experiencia de unboxing y primeras horas con el producto",
+        "funnel": "Top/Middle",
+        "default_length": 1200,
+        "use_case": "Lanzamientos, primeras impresiones, experiencia inicial",
+        "campos_especificos": {
+            "contenido_caja": {
+                "label": "Contenido de la caja",
+                "type": "textarea",
+                "placeholder": "Ej: Robot, base de carga, mopa x2, cepillo extra, filtro adicional, manual",
+                "help": "Qué viene incluido"
+            },
+            "primera_impresion_build": {
+                "label": "Primera impresión - Construcción",
+                "type": "textarea",
+                "placeholder": "Ej: Plástico de calidad media-alta, peso 3kg, acabados limpios, botones físicos táctiles",
+                "help": "Calidad de construcción al tacto"
+            },
+            "sorpresas_positivas": {
+                "label": "Sorpresas positivas",
+                "type": "textarea",
+                "placeholder": "Ej: Incluye 2 mopas de repuesto y filtro extra, embalaje sostenible",
+                "help": "Qué ha superado expectativas"
+            },
+            "sorpresas_negativas": {
+                "label": "Decepciones o sorpresas negativas",
+                "type": "textarea",
+                "placeholder": "Ej: Manual solo en inglés, depósito de agua más pequeño de lo esperado",
+                "help": "Qué ha decepcionado (en tono neutral)"
+            },
+            "setup_inicial": {
+                "label": "Configuración inicial",
+                "type": "text",
+                "placeholder": "Ej: 5 minutos, muy sencillo, app intuitiva",
+                "help": "Experiencia del primer uso"
+            }
+        }
+    },
+    "ARQ-13": {
+        "code": "ARQ-13",
+        "name": "❓ FAQ / Preguntas Frecuentes",
+        "description": "Respuestas a las preguntas más comunes sobre un producto o categoría",
+        "funnel": "Middle",
+        "default_length": 1400,
+        "use_case": "Resolver dudas comunes, SEO de long-tail queries",
+        "campos_especificos": {
+            "producto_categoria": {
+                "label": "Producto o categoría",
+                "type": "text",
+                "placeholder": "Ej: Robots aspiradores / Xiaomi Robot Vacuum E5",
+                "help": "Sobre qué trata el FAQ"
+            },
+            "preguntas_principales": {
+                "label": "Preguntas principales (una por línea)",
+                "type": "textarea",
+                "placeholder": "¿Cuánto dura la batería?\n¿Se puede usar en alfombras?\n¿Necesita WiFi?",
+                "help": "Preguntas más comunes"
+            },
+            "audiencia": {
+                "label": "Audiencia objetivo",
+                "type": "text",
+                "placeholder": "Ej: Usuarios primerizos / Personas considerando compra",
+                "help": "Para quién va dirigido"
+            }
+        }
+    },
+    "ARQ-14": {
+        "code": "ARQ-14",
+        "name": "🎯 Caso de Uso Específico",
+        "description": "Soluciones para un problema o caso de uso muy concreto",
+        "funnel": "Bottom",
+        "default_length": 1600,
+        "use_case": "Nichos específicos (mascotas, pisos pequeños, etc.)",
+        "campos_especificos": {
+            "problema_especifico": {
+                "label": "Problema o caso de uso",
+                "type": "text",
+                "placeholder": "Ej: Limpieza efectiva con perros que sueltan mucho pelo",
+                "help": "Qué problema resuelve"
+            },
+            "contexto_detallado": {
+                "label": "Contexto detallado",
+                "type": "textarea",
+                "placeholder": "Ej: Dos perros labradores, piso 90m², suelos parquet y alfombras, pelo diario abundante",
+                "help": "Situación específica del usuario"
+            },
+            "caracteristicas_criticas": {
+                "label": "Características críticas para este caso",
+                "type": "textarea",
+                "placeholder": "Ej: Cepillo anti-enredo, depósito grande, succión 2500Pa+, app con alertas",
+                "help": "Qué debe tener sí o sí"
+            },
+            "productos_recomendados": {
+                "label": "Productos recomendados",
+                "type": "text",
+                "placeholder": "Ej: Roborock S7+ (premium), Conga 4690 (gama media), Xiaomi E10 (económico)",
+                "help": "Productos que mejor funcionan"
+            }
+        }
+    },
+    "ARQ-15": {
+        "code": "ARQ-15",
+        "name": "⚠️ Errores Comunes",
+        "description": "Errores típicos al comprar o usar un producto",
+        "funnel": "Middle",
+        "default_length": 1400,
+        "use_case": "Educar para evitar frustraciones post-compra",
+        "campos_especificos": {
+            "categoria_producto": {
+                "label": "Categoría o producto",
+                "type": "text",
+                "placeholder": "Ej: Robots aspiradores / Portátiles gaming",
+                "help": "Sobre qué trata"
+            },
+            "errores_principales": {
+                "label": "Errores principales (uno por línea)",
+                "type": "textarea",
+                "placeholder": "No considerar la altura del robot\nElegir por precio solo\nIgnorar tipo de suelos",
+                "help": "Errores más comunes"
+            },
+            "consecuencias": {
+                "label": "Consecuencias de cada error",
+                "type": "textarea",
+                "placeholder": "No puede limpiar debajo de muebles\nRenunciando a funciones esenciales\nRendimiento pobre en alfombras",
+                "help": "Qué pasa si se comete cada error"
+            }
+        }
+    },
+    "ARQ-16": {
+        "code": "ARQ-16",
+        "name": "🆚 X vs Y - Cuál elegir",
+        "description": "Dilema entre dos opciones con recomendación clara según perfil",
+        "funnel": "Bottom",
+        "default_length": 1600,
+        "use_case": "Ayudar a decidir entre dos alternativas populares",
+        "campos_especificos": {
+            "opcion_a": {
+                "label": "Opción A",
+                "type": "text",
+                "placeholder": "Ej: Xiaomi Robot Vacuum E5",
+                "help": "Primera opción"
+            },
+            "opcion_b": {
+                "label": "Opción B",
+                "type": "text",
+                "placeholder": "Ej: Roborock Q7",
+                "help": "Segunda opción"
+            },
+            "perfiles_usuario": {
+                "label": "Perfiles de usuario",
+                "type": "textarea",
+                "placeholder": "Perfil 1: Presupuesto ajustado\nPerfil 2: Necesita mapeo\nPerfil 3: Casa grande",
+                "help": "Diferentes tipos de usuarios"
+            },
+            "recomendacion_por_perfil": {
+                "label": "Recomendación por perfil",
+                "type": "textarea",
+                "placeholder": "Perfil 1 → Xiaomi E5\nPerfil 2 → Roborock Q7\nPerfil 3 → Roborock Q7",
+                "help": "Cuál elegir según perfil"
+            }
+        }
+    },
+    "ARQ-17": {
+        "code": "ARQ-17",
+        "name": "📊 Comparativa Tabla",
+        "description": "Comparación visual de múltiples productos en tabla",
+        "funnel": "Middle",
+        "default_length": 1200,
+        "use_case": "Comparar 3-5 productos visualmente",
+        "campos_especificos": {
+            "productos_comparar": {
+                "label": "Productos a comparar (uno por línea)",
+                "type": "textarea",
+                "placeholder": "Xiaomi E5\nRoborock Q7\nConga 4690\niRobot Roomba i3",
+                "help": "Lista de productos"
+            },
+            "criterios_tabla": {
+                "label": "Criterios de comparación (columnas)",
+                "type": "textarea",
+                "placeholder": "Precio\nPotencia succión\nAutonomía\nMapeo\nFregado\nApp",
+                "help": "Qué aspectos comparar"
+            },
+            "destacar_ganador": {
+                "label": "¿Destacar ganador por criterio?",
+                "type": "text",
+                "placeholder": "Sí / No",
+                "help": "Marcar el mejor en cada categoría"
+            }
+        }
+    },
+    "ARQ-18": {
+        "code": "ARQ-18",
+        "name": "🎁 Regalo Perfecto",
+        "description": "Guía de regalo para ocasión o persona específica",
+        "funnel": "Top/Middle",
+        "default_length": 1400,
+        "use_case": "Navidad, cumpleaños, ocasiones especiales",
+        "campos_especificos": {
+            "ocasion": {
+                "label": "Ocasión",
+                "type": "text",
+                "placeholder": "Ej: Navidad / Cumpleaños papá / Día de la madre",
+                "help": "Para qué ocasión"
+            },
+            "perfil_receptor": {
+                "label": "Perfil del receptor",
+                "type": "textarea",
+                "placeholder": "Ej: Persona mayor, no muy tech-savvy, vive en piso pequeño, le gusta la limpieza",
+                "help": "Cómo es la persona que recibe el regalo"
+            },
+            "presupuesto_regalo": {
+                "label": "Presupuesto",
+                "type": "text",
+                "placeholder": "Ej: 50-100€ / 100-200€ / Sin límite",
+                "help": "Rango de precio del regalo"
+            },
+            "opciones_regalo": {
+                "label": "Opciones de regalo (una por línea)",
+                "type": "textarea",
+                "placeholder": "Xiaomi E5 (económico)\nRoborock Q7 (gama media)\nRoborock S7+ (premium)",
+                "help": "Productos recomendados"
+            },
+            "por_que_perfecto": {
+                "label": "Por qué es perfecto para esta ocasión",
+                "type": "textarea",
+                "placeholder": "Ej: Regalar tiempo libre, producto útil que se usa a diario, tecnología accesible",
+                "help": "Justificación del regalo"
+            }
+        }
+    }
+}
+
+# ============================================================================
+# TONO DE MARCA
+# ============================================================================
+
+BRAND_TONE = """
+# Manual de Tono - PcComponentes
+
+## TONO ASPIRACIONAL (NO NEGATIVO)
+
+### HACER:
+- Enfoca en beneficios y soluciones
+- "Perfecto si..." en lugar de "Evita si..."
+- "Considera alternativas si..." SOLO si hay producto alternativo configurado
+- Honestidad aspiracional: refuerza lo positivo sin mentir
+- Traduce limitaciones en contexto útil
+
+### Ejemplos de tono correcto:
+INCORRECTO: "Este producto no tiene mapeo por habitaciones"
+CORRECTO: "Limpia toda tu casa con navegación inteligente; si necesitas control por habitaciones, hay modelos con láser"
+
+INCORRECTO: "No recomendado para perros grandes"
+CORRECTO: "Perfecto con mascotas estándar; con razas grandes de pelo largo, funciona bien pero el cepillo necesitará limpieza más frecuente"
+
+## PERSONALIDAD:
+- Expertos sin pedantería
+- Frikis sin vergüenza
+- Honestos pero no aburridos
+- Cercanos pero profesionales
+
+## EMOJIS PERMITIDOS:
+- ✅ Para puntos positivos
+- ⚡ Para destacar urgencia o velocidad
+- ❌ SOLO en comparativas técnicas (no para disuadir)
+"""
+
+# ============================================================================
+# CSS CORREGIDO PARA CMS - VERSIÓN 3.3 COMPATIBLE
+# ============================================================================
+
+CSS_CMS_COMPATIBLE = """<style>
+:root{
+  --orange-900:#FF6000;--orange-700:#FF8640;--orange-500:#FFAE80;--orange-300:#FFB7BF;
+  --blue-m-900:#170453;--blue-m-700:#51437E;--blue-m-500:#8B81A9;--blue-m-300:#C5C0D4;
+  --blue-d-900:#090029;--blue-d-700:#46405E;--blue-d-500:#848094;--blue-d-300:#C1BFC9;
+  --white:#FFFFFF;--gray-900:#999999;--gray-700:#949494;--gray-500:#C2C2C2;
+  --gray-300:#E6E6E6;--gray-200:#D9D9D9;--gray-150:#CFCFCF;--gray-50:#F4F4F4;
+  --ink:#141822;--muted:#62697A;--line:var(--gray-300);
+  --primary:var(--blue-m-900);--primary-100:var(--blue-m-300);
+  --accent:var(--orange-900);--accent-100:var(--orange-500);
+  --space-1:6px;--space-2:10px;--space-3:14px;--space-4:18px;--space-5:22px;
+  --radius-0:0;--radius-6:6px;--radius-10:10px;
+}
+*{box-sizing:border-box}
+html,body{margin:0;padding:0;background:var(--white);color:var(--ink);font:16px/1.6 system-ui,-apple-system,Segoe UI,Roboto,Ubuntu,"Helvetica Neue",Arial}
+article{max-width:100%;margin:0 auto}
+h1,h2,h3,h4{font-weight:800;margin:var(--space-4) 0 var(--space-2);color:var(--primary)}
+h1{font-size:34px}h2{font-size:24px}h3{font-size:20px}h4{font-size:16px}
+strong{font-weight:800}p,ul,ol{margin:var(--space-2) 0}
+a{color:var(--primary);text-decoration:underline}a:hover{opacity:.9}
+.kicker{display:inline-block;background:var(--primary-100);color:var(--primary);border:1px solid var(--primary);border-radius:999px;padding:4px 10px;font-size:12px;font-weight:700;margin-bottom:var(--space-2)}
+.badges{display:flex;gap:8px;flex-wrap:wrap;margin:var(--space-2) 0}
+.badge{border:1px solid var(--line);border-radius:999px;padding:4px 10px;font-size:12px;color:var(--muted);background:#fff}
+.callout{border-left:6px solid var(--primary);background:var(--gray-50);padding:var(--space-3) var(--space-4);border-radius:var(--radius-10);margin:var(--space-4) 0}
+.callout.accent{border-left-color:var(--accent);background:var(--accent-100)}
+.callout strong{color:var(--primary)}
+.bf-callout{background-color:#f4f4f4;padding:0.8em 1em;margin:1.2em 0;border-left:4px solid #FF8640;font-size:0.95em}
+.bf-callout a{color:#ff6000;font-weight:bold;text-decoration:underline}
+.btns{display:flex;gap:10px;flex-wrap:wrap;margin:var(--space-3) 0}
+.btn{display:inline-block;padding:10px 14px;border-radius:var(--radius-6);border:1px solid var(--line);text-decoration:none;font-weight:700}
+.btn.primary{background:var(--accent);color:#fff;border-color:var(--accent)}
+.btn.ghost{background:#fff;color:var(--ink)}
+.btn:hover{transform:translateY(-1px)}
+.toc{border:1px dashed var(--line);border-radius:var(--radius-6);padding:12px;background:#fff}
+.toc h4{margin:0 0 6px}
+.toc a{display:block;padding:4px 0;text-decoration:none;border-bottom:1px dashed var(--line);color:var(--muted)}
+.toc a:last-child{border-bottom:none}
+.toc a:hover{color:var(--primary)}
+.note{color:var(--muted);font-size:14px}
+meter{width:100%;height:10px}
+.grid{display:grid;gap:16px;margin:var(--space-3) 0}
+@media(min-width:860px){.grid.cols-3{grid-template-columns:repeat(3,1fr)}}
+@media(min-width:860px){.grid.cols-2{grid-template-columns:repeat(2,1fr)}}
+.card{border:1px solid var(--line);border-radius:var(--radius-6);padding:14px;background:#fff}
+.card h4{margin:0 0 8px}
+.card .why{color:var(--muted);font-size:14px}
+.hr{height:1px;background:var(--line);margin:var(--space-4) 0}
+.lt{border:1px solid var(--line);border-radius:var(--radius-0);overflow:hidden;background:#fff;margin:var(--space-3) 0}
+.lt .r{display:grid;border-top:1px solid var(--line)}
+.lt .r:first-child{border-top:none;background:var(--gray-50);font-weight:800}
+.lt .c{padding:10px}
+.lt.zebra .r:nth-child(odd):not(:first-child){background:#FCFCFD}
+.lt.cols-2 .r{grid-template-columns:1.4fr .6fr}
+.lt.cols-3 .r{grid-template-columns:1fr 1fr 1fr}
+.lt.cols-7 .r{grid-template-columns:1fr 1fr}
+@media(min-width:900px){.lt.cols-7 .r{grid-template-columns:.7fr .9fr .7fr 1.1fr .8fr .9fr .8fr}}
+.faqs .q{font-weight:800;margin:var(--space-3) 0 var(--space-2);font-size:18px;color:var(--primary)}
+.faqs .a{margin:0 0 var(--space-3)}
+.verdict-box{background:#f8f9fa;padding:1.5em;border-left:4px solid var(--primary);margin:1.5em 0;border-radius:var(--radius-6)}
+.verdict-box h3{margin-top:0}
+.verdict-box ul{margin:0;padding-left:1.2em}
+.verdict-box li{margin-bottom:0.5em}
+</style>"""
+
+# ============================================================================
+# EJEMPLOS CSS (para referencia en prompts) - ACTUALIZADO
+# ============================================================================
+
+EJEMPLOS_CSS = CSS_CMS_COMPATIBLE
+
+# ============================================================================
+# GENERADORES DE SHORTCODES - CORREGIDO v3.3: Usar <p><span> en lugar de <div>
+# ============================================================================
+
+def generate_product_module(article_id, nombre=""):
+    """Genera shortcode de producto destacado - CORREGIDO: usa <p><span>"""
+    shortcode = f'#MODULE_START#|{{"type":"article","params":{{"articleId":"{article_id}"}}}}|#MODULE_END#'
+    # CORRECCIÓN v3.3: Usar <p><span> en lugar de <div> para compatibilidad CMS
+    return f'<p><span>{shortcode}</span></p>'
+
+def generate_carousel_module(slug, category_id, order, navigation, loop, article_amount):
+    """Genera shortcode de carrusel de categoría - CORREGIDO: usa <p><span>"""
+    shortcode = {
+        "type": "carouselArticle",
+        "params": {
+            "articlesIds": [],
+            "slug": slug,
+            "slugUuids": {"categoryId": category_id},
+            "order": order,
+            "articleAmount": article_amount,
+            "activityName": "",
+            "title": "",
+            "collection": {"name": "", "id": ""},
+            "navigation": navigation == "true",
+            "loop": loop == "true"
+        }
+    }
+    shortcode_str = f"#MODULE_START#|{json.dumps(shortcode)}|#MODULE_END#"
+    # CORRECCIÓN v3.3: Usar <p><span> en lugar de <div> para compatibilidad CMS
+    return f'<p><span>{shortcode_str}</span></p>'
+
+# ============================================================================
+# ESTRUCTURA HTML OBLIGATORIA - NUEVO v3.3
+# ============================================================================
+
+HTML_STRUCTURE_INSTRUCTIONS = """
+# ESTRUCTURA HTML OBLIGATORIA (v3.3):
+
+El contenido DEBE seguir esta estructura exacta:
+
+```html
+<style>
+[CSS con variables :root - OBLIGATORIO]
+</style>
+<article>
+  <span class="kicker">[Etiqueta tipo ⚡ OFERTA BLACK FRIDAY 2025]</span>
+  <h1>[Título principal]</h1>
+  
+  [Callout Black Friday con clase .bf-callout]
+  
+  [Resto del contenido usando clases CSS definidas]
+  
+  [Módulos con formato: <p><span>#MODULE_START#|...|#MODULE_END#</span></p>]
+  
+</article>
+```
+
+# REGLAS CRÍTICAS:
+1. ✅ OBLIGATORIO envolver TODO el contenido en <article>...</article>
+2. ✅ Kicker SIEMPRE con <span class="kicker"> (NO usar <div>)
+3. ✅ Módulos SIEMPRE con <p><span>...</span></p> (NO usar <div>)
+4. ✅ CSS completo con variables :root al inicio
+5. ✅ Usar TODAS las clases CSS definidas
+"""
+
+# ============================================================================
+# COMPONENTES HTML DE REFERENCIA (compartidos por los prompts de redacción)
+# ============================================================================
+
+BF_CALLOUT_HTML = '<p class="bf-callout">⚡ <strong>Consejo:</strong> No te pierdas las mejores ofertas de PcComponentes este Black Friday. ¡Visita nuestra página de <a href="https://www.pccomponentes.com/black-friday">Black Friday</a>!</p>'
+
+HTML_COMPONENTS_GUIDE = """# CLASES CSS OBLIGATORIAS A USAR:
+
+✅ .kicker - Para etiquetas (USAR CON <span>, NO <div>)
+✅ .badges y .badge - Para tags de características
+✅ .callout - Para destacados importantes
+✅ .callout.accent - Para destacados urgentes (ofertas)
+✅ .bf-callout - Para el callout de Black Friday
+✅ .toc - Para tabla de contenidos
+✅ .lt, .lt .r, .lt .c - Para tablas de especificaciones
+✅ .lt.zebra - Para tablas con filas alternas
+✅ .lt.cols-2, .lt.cols-3 - Para definir columnas en tablas
+✅ .grid, .grid.cols-2, .grid.cols-3 - Para layouts en grid
+✅ .card - Para tarjetas de contenido
+✅ .btns, .btn, .btn.primary, .btn.ghost - Para botones
+✅ .faqs, .faqs .q, .faqs .a - Para sección de FAQs
+✅ .verdict-box - Para el box de veredicto final
+✅ .hr - Para separadores
+✅ .note - Para notas pequeñas
+
+# FORMATO DE MÓDULOS - CRÍTICO:
+
+✅ CORRECTO: <p><span>#MODULE_START#|...|#MODULE_END#</span></p>
+❌ INCORRECTO: <div>#MODULE_START#|...|#MODULE_END#</div>
+❌ INCORRECTO: <div style="margin:...">...</div>
+
+# ESTRUCTURA DE TABLAS (IMPORTANTE):
+
+Para tablas de especificaciones, usa EXACTAMENTE esta estructura:
+
+<div class="lt cols-2 zebra" role="table">
+<div class="r"><div class="c"><strong>Especificación</strong></div><div class="c"><strong>Valor</strong></div></div>
+<div class="r"><div class="c">Tamaño</div><div class="c">27 pulgadas</div></div>
+<div class="r"><div class="c">Resolución</div><div class="c">QHD (2560×1440)</div></div>
+</div>
+
+# ESTRUCTURA DE CARDS EN GRID:
+
+<div class="grid cols-3">
+<div class="card"><h4><strong>Título</strong></h4><p class="why">Descripción</p></div>
+<div class="card"><h4><strong>Título</strong></h4><p class="why">Descripción</p></div>
+<div class="card"><h4><strong>Título</strong></h4><p class="why">Descripción</p></div>
+</div>
+
+# ESTRUCTURA DE BOTONES:
+
+<div class="btns"><a class="btn primary" href="URL">Texto principal</a> <a class="btn ghost" href="URL">Texto secundario</a></div>
+
+# ESTRUCTURA DE VEREDICTO FINAL:
+
+<div class="verdict-box">
+<h3>✅ Perfecto si:</h3>
+<ul>
+<li>Punto 1</li>
+<li>Punto 2</li>
+</ul>
+</div>
+
+# ESTRUCTURA DE FAQs:
+
+<div class="faqs">
+<h3><strong>Pregunta 1</strong></h3>
+<p>Respuesta 1</p>
+<h3><strong>Pregunta 2</strong></h3>
+<p>Respuesta 2</p>
+</div>
+"""
+
+# ============================================================================
+# PROMPTS PARA FLUJO DE 3 ETAPAS - ACTUALIZADOS v3.3 CON ESTRUCTURA ARTICLE
+# ============================================================================
+
+def build_link_info(links):
+    """Bloque de enlaces internos para los prompts de redacción"""
+    
+    link_principal = links.get('principal', {})
+    links_secundarios = links.get('secundarios', [])
+    
+    link_info = ""
+    if link_principal.get('url'):
+        link_info = f"""
+# ENLACES A INCLUIR:
+## Enlace Principal (OBLIGATORIO):
+URL: {link_principal.get('url')}
+Texto anchor: {link_principal.get('text')}
+Ubicación: Primeros 2-3 párrafos
+"""
+    
+    if links_secundarios:
+        link_info += f"""
+## Enlaces Secundarios:
+{chr(10).join([f"- URL: {link.get('url')} | Texto: {link.get('text')}" for link in links_secundarios])}
+"""
+    
+    return link_info
+
+def build_alternativo_info(producto_alternativo, casos_uso):
+    """Bloque de producto alternativo / casos de uso para los prompts de redacción"""
+    
+    alternativo_info = ""
+    if producto_alternativo.get('url'):
+        alternativo_info = f"""
+# PRODUCTO ALTERNATIVO:
+URL: {producto_alternativo.get('url')}
+Texto: {producto_alternativo.get('text', 'producto alternativo')}
+IMPORTANTE: Incluir en "Considera alternativas si:" con enlace.
+"""
+    else:
+        casos_uso_str = ""
+        if casos_uso:
+            casos_uso_str = f"\nCasos de uso:\n" + "\n".join([f"- {caso}" for caso in casos_uso])
+        alternativo_info = f"""
+# PRODUCTO ALTERNATIVO: NO CONFIGURADO
+Box veredicto solo con "✅ Perfecto si:" desarrollado extensamente.{casos_uso_str}
+"""
+    
+    return alternativo_info
+
+def build_module_info(modules):
+    """Bloque de módulos (shortcodes exactos) para los prompts de redacción"""
+    
+    module_info = ""
+    if modules and len(modules) > 0:
+        module_info = f"""
+# MÓDULOS DE CONTENIDO ({len(modules)} configurados - TODOS OBLIGATORIOS):
+
+"""
+        
+        for idx, mod in enumerate(modules):
+            module_info += f"\n## Módulo {idx + 1}:\n"
+            
+            if mod['type'] == 'product':
+                module_info += f"""
+**Tipo:** Producto Destacado
+**Nombre:** {mod['nombre']}
+**Shortcode EXACTO (COPIAR TAL CUAL):**
+{mod['shortcode']}
+"""
+            
+            elif mod['type'] == 'carousel':
+                module_info += f"""
+**Tipo:** Carrusel de Categoría
+**Categoría:** {mod['category_name']}
+**Shortcode EXACTO (COPIAR TAL CUAL):**
+{mod['shortcode']}
+"""
+    
+    return module_info
+
+def build_generation_prompt_stage1_draft(pdp_data, arquetipo, target_length, keywords, 
+                                         context, links, modules, objetivo, 
+                                         producto_alternativo, casos_uso, campos_arquetipo):
+    """
+    ETAPA 1: Generación del BORRADOR inicial - v3.3 CON ESTRUCTURA ARTICLE
+    
+    El prompt es el prefijo estático precompilado del arquetipo (idéntico byte
+    a byte en todas las llamadas) seguido de los datos de esta generación.
+    """
+    
+    keywords_str = ", ".join(keywords) if keywords else "No especificadas"
+    
+    dynamic = DRAFT_DYNAMIC_TEMPLATE.format(
+        objetivo=objetivo,
+        arquetipo_context=build_arquetipo_context(arquetipo['code'], campos_arquetipo),
+        pdp_json=json.dumps(pdp_data, indent=2, ensure_ascii=False) if pdp_data else "N/A",
+        context=context if context else "Condiciones estándar PcComponentes",
+        keywords=keywords_str,
+        link_info=build_link_info(links),
+        alternativo_info=build_alternativo_info(producto_alternativo, casos_uso),
+        module_info=build_module_info(modules),
+        target_length=target_length,
+        min_words=int(target_length * 0.95),
+        max_words=int(target_length * 1.05)
+    )
+    
+    return get_draft_prompt_prefix(arquetipo) + dynamic
+
+
+# Esquema del análisis crítico (Etapa 2): se fuerza mediante tool use
+CRITIQUE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "longitud_actual": {"type": "integer"},
+        "longitud_objetivo": {"type": "integer"},
+        "necesita_ajuste_longitud": {"type": "boolean"},
+        "estructura_html": {
+            "type": "object",
+            "properties": {
+                "tiene_article": {"type": "boolean"},
+                "kicker_usa_span": {"type": "boolean"},
+                "modulos_usan_p_span": {"type": "boolean"},
+                "css_tiene_root": {"type": "boolean"}
+            },
+            "required": ["tiene_article", "kicker_usa_span", "modulos_usan_p_span", "css_tiene_root"]
+        },
+        "problemas_encontrados": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "tipo": {
+                        "type": "string",
+                        "enum": ["longitud", "estructura", "tono", "enlaces", "modulos", "seo", "css"]
+                    },
+                    "gravedad": {"type": "string", "enum": ["crítico", "medio", "menor"]},
+                    "descripcion": {"type": "string"},
+                    "ubicacion": {"type": "string"},
+                    "correccion_sugerida": {"type": "string"}
+                },
+                "required": ["tipo", "gravedad", "descripcion", "ubicacion", "correccion_sugerida"]
+            }
+        },
+        "aspectos_positivos": {"type": "array", "items": {"type": "string"}},
+        "instrucciones_revision": {"type": "array", "items": {"type": "string"}},
+        "necesita_reescritura_completa": {"type": "boolean"}
+    },
+    "required": [
+        "longitud_actual", "longitud_objetivo", "necesita_ajuste_longitud", "estructura_html",
+        "problemas_encontrados", "aspectos_positivos", "instrucciones_revision",
+        "necesita_reescritura_completa"
+    ]
+}
+
+CRITIQUE_TOOL = {
+    "name": "registrar_analisis",
+    "description": "Registra el análisis crítico del borrador con problemas, aspectos positivos e instrucciones de revisión",
+    "input_schema": CRITIQUE_SCHEMA
+}
+
+def build_correction_prompt_stage2(draft_content, target_length, arquetipo, objetivo):
+    """ETAPA 2: Análisis crítico y correcciones - v3.3 con verificación de estructura"""
+    
+    prompt = f"""
+# TAREA: ANÁLISIS CRÍTICO DEL BORRADOR (ETAPA 2/3)
+
+Eres editor senior de PcComponentes. Tu trabajo es CRITICAR el borrador y proponer CORRECCIONES específicas.
+
+# BORRADOR A ANALIZAR:
+
+{draft_content}
+
+# CONTEXTO:
+- Arquetipo: {arquetipo['code']} - {arquetipo['name']}
+- Objetivo: {objetivo}
+- Longitud objetivo: {target_length} palabras
+
+# TU TRABAJO:
+
+Analiza el borrador con OJO CRÍTICO y registra el resultado con la herramienta
+`{CRITIQUE_TOOL['name']}`. Todos los campos son obligatorios.
+
+# CRITERIOS DE EVALUACIÓN:
+
+1. **Estructura HTML** (CRÍTICO - v3.3):
+   - ¿Está envuelto en <article>...</article>? → CRÍTICO si falta
+   - ¿El kicker usa <span class="kicker">? → CRÍTICO si usa <div>
+   - ¿Los módulos usan <p><span>...</span></p>? → CRÍTICO si usan <div>
+   - ¿El CSS tiene variables :root? → CRÍTICO si falta
+
+2. **Longitud** (CRÍTICO):
+   - ¿Está en rango {int(target_length * 0.95)}-{int(target_length * 1.05)} palabras?
+   - Si no, ¿qué secciones ampliar o reducir?
+
+3. **HTML puro**:
+   - ¿Hay markdown (**, ##, [])? → CRÍTICO
+   - ¿Está bien formateado?
+
+4. **CSS y Clases**:
+   - ¿Usa las clases CSS definidas (.kicker, .callout, .lt, .grid, etc.)?
+   - ¿Hay estilos inline que deberían ser clases?
+   - ¿Las tablas usan estructura .lt correcta?
+
+5. **Módulos**:
+   - ¿Están TODOS los módulos?
+   - ¿Los shortcodes están exactos?
+   - ¿Tienen formato <p><span>?
+
+6. **Tono**:
+   - ¿Es aspiracional?
+   - ¿Evita negatividad?
+   - ¿Suena humano?
+
+7. **Estructura**:
+   - ¿Sigue el arquetipo?
+   - ¿Hay jerarquía HTML clara?
+
+8. **Enlaces**:
+   - ¿Están los enlaces obligatorios?
+   - ¿Están integrados naturalmente?
+   - ¿Incluye callout Black Friday?
+
+9. **SEO**:
+   - ¿Keywords bien integradas?
+   - ¿Títulos optimizados?
+
+10. **Valor**:
+    - ¿Aporta información útil?
+    - ¿Ayuda a tomar decisiones?
+
+SÉ CRÍTICO. Encuentra 3-5 problemas reales.
+Responde SOLO usando la herramienta `{CRITIQUE_TOOL['name']}`.
+"""
+    
+    return prompt
+
+
+def build_final_generation_prompt_stage3(draft_content, corrections_json, target_length):
+    """ETAPA 3: Generación final con correcciones aplicadas - v3.3"""
+    
+    # El análisis estructurado se envía compacto (sin indentación) para reducir tokens
+    if not isinstance(corrections_json, str):
+        corrections_json = json.dumps(corrections_json, ensure_ascii=False, separators=(',', ':'))
+    
+    prompt = f"""
+# TAREA: GENERACIÓN FINAL CON CORRECCIONES (ETAPA 3/3)
+
+# BORRADOR INICIAL:
+{draft_content}
+
+# ANÁLISIS CRÍTICO Y CORRECCIONES:
+{corrections_json}
+
+# TU TRABAJO:
+
+Genera la VERSIÓN FINAL del contenido aplicando TODAS las correcciones indicadas.
+
+# INSTRUCCIONES CRÍTICAS (v3.3):
+
+1. **Estructura <article>**: OBLIGATORIO envolver todo en <article>...</article>
+2. **Kicker**: OBLIGATORIO usar <span class="kicker"> (NO <div>)
+3. **Módulos**: OBLIGATORIO formato <p><span>#MODULE_START#|...|#MODULE_END#</span></p>
+4. **Longitud**: DEBE estar en rango {int(target_length * 0.95)}-{int(target_length * 1.05)} palabras
+5. **HTML puro**: Elimina TODO el markdown si quedó alguno
+6. **CSS**: Debe usar el CSS con variables :root (NO CSS simple)
+7. **Clases CSS**: Usa TODAS las clases definidas (.kicker, .callout, .lt, .grid, etc.)
+8. **NO estilos inline**: Reemplaza estilos inline por clases CSS
+9. **Correcciones**: Aplica TODAS las correcciones del JSON
+10. **Calidad**: Esta es la versión final - máxima calidad
+
+# CSS OBLIGATORIO (debe aparecer al inicio):
+
+{CSS_CMS_COMPATIBLE}
+
+# ESTRUCTURA OBLIGATORIA:
+
+```html
+<style>[CSS con :root]</style>
+<article>
+  <span class="kicker">...</span>
+  <h1>...</h1>
+  <p class="bf-callout">...</p>
+  [Contenido]
+  <p><span>#MODULE_START#|...|#MODULE_END#</span></p>
+  [Más contenido]
+</article>
+```
+
+# VERIFICACIÓN FINAL:
+
+Antes de entregar, confirma:
+✅ Envuelto en <article>...</article>
+✅ Kicker con <span class="kicker"> (NO div)
+✅ Módulos con <p><span>...</span></p> (NO div)
+✅ CSS con variables :root
+✅ Longitud correcta
+✅ Sin markdown
+✅ Clases CSS usadas correctamente
+✅ Sin estilos inline innecesarios
+✅ Todos los módulos presentes
+✅ Todas las correcciones aplicadas
+✅ Tono aspiracional
+✅ Enlaces incluidos
+✅ Callout Black Friday presente
+✅ Tablas con estructura .lt
+
+GENERA AHORA LA VERSIÓN FINAL.
+Responde SOLO con el HTML completo (desde <style> hasta </article>).
+"""
+    
+    return prompt
+
+# ============================================================================
+# PROMPTS MODO ESQUEMA + SECCIONES EN PARALELO (ETAPA 1 ALTERNATIVA)
+# ============================================================================
+
+def build_outline_prompt_stage1(pdp_data, arquetipo, target_length, keywords,
+                                context, links, modules, objetivo,
+                                producto_alternativo, casos_uso, campos_arquetipo):
+    """ETAPA 1 (modo esquema): Esquema estructurado del artículo en JSON"""
+    
+    keywords_str = ", ".join(keywords) if keywords else "No especificadas"
+    arquetipo_context = build_arquetipo_context(arquetipo['code'], campos_arquetipo)
+    link_info = build_link_info(links)
+    alternativo_info = build_alternativo_info(producto_alternativo, casos_uso)
+    
+    modules_list = "Sin módulos configurados"
+    if modules:
+        modules_list = "\n".join([
+            f"- Módulo {idx}: " + (
+                f"Producto Destacado - {mod['nombre']}" if mod['type'] == 'product'
+                else f"Carrusel de Categoría - {mod['category_name']}"
+            )
+            for idx, mod in enumerate(modules)
+        ])
+    
+    prompt = f"""
+# TAREA: ESQUEMA DEL ARTÍCULO (ETAPA 1/3 - MODO ESQUEMA)
+
+Eres experto redactor de PcComponentes para contenido optimizado Google Discover.
+
+Diseña el ESQUEMA del artículo. Cada sección se redactará después por separado,
+así que el esquema debe ser completo y sin solapamientos entre secciones.
+
+# OBJETIVO DEL CONTENIDO:
+{objetivo}
+
+# ARQUETIPO:
+{arquetipo['code']} - {arquetipo['name']}
+{arquetipo['description']}
+
+{get_arquetipo_guidelines(arquetipo['code'])}
+
+{arquetipo_context}
+
+# DATOS PRODUCTO:
+{json.dumps(pdp_data, indent=2, ensure_ascii=False) if pdp_data else "N/A"}
+
+# CONTEXTO:
+{context if context else "Condiciones estándar PcComponentes"}
+
+# KEYWORDS SEO:
+{keywords_str}
+
+{link_info}
+
+{alternativo_info}
+
+# MÓDULOS DISPONIBLES (TODOS deben asignarse a alguna sección):
+{modules_list}
+
+# LONGITUD TOTAL: {target_length} palabras
+
+# FORMATO DE RESPUESTA (SOLO JSON):
+
+{{
+  "kicker": "⚡ [ETIQUETA]",
+  "titulo": "Título H1 optimizado",
+  "secciones": [
+    {{
+      "nivel": "intro|h2",
+      "titulo": "Título de la sección (vacío en la intro)",
+      "palabras": <palabras objetivo de la sección>,
+      "puntos": ["Idea clave a desarrollar"],
+      "componentes": ["callout|tabla|grid|btns|faqs|verdict-box|toc|badges"],
+      "modulos": [<índices de módulo a insertar en esta sección>],
+      "enlaces": ["URL de los enlaces a integrar en esta sección"]
+    }}
+  ]
+}}
+
+REGLAS:
+- La primera sección es la introducción (nivel "intro"), sin título
+- Entre 4 y 10 secciones; la suma de "palabras" debe ser {target_length}
+- El enlace principal va en la introducción
+- Termina con la sección de veredicto (verdict-box)
+
+Responde SOLO con el JSON.
+"""
+    
+    return prompt
+
+
+def build_section_prompt_stage1(outline, section_idx, pdp_data, arquetipo, keywords,
+                                objetivo, links, modules, producto_alternativo, casos_uso):
+    """ETAPA 1 (modo esquema): Redacción de UNA sección del esquema"""
+    
+    section = outline['secciones'][section_idx]
+    keywords_str = ", ".join(keywords) if keywords else "No especificadas"
+    target_words = section['palabras']
+    
+    outline_summary = "\n".join([
+        f"{idx + 1}. {'[ESTA SECCIÓN] ' if idx == section_idx else ''}"
+        f"{sec.get('titulo') or 'Introducción'} - {', '.join(sec.get('puntos', []))}"
+        for idx, sec in enumerate(outline['secciones'])
+    ])
+    
+    section_modules = [modules[idx] for idx in section.get('modulos', [])]
+    section_links = [
+        link for link in [links.get('principal', {})] + links.get('secundarios', [])
+        if link.get('url') and link.get('url') in section.get('enlaces', [])
+    ]
+    
+    links_str = "\n".join([
+        f"- URL: {link.get('url')} | Texto: {link.get('text')}" for link in section_links
+    ]) or "Ninguno en esta sección"
+    
+    if section.get('nivel') == 'intro':
+        heading_rule = "Es la INTRODUCCIÓN: sin encabezado, empieza directamente con párrafos (el kicker, el H1 y el callout ya están)"
+    else:
+        heading_rule = f"Empieza EXACTAMENTE con: <h2>{section['titulo']}</h2>"
+    
+    alternativo_info = ""
+    if any('verdict-box' in c for c in section.get('componentes', [])):
+        alternativo_info = build_alternativo_info(producto_alternativo, casos_uso)
+    
+    prompt = f"""
+# TAREA: REDACCIÓN DE UNA SECCIÓN (ETAPA 1/3 - MODO ESQUEMA)
+
+Eres experto redactor de PcComponentes para contenido optimizado Google Discover.
+
+Redacta SOLO la sección {section_idx + 1} de {len(outline['secciones'])} del artículo.
+El resto de secciones se redactan en paralelo: no repitas su contenido.
+
+# ARTÍCULO:
+Título: {outline.get('titulo', '')}
+Arquetipo: {arquetipo['code']} - {arquetipo['name']}
+Objetivo: {objetivo}
+Keywords SEO: {keywords_str}
+
+# ESQUEMA COMPLETO:
+{outline_summary}
+
+# SECCIÓN A REDACTAR:
+Título: {section.get('titulo') or 'Introducción'}
+Puntos a desarrollar: {', '.join(section.get('puntos', []))}
+Componentes sugeridos: {', '.join(section.get('componentes', [])) or 'Libre'}
+
+# DATOS PRODUCTO:
+{json.dumps(pdp_data, indent=2, ensure_ascii=False) if pdp_data else "N/A"}
+
+# ENLACES DE ESTA SECCIÓN:
+{links_str}
+
+{alternativo_info}
+
+{build_module_info(section_modules)}
+
+# LONGITUD: entre {int(target_words * 0.95)} y {int(target_words * 1.05)} palabras
+
+{HTML_COMPONENTS_GUIDE}
+# REGLAS:
+
+1. {heading_rule}
+2. HTML puro: NO markdown, NO ``` de código
+3. NO incluyas <style>, <article>, kicker ni <h1>
+4. Módulos con formato <p><span>...</span></p>, shortcodes EXACTOS
+5. Usa las clases CSS definidas (NO estilos inline)
+6. Tono aspiracional PcComponentes (solo ✅ ⚡ como emojis)
+
+Responde SOLO con el HTML de la sección.
+"""
+    
+    return prompt
+
+def build_arquetipo_context(arquetipo_code, campos_valores):
+    """Construye contexto específico del arquetipo"""
+    if not campos_valores:
+        return ""
+    
+    campos_llenos = {k: v for k, v in campos_valores.items() if v and v.strip()}
+    
+    if not campos_llenos:
+        return ""
+    
+    context = f"\n# INFORMACIÓN ESPECÍFICA DEL ARQUETIPO {arquetipo_code}:\n\n"
+    
+    for campo_key, valor in campos_llenos.items():
+        label = campo_key.replace('_', ' ').title()
+        context += f"**{label}:**\n{valor}\n\n"
+    
+    context += "Usa esta información específica para crear contenido relevante.\n"
+    
+    return context
+
+def get_arquetipo_guidelines(arquetipo_code):
+    """Devuelve directrices específicas de estructura para cada arquetipo"""
+    
+    guidelines = {
+        "ARQ-1": """
+**Estructura Noticia:**
+1. Lead con las 5W (qué, quién, cuándo, dónde, por qué)
+2. Contexto y antecedentes
+3. Detalles específicos
+4. Implicaciones para usuarios
+5. Fuentes y referencias
+6. Conclusión con proyección futura
+
+**Tono:** Informativo, urgente si procede.
+""",
+        "ARQ-2": """
+**Estructura Guía:**
+1. Introducción: qué se va a conseguir
+2. Requisitos previos listados
+3. Pasos numerados (3-10 típicamente)
+4. Avisos de puntos críticos en callouts
+5. Verificación final
+6. Troubleshooting común
+
+**Tono:** Instructivo, claro, paciente.
+""",
+        "ARQ-3": """
+**Estructura Explicación:**
+1. Hook: por qué importa
+2. Definición simple primero
+3. Explicación técnica progresiva
+4. Analogías y ejemplos
+5. Aplicaciones reales
+6. Comparaciones si aplica
+7. Takeaway clave
+
+**Tono:** Educativo pero accesible.
+""",
+        "ARQ-4": """
+**Estructura Review:**
+1. Veredicto rápido
+2. Contexto (precio, competencia)
+3. Diseño y construcción
+4. Rendimiento con datos reales
+5. Experiencia de uso
+6. Comparativa con competencia
+7. FAQs
+8. Veredicto final
+
+**Tono:** Experto, honesto, equilibrado.
+""",
+        "ARQ-5": """
+**Estructura Comparativa:**
+1. Intro: por qué comparar
+2. Tabla comparativa visual
+3. Análisis Producto A
+4. Análisis Producto B
+5. Comparación por categorías
+6. Veredicto: cuál elegir
+7. Conclusión con recomendación
+
+**Tono:** Imparcial, analítico.
+""",
+        "ARQ-6": """
+**Estructura Deal Alert:**
+1. Hook con precio en negrita
+2. Por qué es chollo
+3. Características clave
+4. Para quién es perfecto
+5. Duración y stock
+6. CTA urgente
+7. Alternativas si se agota
+
+**Tono:** Urgente, directo.
+""",
+        "ARQ-7": """
+**Estructura Roundup:**
+1. Criterios de selección
+2. Ganador destacado si lo hay
+3. Producto #1-N con análisis
+4. Tabla comparativa completa
+5. Guía de compra
+6. Conclusión por perfil
+
+**Tono:** Autoridad, comprehensivo.
+""",
+        "ARQ-8": """
+**Estructura Por Presupuesto:**
+1. Qué esperar en este rango
+2. Mejor opción destacada
+3. Alternativas en el rango
+4. Qué sacrificas vs superiores (positivo)
+5. Tabla comparativa
+6. Consejos para maximizar
+7. Conclusión
+
+**Tono:** Realista, honesto, optimista.
+""",
+        "ARQ-9": """
+**Estructura Versus:**
+1. Presentación de contendientes
+2. Round 1-N por categoría
+3. Tabla puntuación final
+4. Ganador absoluto y por qué
+5. Cuándo elegir al perdedor
+
+**Tono:** Deportivo, entretenido, riguroso.
+""",
+        "ARQ-10": """
+**Estructura Por Perfil:**
+1. Definición del perfil
+2. Necesidades específicas
+3. Producto recomendado y por qué
+4. Características clave
+5. Qué NO necesita (ahorro)
+6. Alternativas si varía
+7. Conclusión personalizada
+
+**Tono:** Empático, consultivo.
+""",
+        "ARQ-11": """
+**Estructura Tendencias:**
+1. Contexto: situación actual
+2. Tendencia con datos
+3. Causas
+4. Predicción de evolución
+5. Impacto para consumidores
+6. Recomendaciones prácticas
+7. Qué hacer ahora
+
+**Tono:** Analítico, con autoridad.
+""",
+        "ARQ-12": """
+**Estructura Unboxing:**
+1. Primera impresión caja/packaging
+2. Contenido completo
+3. Construcción y materiales
+4. Sorpresas positivas
+5. Decepciones (neutral)
+6. Setup inicial
+7. Primeras horas de uso
+8. Veredicto preliminar
+
+**Tono:** Entusiasta, descriptivo, honesto.
+"""
+    }
+    
+    return guidelines.get(arquetipo_code, "Sigue mejores prácticas del arquetipo.")
+
+# ============================================================================
+# PROMPTS PRECOMPILADOS (PREFIJO ESTÁTICO POR ARQUETIPO)
+# ============================================================================
+
+# Datos de cada generación: van DESPUÉS del prefijo estático para no romper la caché de prompts
+DRAFT_DYNAMIC_TEMPLATE = """
+# DATOS DE ESTE CONTENIDO
+
+# OBJETIVO DEL CONTENIDO:
+{objetivo}
+
+{arquetipo_context}
+
+# DATOS PRODUCTO:
+{pdp_json}
+
+# CONTEXTO:
+{context}
+
+# KEYWORDS SEO:
+{keywords}
+
+{link_info}
+
+{alternativo_info}
+
+{module_info}
+
+# CONTROL ESTRICTO DE LONGITUD:
+
+**LONGITUD OBJETIVO: {target_length} palabras**
+
+CRÍTICO - CONTROL DE EXTENSIÓN:
+- Genera EXACTAMENTE entre {min_words} y {max_words} palabras
+- Cuenta palabras mientras escribes
+- Si te quedas corto, desarrolla más las secciones principales
+- Si te pasas, sé más conciso en descripciones
+
+GENERA AHORA EL BORRADOR INICIAL.
+Responde SOLO con el HTML (desde <style> hasta </article>).
+"""
+
+def compile_draft_prompt_prefix(arquetipo):
+    """
+    Parte estática del prompt de borrador de un arquetipo
+    
+    Instrucciones, CSS, guía de componentes, tono y directrices del arquetipo:
+    nada que dependa de la generación concreta.
+    """
+    return f"""
+# TAREA: GENERACIÓN DE BORRADOR INICIAL (ETAPA 1/3)
+
+Eres experto redactor de PcComponentes para contenido optimizado Google Discover.
+
+Esta es la ETAPA 1: Genera un BORRADOR inicial del contenido.
+Las instrucciones van primero; los datos de este contenido, al final.
+
+# ARQUETIPO:
+{arquetipo['code']} - {arquetipo['name']}
+{arquetipo['description']}
+
+{get_arquetipo_guidelines(arquetipo['code'])}
+
+# FORMATO OUTPUT - HTML PURO (NO MARKDOWN):
+
+Genera HTML puro y funcional. NO uses markdown. NO uses ``` de código.
+
+{HTML_STRUCTURE_INSTRUCTIONS}
+
+# CSS OBLIGATORIO (COPIAR EXACTAMENTE AL INICIO):
+
+{CSS_CMS_COMPATIBLE}
+
+# ESTRUCTURA OBLIGATORIA DEL CONTENIDO:
+
+```html
+<style>[CSS completo con :root]</style>
+<article>
+  <span class="kicker">⚡ [ETIQUETA]</span>
+  <h1>[Título]</h1>
+  
+  {BF_CALLOUT_HTML}
+  
+  [Contenido con clases CSS]
+  
+  [Módulos con <p><span>...</span></p>]
+  
+</article>
+```
+
+{HTML_COMPONENTS_GUIDE}
+# TONO DE MARCA PCCOMPONENTES:
+
+✅ HACER:
+- Enfoque aspiracional y positivo
+- "Perfecto si..." en lugar de "Evita si..."
+- Honestidad sin negatividad
+- Expertos sin pedantería
+
+❌ NO HACER:
+- Negatividad o desánimo
+- "Este producto no tiene X" → "Funciona con Y; si necesitas X, hay alternativas"
+- Lenguaje robótico o corporativo
+- Exceso de emojis (solo ✅ ⚡ en puntos clave)
+
+# VERIFICACIÓN FINAL ANTES DE ENTREGAR:
+
+1. ¿Está envuelto en <article>...</article>?
+2. ¿El kicker usa <span class="kicker"> (NO <div>)?
+3. ¿Respeta el rango de palabras del CONTROL ESTRICTO DE LONGITUD?
+4. ¿Es HTML puro (sin markdown)?
+5. ¿Incluye TODOS los módulos con formato <p><span>?
+6. ¿Los shortcodes están exactos (sin modificar)?
+7. ¿El tono es aspiracional?
+8. ¿Los enlaces están incluidos?
+9. ¿Usa las clases CSS definidas (NO estilos inline)?
+10. ¿Incluye el callout de Black Friday?
+11. ¿Las tablas usan la estructura .lt correcta?
+"""
+
+# Se compilan una sola vez al importar: mismos bytes en todas las llamadas
+DRAFT_PROMPT_PREFIXES = MappingProxyType({
+    code: compile_draft_prompt_prefix(arquetipo) for code, arquetipo in ARQUETIPOS.items()
+})
+
+def get_draft_prompt_prefix(arquetipo):
+    """Prefijo estático precompilado del arquetipo (se compila al vuelo si no está registrado)"""
+    prefix = DRAFT_PROMPT_PREFIXES.get(arquetipo['code'])
+    return prefix if prefix is not None else compile_draft_prompt_prefix(arquetipo)
+
+def split_static_prefix(prompt):
+    """
+    Separa un prompt en (prefijo estático precompilado, resto)
+    
+    Returns:
+        (prefijo, resto) o (None, prompt) si no empieza por ningún prefijo conocido
+    """
+    for prefix in DRAFT_PROMPT_PREFIXES.values():
+        if prompt.startswith(prefix):
+            return prefix, prompt[len(prefix):]
+    return None, prompt
@@ -0,0 +1,466 @@
+"""
+Rate Limiter
+Planificador de llamadas a Anthropic compartido por todas las sesiones del proceso
+- Control de admisión: máximo de llamadas en curso con cola justa entre trabajos
+- Token bucket de peticiones y tokens por minuto
+- Reintentos con backoff exponencial respetando retry-after (429/529)
+- Plazo máximo por trabajo
+- Esperas con asyncio (run_async, slot_async): el generador trabaja sobre AsyncAnthropic
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, Callable, Dict, Optional
+
+import anthropic
+
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_TOKENS_PER_MINUTE = 80000
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 2.0     # segundos
+DEFAULT_MAX_DELAY = 60.0     # segundos
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_CALL_SECONDS = 60.0  # Duración estimada de una llamada sin histórico
+ASYNC_POLL_SECONDS = 0.05    # Sondeo de la cola de admisión desde corrutinas
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Estimador local de tokens: aproxima un tokenizador BPE por clases de caracteres
+WORD_PATTERN = re.compile(r'[^\W\d_]+')            # Palabras (con tildes y ñ)
+DIGITS_PATTERN = re.compile(r'\d+')
+SYMBOLS_PATTERN = re.compile(r'[^\w\s]+|_+')       # Marcado, puntuación, CSS, JSON, emojis
+NEWLINES_PATTERN = re.compile(r'\s*\n\s*')         # Saltos de línea con su sangría
+CHARS_PER_WORD_TOKEN = 6  # Las palabras comunes son un solo token
+DIGITS_PER_TOKEN = 3
+SYMBOLS_PER_TOKEN = 2
+
+
+class DeadlineExceeded(Exception):
+    """El trabajo ha superado su plazo antes de poder completar la llamada"""
+
+
+def _runs_tokens(runs, chars_per_token: int) -> int:
+    """Tokens de una lista de tramos: uno por tramo más uno por cada `chars_per_token` extra"""
+    return sum((len(run) - 1) // chars_per_token for run in runs) + len(runs)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación local de tokens, sin llamadas a la API
+
+    Cuenta por separado palabras (~6 caracteres por token, uno más si llevan
+    tildes o ñ), números, símbolos (marcado HTML, CSS, JSON) y saltos de línea;
+    los espacios sueltos van con la palabra siguiente.
+    """
+    if not text:
+        return 1
+    words = WORD_PATTERN.findall(text)
+    tokens = (
+        _runs_tokens(words, CHARS_PER_WORD_TOKEN)
+        + sum(1 for word in words if not word.isascii())
+        + _runs_tokens(DIGITS_PATTERN.findall(text), DIGITS_PER_TOKEN)
+        + _runs_tokens(SYMBOLS_PATTERN.findall(text), SYMBOLS_PER_TOKEN)
+        + len(NEWLINES_PATTERN.findall(text))
+    )
+    return max(tokens, 1)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Segundos indicados por la API en retry-after-ms / retry-after (si existen)"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+
+    for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(float(value) * scale, 0.0)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """True para límites de uso, sobrecarga, errores 5xx y fallos de conexión"""
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """Token bucket seguro entre hilos; las esperas no bloquean el event loop"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def try_acquire(self, amount: float) -> float:
+        """
+        Consume `amount` tokens si están disponibles, sin esperar
+
+        Returns:
+            0 si se consumieron; si no, segundos estimados hasta que haya cupo
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.refill_per_second
+
+    async def acquire_async(self, amount: float, deadline: Optional[float] = None):
+        """
+        Espera hasta disponer de `amount` tokens y los consume
+
+        Args:
+            amount: Tokens a consumir (se limita a la capacidad del bucket)
+            deadline: Instante límite (time.monotonic) o None
+
+        Raises:
+            DeadlineExceeded: si no hay tokens antes del plazo
+        """
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise DeadlineExceeded("Plazo agotado esperando cupo de la API")
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float):
+        """Devuelve tokens reservados de más"""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        """Vacía el bucket (tras un 429 todas las sesiones esperan)"""
+        with self._lock:
+            self._refill()
+            self.tokens = 0
+
+
+class RateLimitScheduler:
+    """Planificador de llamadas con límites compartidos y reintentos"""
+
+    def __init__(self, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        Inicializa el planificador
+
+        Args:
+            requests_per_minute: Peticiones por minuto permitidas en el proceso
+            tokens_per_minute: Tokens (entrada + salida reservada) por minuto
+            max_retries: Reintentos máximos por llamada
+            base_delay: Espera base del backoff exponencial
+            max_delay: Espera máxima entre reintentos
+        """
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Pausa todas las llamadas del proceso (p. ej. tras un retry-after)"""
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def _pause_remaining(self, deadline: Optional[float]) -> float:
+        """Segundos de pausa pendientes (DeadlineExceeded si superan el plazo)"""
+        with self._lock:
+            remaining = self._pause_until - time.monotonic()
+        if remaining > 0 and deadline is not None and time.monotonic() + remaining > deadline:
+            raise DeadlineExceeded("Plazo agotado durante la pausa por límite de la API")
+        return remaining
+
+    async def _wait_pause_async(self, deadline: Optional[float]):
+        while True:
+            remaining = self._pause_remaining(deadline)
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Espera antes del reintento: retry-after si existe, si no backoff exponencial con jitter"""
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run_async(self, fn: Callable, estimated_tokens: int = 0, deadline: Optional[float] = None,
+                        on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+                        usage_tokens: Optional[Callable] = None,
+                        slot: Optional[Callable[[], AsyncContextManager]] = None):
+        """
+        Ejecuta una llamada respetando límites, reintentos y plazo
+
+        Las esperas no bloquean el event loop. Si la corrutina se cancela, se
+        devuelve la reserva de tokens y se propaga la cancelación.
+
+        Args:
+            fn: Función sin argumentos que devuelve la corrutina de la llamada
+            estimated_tokens: Tokens a reservar en el bucket (entrada + salida)
+            deadline: Instante límite del trabajo (time.monotonic) o None
+            on_retry: Callback (intento, espera, error) antes de cada reintento
+            usage_tokens: Función resultado -> tokens reales, para devolver la reserva sobrante
+                (también se aplica a los errores con `usage`, como EarlyAbort)
+            slot: Context manager async por intento (p. ej. AdmissionController.slot_async
+                con sus argumentos). Se toma con el cupo ya reservado y se suelta antes
+                de esperar el reintento: las pausas por 429 y el backoff no ocupan plaza.
+
+        Returns:
+            (resultado de fn, número de intentos)
+
+        Raises:
+            DeadlineExceeded o el último error de la API si no es reintentable
+        """
+        attempt = 0
+        while True:
+            await self._wait_pause_async(deadline)
+            await self.requests.acquire_async(1, deadline)
+            await self.tokens.acquire_async(estimated_tokens, deadline)
+
+            try:
+                if slot:
+                    async with slot():
+                        result = await fn()
+                else:
+                    result = await fn()
+            except asyncio.CancelledError:
+                self.tokens.refund(estimated_tokens)
+                raise
+            except Exception as e:
+                delay = self._handle_failure(e, attempt, estimated_tokens, deadline, usage_tokens)
+                if on_retry:
+                    on_retry(attempt + 1, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self._settle(result, estimated_tokens, usage_tokens)
+            return result, attempt + 1
+
+    def _handle_failure(self, error: Exception, attempt: int, estimated_tokens: int,
+                        deadline: Optional[float], usage_tokens: Optional[Callable] = None) -> float:
+        """
+        Gestiona una llamada fallida: devuelve la reserva y calcula la espera
+
+        Un error con `usage` (p. ej. EarlyAbort: el stream se cortó ya generando)
+        se liquida como un resultado; el resto no consumió tokens.
+
+        Returns:
+            Segundos a esperar antes del reintento
+
+        Raises:
+            El propio error si no es reintentable, o DeadlineExceeded
+        """
+        if getattr(error, 'usage', None) is not None and usage_tokens:
+            self._settle(error, estimated_tokens, usage_tokens)
+        else:
+            # La llamada fallida no consume tokens: devolver la reserva
+            self.tokens.refund(estimated_tokens)
+
+        if not is_retryable(error) or attempt >= self.max_retries:
+            raise error
+
+        delay = self.backoff_delay(attempt, error)
+        if getattr(error, 'status_code', None) == 429:
+            self.pause(delay)
+            self.tokens.drain()
+
+        if deadline is not None and time.monotonic() + delay > deadline:
+            raise DeadlineExceeded(f"Plazo agotado tras {attempt + 1} intentos: {error}") from error
+
+        return delay
+
+    def _settle(self, result, estimated_tokens: int, usage_tokens: Optional[Callable]):
+        """Devuelve al bucket la parte de la reserva que no se usó"""
+        if usage_tokens:
+            try:
+                self.tokens.refund(estimated_tokens - usage_tokens(result))
+            except Exception:
+                pass
+
+
+class AdmissionController:
+    """
+    Limita las llamadas en curso del proceso con una cola justa
+
+    Los turnos se reparten en round-robin entre trabajos: un trabajo que lanza
+    muchas llamadas a la vez (secciones en paralelo) no adelanta a los demás.
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 poll_seconds: float = 1.0):
+        """
+        Inicializa el controlador
+
+        Args:
+            max_in_flight: Llamadas simultáneas permitidas en el proceso
+            poll_seconds: Cada cuánto se refresca la posición de los que esperan
+        """
+        self.max_in_flight = max_in_flight
+        self.poll_seconds = poll_seconds
+        self.in_flight = 0
+        self._queues = {}          # job_id -> deque de tickets
+        self._order = deque()      # Orden round-robin de trabajos con tickets
+        self._durations = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def _schedule(self, limit: Optional[int] = None):
+        """Orden en que se atenderán los tickets pendientes (round-robin), hasta `limit`"""
+        queues = [self._queues[job_id] for job_id in self._order]
+        order = []
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            for q in queues:
+                if depth < len(q):
+                    order.append(q[depth])
+                    if limit is not None and len(order) >= limit:
+                        return order
+            depth += 1
+        return order
+
+    def _average_duration(self) -> float:
+        if not self._durations:
+            return DEFAULT_CALL_SECONDS
+        return sum(self._durations) / len(self._durations)
+
+    def _eta(self, position: int) -> float:
+        """Segundos estimados hasta obtener turno desde `position` (1 = siguiente)"""
+        rounds = (position - 1) // self.max_in_flight + 1
+        return rounds * self._average_duration()
+
+    def _enqueue(self, job_id):
+        """Pide turno para `job_id` (con el lock retenido); devuelve el ticket"""
+        ticket = object()
+        if job_id not in self._queues:
+            self._queues[job_id] = deque()
+            self._order.append(job_id)
+        self._queues[job_id].append(ticket)
+        return ticket
+
+    def _try_grant(self, job_id, ticket) -> bool:
+        """Ocupa una plaza si el ticket está entre los siguientes a atender (con el lock retenido)"""
+        free = self.max_in_flight - self.in_flight
+        if free <= 0 or ticket not in self._schedule(limit=free):
+            return False
+
+        self._queues[job_id].remove(ticket)
+        self._order.remove(job_id)
+        if self._queues[job_id]:
+            self._order.append(job_id)  # Pasa al final: turno para otros trabajos
+        else:
+            del self._queues[job_id]
+        self.in_flight += 1
+        return True
+
+    def _waiting_position(self, ticket) -> int:
+        """Posición en la cola sin contar las plazas libres (1 = el siguiente)"""
+        free = max(self.max_in_flight - self.in_flight, 0)
+        return self._schedule().index(ticket) + 1 - free
+
+    def _cancel(self, job_id, ticket):
+        queue = self._queues.get(job_id)
+        if not queue or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[job_id]
+            self._order.remove(job_id)
+
+    async def acquire_async(self, job_id, deadline: Optional[float] = None,
+                            on_wait: Optional[Callable[[int, float], None]] = None):
+        """
+        Espera turno y ocupa una plaza; sondea la cola sin bloquear el event loop
+
+        Si la corrutina se cancela mientras espera, el ticket sale de la cola.
+
+        Args:
+            job_id: Trabajo que hace la llamada (unidad de reparto justo)
+            deadline: Instante límite (time.monotonic) o None
+            on_wait: Callback (posición, eta_segundos) cuando cambia la posición
+
+        Raises:
+            DeadlineExceeded: si no hay turno antes del plazo
+        """
+        last_position = None
+        next_report = 0.0
+
+        with self._lock:
+            ticket = self._enqueue(job_id)
+
+        try:
+            while True:
+                with self._lock:
+                    if self._try_grant(job_id, ticket):
+                        return
+                    report = on_wait is not None and time.monotonic() >= next_report
+                    position = self._waiting_position(ticket) if report else None
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded("Plazo agotado esperando turno en la cola")
+
+                if report:
+                    next_report = time.monotonic() + self.poll_seconds
+                    if position != last_position:
+                        last_position = position
+                        on_wait(position, self._eta(position))
+
+                await asyncio.sleep(ASYNC_POLL_SECONDS)
+        except BaseException:
+            with self._lock:
+                self._cancel(job_id, ticket)
+            raise
+
+    def release(self, duration: Optional[float] = None):
+        """Libera la plaza y registra la duración de la llamada para las ETAs"""
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if duration is not None:
+                self._durations.append(duration)
+
+    @asynccontextmanager
+    async def slot_async(self, job_id, deadline: Optional[float] = None,
+                         on_wait: Optional[Callable[[int, float], None]] = None):
+        """Context manager: acquire_async + release midiendo la duración"""
+        await self.acquire_async(job_id, deadline, on_wait)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def snapshot(self) -> Dict:
+        """Estado actual: llamadas en curso, en cola y duración media"""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'waiting': sum(len(q) for q in self._queues.values()),
+                'jobs_waiting': len(self._queues),
+                'avg_call_seconds': round(self._average_duration(), 1)
+            }
@@ -0,0 +1,130 @@
+"""
+Result Cache
+Caché en disco de generaciones completas (borrador, análisis y versión final)
+Direccionada por contenido: la clave es un hash de los prompts y la configuración
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+
+def make_cache_key(*parts) -> str:
+    """
+    Hash SHA-256 estable de las partes que determinan un resultado
+
+    Args:
+        parts: Valores serializables a JSON (prompts, configuración de modelos...)
+
+    Returns:
+        Clave hexadecimal
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Caché de resultados en disco con desalojo LRU por tamaño"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Inicializa la caché
+
+        Args:
+            directory: Carpeta donde se guardan las entradas (<clave>.json)
+            max_bytes: Tamaño máximo total; al superarlo se eliminan las menos usadas
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Devuelve la entrada o None (y contabiliza acierto/fallo)"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # Marca de uso reciente para el desalojo LRU
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict):
+        """Guarda una entrada (escritura atómica) y aplica el límite de tamaño"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Elimina las entradas menos usadas hasta quedar por debajo de max_bytes
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+
+            for path, size, _ in sorted(entries, key=lambda e: e[2]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+
+        return removed
+
+    def _entries(self):
+        """[(ruta, bytes, último uso)] de las entradas en disco"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def stats(self) -> Dict:
+        """Aciertos, fallos y ocupación de la caché (desde el arranque del proceso)"""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,213 @@
+"""
+Shortcode Verifier
+Comprueba que los módulos del CMS (#MODULE_START#|{json}|#MODULE_END#) del artículo
+son exactamente los configurados y los repara en local, sin otra llamada al modelo
+- Shortcodes alterados (JSON reformateado o con cambios, marcadores dañados): se sustituyen por el original
+- Envueltos en <div> u otra etiqueta: se vuelven a envolver en <p><span>
+- Módulos que faltan: se insertan al final del <article>
+- Duplicados o no configurados: se eliminan (un módulo roto rompe la página en el CMS)
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Tolerante con marcadores dañados (sin '#', espacios alrededor de '|')
+LOOSE_SHORTCODE_PATTERN = re.compile(r'#?MODULE_START#?\s*\|(.*?)\|\s*#?MODULE_END#?', re.DOTALL)
+
+# Etiquetas de envoltorio pegadas al shortcode (antes y después)
+OPENING_WRAPPERS_PATTERN = re.compile(r'(?:<(p|div|span)\b[^>]*>\s*)+$')
+CLOSING_WRAPPERS_PATTERN = re.compile(r'(?:\s*</(?:p|div|span)\s*>)+')
+OPENING_TAG_PATTERN = re.compile(r'<(p|div|span)\b[^>]*>')
+CLOSING_TAG_PATTERN = re.compile(r'</(p|div|span)\s*>')
+
+CANONICAL_WRAPPER = '<p><span>{}</span></p>'
+
+# Párrafos vacíos que deja partir un párrafo alrededor de un módulo
+EMPTY_SPLIT_PATTERN = re.compile(
+    r'<p>\s*</p>\n(?=<p><span>#MODULE_START#)|(?<=\|#MODULE_END#</span></p>)\n<p>\s*</p>'
+)
+
+
+def _parse_payload(payload: str) -> Optional[Dict]:
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def module_identity(data: Optional[Dict]) -> Optional[Tuple]:
+    """
+    Qué módulo es (independiente del formato del JSON)
+
+    Producto: ('article', articleId). Carrusel: ('carouselArticle', slug, categoryId).
+    Otros tipos: el JSON completo normalizado.
+    """
+    if not data:
+        return None
+    params = data.get('params') or {}
+    if data.get('type') == 'article':
+        return ('article', str(params.get('articleId')))
+    if data.get('type') == 'carouselArticle':
+        return ('carouselArticle', params.get('slug'), str((params.get('slugUuids') or {}).get('categoryId')))
+    return (data.get('type'), json.dumps(data, sort_keys=True))
+
+
+def _is_same_module(expected: Dict, identity: Optional[Tuple], payload: str) -> bool:
+    """
+    True si un shortcode encontrado corresponde al módulo esperado
+
+    Con JSON válido se compara la identidad; con JSON no válido, que los valores
+    que identifican el módulo aparezcan en el texto.
+    """
+    if not expected['identity']:
+        return False
+    if identity:
+        return identity == expected['identity']
+    return all(str(value) in payload for value in expected['identity'] if value)
+
+
+def _wrapper_span(html_content: str, start: int, end: int) -> Tuple[int, int, bool]:
+    """
+    Amplía [start, end) a las etiquetas que envuelven el shortcode
+
+    Solo se toman pares de apertura/cierre equilibrados pegados al shortcode.
+
+    Returns:
+        (inicio, fin, ya_en_p_span)
+    """
+    opening = OPENING_WRAPPERS_PATTERN.search(html_content, 0, start)
+    closing = CLOSING_WRAPPERS_PATTERN.match(html_content, end)
+    if not opening or not closing:
+        return start, end, False
+
+    open_tags = list(OPENING_TAG_PATTERN.finditer(html_content, opening.start(), start))
+    close_tags = list(CLOSING_TAG_PATTERN.finditer(html_content, end, closing.end()))
+
+    # Emparejar de dentro hacia fuera: último abierto con primer cerrado
+    pairs = 0
+    for open_tag, close_tag in zip(reversed(open_tags), close_tags):
+        if open_tag.group(1) != close_tag.group(1):
+            break
+        pairs += 1
+    if not pairs:
+        return start, end, False
+
+    wrapped = [tag.group(0) for tag in open_tags[-pairs:]] == ['<p>', '<span>']
+    return open_tags[-pairs].start(), close_tags[pairs - 1].end(), wrapped
+
+
+def _inside_paragraph(html_content: str, position: int) -> bool:
+    """True si la posición está dentro de un <p> abierto (texto junto al shortcode)"""
+    last_open = max(html_content.rfind('<p>', 0, position), html_content.rfind('<p ', 0, position))
+    return last_open > html_content.rfind('</p>', 0, position)
+
+
+def repair_modules(html_content: str, modules: Optional[List[Dict]]) -> Dict:
+    """
+    Verifica los shortcodes del artículo contra los módulos configurados y los repara
+
+    Args:
+        html_content: HTML del artículo
+        modules: Módulos configurados (con 'shortcode' exacto)
+
+    Returns:
+        Diccionario con 'content' (HTML reparado), 'expected', 'found', 'ok',
+        'repairs' (acción por módulo) y 'applied'
+    """
+    expected = []
+    for idx, module in enumerate(modules or []):
+        shortcode = module.get('shortcode', '')
+        match = LOOSE_SHORTCODE_PATTERN.search(shortcode)
+        data = _parse_payload(match.group(1)) if match else None
+        inner = re.search(r'#MODULE_START#\|.*?\|#MODULE_END#', shortcode, re.DOTALL)
+        expected.append({
+            'index': idx,
+            'shortcode': inner.group(0) if inner else shortcode,
+            'identity': module_identity(data),
+            'type': (data or {}).get('type') or module.get('type')
+        })
+
+    found = list(LOOSE_SHORTCODE_PATTERN.finditer(html_content))
+    replacements = []  # (inicio, fin, texto nuevo)
+    repairs = []
+    ok = 0
+
+    # Primero las copias exactas (así una copia dañada no le quita el sitio a la buena)
+    targets = {}
+    for pos, match in enumerate(found):
+        exp = next((e for e in expected if match.group(0) == e['shortcode'] and e['index'] not in
+                    targets.values()), None)
+        if exp:
+            targets[pos] = exp['index']
+
+    matched = set(targets.values())
+    for pos, match in enumerate(found):
+        raw = match.group(0)
+        data = _parse_payload(match.group(1))
+        identity = module_identity(data)
+
+        target = expected[targets[pos]] if pos in targets else next(
+            (exp for exp in expected
+             if exp['index'] not in matched and _is_same_module(exp, identity, match.group(1))),
+            None
+        )
+
+        start, end, wrapped = _wrapper_span(html_content, match.start(), match.end())
+
+        if target is None:
+            duplicate = any(_is_same_module(exp, identity, match.group(1)) for exp in expected)
+            replacements.append((start, end, ''))
+            repairs.append({
+                'module': None,
+                'type': (data or {}).get('type'),
+                'action': 'duplicado' if duplicate else 'eliminado',
+                'detail': raw[:120]
+            })
+            continue
+
+        matched.add(target['index'])
+        exact = raw == target['shortcode']
+        if exact and wrapped:
+            ok += 1
+            continue
+
+        replacement = CANONICAL_WRAPPER.format(target['shortcode'])
+        if _inside_paragraph(html_content, start):
+            # En mitad de un párrafo: se parte el párrafo para no anidar <p>
+            replacement = f"</p>\n{replacement}\n<p>"
+        replacements.append((start, end, replacement))
+        repairs.append({
+            'module': target['index'],
+            'type': target['type'],
+            'action': 'reenvuelto' if exact else 'corregido',
+            'detail': html_content[start:end][:120] if exact else raw[:120]
+        })
+
+    # Módulos que faltan: al final del <article> (o del contenido si no hay <article>)
+    missing = [exp for exp in expected if exp['index'] not in matched]
+    if missing:
+        insert_at = html_content.rfind('</article>')
+        insert_at = len(html_content) if insert_at == -1 else insert_at
+        block = ''.join(f"\n{CANONICAL_WRAPPER.format(exp['shortcode'])}" for exp in missing) + '\n'
+        replacements.append((insert_at, insert_at, block))
+        repairs.extend(
+            {'module': exp['index'], 'type': exp['type'], 'action': 'insertado', 'detail': ''}
+            for exp in missing
+        )
+
+    content = html_content
+    for start, end, text in sorted(replacements, key=lambda r: r[0], reverse=True):
+        content = content[:start] + text + content[end:]
+    if replacements:
+        content = EMPTY_SPLIT_PATTERN.sub('', content)
+
+    return {
+        'content': content,
+        'expected': len(expected),
+        'found': len(found),
+        'ok': ok,
+        'repairs': repairs,
+        'applied': bool(repairs)
+    }
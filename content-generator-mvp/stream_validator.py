@@ -0,0 +1,149 @@
+"""
+Stream Validator
+Validación incremental del HTML mientras llega en streaming
+- Sigue el estado de la estructura línea a línea (dentro/fuera de <style>, bloques HTML vistos)
+- Detecta pronto las salidas que incumplen claramente la v3.3 y no se arreglan en local:
+  un artículo en markdown, texto sin HTML o un documento completo donde se pedía una sección
+- Lo que structure_fixer corrige en local (un ## suelto, <div class="kicker">...) no aborta
+"""
+
+import re
+from typing import Dict, Optional
+
+from rate_limiter import estimate_tokens
+
+# Solo se aborta dentro de los primeros tokens: más tarde ya sale más a cuenta terminar
+EARLY_WINDOW_TOKENS = 500
+
+# Salida esperada por etapa: artículo completo o fragmento (sección)
+ARTICLE = 'article'
+FRAGMENT = 'fragment'
+STAGE_OUTPUT_KINDS = {
+    'draft': ARTICLE,
+    'final': ARTICLE,
+    'section': FRAGMENT,
+    'length': FRAGMENT,
+}
+
+HTML_BLOCK_PATTERN = re.compile(r'<(?:p|h[1-6]|div|ul|ol|table|article|section|span)\b', re.IGNORECASE)
+MARKDOWN_HEADING_PATTERN = re.compile(r'^\s*#{1,6}\s+\S')
+DOCUMENT_START_PATTERN = re.compile(r'^(?:\s|```[\w-]*)*<(style|article)\b', re.IGNORECASE)
+FRAGMENT_PROBE_CHARS = 40  # Caracteres necesarios para saber cómo empieza un fragmento
+
+# Instrucción añadida al prompt al reintentar tras un aborto
+RETRY_INSTRUCTIONS = {
+    'markdown': (
+        "IMPORTANTE: tu intento anterior se descartó porque estaba escrito en markdown. "
+        "Responde SOLO con HTML (<h2>, <p>, <ul>...): sin #, sin ** y sin ``` de código."
+    ),
+    'sin_html': (
+        "IMPORTANTE: tu intento anterior se descartó porque no contenía HTML. "
+        "Responde SOLO con el HTML pedido, sin explicaciones previas."
+    ),
+    'documento_completo': (
+        "IMPORTANTE: tu intento anterior se descartó porque repetía el artículo completo. "
+        "Responde SOLO con el HTML de esta sección: sin <style> y sin <article>."
+    ),
+}
+
+
+class StreamValidator:
+    """Consume el texto de una respuesta en streaming y detecta incumplimientos tempranos"""
+
+    def __init__(self, kind: str = ARTICLE, window_tokens: int = EARLY_WINDOW_TOKENS):
+        """
+        Args:
+            kind: ARTICLE (artículo completo) o FRAGMENT (sección suelta)
+            window_tokens: Tokens de contenido (sin contar el <style>) dentro de
+                los que se puede abortar
+        """
+        self.kind = kind
+        self.window_tokens = window_tokens
+        self.text = ''
+        self.violation = None
+        self.done = False      # Fuera de la ventana: ya no se analiza
+        self._scanned = 0      # Hasta dónde se ha analizado (líneas completas)
+        self.in_style = False
+        self.body_tokens = 0   # Tokens fuera de <style> (el CSS no cuenta para la ventana)
+        self.html_blocks = 0   # Bloques HTML fuera de <style>
+        self.markdown_headings = 0
+        self.tokens = 0        # Tokens de salida recibidos (estimados fragmento a fragmento)
+
+    def feed(self, chunk: str) -> Optional[Dict]:
+        """
+        Añade un fragmento del stream
+
+        Returns:
+            El incumplimiento ('rule', 'detail', 'tokens') la primera vez que se
+            detecta dentro de la ventana; None en otro caso
+        """
+        if not chunk:
+            return None
+        self.text += chunk
+        self.tokens += estimate_tokens(chunk)
+        if self.done or self.violation:
+            return None
+
+        if self.kind == FRAGMENT:
+            violation = None if self._scanned else self._check_fragment_start()
+            if not violation and self.tokens > self.window_tokens:
+                self.done = True
+                if '<' not in self.text:
+                    violation = self._flag('sin_html', "La sección no contiene HTML")
+            return violation
+
+        end = self.text.rfind('\n')
+        if end >= self._scanned:
+            for line in self.text[self._scanned:end].split('\n'):
+                self._scan_line(line)
+            self._scanned = end + 1
+
+        if self.markdown_headings and not self.html_blocks:
+            return self._flag('markdown', "El artículo está saliendo en markdown")
+        pending = 0 if self.in_style else estimate_tokens(self.text[self._scanned:])  # Línea aún sin terminar
+        if self.body_tokens + pending > self.window_tokens:
+            self.done = True
+            if not self.html_blocks:
+                return self._flag('sin_html', "El artículo no contiene bloques HTML")
+        return None
+
+    def _scan_line(self, line: str):
+        lower = line.lower()
+        if '<style' in lower:
+            self.in_style = True
+        if self.in_style:
+            if '</style>' in lower:
+                self.in_style = False
+                rest = line[lower.rindex('</style>') + len('</style>'):]
+                self.body_tokens += estimate_tokens(rest)
+                self.html_blocks += len(HTML_BLOCK_PATTERN.findall(rest))
+            return
+
+        self.body_tokens += estimate_tokens(line + '\n')
+        self.html_blocks += len(HTML_BLOCK_PATTERN.findall(line))
+        if MARKDOWN_HEADING_PATTERN.match(line):
+            self.markdown_headings += 1
+
+    def _check_fragment_start(self) -> Optional[Dict]:
+        if len(self.text.strip()) < FRAGMENT_PROBE_CHARS:
+            return None
+        self._scanned = len(self.text)  # Solo se mira cómo empieza
+        match = DOCUMENT_START_PATTERN.match(self.text)
+        if match:
+            return self._flag('documento_completo', f"La sección empieza con <{match.group(1).lower()}>")
+        if MARKDOWN_HEADING_PATTERN.match(self.text.lstrip('`\n')):
+            return self._flag('markdown', "La sección está saliendo en markdown")
+        return None
+
+    def _flag(self, rule: str, detail: str) -> Dict:
+        self.violation = {'rule': rule, 'detail': detail, 'tokens': self.tokens}
+        return self.violation
+
+
+class EarlyAbort(Exception):
+    """La respuesta se ha cortado en streaming por incumplir la estructura"""
+
+    def __init__(self, violation: Dict, usage=None):
+        super().__init__(violation['detail'])
+        self.violation = violation
+        self.usage = usage  # Tokens consumidos hasta el corte (salida estimada)
@@ -0,0 +1,388 @@
+"""
+Structure Fixer
+Corrección local y determinista de la estructura v3.3 (sin otra llamada al modelo)
+- Trabaja sobre un árbol (html.parser), no sobre el texto con expresiones regulares
+- Bloques de código (```html) alrededor del HTML: se eliminan
+- Sin <article>: se envuelve todo el contenido (salvo el <style>)
+- <div class="kicker">: pasa a <span class="kicker">
+- Módulos en <div>, en <p> sin <span> o sueltos: se envuelven en <p><span>
+- Markdown (**negrita**, ## encabezados, [texto](url)): se pasa a HTML; los "## ..." solo
+  pasan a encabezado como hijos directos del <article> (en <li>, <td>... se quitan las marcas)
+- Si no hay nada que corregir el HTML se devuelve tal cual (byte a byte)
+"""
+
+import html
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from article_analyzer import analyze_article
+from word_count import INLINE_TAGS, SHORTCODE_MARKER, SHORTCODE_PATTERN, VOID_TAGS
+
+RAW_TEXT_TAGS = {'style', 'script', 'template', 'pre', 'code'}  # Su texto no se toca
+WRAPPER_TAGS = {'p', 'div', 'span'}
+LEADING_TAGS = {'style'}  # Se quedan fuera del <article> al envolver
+KICKER_TAGS = {'div', 'p'}
+HEADING_CONTAINERS = {'article', '#root'}  # Únicos sitios donde un "## ..." pasa a encabezado
+
+CODE_FENCE_PATTERN = re.compile(r'^[ \t]*```[\w-]*[ \t]*(?:\n|$)', re.MULTILINE)
+MARKDOWN_HEADING_PATTERN = re.compile(r'^[ \t]*(#{1,6})[ \t]+(.+?)[ \t#]*$', re.MULTILINE)
+MARKDOWN_INLINE_PATTERN = re.compile(
+    r'\*\*(?P<bold>[^*\n]+?)\*\*|\[(?P<text>[^\]\n]+)\]\((?P<href>[^)\s]+)\)'
+)
+ONLY_SHORTCODES_PATTERN = re.compile(r'\s*(?:#MODULE_START#\|.*?\|#MODULE_END#\s*)+', re.DOTALL)
+
+DETAIL_LENGTH = 80
+
+
+class Element:
+    """Nodo del árbol; conserva la etiqueta original para no reescribir lo que no cambia"""
+
+    def __init__(self, tag: str, attrs: Optional[List] = None, start_text: Optional[str] = None,
+                 closed: bool = True):
+        self.tag = tag
+        self.attrs = list(attrs or [])
+        self.start_text = start_text  # None si es nuevo o se ha modificado
+        self.closed = closed          # False: sin etiqueta de cierre en el original
+        self.self_closing = False
+        self.children = []
+        self.parent = None
+
+    def append(self, node):
+        if isinstance(node, Element):
+            node.parent = self
+        self.children.append(node)
+
+    def classes(self) -> List[str]:
+        return (dict(self.attrs).get('class') or '').split()
+
+    def rename(self, tag: str):
+        self.tag = tag
+        self.start_text = None
+        self.closed = True
+
+
+class Raw(str):
+    """Comentarios, declaraciones y cierres sueltos: se copian sin tocar"""
+
+
+class _TreeBuilder(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.root = Element('#root')
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, attrs, self.get_starttag_text(), closed=False)
+        self.stack[-1].append(element)
+        if tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        element = Element(tag, attrs, self.get_starttag_text(), closed=False)
+        element.self_closing = True
+        self.stack[-1].append(element)
+
+    def handle_endtag(self, tag):
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].tag == tag:
+                self.stack[depth].closed = True
+                del self.stack[depth:]
+                return
+        self.stack[-1].append(Raw(f"</{tag}>"))
+
+    def handle_data(self, data):
+        # Las entidades llegan aparte: se unen al texto para tratarlo entero
+        children = self.stack[-1].children
+        if children and type(children[-1]) is str:
+            children[-1] += data
+        else:
+            children.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(f"&{name};")
+
+    def handle_charref(self, name):
+        self.handle_data(f"&#{name};")
+
+    def handle_comment(self, data):
+        self.stack[-1].append(Raw(f"<!--{data}-->"))
+
+    def handle_decl(self, decl):
+        self.stack[-1].append(Raw(f"<!{decl}>"))
+
+    def handle_pi(self, data):
+        self.stack[-1].append(Raw(f"<?{data}>"))
+
+
+def parse_tree(html_content: str) -> Element:
+    """Árbol del HTML (nodo raíz '#root'); los textos son str y el resto Raw"""
+    builder = _TreeBuilder()
+    builder.feed(html_content)
+    builder.close()
+    return builder.root
+
+
+def serialize(node) -> str:
+    """HTML de un nodo (las etiquetas sin modificar se copian tal cual)"""
+    if not isinstance(node, Element):
+        return node
+    inner = ''.join(serialize(child) for child in node.children)
+    if node.tag == '#root':
+        return inner
+
+    start = node.start_text
+    if start is None:
+        attrs = ''.join(
+            f' {name}' if value is None else f' {name}="{html.escape(value, quote=True)}"'
+            for name, value in node.attrs
+        )
+        start = f"<{node.tag}{attrs}{' /' if node.self_closing else ''}>"
+    if node.self_closing or node.tag in VOID_TAGS:
+        return start + inner
+    return start + inner + (f"</{node.tag}>" if node.closed else '')
+
+
+def _walk(node):
+    """Elementos del árbol en orden de documento (copia: se puede modificar al recorrer)"""
+    for child in list(node.children):
+        if isinstance(child, Element):
+            yield child
+            yield from _walk(child)
+
+
+def _text_nodes(node):
+    """
+    (padre, índice, texto) de los textos editables, del último al primero
+
+    Al recorrerlos al revés, sustituir un texto no mueve los que faltan.
+    """
+    found = []
+
+    def visit(parent):
+        if parent.tag in RAW_TEXT_TAGS:
+            return
+        for idx, child in enumerate(parent.children):
+            if isinstance(child, Element):
+                visit(child)
+            elif not isinstance(child, Raw):
+                found.append((parent, idx, child))
+
+    visit(node)
+    return reversed(found)
+
+
+def _replace(parent: Element, idx: int, nodes: List):
+    parent.children[idx:idx + 1] = nodes
+    for node in nodes:
+        if isinstance(node, Element):
+            node.parent = parent
+
+
+def _new(tag: str, children: List, attrs: Optional[List] = None) -> Element:
+    element = Element(tag, attrs)
+    for child in children:
+        element.append(child)
+    return element
+
+
+def _interleave(nodes: List) -> List:
+    """Nodos separados por saltos de línea"""
+    result = []
+    for node in nodes:
+        if result:
+            result.append('\n')
+        result.append(node)
+    return result
+
+
+def _detail(text: str) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= DETAIL_LENGTH else text[:DETAIL_LENGTH - 1] + '…'
+
+
+def _strip_code_fences(root: Element, fixes: List[Dict]):
+    start = len(fixes)
+    for parent, idx, text in _text_nodes(root):
+        if '```' not in text:
+            continue
+        cleaned = CODE_FENCE_PATTERN.sub('', text)
+        if cleaned != text:
+            parent.children[idx] = cleaned
+            fixes.insert(start, {'rule': 'bloque_codigo', 'detail': "Marcas ``` eliminadas"})
+
+
+def _is_leading(node) -> bool:
+    return isinstance(node, Element) and node.tag in LEADING_TAGS
+
+
+def _wrap_article(root: Element, fixes: List[Dict]):
+    if any(element.tag == 'article' for element in _walk(root)):
+        return
+
+    positions = [
+        idx for idx, node in enumerate(root.children)
+        if not isinstance(node, Raw) and not _is_leading(node) and (isinstance(node, Element) or node.strip())
+    ]
+    if not positions:
+        return
+
+    # El <style> se queda delante; el resto (desde el primer contenido hasta el último), dentro
+    first, last = positions[0], positions[-1] + 1
+    block = root.children[first:last]
+    styles = [node for node in block if _is_leading(node)]
+    article = _new('article', ['\n', *(node for node in block if not _is_leading(node)), '\n'])
+    root.children[first:last] = [*_interleave(styles), '\n', article] if styles else [article]
+    article.parent = root
+    fixes.append({'rule': 'article', 'detail': "Contenido envuelto en <article>"})
+
+
+def _fix_kicker(root: Element, fixes: List[Dict]):
+    for element in _walk(root):
+        if element.tag in KICKER_TAGS and 'kicker' in element.classes():
+            fixes.append({'rule': 'kicker', 'detail': f"<{element.tag} class=\"kicker\"> → <span>"})
+            element.rename('span')
+
+
+def _fix_markdown_headings(root: Element, fixes: List[Dict]):
+    start = len(fixes)
+    for parent, idx, text in _text_nodes(root):
+        if '#' not in text or SHORTCODE_MARKER in text:
+            continue
+        matches = list(MARKDOWN_HEADING_PATTERN.finditer(text))
+        if not matches:
+            continue
+
+        # "<p>## Título</p>": el párrafo pasa a ser el encabezado
+        if len(matches) == 1 and matches[0].group(0).strip() == text.strip() \
+                and parent.tag in {'p', 'div'} and _significant(parent) == [text] \
+                and parent.parent is not None and parent.parent.tag in HEADING_CONTAINERS:
+            parent.rename(f"h{len(matches[0].group(1))}")
+            parent.children[idx] = matches[0].group(2)
+            fixes.insert(start, {'rule': 'markdown', 'detail': f"{matches[0].group(1)} {_detail(matches[0].group(2))}"})
+            continue
+        if parent.tag not in HEADING_CONTAINERS:
+            # Dentro de <li>, <td>, un párrafo...: un encabezado rompería la estructura; se quitan las marcas
+            parent.children[idx] = MARKDOWN_HEADING_PATTERN.sub(
+                lambda match: match.group(0)[:match.start(1) - match.start()] + match.group(2), text
+            )
+            fixes[start:start] = [
+                {'rule': 'markdown', 'detail': f"{match.group(1)} {_detail(match.group(2))} → texto"}
+                for match in matches
+            ]
+            continue
+
+        nodes, position = [], 0
+        for match in matches:
+            nodes.append(text[position:match.start()])
+            nodes.append(_new(f"h{len(match.group(1))}", [match.group(2)]))
+            position = match.end()
+        nodes.append(text[position:])
+        _replace(parent, idx, [node for node in nodes if node])
+        fixes[start:start] = [
+            {'rule': 'markdown', 'detail': f"{match.group(1)} {_detail(match.group(2))}"} for match in matches
+        ]
+
+
+def _fix_markdown_inline(root: Element, fixes: List[Dict]):
+    start = len(fixes)
+    for parent, idx, text in _text_nodes(root):
+        if ('**' not in text and '](' not in text) or SHORTCODE_MARKER in text:
+            continue
+
+        nodes, node_fixes, position = [], [], 0
+        for match in MARKDOWN_INLINE_PATTERN.finditer(text):
+            if match.group('bold'):
+                node = _new('strong', [match.group('bold')])
+            elif parent.tag != 'a':
+                node = _new('a', [match.group('text')], [('href', html.unescape(match.group('href')))])
+            else:
+                continue  # Sin enlaces anidados
+            nodes.extend([text[position:match.start()], node])
+            position = match.end()
+            node_fixes.append({'rule': 'markdown', 'detail': _detail(match.group(0))})
+        if nodes:
+            nodes.append(text[position:])
+            _replace(parent, idx, [node for node in nodes if node])
+            fixes[start:start] = node_fixes
+
+
+def _significant(element: Element) -> List:
+    """Hijos que cuentan (elementos y texto que no es solo espacio)"""
+    return [
+        child for child in element.children
+        if isinstance(child, Element) or (not isinstance(child, Raw) and child.strip())
+    ]
+
+
+def _fix_modules(root: Element, fixes: List[Dict]):
+    start = len(fixes)
+    for parent, idx, text in _text_nodes(root):
+        if SHORTCODE_MARKER not in text or not ONLY_SHORTCODES_PATTERN.fullmatch(text):
+            continue  # Sin módulos o con texto alrededor (lo resuelve shortcode_verifier)
+
+        # Envoltorios que solo contienen el módulo: <div><p>módulo</p></div> se sustituye entero
+        node, chain = text, []
+        while parent.tag in WRAPPER_TAGS and _significant(parent) == [node] and parent.parent is not None:
+            chain.insert(0, parent.tag)
+            node, parent = parent, parent.parent
+
+        shortcodes = SHORTCODE_PATTERN.findall(text)
+        if len(shortcodes) == 1 and chain[-2:] == ['p', 'span'] and len(chain) == 2:
+            continue  # Ya está en <p><span>
+        if parent.tag in INLINE_TAGS | {'p'}:
+            continue  # Dentro de un párrafo con más texto (lo resuelve shortcode_verifier)
+
+        position = next(i for i, child in enumerate(parent.children) if child is node)
+        nodes = _interleave([_new('p', [_new('span', [shortcode])]) for shortcode in shortcodes])
+        if node is text:
+            # Módulo suelto: se conservan los saltos de línea de alrededor
+            nodes = [text[:len(text) - len(text.lstrip())], *nodes, text[len(text.rstrip()):]]
+        _replace(parent, position, [node for node in nodes if node])
+
+        wrapper = ''.join(f"<{tag}>" for tag in chain) or "sin envoltorio"
+        fixes[start:start] = [
+            {'rule': 'modulo', 'detail': f"{wrapper} → <p><span>: {_detail(shortcode)}"} for shortcode in shortcodes
+        ]
+
+
+FIXERS = (
+    _strip_code_fences,
+    _wrap_article,
+    _fix_kicker,
+    _fix_markdown_headings,
+    _fix_markdown_inline,
+    _fix_modules,
+)
+
+
+def fix_structure(html_content: str) -> Dict:
+    """
+    Corrige en local los fallos de formato de la estructura v3.3
+
+    Args:
+        html_content: HTML del artículo
+
+    Returns:
+        Diccionario con 'content' (HTML corregido; el original si no hay
+        nada que corregir), 'fixes' (regla y detalle de cada corrección),
+        'applied' y 'pending' (comprobaciones de estructura que siguen
+        fallando y no se pueden corregir en local, p. ej. el CSS sin :root)
+    """
+    fixes = []
+    content = html_content or ''
+    if content.strip():
+        root = parse_tree(content)
+        for fixer in FIXERS:
+            fixer(root, fixes)
+        if fixes:
+            content = serialize(root)
+
+    structure = analyze_article(content)['structure']
+    return {
+        'content': content,
+        'fixes': fixes,
+        'applied': bool(fixes),
+        'pending': [name for name, ok in structure.items() if not ok]
+    }
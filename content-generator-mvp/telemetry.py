@@ -0,0 +1,254 @@
+"""
+Telemetry
+Registro por etapa de tokens, coste y latencia de las llamadas a Claude
+Se persiste en un JSONL local (rotado por tamaño) y se resume con p50/p95 por arquetipo
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Precios en USD por millón de tokens (entrada, salida, escritura caché, lectura caché)
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": {"input": 3.00, "output": 15.00, "cache_write": 3.75, "cache_read": 0.30},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.00, "cache_write": 1.00, "cache_read": 0.08},
+}
+
+# Métricas numéricas que se resumen con percentiles
+SUMMARY_FIELDS = ["latency_s", "ttft_s", "input_tokens", "output_tokens", "cost_usd"]
+
+# Rotación del JSONL: al superar el tamaño pasa a .1 (y .1 a .2...), se conservan BACKUPS
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+TAIL_BLOCK_BYTES = 64 * 1024  # Lectura desde el final por bloques (solo los registros recientes)
+
+
+def estimate_cost(model: str, input_tokens: int = 0, output_tokens: int = 0,
+                  cache_creation_input_tokens: int = 0, cache_read_input_tokens: int = 0) -> Optional[float]:
+    """
+    Coste estimado en USD de una llamada
+
+    Returns:
+        Coste en USD o None si el modelo no tiene precio configurado
+    """
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return None
+
+    cost = (
+        input_tokens * pricing["input"]
+        + output_tokens * pricing["output"]
+        + cache_creation_input_tokens * pricing["cache_write"]
+        + cache_read_input_tokens * pricing["cache_read"]
+    ) / 1_000_000
+    return round(cost, 6)
+
+
+def build_stage_record(stage: str, stage_name: str, model: str, usage=None,
+                       latency_s: float = 0.0, ttft_s: Optional[float] = None,
+                       stop_reason: Optional[str] = None, error: Optional[str] = None,
+                       context: Optional[Dict] = None) -> Dict:
+    """
+    Construye el registro de telemetría de una etapa
+
+    Args:
+        stage: Clave de la etapa (draft, critique, final...)
+        stage_name: Nombre legible de la etapa
+        model: Modelo usado
+        usage: Objeto `usage` de la respuesta de Anthropic (o None si falló)
+        latency_s: Tiempo total de la llamada
+        ttft_s: Tiempo hasta el primer token (solo en streaming)
+        stop_reason: Motivo de parada devuelto por la API
+        error: Mensaje de error si la llamada falló
+        context: Datos del trabajo (arquetipo, perfil de enrutado...)
+
+    Returns:
+        Diccionario serializable a JSON
+    """
+    tokens = {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "stage": stage,
+        "stage_name": stage_name,
+        "model": model,
+        **tokens,
+        "cost_usd": estimate_cost(model, **tokens),
+        "latency_s": round(latency_s, 3),
+        "ttft_s": round(ttft_s, 3) if ttft_s is not None else None,
+        "stop_reason": stop_reason,
+        "error": error,
+    }
+    record.update(context or {})
+    return record
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil con interpolación lineal (pct entre 0 y 100)"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+
+    rank = (len(values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize_records(records: List[Dict], group_by: str = "arquetipo") -> List[Dict]:
+    """
+    Resume p50/p95 por grupo y etapa
+
+    Args:
+        records: Registros de telemetría
+        group_by: Campo por el que agrupar (arquetipo, routing_profile, model...)
+
+    Returns:
+        Lista de filas {grupo, etapa, llamadas, <campo>_p50, <campo>_p95}
+    """
+    groups = defaultdict(list)
+    for record in records:
+        if record.get("error"):
+            continue
+        groups[(record.get(group_by) or "N/A", record.get("stage") or "N/A")].append(record)
+
+    rows = []
+    for (group, stage), items in sorted(groups.items()):
+        row = {group_by: group, "stage": stage, "calls": len(items)}
+        for field in SUMMARY_FIELDS:
+            values = [item.get(field) for item in items]
+            p50 = percentile(values, 50)
+            p95 = percentile(values, 95)
+            row[f"{field}_p50"] = round(p50, 4) if p50 is not None else None
+            row[f"{field}_p95"] = round(p95, 4) if p95 is not None else None
+        rows.append(row)
+
+    return rows
+
+
+def summarize_totals(records: List[Dict]) -> Dict:
+    """Totales de una generación: tokens, coste y tiempo acumulado"""
+    return {
+        "calls": len(records),
+        "errors": sum(1 for r in records if r.get("error")),
+        "input_tokens": sum(r.get("input_tokens", 0) for r in records),
+        "output_tokens": sum(r.get("output_tokens", 0) for r in records),
+        "cache_read_input_tokens": sum(r.get("cache_read_input_tokens", 0) for r in records),
+        "cost_usd": round(sum(r.get("cost_usd") or 0 for r in records), 4),
+        "latency_s": round(sum(r.get("latency_s", 0) for r in records), 2),
+    }
+
+
+def read_tail_lines(path: str, max_lines: Optional[int] = None) -> List[str]:
+    """
+    Últimas `max_lines` líneas no vacías de un fichero (todas si es None)
+
+    Lee desde el final por bloques: el coste depende de las líneas pedidas, no
+    del tamaño del fichero.
+    """
+    with open(path, "rb") as f:
+        if max_lines is None:
+            data, position = f.read(), 0
+        else:
+            position = f.seek(0, os.SEEK_END)
+            data = b""
+            while position > 0 and data.count(b"\n") <= max_lines:
+                step = min(TAIL_BLOCK_BYTES, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+
+    lines = data.split(b"\n")
+    if position > 0:
+        lines = lines[1:]  # La primera puede estar cortada por el bloque
+    lines = [line.decode("utf-8", errors="replace") for line in lines if line.strip()]
+    return lines if max_lines is None else lines[-max_lines:]
+
+
+class TelemetryStore:
+    """Almacén JSONL de telemetría (append-only, rotado por tamaño, seguro entre hilos)"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS):
+        """
+        Inicializa el almacén
+
+        Args:
+            path: Ruta del fichero JSONL
+            max_bytes: Tamaño a partir del cual el fichero se rota
+            backups: Ficheros rotados que se conservan (path.1 es el más reciente)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotated_paths(self) -> List[str]:
+        return [f"{self.path}.{idx}" for idx in range(1, self.backups + 1)]
+
+    def _rotate(self):
+        """path -> path.1 -> path.2 ... (el más antiguo se descarta); con el lock retenido"""
+        rotated = self._rotated_paths()
+        for older, newer in zip(reversed(rotated), reversed([self.path] + rotated[:-1])):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+
+    def append(self, record: Dict):
+        """Añade un registro al final del fichero (rotándolo si supera max_bytes)"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            try:
+                if os.path.getsize(self.path) + len(line.encode("utf-8")) > self.max_bytes:
+                    self._rotate()
+            except OSError:
+                pass  # Aún no existe
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def signature(self) -> Optional[tuple]:
+        """(mtime_ns, tamaño) del fichero actual: cambia con cada registro nuevo; None si no existe"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Lee los registros (los `limit` más recientes si se indica)
+
+        Con `limit` solo se leen las últimas líneas (del fichero actual y, si no
+        llegan, de los rotados).
+        """
+        records = []
+        with self._lock:
+            for path in [self.path] + self._rotated_paths():
+                remaining = limit - len(records) if limit else None
+                if remaining is not None and remaining <= 0:
+                    break
+                if not os.path.exists(path):
+                    continue
+                parsed = []
+                for line in read_tail_lines(path, remaining):
+                    try:
+                        parsed.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+                records = parsed + records
+
+        return records[-limit:] if limit else records
+
+    def summary(self, group_by: str = "arquetipo", limit: Optional[int] = 5000) -> List[Dict]:
+        """p50/p95 por grupo y etapa sobre los registros recientes"""
+        return summarize_records(self.load(limit), group_by)
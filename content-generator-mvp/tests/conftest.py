@@ -0,0 +1,6 @@
+"""Los módulos de la app están en la raíz de content-generator-mvp (sin paquete)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
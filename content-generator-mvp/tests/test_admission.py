@@ -0,0 +1,71 @@
+"""Control de admisión: reparto round-robin entre trabajos y plazo en la cola"""
+
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import AdmissionController, DeadlineExceeded
+
+
+async def queue_calls(admission, jobs):
+    """Encola una llamada por elemento de `jobs` con la única plaza ocupada; devuelve el orden de turno"""
+    granted = []
+
+    async def call(job_id):
+        async with admission.slot_async(job_id):
+            granted.append(job_id)
+
+    await admission.acquire_async('ocupa')
+    tasks = []
+    for job_id in jobs:
+        tasks.append(asyncio.create_task(call(job_id)))
+        await asyncio.sleep(0)  # Cada ticket entra en la cola en este orden
+    assert admission.snapshot()['waiting'] == len(jobs)
+
+    admission.release()
+    await asyncio.gather(*tasks)
+    return granted
+
+
+def test_turns_alternate_between_jobs():
+    admission = AdmissionController(max_in_flight=1)
+
+    granted = asyncio.run(queue_calls(admission, ['A', 'A', 'A', 'B', 'C']))
+
+    # Un trabajo con muchas llamadas en cola no adelanta a los demás
+    assert granted == ['A', 'B', 'C', 'A', 'A']
+    assert admission.snapshot()['in_flight'] == 0
+
+
+def test_waiting_position_is_reported():
+    admission = AdmissionController(max_in_flight=1, poll_seconds=0)
+    positions = []
+
+    async def scenario():
+        await admission.acquire_async('ocupa')
+        first = asyncio.create_task(admission.acquire_async('A'))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(admission.acquire_async('B', on_wait=lambda pos, eta: positions.append(pos)))
+        await asyncio.sleep(0.1)
+        admission.release()
+        await first
+        admission.release()
+        await second
+
+    asyncio.run(scenario())
+
+    assert positions == [2, 1]
+
+
+def test_deadline_leaves_the_queue():
+    admission = AdmissionController(max_in_flight=1)
+
+    async def scenario():
+        await admission.acquire_async('ocupa')
+        with pytest.raises(DeadlineExceeded):
+            await admission.acquire_async('A', deadline=time.monotonic() + 0.1)
+
+    asyncio.run(scenario())
+
+    assert admission.snapshot()['waiting'] == 0
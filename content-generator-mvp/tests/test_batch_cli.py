@@ -0,0 +1,86 @@
+"""CLI por lotes: construcción de trabajos, carga de la PDP y ejecución en un solo event loop"""
+
+import asyncio
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import batch_cli
+from fake_client import FakeAsyncAnthropic
+from generator import AsyncContentGenerator
+
+
+def make_args(**overrides):
+    args = dict(no_length_correction=False, mode='auto', variants=1, force=False, mock_pdp=False,
+                routing_profile='calidad', workers=2, verbose=False)
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+def make_row(job_id, product_id='123'):
+    return {'job_id': job_id, 'product_id': product_id, 'arquetipo': 'ARQ-4',
+            'objetivo': 'Decidir si merece la pena', 'keyword_principal': 'robot aspirador'}
+
+
+def failing_fetch(product_id):
+    raise requests.exceptions.ConnectionError(f"webhook caído ({product_id})")
+
+
+def test_build_job_does_not_fetch_pdp(monkeypatch):
+    monkeypatch.setattr(batch_cli, 'fetch_pdp_data', failing_fetch)
+
+    job = batch_cli.build_job(make_row('a'), 0, make_args())
+
+    assert job['product_id'] == '123'
+    assert job['request']['pdp_data'] is None
+
+
+def test_load_pdp_fills_request(monkeypatch):
+    monkeypatch.setattr(batch_cli, 'fetch_pdp_data', lambda product_id: {'productId': product_id})
+    job = batch_cli.build_job(make_row('a'), 0, make_args())
+
+    batch_cli.load_pdp(job, make_args())
+
+    assert job['request']['pdp_data'] == {'productId': '123'}
+
+
+def test_failed_pdp_fails_only_its_job(monkeypatch):
+    monkeypatch.setattr(batch_cli, 'fetch_pdp_data',
+                        lambda product_id: failing_fetch(product_id) if product_id == 'roto' else {'ok': True})
+    args = make_args()
+    jobs = [batch_cli.build_job(make_row('a'), 0, args), batch_cli.build_job(make_row('b', 'roto'), 1, args)]
+
+    loaded, failed = asyncio.run(batch_cli.load_pdps(jobs, args))
+
+    assert [job['job_id'] for job in loaded] == ['a']
+    assert [(row['job_id'], row['status']) for row in failed] == [('b', 'error')]
+    with pytest.raises(requests.exceptions.ConnectionError):
+        batch_cli.load_pdp(jobs[1], args)
+
+
+def test_jobs_run_on_one_event_loop(monkeypatch, tmp_path):
+    client = FakeAsyncAnthropic()
+    closed = []
+    monkeypatch.setattr(batch_cli, 'fetch_pdp_data',
+                        lambda product_id: failing_fetch(product_id) if product_id == 'roto' else {'ok': True})
+    monkeypatch.setattr(batch_cli, 'AsyncContentGenerator', partial(AsyncContentGenerator, client=client))
+
+    async def close():
+        closed.append(True)
+
+    monkeypatch.setattr(client, 'close', close)
+    args = make_args(output_dir=str(tmp_path), mode='serial', no_length_correction=True)
+    jobs = [batch_cli.build_job(make_row(f"j{idx}", 'roto' if idx == 2 else '123'), idx, args) for idx in range(4)]
+    services = {'api_key': None, 'base_url': None, 'telemetry': None, 'cache': None, 'checkpoints': None,
+                'scheduler': None, 'admission': None}
+
+    rows = asyncio.run(batch_cli.run_jobs(jobs, services, args))
+
+    assert [(row['job_id'], row['status']) for row in rows] == [
+        ('j0', 'ok'), ('j1', 'ok'), ('j2', 'error'), ('j3', 'ok')
+    ]
+    assert len(closed) == 3  # Un cliente cerrado por trabajo generado
+    assert client.server.max_in_flight <= args.workers
+    assert (tmp_path / 'j0.html').exists()
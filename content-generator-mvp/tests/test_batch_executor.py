@@ -0,0 +1,106 @@
+"""
+BatchExecutor contra la Message Batches API simulada (fake_client.FakeAnthropic):
+envío, sondeo y recogida por etapas, reintento de resultados con error y reanudación
+"""
+
+from batch_executor import BATCH_DISCOUNT, BatchExecutor
+from fake_client import FakeAnthropic
+from prompt_profiler import sample_request
+from prompts import CRITIQUE_TOOL
+from telemetry import estimate_cost
+
+
+def make_jobs(*codes):
+    jobs = []
+    for idx, code in enumerate(codes):
+        request = sample_request(code)
+        jobs.append({
+            'job_id': f"job-{idx}",
+            'request': request,
+            'metadata': {'arquetipo': code, 'longitud_objetivo': request['target_length']}
+        })
+    return jobs
+
+
+def make_executor(client, tmp_path, **kwargs):
+    return BatchExecutor(client, str(tmp_path / 'state.json'), poll_seconds=0,
+                         log=lambda message: None, **kwargs)
+
+
+def test_runs_one_batch_per_stage(tmp_path):
+    client = FakeAnthropic(polls_to_end=3)
+    jobs = make_jobs('ARQ-1', 'ARQ-4')
+
+    results = make_executor(client, tmp_path).run(jobs)
+
+    batches = client.messages.batches.batches
+    assert [batch['requests'][0]['custom_id'].split('-')[0] for batch in batches.values()] == \
+        ['draft', 'critique', 'final']
+    assert all(len(batch['requests']) == 2 for batch in batches.values())
+    assert all(batch['polls'] == 3 for batch in batches.values())
+
+    critique = batches['msgbatch_fake_2']['requests'][0]['params']
+    assert critique['tools'] == [CRITIQUE_TOOL]
+    assert critique['tool_choice'] == {"type": "tool", "name": CRITIQUE_TOOL['name']}
+
+    for job in jobs:
+        result = results[job['job_id']]
+        assert 'error' not in result
+        assert result['final'].strip().endswith('</article>')
+        assert result['corrections']['longitud_objetivo'] == job['request']['target_length']
+        assert result['metadata']['modo'] == 'batch_api'
+        telemetry = result['metadata']['telemetria']
+        assert [record['stage'] for record in telemetry] == ['draft', 'critique', 'final']
+        assert all(record['batch_id'].startswith('msgbatch_fake_') for record in telemetry)
+
+
+def test_batch_cost_is_discounted(tmp_path):
+    client = FakeAnthropic()
+    result = make_executor(client, tmp_path).run(make_jobs('ARQ-1'))['job-0']
+
+    record = result['metadata']['telemetria'][0]
+    full = estimate_cost(record['model'], record['input_tokens'], record['output_tokens'])
+    assert record['cost_usd'] == round(full * BATCH_DISCOUNT, 6)
+
+
+def test_errored_results_are_resubmitted(tmp_path):
+    failed = []
+
+    def errored(item):
+        # El primer borrador del primer trabajo falla una vez
+        if item['custom_id'] == 'draft-0' and not failed:
+            failed.append(item)
+            return True
+        return False
+
+    client = FakeAnthropic(errored=errored)
+    results = make_executor(client, tmp_path).run(make_jobs('ARQ-1', 'ARQ-4'))
+
+    stages = [batch['requests'] for batch in client.messages.batches.batches.values()]
+    assert [len(requests) for requests in stages] == [2, 1, 2, 2]  # Reenvío solo del que falló
+    assert all('error' not in result for result in results.values())
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    client = FakeAnthropic(errored=lambda item: item['custom_id'].startswith('critique'))
+    results = make_executor(client, tmp_path, max_attempts=2).run(make_jobs('ARQ-1'))
+
+    result = results['job-0']
+    assert result['draft'] and result['final'] is None
+    assert result['error'] == "Error en Análisis: overloaded_error"
+
+
+def test_resumes_open_batch_after_restart(tmp_path):
+    client = FakeAnthropic(polls_to_end=2)
+    jobs = make_jobs('ARQ-1')
+
+    # Primer proceso: envía el lote de borradores y se interrumpe antes de recogerlo
+    first = make_executor(client, tmp_path)
+    record = first._submit('draft', jobs)
+    assert first.state.open_batches() == [record]
+
+    # Segundo proceso con el mismo estado: recoge ese lote en vez de enviar otro borrador
+    results = make_executor(client, tmp_path).run(jobs)
+
+    assert list(client.messages.batches.batches) == ['msgbatch_fake_1', 'msgbatch_fake_2', 'msgbatch_fake_3']
+    assert 'error' not in results['job-0']
@@ -0,0 +1,37 @@
+"""Minificado del CSS en la exportación para el CMS"""
+
+from cms_export import export_for_cms, parse_css
+
+
+def test_statement_at_rules_do_not_swallow_next_rule():
+    css = '@charset "UTF-8";\n@import url("fuentes.css");\n.kicker { color: red; }'
+
+    assert parse_css(css) == [
+        ('@charset "UTF-8"', None),
+        ('@import url("fuentes.css")', None),
+        ('.kicker', ' color: red; ')
+    ]
+
+
+def test_export_keeps_statement_at_rules():
+    html = ('<style>@import url("fuentes.css");\n.kicker { color: red; }\n.sin-uso { margin: 0; }</style>'
+            '<article><span class="kicker">Black Friday</span></article>')
+
+    result = export_for_cms(html)
+
+    assert '<style>@import url("fuentes.css");.kicker{color:red}</style>' in result['content']
+    assert result['css_rules_removed'] == 1
+
+
+def test_data_uri_declarations_are_not_split():
+    icon = 'url("data:image/svg+xml;base64,PHN2Zz48L3N2Zz4=")'
+    html = ('<style>:root { --icono: url(data:image/png;base64,iVBORw0=); --sin-uso: 0; }\n'
+            f'.kicker {{ background: {icon}  no-repeat; content: "a  b"; }}\n'
+            '.check { background-image: var(--icono); }</style>'
+            '<article><span class="kicker">Black Friday</span><p class="check">Texto</p></article>')
+
+    result = export_for_cms(html)
+
+    assert ('<style>:root{--icono:url(data:image/png;base64,iVBORw0=)}'
+            f'.kicker{{background:{icon} no-repeat;content:"a  b"}}'
+            '.check{background-image:var(--icono)}</style>') in result['content']
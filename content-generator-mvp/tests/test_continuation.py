@@ -0,0 +1,106 @@
+"""Respuestas cortadas por max_tokens: petición de continuación y costura del texto"""
+
+import asyncio
+
+import pytest
+
+from fake_client import FakeAsyncAnthropic
+from generator import (
+    MAX_CONTINUATIONS, MODEL_SONNET, AsyncContentGenerator, build_continuation_request, build_stage_request
+)
+from rate_limiter import estimate_tokens
+from token_budget import ESTIMATE_SAFETY_RATIO, PromptBudgetExceeded, get_model_limits
+
+MAX_TOKENS = 300
+WORDS = ['recomendación', 'portátil', 'batería', 'pantalla', 'teclado', 'autonomía', 'procesador']
+
+
+def long_answer(calls: float) -> str:
+    """Respuesta que necesita unas `calls` llamadas de MAX_TOKENS para completarse"""
+    words = int(MAX_TOKENS * calls * len(WORDS) / estimate_tokens(" ".join(WORDS)))
+    return "<p>" + " ".join(WORDS[idx % len(WORDS)] for idx in range(words)) + "</p>"
+
+
+def generate(responder, streaming: bool):
+    client = FakeAsyncAnthropic(responder=responder)
+    generator = AsyncContentGenerator(None, client=client, use_streaming=streaming)
+    result = asyncio.run(generator.agenerate_stage("Redacta el artículo", max_tokens=MAX_TOKENS,
+                                                   stage_name="Borrador"))
+    return result, generator, client.server
+
+
+def test_continuation_request_prefills_partial_answer():
+    request = build_stage_request("Redacta el artículo", max_tokens=MAX_TOKENS)
+
+    continued = build_continuation_request(request, "<p>Texto cortado \n")
+
+    assert continued['messages'][-1] == {"role": "assistant", "content": "<p>Texto cortado"}
+    assert continued['messages'][:-1] == request['messages']
+    assert len(request['messages']) == 1
+    assert continued['max_tokens'] == MAX_TOKENS
+
+
+def test_continuation_request_without_room_raises():
+    context = get_model_limits(MODEL_SONNET)['context']
+    request = build_stage_request("Redacta el artículo", max_tokens=MAX_TOKENS)
+
+    with pytest.raises(PromptBudgetExceeded):
+        build_continuation_request(request, "palabra " * (context // 2))
+
+
+def test_tool_definition_counts_for_max_tokens():
+    limits = get_model_limits(MODEL_SONNET)
+    # Prompt que deja ~3000 tokens libres de contexto ("palabra " son 2 tokens)
+    prompt = "palabra " * int((limits['context'] - 3000) / (1 + ESTIMATE_SAFETY_RATIO) / 2)
+    tool = {'name': 'correcciones', 'description': "detalle " * 500,
+            'input_schema': {'type': 'object', 'properties': {}}}
+
+    plain = build_stage_request(prompt, max_tokens=4000)
+    with_tool = build_stage_request(prompt, max_tokens=4000, tool=tool)
+
+    assert with_tool['tools'] == [tool]
+    assert with_tool['tool_choice'] == {"type": "tool", "name": "correcciones"}
+    assert with_tool['max_tokens'] < plain['max_tokens'] < 4000
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_truncated_answer_is_completed(streaming):
+    answer = long_answer(2.5)
+
+    result, generator, server = generate(lambda request: answer, streaming)
+
+    assert result == answer
+    assert len(server.requests) == 3
+    assert [c['number'] for c in generator.continuations] == [1, 2]
+    assert generator.continuations[-1]['stop_reason'] == 'end_turn'
+    for request in server.requests[1:]:
+        assert request['messages'][-1]['role'] == 'assistant'
+        assert answer.startswith(request['messages'][-1]['content'])
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_continuations_stop_at_limit(streaming):
+    answer = long_answer(MAX_CONTINUATIONS + 3)
+
+    result, generator, server = generate(lambda request: answer, streaming)
+
+    assert len(server.requests) == MAX_CONTINUATIONS + 1
+    assert len(generator.continuations) == MAX_CONTINUATIONS
+    assert generator.continuations[-1]['stop_reason'] == 'max_tokens'
+    assert answer.startswith(result) and len(result) < len(answer)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_failed_continuation_keeps_partial_answer(streaming):
+    answer = long_answer(2.5)
+
+    def responder(request):
+        if request['messages'][-1]['role'] == 'assistant':
+            raise ValueError("conexión perdida")
+        return answer
+
+    result, generator, server = generate(responder, streaming)
+
+    assert answer.startswith(result) and len(result) < len(answer)
+    assert generator.continuations == []
+    assert any("Error al continuar Borrador" in error for error in generator.errors)
@@ -0,0 +1,75 @@
+"""Cancelación de trabajos: en cola, en curso y antes de que el generador arranque"""
+
+import threading
+
+from fake_client import FakeAsyncAnthropic
+from generator import ContentGeneratorV4, run_generation_job
+from job_runner import JOB_CANCELLED, JOB_DONE, JOB_QUEUED, JOB_RUNNING, JobRunner, JobStore
+from prompt_profiler import sample_request
+
+
+def make_runner(tmp_path):
+    return JobRunner(JobStore(str(tmp_path / 'jobs.db')), max_workers=1)
+
+
+def test_transition_only_from_expected_status(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    job_id = store.create('editor', 'trabajo')
+
+    assert store.transition(job_id, JOB_QUEUED, JOB_CANCELLED)
+    assert not store.transition(job_id, JOB_QUEUED, JOB_RUNNING)
+    assert store.get(job_id)['status'] == JOB_CANCELLED
+
+
+def test_cancel_queued_job_discards_it(tmp_path):
+    runner = make_runner(tmp_path)
+    release = threading.Event()
+    ran, discarded = [], []
+
+    # El único hilo queda ocupado: el segundo trabajo sigue en cola
+    blocker = runner.submit(lambda progress: release.wait() and {}, owner='editor', title='ocupa el hilo')
+    queued = runner.submit(lambda progress: ran.append(True) or {}, owner='editor', title='en cola',
+                           on_discard=lambda: discarded.append(True))
+
+    assert runner.cancel(queued)
+    release.set()
+    runner._executor.shutdown(wait=True)
+
+    assert discarded == [True]
+    assert ran == []
+    assert runner.store.get(queued)['status'] == JOB_CANCELLED
+    assert runner.store.get(blocker)['status'] == JOB_DONE
+
+
+def test_cancel_queued_generation_closes_generator(tmp_path):
+    runner = make_runner(tmp_path)
+    release = threading.Event()
+    client = FakeAsyncAnthropic()
+    generator = ContentGeneratorV4(None, client=client)
+
+    runner.submit(lambda progress: release.wait() and {}, owner='editor', title='ocupa el hilo')
+    queued = runner.submit(
+        lambda progress: run_generation_job(generator, sample_request('ARQ-1'), {}, progress),
+        owner='editor', title='en cola', on_cancel=generator.cancel, on_discard=generator.close
+    )
+
+    assert runner.cancel(queued)
+    release.set()
+    runner._executor.shutdown(wait=True)
+
+    assert generator._loop.is_closed()
+    assert client.server.requests == []
+
+
+def test_generator_cancelled_before_start_skips_api():
+    client = FakeAsyncAnthropic()
+    generator = ContentGeneratorV4(None, client=client)
+    generator.cancel()
+    try:
+        draft, corrections, final = generator.generate_with_3_stages(**sample_request('ARQ-1'))
+    finally:
+        generator.close()
+
+    assert (draft, corrections, final) == (None, None, None)
+    assert generator.cancelled
+    assert client.server.requests == []
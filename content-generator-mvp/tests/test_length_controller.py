@@ -0,0 +1,75 @@
+"""Ajuste de longitud por secciones: división del artículo, plan y reescritura"""
+
+import asyncio
+
+from length_controller import (
+    MAX_SECTIONS_PER_PASS, MIN_ADJUSTMENT_WORDS, LengthController, join_sections, plan_adjustments, split_sections
+)
+from word_count import count_words
+
+ARTICLE = """<style>.kicker{color:red}</style>
+<article>
+<span class="kicker">Black Friday</span>
+<h1>Robot aspirador</h1>
+<p>Entradilla del artículo.</p>
+<h2>Diseño</h2>
+<p>Texto del diseño.</p>
+<div class="faqs"><h3>¿Es ruidoso?</h3><p>No mucho.</p></div>
+<h2>Autonomía</h2>
+<p>Texto de la autonomía.</p>
+</article>"""
+
+
+def paragraph(words):
+    return "<p>" + " ".join(["palabra"] * words) + "</p>"
+
+
+def test_split_sections_cuts_only_top_level_headings():
+    parts = split_sections(ARTICLE)
+
+    assert [s['heading'] for s in parts['sections']] == ['Introducción', 'Diseño', 'Autonomía']
+    assert [s['level'] for s in parts['sections']] == ['intro', 'h2', 'h2']
+    assert '<h3>¿Es ruidoso?</h3>' in parts['sections'][1]['html']
+    assert parts['prefix'].endswith('<article>')
+    assert parts['suffix'] == '</article>'
+    assert join_sections(parts) == ARTICLE
+
+
+def test_split_sections_without_article():
+    parts = split_sections("<p>Sin article</p>")
+
+    assert parts == {'prefix': "<p>Sin article</p>", 'sections': [], 'suffix': ''}
+
+
+def test_plan_expands_longest_sections_within_ratio():
+    plan = plan_adjustments([300, 100, 30], target_length=800)
+
+    # La más larga crece hasta un 60% (+180), la siguiente también (+60); la corta no se toca
+    assert plan == {0: 480, 1: 160}
+
+
+def test_plan_condenses_and_skips_small_changes():
+    assert plan_adjustments([400, 200], target_length=500) == {0: 300}
+    assert plan_adjustments([400, 200], target_length=600 - MIN_ADJUSTMENT_WORDS + 1) == {}
+
+
+def test_plan_limits_sections_per_pass():
+    plan = plan_adjustments([100] * (MAX_SECTIONS_PER_PASS + 2), target_length=2000)
+
+    assert len(plan) == MAX_SECTIONS_PER_PASS
+
+
+def test_adjust_rewrites_only_planned_sections():
+    html = f"<article><h2>Uno</h2>{paragraph(200)}<h2>Dos</h2>{paragraph(50)}</article>"
+    calls = []
+
+    async def generate(prompt, target_words, stage_name):
+        calls.append(stage_name)
+        return f"<h2>Uno</h2>{paragraph(target_words)}"
+
+    report = asyncio.run(LengthController(generate, count_words).adjust_async(html, 300))
+
+    assert calls == ["Ajuste longitud: Uno"]
+    assert report['applied']
+    assert report['before'] == 252 and report['after'] == 301
+    assert f"<h2>Dos</h2>{paragraph(50)}" in report['content']
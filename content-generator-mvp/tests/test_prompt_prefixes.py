@@ -0,0 +1,52 @@
+"""Estabilidad del prefijo estático de los prompts de borrador (lo que cachea la API)"""
+
+import pytest
+
+from prompt_profiler import sample_request
+from prompts import ARQUETIPOS, DRAFT_PROMPT_PREFIXES, build_generation_prompt_stage1_draft, split_static_prefix
+
+
+def other_request(arquetipo_code):
+    """Otra generación del mismo arquetipo: cambian todos los datos dinámicos"""
+    request = sample_request(arquetipo_code)
+    request.update({
+        'pdp_data': None,
+        'target_length': request['target_length'] + 500,
+        'keywords': ['portátil gaming', 'rtx 4060'],
+        'context': 'Stock limitado hasta el domingo',
+        'links': {},
+        'modules': [],
+        'objetivo': 'Comparar con la gama anterior',
+        'producto_alternativo': {'url': 'https://www.pccomponentes.com/otro', 'text': 'Otro'},
+        'casos_uso': ['Oficina', 'Viajes'],
+        'campos_arquetipo': {}
+    })
+    return request
+
+
+@pytest.mark.parametrize('code', sorted(ARQUETIPOS))
+def test_draft_prefix_is_byte_identical_across_generations(code):
+    prefix = DRAFT_PROMPT_PREFIXES[code]
+    prompts = [
+        build_generation_prompt_stage1_draft(**sample_request(code)),
+        build_generation_prompt_stage1_draft(**other_request(code))
+    ]
+
+    assert prompts[0] != prompts[1]
+    for prompt in prompts:
+        assert prompt.encode('utf-8')[:len(prefix.encode('utf-8'))] == prefix.encode('utf-8')
+
+
+@pytest.mark.parametrize('code', sorted(ARQUETIPOS))
+def test_split_static_prefix_round_trips(code):
+    prompt = build_generation_prompt_stage1_draft(**other_request(code))
+
+    prefix, rest = split_static_prefix(prompt)
+
+    assert prefix is DRAFT_PROMPT_PREFIXES[code]
+    assert rest
+    assert prefix + rest == prompt
+
+
+def test_split_static_prefix_without_known_prefix():
+    assert split_static_prefix("Analiza este borrador") == (None, "Analiza este borrador")
@@ -0,0 +1,73 @@
+"""Verificación de shortcodes: módulos alterados, mal envueltos, ausentes o sobrantes"""
+
+from prompts import generate_carousel_module, generate_product_module
+from shortcode_verifier import repair_modules
+
+PRODUCT = generate_product_module('1234567')
+CAROUSEL = generate_carousel_module('robots-aspiradores', '123', 'relevance', 'true', 'true', 12)
+MODULES = [{'type': 'product', 'shortcode': PRODUCT}, {'type': 'carousel', 'shortcode': CAROUSEL}]
+
+
+def inner(shortcode):
+    return shortcode[len('<p><span>'):-len('</span></p>')]
+
+
+def article(*blocks):
+    return "<article>\n<h1>Robot aspirador</h1>\n" + "\n".join(blocks) + "\n</article>"
+
+
+def test_exact_modules_are_left_alone():
+    html = article("<p>Texto.</p>", PRODUCT, CAROUSEL)
+
+    result = repair_modules(html, MODULES)
+
+    assert result['content'] == html
+    assert (result['expected'], result['found'], result['ok']) == (2, 2, 2)
+    assert not result['applied']
+
+
+def test_reformatted_module_is_restored_and_rewrapped():
+    altered = '<div>#MODULE_START# | {"type": "article", "params": {"articleId": "1234567"}} | #MODULE_END#</div>'
+    html = article(altered, CAROUSEL)
+
+    result = repair_modules(html, MODULES)
+
+    assert result['content'] == article(PRODUCT, CAROUSEL)
+    assert [(r['module'], r['action']) for r in result['repairs']] == [(0, 'corregido')]
+
+
+def test_wrapper_only_change_is_rewrapped():
+    html = article(f"<div>{inner(PRODUCT)}</div>", CAROUSEL)
+
+    result = repair_modules(html, MODULES)
+
+    assert result['content'] == article(PRODUCT, CAROUSEL)
+    assert [r['action'] for r in result['repairs']] == ['reenvuelto']
+
+
+def test_missing_module_is_inserted_before_article_end():
+    result = repair_modules(article("<p>Texto.</p>", PRODUCT), MODULES)
+
+    assert result['content'].endswith(f"{PRODUCT}\n\n{CAROUSEL}\n</article>")
+    assert [(r['module'], r['action']) for r in result['repairs']] == [(1, 'insertado')]
+
+
+def test_duplicates_and_unknown_modules_are_removed():
+    unknown = generate_product_module('999')
+    html = article(PRODUCT, PRODUCT, unknown, CAROUSEL)
+
+    result = repair_modules(html, MODULES)
+
+    assert result['content'].count(inner(PRODUCT)) == 1
+    assert inner(unknown) not in result['content']
+    assert [r['action'] for r in result['repairs']] == ['duplicado', 'eliminado']
+    assert result['ok'] == 2
+
+
+def test_module_inside_paragraph_splits_it():
+    html = article(f"<p>Antes {inner(PRODUCT)} después</p>", CAROUSEL)
+
+    result = repair_modules(html, MODULES)
+
+    assert result['content'] == article(f"<p>Antes </p>\n{PRODUCT}\n<p> después</p>", CAROUSEL)
+    assert [r['action'] for r in result['repairs']] == ['reenvuelto']
@@ -0,0 +1,83 @@
+"""Validación en streaming: reglas de aborto temprano y liquidación de los tokens del corte"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limiter import RateLimitScheduler
+from stream_validator import ARTICLE, FRAGMENT, EarlyAbort, StreamValidator
+
+PARAGRAPH = "<p>El robot aspira y friega en una sola pasada sin esfuerzo.</p>\n"
+
+
+def feed_all(validator, text, chunk_size=16):
+    """Entrega el texto en trozos como un stream; devuelve el primer incumplimiento"""
+    violations = [validator.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    return next((violation for violation in violations if violation), None)
+
+
+def test_markdown_article_is_flagged():
+    violation = feed_all(StreamValidator(ARTICLE), "# Robot aspirador\n\nUn análisis completo.\n## Diseño\n")
+
+    assert violation['rule'] == 'markdown'
+    assert violation['tokens'] > 0
+
+
+def test_stray_markdown_heading_inside_html_is_not_flagged():
+    text = "<article>\n<h1>Robot aspirador</h1>\n## Diseño\n" + PARAGRAPH * 5
+
+    assert feed_all(StreamValidator(ARTICLE), text) is None
+
+
+def test_plain_text_article_is_flagged_after_the_window():
+    validator = StreamValidator(ARTICLE, window_tokens=40)
+    text = "Claro, aquí tienes el artículo que me pediste sobre el robot aspirador.\n" * 5
+
+    violation = feed_all(validator, text)
+
+    assert violation['rule'] == 'sin_html'
+    assert validator.done
+
+
+def test_style_block_does_not_count_towards_the_window():
+    validator = StreamValidator(ARTICLE, window_tokens=40)
+    css = "<style>\n" + ":root { --pc-orange: #ff6000; --pc-gray: #f5f5f5; }\n" * 30 + "</style>\n"
+
+    assert feed_all(validator, css) is None
+    assert validator.body_tokens < validator.window_tokens and not validator.done
+
+    assert feed_all(validator, "<article>\n" + PARAGRAPH * 5) is None
+    assert validator.html_blocks > 0 and validator.done
+
+
+def test_fragment_with_full_document_is_flagged():
+    violation = feed_all(StreamValidator(FRAGMENT), "```html\n<style>\n:root { --pc-orange: #ff6000; }\n")
+
+    assert violation['rule'] == 'documento_completo'
+    assert violation['detail'] == "La sección empieza con <style>"
+
+
+def test_fragment_rules():
+    assert feed_all(StreamValidator(FRAGMENT), "## Autonomía\nLa batería dura dos horas en modo normal.\n")['rule'] == 'markdown'
+    assert feed_all(StreamValidator(FRAGMENT), "<h2>Autonomía</h2>\n" + PARAGRAPH * 3) is None
+
+
+def test_early_abort_refunds_only_unused_tokens():
+    scheduler = RateLimitScheduler(tokens_per_minute=10000)
+    usage = SimpleNamespace(input_tokens=100, output_tokens=50)
+
+    async def aborted():
+        raise EarlyAbort({'rule': 'markdown', 'detail': "markdown", 'tokens': 50}, usage)
+
+    async def failed():
+        raise ValueError("sin salida")
+
+    for fn, spent in ((aborted, 150), (failed, 0)):
+        scheduler.tokens.tokens = 10000
+        with pytest.raises((EarlyAbort, ValueError)):
+            asyncio.run(scheduler.run_async(
+                fn, estimated_tokens=1000,
+                usage_tokens=lambda m: m.usage.input_tokens + m.usage.output_tokens
+            ))
+        assert scheduler.tokens.tokens == pytest.approx(10000 - spent, abs=5)
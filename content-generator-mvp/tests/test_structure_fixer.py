@@ -0,0 +1,55 @@
+"""Corrección local de la estructura: article, kicker, módulos y markdown"""
+
+from prompts import generate_product_module
+from structure_fixer import fix_structure
+
+PRODUCT = generate_product_module('1234567')
+SHORTCODE = PRODUCT[len('<p><span>'):-len('</span></p>')]
+
+
+def test_valid_html_is_returned_unchanged():
+    html = f'<article>\n<span class="kicker">Oferta</span>\n<h2>Diseño</h2>\n{PRODUCT}\n</article>'
+
+    result = fix_structure(html)
+
+    assert result['content'] == html
+    assert not result['applied']
+
+
+def test_fences_article_and_kicker():
+    html = '```html\n<style>p{margin:0}</style>\n<div class="kicker">Oferta</div>\n<p>Texto.</p>\n```'
+
+    result = fix_structure(html)
+
+    assert result['content'] == (
+        '<style>p{margin:0}</style>\n<article>\n<span class="kicker">Oferta</span>\n<p>Texto.</p>\n</article>\n'
+    )
+    assert [fix['rule'] for fix in result['fixes']] == ['bloque_codigo', 'bloque_codigo', 'article', 'kicker']
+
+
+def test_modules_are_rewrapped():
+    result = fix_structure(f"<article>\n<div>{SHORTCODE}</div>\n</article>")
+
+    assert result['content'] == f"<article>\n{PRODUCT}\n</article>"
+
+
+def test_markdown_headings_are_promoted_at_article_level():
+    html = "<article>\n## Diseño\n<p>Texto con **negrita** y [enlace](https://a.es).</p>\n<p>### Batería</p>\n</article>"
+
+    result = fix_structure(html)
+
+    assert result['content'] == (
+        '<article>\n<h2>Diseño</h2>\n<p>Texto con <strong>negrita</strong> y <a href="https://a.es">enlace</a>.</p>\n'
+        '<h3>Batería</h3>\n</article>'
+    )
+
+
+def test_markdown_headings_inside_lists_and_tables_lose_their_markers():
+    html = "<article>\n<ul><li>## Ventajas</li></ul>\n<table><tr><td>\n### Precio\n</td></tr></table>\n</article>"
+
+    result = fix_structure(html)
+
+    assert result['content'] == (
+        "<article>\n<ul><li>Ventajas</li></ul>\n<table><tr><td>\nPrecio\n</td></tr></table>\n</article>"
+    )
+    assert [fix['detail'] for fix in result['fixes']] == ["## Ventajas → texto", "### Precio → texto"]
@@ -0,0 +1,108 @@
+"""Salidas estructuradas: validación contra el esquema, normalización del esquema de secciones y cortes por max_tokens"""
+
+import asyncio
+
+from fake_client import FakeAsyncAnthropic
+from generator import AsyncContentGenerator, normalize_outline, parse_json_response, validate_json_schema
+from rate_limiter import estimate_tokens
+from token_budget import get_model_limits
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['puntuacion', 'problemas'],
+    'properties': {
+        'puntuacion': {'type': 'integer'},
+        'nivel': {'type': 'string', 'enum': ['alto', 'bajo']},
+        'problemas': {'type': 'array', 'items': {'type': 'string'}}
+    }
+}
+
+TOOL = {
+    'name': 'respuesta',
+    'description': "Respuesta estructurada",
+    'input_schema': {'type': 'object', 'required': ['texto'], 'properties': {'texto': {'type': 'string'}}}
+}
+
+
+def tool_answer(tokens):
+    """Input de la herramienta de unos `tokens` tokens de salida"""
+    sentence = "el robot aspira y friega en una sola pasada "
+    return {'texto': sentence * (tokens // estimate_tokens(sentence))}
+
+
+def run_structured(responder, max_attempts=2):
+    client = FakeAsyncAnthropic(responder=responder)
+    generator = AsyncContentGenerator(None, client=client)
+    result = asyncio.run(generator.agenerate_structured_stage("Analiza el borrador", TOOL, stage_name="Análisis",
+                                                              max_attempts=max_attempts))
+    return result, generator, [request['max_tokens'] for request in client.server.requests]
+
+
+def test_valid_object_has_no_errors():
+    assert validate_json_schema({'puntuacion': 7, 'nivel': 'alto', 'problemas': ['a']}, SCHEMA) == []
+
+
+def test_schema_errors_carry_their_path():
+    errors = validate_json_schema({'puntuacion': True, 'nivel': 'medio', 'problemas': ['a', 3]}, SCHEMA)
+
+    assert errors == [
+        "$.puntuacion: se esperaba integer",
+        "$.nivel: valor 'medio' no permitido",
+        "$.problemas[1]: se esperaba string"
+    ]
+
+
+def test_missing_fields_and_wrong_root_type():
+    assert validate_json_schema({}, SCHEMA) == ["$.puntuacion: obligatorio", "$.problemas: obligatorio"]
+    assert validate_json_schema(None, SCHEMA) == ["$: se esperaba object"]
+
+
+def test_parse_json_response_tolerates_fences():
+    assert parse_json_response('```json\n{"a": 1}\n```') == {'a': 1}
+    assert parse_json_response('sin json') is None
+
+
+def test_normalize_outline_scales_words_and_assigns_modules():
+    outline = {
+        'titulo': 'Robot aspirador',
+        'secciones': [
+            {'titulo': '', 'palabras': 100, 'modulos': []},
+            {'titulo': 'Diseño', 'palabras': 100, 'modulos': [0, 0, 5]},
+            {'titulo': 'Autonomía', 'palabras': 200, 'modulos': ['x']}
+        ]
+    }
+
+    result = normalize_outline(outline, target_length=800, num_modules=2)
+
+    assert [sec['nivel'] for sec in result['secciones']] == ['intro', 'h2', 'h2']
+    assert [sec['palabras'] for sec in result['secciones']] == [200, 200, 400]
+    # Cada módulo en una sola sección; los no asignados van a la más larga
+    assert [sec['modulos'] for sec in result['secciones']] == [[], [0], [1]]
+    assert result['kicker'] == '⚡ PcComponentes'
+
+
+def test_normalize_outline_rejects_h2_without_title():
+    outline = {'secciones': [{'titulo': 'Intro'}, {'titulo': '  ', 'palabras': 100}]}
+
+    assert normalize_outline(outline, target_length=800, num_modules=0) is None
+    assert normalize_outline({'secciones': 'no'}, target_length=800, num_modules=0) is None
+
+
+def test_truncated_tool_call_retries_with_more_output():
+    answer = tool_answer(15000)
+
+    result, generator, budgets = run_structured(lambda request: answer)
+
+    assert result == answer
+    assert budgets == [10000, 20000]
+    assert [record['stop_reason'] for record in generator.stage_metrics] == ['max_tokens', 'tool_use']
+
+
+def test_truncated_tool_call_fails_when_output_cannot_grow():
+    result, generator, budgets = run_structured(lambda request: tool_answer(100000), max_attempts=6)
+
+    model = generator.stage_metrics[0]['model']
+    model_output = get_model_limits(model)['output']
+    assert result is None
+    assert budgets == [10000, 20000, 40000, model_output]
+    assert generator.errors == [f"Error en Análisis: la respuesta no cabe en {model_output} tokens de salida de {model}"]
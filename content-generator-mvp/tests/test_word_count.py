@@ -0,0 +1,59 @@
+"""Recuento de palabras: CSS, scripts y shortcodes fuera; palabras por sección"""
+
+from word_count import count_words, count_words_by_section
+
+SHORTCODE = '#MODULE_START#|{"type": "product", "id": "1234567", "nombre": "Xiaomi E5"}|#MODULE_END#'
+
+
+def test_style_script_and_template_are_not_counted():
+    html = ("<style>.kicker{color:red} :root{--pc-orange:#ff6000}</style>"
+            '<script type="application/ld+json">{"@type": "Article"}</script>'
+            "<template><p>oculto del todo</p></template>"
+            "<p>Tres palabras visibles</p>")
+
+    assert count_words(html) == 3
+
+
+def test_shortcodes_are_not_counted():
+    html = f"<p>Antes del módulo</p>\n{SHORTCODE}\n<p>después{SHORTCODE}fin</p>"
+
+    # El shortcode separa las palabras que lo rodean
+    assert count_words(html) == 5
+
+
+def test_inline_tags_do_not_split_words_but_blocks_do():
+    assert count_words("<p><strong>Xiao</strong>mi E5</p>") == 2
+    assert count_words("<p>robot <a href='#'>aspirador</a> barato</p>") == 3
+    assert count_words("<li>uno</li><li>dos</li>") == 2
+    assert count_words("<p>línea<br>partida</p>") == 2
+
+
+def test_empty_content():
+    assert count_words("") == 0
+    assert count_words_by_section("") == {'total': 0, 'sections': []}
+
+
+def test_sections_are_article_level_headings():
+    html = f"""<style>p{{margin:0}}</style>
+<article>
+<span class="kicker">Oferta</span>
+<h1>Robot aspirador</h1>
+<p>Una entradilla corta.</p>
+<h2>Diseño <em>compacto</em></h2>
+<p>Texto del diseño.</p>
+<div class="faqs"><h3>¿Es ruidoso?</h3><p>No mucho.</p></div>
+{SHORTCODE}
+<h3>Batería</h3>
+<p>Dura dos horas.</p>
+</article>
+<p>Nota final</p>"""
+
+    result = count_words_by_section(html)
+
+    assert result['sections'] == [
+        {'heading': 'Introducción', 'level': 'intro', 'words': 6},
+        {'heading': 'Diseño compacto', 'level': 'h2', 'words': 9},
+        {'heading': 'Batería', 'level': 'h3', 'words': 4},
+        {'heading': '', 'level': 'outro', 'words': 2}
+    ]
+    assert result['total'] == sum(section['words'] for section in result['sections']) == count_words(html)
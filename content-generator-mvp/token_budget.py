@@ -0,0 +1,146 @@
+"""
+Token Budget
+Presupuesto de tokens de cada llamada, comprobado en local antes de enviarla
+- max_tokens ajustado a lo que cabe: límite de salida del modelo y ventana de contexto
+  menos el prompt estimado (rate_limiter.estimate_tokens)
+- Datos opcionales del prompt recortados por prioridad si el prompt no cabe en su presupuesto
+- Si ni así cabe, PromptBudgetExceeded antes de llamar (no se paga una respuesta cortada)
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+from rate_limiter import estimate_tokens
+
+# Límites por modelo (tokens): ventana de contexto y salida máxima
+MODEL_LIMITS = {
+    "claude-sonnet-4-20250514": {"context": 200000, "output": 64000},
+    "claude-3-5-haiku-20241022": {"context": 200000, "output": 8192},
+}
+DEFAULT_MODEL_LIMITS = {"context": 200000, "output": 8192}
+
+ESTIMATE_SAFETY_RATIO = 0.15  # Margen sobre la entrada estimada (error de la estimación local)
+MIN_OUTPUT_TOKENS = 1000      # Con menos hueco de salida no merece la pena llamar
+
+# Entrada máxima de los prompts de redacción (uno normal ronda 5-8k tokens):
+# acota el coste y deja sitio al borrador cuando se repite en las etapas 2 y 3
+PROMPT_TOKEN_BUDGET = 30000
+
+# Argumentos de los constructores de prompts de la etapa 1 (mismo orden)
+PROMPT_ARG_NAMES = (
+    'pdp_data', 'arquetipo', 'target_length', 'keywords', 'context', 'links',
+    'modules', 'objetivo', 'producto_alternativo', 'casos_uso', 'campos_arquetipo'
+)
+
+# Datos opcionales, del primero que se recorta al último
+OPTIONAL_PROMPT_INPUTS = (
+    ('pdp_data', 'opiniones_resumen'),
+    ('links', 'secundarios'),
+    ('casos_uso',),
+    ('context',),
+    ('pdp_data', 'descripcion'),
+    ('campos_arquetipo',),
+    ('pdp_data', 'especificaciones'),
+    ('pdp_data', '*'),  # Último recurso: todo lo que no sea PDP_CORE_FIELDS
+)
+PDP_CORE_FIELDS = {'productId', 'nombre', 'precio_actual', 'precio_anterior', 'descuento', 'url_producto'}
+
+
+class PromptBudgetExceeded(Exception):
+    """El prompt no deja sitio suficiente para la respuesta"""
+
+
+def get_model_limits(model: str) -> Dict:
+    """Ventana de contexto ('context') y salida máxima ('output') del modelo"""
+    return MODEL_LIMITS.get(model, DEFAULT_MODEL_LIMITS)
+
+
+def fit_output_tokens(model: str, input_tokens: int, max_tokens: int) -> int:
+    """
+    max_tokens que cabe con una entrada de `input_tokens` (estimados)
+
+    Args:
+        model: Modelo de la llamada
+        input_tokens: Tokens de entrada estimados (prompt, herramientas, respuesta parcial)
+        max_tokens: Salida pedida
+
+    Returns:
+        max_tokens limitado por la salida del modelo y el hueco libre en el contexto
+
+    Raises:
+        PromptBudgetExceeded: si el hueco no llega a MIN_OUTPUT_TOKENS (ni a lo pedido, si es menos)
+    """
+    limits = get_model_limits(model)
+    available = limits['context'] - int(input_tokens * (1 + ESTIMATE_SAFETY_RATIO))
+    fitted = min(max_tokens, limits['output'], available)
+    if fitted < min(max_tokens, MIN_OUTPUT_TOKENS):
+        raise PromptBudgetExceeded(
+            f"el prompt (~{input_tokens} tokens) solo deja {max(available, 0)} tokens de respuesta "
+            f"en {model}"
+        )
+    return fitted
+
+
+def _trim(args: Dict, path: Tuple[str, ...]) -> bool:
+    """Vacía un dato opcional en `args` (copiando lo que modifica); True si había algo"""
+    name, key = path[0], path[1] if len(path) > 1 else None
+    value = args.get(name)
+    if not value:
+        return False
+    if key is None:
+        args[name] = type(value)()
+        return True
+    if not isinstance(value, dict):
+        return False
+
+    value = dict(value)
+    if key == '*':
+        removed = [k for k in value if k not in PDP_CORE_FIELDS]
+        for k in removed:
+            del value[k]
+    else:
+        removed = [key] if value.get(key) else []
+        value.pop(key, None)
+    args[name] = value
+    return bool(removed)
+
+
+def fit_prompt_args(build_prompt: Callable[..., str], prompt_args: tuple,
+                    budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[tuple, List[str], int]:
+    """
+    Recorta los datos opcionales de la etapa 1 hasta que el prompt quepa en `budget`
+
+    Se recorta por orden de OPTIONAL_PROMPT_INPUTS; los argumentos originales no se modifican.
+
+    Args:
+        build_prompt: Constructor del prompt (build_generation_prompt_stage1_draft...)
+        prompt_args: Argumentos en el orden de PROMPT_ARG_NAMES
+        budget: Tokens de entrada máximos
+
+    Returns:
+        (argumentos, datos recortados ['pdp_data.opiniones_resumen', ...], tokens estimados del prompt)
+    """
+    args = dict(zip(PROMPT_ARG_NAMES, prompt_args))
+    tokens = estimate_tokens(build_prompt(*prompt_args))
+    trimmed = []
+
+    for path in OPTIONAL_PROMPT_INPUTS:
+        if tokens <= budget:
+            break
+        if _trim(args, path):
+            trimmed.append('.'.join(path))
+            tokens = estimate_tokens(build_prompt(*(args[name] for name in PROMPT_ARG_NAMES)))
+
+    if not trimmed:
+        return prompt_args, [], tokens
+    return tuple(args[name] for name in PROMPT_ARG_NAMES), trimmed, tokens
+
+
+def request_text(request: Dict) -> str:
+    """Texto de entrada de una petición: mensajes (también la respuesta parcial) y herramientas"""
+    parts = []
+    for message in request['messages']:
+        content = message['content']
+        parts.append(content if isinstance(content, str) else "".join(block['text'] for block in content))
+    if request.get('tools'):
+        parts.append(repr(request['tools']))
+    return "".join(parts)
@@ -0,0 +1,159 @@
+"""
+Word Count
+Recuento de palabras de un artículo HTML en una sola pasada (html.parser)
+- No cuenta el contenido de <style>/<script> ni los shortcodes #MODULE_START#|...|#MODULE_END#
+- Las etiquetas en línea (<strong>, <a>...) no parten palabras; las de bloque sí
+- Total y palabras por sección (h2/h3 hijos directos de <article>) en la misma pasada
+- Memoizado por contenido: contar varias veces el mismo HTML no repite el análisis
+"""
+
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Dict, Tuple
+
+SKIPPED_TAGS = {'style', 'script', 'template'}
+
+# Etiquetas que no separan palabras: "<strong>Xiao</strong>mi" es una sola palabra
+INLINE_TAGS = {
+    'a', 'abbr', 'b', 'bdi', 'bdo', 'cite', 'code', 'data', 'dfn', 'em', 'i', 'kbd',
+    'mark', 'q', 's', 'samp', 'small', 'span', 'strong', 'sub', 'sup', 'time', 'u', 'var'
+}
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr'
+}
+
+SECTION_TAGS = ('h2', 'h3')
+SHORTCODE_MARKER = '#MODULE_START#'
+SHORTCODE_PATTERN = re.compile(r'#MODULE_START#\|.*?\|#MODULE_END#', re.DOTALL)
+
+CACHE_SIZE = 256
+
+
+class WordCountParser(HTMLParser):
+    """
+    Cuenta palabras visibles y las reparte por secciones del <article>
+
+    Se puede extender (article_analyzer) para sacar más datos en la misma pasada.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.total = 0
+        self.sections = [['Introducción', 'intro', 0]]  # [encabezado, nivel, palabras]
+        self.depth = 0
+        self.article_depth = None
+        self.skip_depth = 0          # >0 dentro de <style>/<script>
+        self.heading_tag = None      # Encabezado de sección abierto
+        self.heading_text = []
+        self.joinable = False        # La última palabra puede continuar en el siguiente texto
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+            return
+        if tag not in INLINE_TAGS:
+            self.joinable = False
+
+        if tag == 'article' and self.article_depth is None:
+            self.article_depth = self.depth
+        elif (tag in SECTION_TAGS and self.article_depth is not None
+              and self.depth == self.article_depth + 1):
+            self.sections.append([None, tag, 0])
+            self.heading_tag = tag
+            self.heading_text = []
+
+        if tag not in VOID_TAGS:
+            self.depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in INLINE_TAGS:
+            self.joinable = False
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag not in INLINE_TAGS:
+            self.joinable = False
+
+        self.depth = max(self.depth - 1, 0)
+        if tag == self.heading_tag and self.article_depth is not None and self.depth == self.article_depth + 1:
+            self.sections[-1][0] = ' '.join(''.join(self.heading_text).split())
+            self.heading_tag = None
+        elif tag == 'article' and self.depth == self.article_depth:
+            # Lo que siga a </article> ya no es de ninguna sección
+            self.sections.append([None, 'outro', 0])
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if SHORTCODE_MARKER in data:
+            data = SHORTCODE_PATTERN.sub(' ', data)
+        self.handle_text(data)
+
+    def handle_text(self, data):
+        """Texto visible (sin CSS, scripts ni shortcodes)"""
+        if self.heading_tag:
+            self.heading_text.append(data)
+
+        words = len(data.split())
+        if not words:
+            self.joinable = self.joinable and not data
+            return
+        if self.joinable and not data[0].isspace():
+            words -= 1  # Continuación de la palabra anterior
+        self.joinable = not data[-1].isspace()
+
+        self.total += words
+        self.sections[-1][2] += words
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _analyze(html_content: str) -> Tuple[int, Tuple[Tuple[str, str, int], ...]]:
+    """Análisis memoizado (la clave es el propio contenido; su hash lo cachea Python)"""
+    parser = WordCountParser()
+    parser.feed(html_content)
+    parser.close()
+    return parser.total, section_counts(parser)
+
+
+def count_words(html_content: str) -> int:
+    """Palabras visibles de un fragmento o artículo HTML"""
+    if not html_content:
+        return 0
+    return _analyze(html_content)[0]
+
+
+def section_counts(parser: WordCountParser) -> Tuple[Tuple[str, str, int], ...]:
+    """Secciones de un parser ya alimentado: (encabezado, nivel, palabras)"""
+    return tuple(
+        (heading or '', level, words) for heading, level, words in parser.sections
+        if level in SECTION_TAGS or words
+    )
+
+
+def count_words_by_section(html_content: str) -> Dict:
+    """
+    Palabras del artículo en total y por sección
+
+    Returns:
+        Diccionario con 'total' y 'sections' (lista con 'heading', 'level' y
+        'words'). La introducción (antes del primer h2/h3) tiene nivel 'intro';
+        el texto fuera de <article>, si lo hay, nivel 'outro'.
+    """
+    if not html_content:
+        return {'total': 0, 'sections': []}
+
+    total, sections = _analyze(html_content)
+    return {
+        'total': total,
+        'sections': [
+            {'heading': heading, 'level': level, 'words': words}
+            for heading, level, words in sections
+        ]
+    }